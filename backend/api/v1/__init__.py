@@ -13,6 +13,7 @@ Routes:
 - /api/v1/metrics - System metrics & experiments (v4.0)
 - /api/v1/learning - Adaptive learning controls (v4.0)
 - /api/v1/v5 - Adaptive recommendations v5.0
+- /api/v1/admin - Pipeline tracing & operational metrics
 """
 
 from fastapi import APIRouter
@@ -25,6 +26,7 @@ from .conversation import router as conversation_router
 from .analytics import router as analytics_router
 from .recommendation import router as recommendation_router
 from .adaptive import router as adaptive_router
+from .admin import router as admin_router
 
 # Create main v1 router
 v1_router = APIRouter(prefix="/api/v1")
@@ -45,4 +47,7 @@ v1_router.include_router(recommendation_router, prefix="/learning", tags=["Learn
 # Adaptive Recommendation System v5.0
 v1_router.include_router(adaptive_router, prefix="/v5", tags=["Adaptive v5.0"])
 
+# Operational endpoints
+v1_router.include_router(admin_router, prefix="/admin", tags=["Admin"])
+
 __all__ = ["v1_router"]
@@ -43,6 +43,7 @@ from backend.services.conversation.session_reward import (
 from backend.services.recommendation.scoring_engine import (
     ScoringEngine,
     ScoredSong,
+    get_scoring_engine,
 )
 from backend.services.recommendation.cold_start import (
     get_cold_start_handler,
@@ -549,6 +550,13 @@ async def submit_reward_feedback(
     emotional = calculator.calculate_emotional_alignment()
     total_reward = calculator.calculate_session_reward()
     
+    # Credit the strategy that produced the song, in this user's posteriors
+    strategy = request.context.get("strategy") if request.context else None
+    if strategy in ScoringEngine.STRATEGIES:
+        get_scoring_engine().update_bandit(
+            strategy, calculator.get_bandit_reward(strategy), user_id=user_id
+        )
+    
     # Update weights based on feedback
     weight_adapter = WeightAdapter()
     weights_updated = False
@@ -0,0 +1,89 @@
+"""
+=============================================================================
+ADMIN API ENDPOINTS
+=============================================================================
+
+Operational endpoints for inspecting the chat pipeline.
+All endpoints require an admin token (see get_admin_user_id).
+
+Endpoints:
+- GET /api/v1/admin/pipeline/stats - Per-stage latency histograms
+- GET /api/v1/admin/pipeline/traces - Recent slow (or all recent) traces
+- DELETE /api/v1/admin/pipeline/traces - Reset histograms and trace buffers
+
+Author: MusicMoodBot Team
+Version: 1.0.0
+=============================================================================
+"""
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+from typing import Any, Dict, List
+
+from backend.services.tracing import get_pipeline_tracer
+from backend.api.v1.dependencies import get_admin_user_id
+
+router = APIRouter(dependencies=[Depends(get_admin_user_id)])
+
+
+# =============================================================================
+# RESPONSE MODELS
+# =============================================================================
+
+class PipelineStatsResponse(BaseModel):
+    """Per-stage latency histograms."""
+    slow_threshold_ms: float
+    stages: Dict[str, Dict[str, Any]]
+
+
+class PipelineTracesResponse(BaseModel):
+    """Recent request traces."""
+    slow_only: bool
+    count: int
+    traces: List[Dict[str, Any]]
+
+
+# =============================================================================
+# ENDPOINTS
+# =============================================================================
+
+@router.get(
+    "/pipeline/stats",
+    response_model=PipelineStatsResponse,
+    summary="Get pipeline stage latencies",
+    description="Latency histograms (count, mean, p50/p95/p99, buckets) per pipeline stage."
+)
+async def get_pipeline_stats():
+    """Get aggregated per-stage latency histograms."""
+    tracer = get_pipeline_tracer()
+    return PipelineStatsResponse(
+        slow_threshold_ms=tracer.slow_threshold_ms,
+        stages=tracer.get_stats()
+    )
+
+
+@router.get(
+    "/pipeline/traces",
+    response_model=PipelineTracesResponse,
+    summary="Get recent pipeline traces",
+    description="Recent slow traces (above the slow threshold) with per-stage spans."
+)
+async def get_pipeline_traces(
+    limit: int = Query(20, ge=1, le=100, description="Maximum traces to return"),
+    slow_only: bool = Query(True, description="Only traces above the slow threshold")
+):
+    """Get recent traces, newest first."""
+    tracer = get_pipeline_tracer()
+    traces = tracer.get_slow_traces(limit) if slow_only else tracer.get_recent_traces(limit)
+    return PipelineTracesResponse(slow_only=slow_only, count=len(traces), traces=traces)
+
+
+@router.delete(
+    "/pipeline/traces",
+    summary="Reset pipeline tracing",
+    description="Clear latency histograms and trace buffers."
+)
+async def reset_pipeline_traces():
+    """Reset histograms and trace buffers."""
+    get_pipeline_tracer().reset()
+    return {"status": "success"}
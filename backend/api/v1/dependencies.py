@@ -5,6 +5,7 @@ Shared dependencies for API routes (authentication, rate limiting, etc.)
 """
 
 from fastapi import HTTPException, Header, Depends
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 import jwt
 import os
@@ -67,6 +68,45 @@ async def get_optional_user_id(
         return None
 
 
+async def get_admin_user_id(
+    authorization: Optional[str] = Header(None)
+) -> int:
+    """
+    Require an authenticated admin user.
+    
+    Unlike ``get_current_user_id`` there is no anonymous fallback: the
+    token's user must be listed in ``MMB_ADMIN_USER_IDS``
+    (comma-separated user ids).
+    """
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    
+    user_id = await get_current_user_id(authorization)
+    admin_ids = {
+        int(value) for value in os.environ.get("MMB_ADMIN_USER_IDS", "").split(",")
+        if value.strip().isdigit()
+    }
+    if user_id not in admin_ids:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user_id
+
+
+async def get_read_consistent_user_id(
+    user_id: int = Depends(get_current_user_id)
+) -> int:
+    """
+    Resolve the current user and wait for their buffered chat writes.
+    
+    Chat history is persisted by a background writer; read endpoints
+    use this dependency so a user always sees the recommendations they
+    just received (read-your-writes).
+    """
+    from backend.services.write_behind import wait_for_pending_writes
+    
+    await run_in_threadpool(wait_for_pending_writes, user_id=user_id)
+    return user_id
+
+
 def get_db_path() -> str:
     """
     Get the database path for analytics and other DB operations.
@@ -22,7 +22,7 @@ from backend.repositories import (
     FeedbackRepository,
     UserPreferencesRepository
 )
-from backend.api.v1.dependencies import get_current_user_id
+from backend.api.v1.dependencies import get_current_user_id, get_read_consistent_user_id
 
 router = APIRouter()
 
@@ -107,7 +107,7 @@ class HistoryResponse(BaseModel):
 # =============================================================================
 
 @router.get("/profile", response_model=UserProfileResponse)
-async def get_profile(user_id: int = Depends(get_current_user_id)):
+async def get_profile(user_id: int = Depends(get_read_consistent_user_id)):
     """
     Get user profile with statistics and learned preferences.
     
@@ -220,7 +220,7 @@ async def update_profile(
 
 @router.get("/history", response_model=HistoryResponse)
 async def get_history(
-    user_id: int = Depends(get_current_user_id),
+    user_id: int = Depends(get_read_consistent_user_id),
     mood: Optional[str] = Query(None, description="Filter by mood"),
     from_date: Optional[str] = Query(None, description="Filter from date (YYYY-MM-DD)"),
     to_date: Optional[str] = Query(None, description="Filter to date (YYYY-MM-DD)"),
@@ -340,7 +340,7 @@ async def get_preferences(user_id: int = Depends(get_current_user_id)):
 
 
 @router.delete("/history")
-async def clear_history(user_id: int = Depends(get_current_user_id)):
+async def clear_history(user_id: int = Depends(get_read_consistent_user_id)):
     """
     Clear all listening history for the user.
     
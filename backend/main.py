@@ -14,6 +14,7 @@ from backend.src.api.mood_api import router as mood_router
 from backend.src.api.extended_api import router as extended_router
 from backend.src.api.auth_api import router as auth_router
 from backend.api.v1 import v1_router  # New production API
+from backend.services.write_behind import shutdown_write_behind
 import logging
 
 # Setup logging
@@ -68,6 +69,12 @@ app.include_router(extended_router, prefix="/api/v2", tags=["extended", "playlis
 app.include_router(auth_router, prefix="/api/v2", tags=["authentication"])
 
 
+@app.on_event("shutdown")
+def flush_background_writes():
+    """Flush buffered chat history writes before exit."""
+    shutdown_write_behind()
+
+
 @app.get("/health")
 def health_check():
     """Health check endpoint."""
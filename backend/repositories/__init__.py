@@ -8,12 +8,28 @@ Uses context managers for safe database connections.
 """
 
 from .base import BaseRepository
-from .song_repository import SongRepository
+from .song_repository import (
+    SongRepository,
+    get_catalog_generation,
+    bump_catalog_generation,
+    ensure_song_moods,
+    sync_song_moods,
+    normalize_mood,
+)
 from .user_repository import UserRepository
 from .history_repository import HistoryRepository
 from .feedback_repository import FeedbackRepository
 from .preferences_repository import UserPreferencesRepository
 from .playlist_repository import PlaylistRepository
+from .invalidation import (
+    CATALOG_TAG,
+    InvalidationBus,
+    feedback_tag,
+    get_invalidation_bus,
+    publish_invalidation,
+    song_tag,
+    user_tag,
+)
 
 # Connection pool for shared access
 from .connection import get_connection, get_db_path
@@ -28,4 +44,16 @@ __all__ = [
     "PlaylistRepository",
     "get_connection",
     "get_db_path",
+    "get_catalog_generation",
+    "bump_catalog_generation",
+    "ensure_song_moods",
+    "sync_song_moods",
+    "normalize_mood",
+    "CATALOG_TAG",
+    "InvalidationBus",
+    "feedback_tag",
+    "get_invalidation_bus",
+    "publish_invalidation",
+    "song_tag",
+    "user_tag",
 ]
@@ -20,6 +20,7 @@ from dataclasses import dataclass, field, asdict
 import math
 import json
 from .base import BaseRepository
+from .invalidation import feedback_tag, publish_invalidation, user_tag
 
 
 # =============================================================================
@@ -109,6 +110,7 @@ class FeedbackRepository(BaseRepository):
                 VALUES (?, ?, ?, ?)
             """, (user_id, song_id, feedback_type, history_id))
             conn.commit()
+            publish_invalidation(user_tag(user_id), feedback_tag(user_id))
             return cursor.lastrowid
     
     def get_user_feedback(self, user_id: int, limit: int = 100) -> List[Dict]:
@@ -200,6 +202,7 @@ class FeedbackRepository(BaseRepository):
                 """, (user_id, song_id, new_feedback_type))
             
             conn.commit()
+            publish_invalidation(user_tag(user_id), feedback_tag(user_id))
             return True
     
     def get_feedback_for_training(self, user_id: int, limit: int = 500) -> List[Dict]:
@@ -228,6 +231,25 @@ class FeedbackRepository(BaseRepository):
             """, (user_id, limit))
             return [dict(row) for row in cursor.fetchall()]
 
+    def get_training_version(self, user_id: int) -> int:
+        """
+        Get the write-version of a user's training feedback.
+        
+        The version is the newest like/dislike feedback_id, so it
+        increases with every write that changes the training data of
+        ``get_feedback_for_training``.
+        
+        Returns:
+            Latest training feedback_id, or 0 if the user has none
+        """
+        with self.connection() as conn:
+            cursor = conn.execute("""
+                SELECT MAX(feedback_id) FROM feedback
+                WHERE user_id = ? AND feedback_type IN ('like', 'dislike')
+            """, (user_id,))
+            row = cursor.fetchone()
+            return row[0] or 0
+
     # =========================================================================
     # EXTENDED FEEDBACK TYPES (v4.0)
     # =========================================================================
@@ -271,6 +293,7 @@ class FeedbackRepository(BaseRepository):
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (user_id, song_id, feedback_type, context_json, emotional_json, session_id))
             conn.commit()
+            publish_invalidation(user_tag(user_id), feedback_tag(user_id))
             return cursor.lastrowid
     
     def get_contextual_patterns(self, user_id: int) -> Dict[str, Dict]:
@@ -593,6 +616,7 @@ class FeedbackRepository(BaseRepository):
             """, (user_id, feature, old_weight, new_weight, reason))
             
             conn.commit()
+            publish_invalidation(user_tag(user_id))
         
         return WeightAdjustment(
             user_id=user_id,
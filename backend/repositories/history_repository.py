@@ -7,6 +7,7 @@ Data access for chat_history and recommendations tables.
 from typing import List, Dict, Optional
 from datetime import datetime
 from .base import BaseRepository
+from .invalidation import publish_invalidation, user_tag
 
 
 class HistoryRepository(BaseRepository):
@@ -27,8 +28,49 @@ class HistoryRepository(BaseRepository):
                 (user_id, mood, intensity, song_id, reason)
             )
             conn.commit()
+            publish_invalidation(user_tag(user_id))
             return cursor.lastrowid
     
+    def insert_chat_entries(self, conn, entries: List[Dict]) -> int:
+        """
+        Insert several chat history entries on an open connection.
+        
+        The caller owns the transaction (commit/rollback), which lets
+        batched writers group many entries into a single transaction.
+        The caller also publishes ``user:<id>`` for the affected users
+        once it has committed, so no cache reloads uncommitted data.
+        
+        Args:
+            conn: Open sqlite3 connection
+            entries: Dicts with user_id, mood, intensity, song_id, reason
+            
+        Returns:
+            Number of rows inserted
+        """
+        conn.executemany(
+            f"""INSERT INTO {self.TABLE} 
+            (user_id, mood, intensity, song_id, reason) 
+            VALUES (?, ?, ?, ?, ?)""",
+            [
+                (e["user_id"], e.get("mood"), e.get("intensity"),
+                 e.get("song_id"), e.get("reason"))
+                for e in entries
+            ]
+        )
+        return len(entries)
+    
+    def get_recent_chat_song_ids(self, user_id: int, limit: int = 100) -> List[int]:
+        """Get song IDs from the user's most recent chat history entries"""
+        with self.connection() as conn:
+            cursor = conn.execute(
+                f"""SELECT song_id FROM {self.TABLE} 
+                WHERE user_id = ? AND song_id IS NOT NULL 
+                ORDER BY history_id DESC 
+                LIMIT ?""",
+                (user_id, limit)
+            )
+            return [row["song_id"] for row in cursor.fetchall()]
+    
     def get_user_history(self, user_id: int, limit: int = 50) -> List[Dict]:
         """Get chat history for a user"""
         with self.connection() as conn:
@@ -101,4 +143,5 @@ class HistoryRepository(BaseRepository):
                 (user_id,)
             )
             conn.commit()
+            publish_invalidation(user_tag(user_id))
             return cursor.rowcount
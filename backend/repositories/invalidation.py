@@ -0,0 +1,204 @@
+"""
+Cache Invalidation Bus
+======================
+Tag-based invalidation shared by every in-process cache.
+
+Cache entries can carry tags naming the data they were computed from:
+``song:<id>``, ``user:<id>``, ``feedback:<id>`` for a user's like,
+dislike and skip feedback only, or ``catalog`` for anything that
+depends on the song catalog as a whole. Caches register tagged keys with the
+bus, and repository writes publish the tags they touch. A publish
+deletes exactly the entries carrying those tags. It costs one lookup
+per tag plus one delete per affected entry. There are no pattern scans
+over cache keys.
+
+Caches only need a ``delete(key)`` method and must call ``untag`` when
+they drop an entry themselves (eviction, expiry, clear). Caches that
+keep their own tag index (e.g. on disk) can ``subscribe`` instead and
+receive every published tag through ``invalidate_tags(tags)``. The bus
+holds caches weakly.
+
+Author: MusicMoodBot Team
+Version: 1.0.0
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+CATALOG_TAG = "catalog"
+
+
+def song_tag(song_id: Any) -> str:
+    """Tag of entries derived from one song."""
+    return f"song:{song_id}"
+
+
+def user_tag(user_id: Any) -> str:
+    """Tag of entries derived from one user's feedback or preferences."""
+    return f"user:{user_id}"
+
+
+def feedback_tag(user_id: Any) -> str:
+    """Tag of entries derived only from one user's feedback rows."""
+    return f"feedback:{user_id}"
+
+
+@dataclass
+class InvalidationStats:
+    """Invalidation bus statistics."""
+    tagged_entries: int = 0
+    publishes: int = 0
+    invalidated: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'tagged_entries': self.tagged_entries,
+            'publishes': self.publishes,
+            'invalidated': self.invalidated,
+        }
+
+
+class InvalidationBus:
+    """
+    Maps tags to cache keys across caches.
+
+    Usage:
+        bus = get_invalidation_bus()
+        bus.tag(cache, key, [song_tag(12), CATALOG_TAG])  # after cache.put
+        bus.untag(cache, key)                               # on eviction
+        bus.publish(song_tag(12))                           # after a write
+
+        bus.subscribe(cache)  # cache.invalidate_tags(tags) on every publish
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # tag -> {(cache ref, key)}
+        self._keys: Dict[str, Set[Tuple[weakref.ref, str]]] = {}
+        # cache -> key -> tags
+        self._tags: "weakref.WeakKeyDictionary[Any, Dict[str, Tuple[str, ...]]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        # caches resolving tags themselves
+        self._subscribers: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self._publishes = 0
+        self._invalidated = 0
+
+    def tag(self, cache: Any, key: str, tags: Iterable[str]) -> None:
+        """Set the tags of a cache entry (replacing previous tags)."""
+        tags = tuple(dict.fromkeys(tags))
+        with self._lock:
+            entries = self._tags.get(cache)
+            if entries is None:
+                if not tags:
+                    return
+                entries = self._tags[cache] = {}
+            ref = weakref.ref(cache)
+            self._unlink(ref, key, entries.pop(key, ()))
+            if tags:
+                entries[key] = tags
+                for tag in tags:
+                    self._keys.setdefault(tag, set()).add((ref, key))
+
+    def untag(self, cache: Any, key: str) -> None:
+        """Forget a cache entry (call when the cache drops it)."""
+        with self._lock:
+            entries = self._tags.get(cache)
+            if entries:
+                self._unlink(weakref.ref(cache), key, entries.pop(key, ()))
+
+    def untag_all(self, cache: Any) -> None:
+        """Forget every entry of a cache (call when it is cleared)."""
+        with self._lock:
+            entries = self._tags.pop(cache, None)
+            if entries:
+                ref = weakref.ref(cache)
+                for key, tags in entries.items():
+                    self._unlink(ref, key, tags)
+
+    def subscribe(self, cache: Any) -> None:
+        """Call ``cache.invalidate_tags(tags)`` on every publish."""
+        with self._lock:
+            self._subscribers.add(cache)
+
+    def unsubscribe(self, cache: Any) -> None:
+        """Stop notifying a subscribed cache."""
+        with self._lock:
+            self._subscribers.discard(cache)
+
+    def tags_of(self, cache: Any, key: str) -> Tuple[str, ...]:
+        """Tags of a cache entry (empty if untagged)."""
+        with self._lock:
+            return self._tags.get(cache, {}).get(key, ())
+
+    def publish(self, *tags: str) -> int:
+        """Invalidate every entry carrying any of ``tags``, returns the count."""
+        targets: List[Tuple[Any, str]] = []
+        with self._lock:
+            self._publishes += 1
+            for tag in tags:
+                for ref, key in self._keys.pop(tag, ()):
+                    cache = ref()
+                    if cache is None:
+                        continue
+                    entry_tags = self._tags.get(cache, {}).pop(key, None)
+                    if entry_tags is None:
+                        continue  # Already collected through another tag
+                    self._unlink(ref, key, entry_tags)
+                    targets.append((cache, key))
+            subscribers = list(self._subscribers)
+
+        # Caches are called without the bus lock (they untag under their own)
+        invalidated = len(targets)
+        for cache, key in targets:
+            try:
+                cache.delete(key)
+            except Exception as e:
+                logger.warning(f"Cache invalidation of {key} failed: {e}")
+        for cache in subscribers:
+            try:
+                invalidated += cache.invalidate_tags(tags)
+            except Exception as e:
+                logger.warning(f"Cache invalidation of {tags} failed: {e}")
+
+        with self._lock:
+            self._invalidated += invalidated
+        return invalidated
+
+    def get_stats(self) -> InvalidationStats:
+        with self._lock:
+            return InvalidationStats(
+                tagged_entries=sum(len(entries) for entries in self._tags.values()),
+                publishes=self._publishes,
+                invalidated=self._invalidated,
+            )
+
+    def _unlink(self, ref: weakref.ref, key: str, tags: Iterable[str]) -> None:
+        """Remove (cache, key) from the tag index (caller holds the lock)."""
+        for tag in tags:
+            keys = self._keys.get(tag)
+            if keys is not None:
+                keys.discard((ref, key))
+                if not keys:
+                    del self._keys[tag]
+
+
+_bus = InvalidationBus()
+
+
+def get_invalidation_bus() -> InvalidationBus:
+    """The process-wide invalidation bus."""
+    return _bus
+
+
+def publish_invalidation(*tags: str) -> int:
+    """Invalidate cache entries carrying any of ``tags`` on the shared bus."""
+    return _bus.publish(*tags)
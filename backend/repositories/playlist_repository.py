@@ -235,19 +235,42 @@ class PlaylistRepository(BaseRepository):
         """
         Create auto-generated playlist from chat session.
         
+        Returns:
+            playlist_id
+        """
+        with self.connection() as conn:
+            playlist_id = self.insert_auto_playlist(conn, user_id, mood, song_ids)
+            conn.commit()
+            return playlist_id
+    
+    def insert_auto_playlist(self, conn, user_id: int, mood: str,
+                             song_ids: List[int]) -> int:
+        """
+        Insert an auto-generated playlist and its songs on an open connection.
+        
+        The caller owns the transaction (commit/rollback).
+        
+        Args:
+            conn: Open sqlite3 connection
+            user_id: Owner of the playlist
+            mood: Mood label used in the name and description
+            song_ids: Songs in playlist order
+            
         Returns:
             playlist_id
         """
         name = f"Playlist {mood} - {datetime.now().strftime('%d/%m %H:%M')}"
-        playlist_id = self.create(
-            user_id=user_id,
-            name=name,
-            mood=mood,
-            description=f"Auto-generated for mood: {mood}",
-            is_auto_generated=True
-        )
         
-        if playlist_id:
-            self.add_songs_bulk(playlist_id, song_ids)
+        cursor = conn.execute("""
+            INSERT INTO playlists 
+            (user_id, name, description, mood, is_auto_generated, song_count, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (user_id, name, f"Auto-generated for mood: {mood}", mood, True, len(song_ids)))
+        playlist_id = cursor.lastrowid
+        
+        conn.executemany("""
+            INSERT INTO playlist_songs (playlist_id, song_id, position)
+            VALUES (?, ?, ?)
+        """, [(playlist_id, song_id, i + 1) for i, song_id in enumerate(song_ids)])
         
         return playlist_id
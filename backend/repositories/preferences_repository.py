@@ -7,6 +7,7 @@ Data access for user_preferences table (learned preference weights).
 from typing import List, Dict, Optional
 from datetime import datetime
 from .base import BaseRepository
+from .invalidation import publish_invalidation, user_tag
 
 
 class UserPreferencesRepository(BaseRepository):
@@ -104,6 +105,7 @@ class UserPreferencesRepository(BaseRepository):
                 """, (user_id, pref_type, pref_value, new_weight))
             
             conn.commit()
+            publish_invalidation(user_tag(user_id))
             return new_weight
     
     def set_preference(self, user_id: int, pref_type: str, 
@@ -123,6 +125,7 @@ class UserPreferencesRepository(BaseRepository):
                 DO UPDATE SET weight = ?, updated_at = CURRENT_TIMESTAMP
             """, (user_id, pref_type, pref_value, weight, weight))
             conn.commit()
+            publish_invalidation(user_tag(user_id))
             return cursor.rowcount > 0
     
     def get_top_preferences(self, user_id: int, pref_type: str, 
@@ -177,6 +180,7 @@ class UserPreferencesRepository(BaseRepository):
                 (user_id,)
             )
             conn.commit()
+            publish_invalidation(user_tag(user_id))
             return cursor.rowcount
     
     def get_preference_summary(self, user_id: int) -> Dict:
@@ -2,10 +2,172 @@
 Song Repository
 ===============
 Data access for songs table.
+
+Every catalog write through this repository advances a process-wide
+catalog generation; caches derived from the catalog include it in their
+keys so they never serve results computed from an older catalog. The
+write also publishes the ``catalog`` and ``song:<id>`` tags on the
+invalidation bus, dropping tagged cache entries.
+
+Mood filters read the normalized ``song_moods(song_id, mood, confidence)``
+table instead of ``LIKE`` scans over ``songs``. Every write that touches
+a mood column re-syncs the affected rows with ``sync_song_moods``.
 """
 
-from typing import List, Dict, Optional
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterable, List, Dict, Optional
 from .base import BaseRepository
+from .invalidation import CATALOG_TAG, publish_invalidation, song_tag
+
+
+_catalog_generation = 0
+_generation_lock = threading.Lock()
+
+
+def get_catalog_generation() -> int:
+    """Current catalog generation (advanced on every song write)."""
+    return _catalog_generation
+
+
+def bump_catalog_generation(song_ids: Iterable[Any] = ()) -> int:
+    """
+    Advance the catalog generation, returns the new value.
+    
+    Also invalidates cache entries tagged ``catalog`` or with the
+    ``song:<id>`` tag of a changed song.
+    """
+    global _catalog_generation
+    with _generation_lock:
+        _catalog_generation += 1
+        generation = _catalog_generation
+    publish_invalidation(CATALOG_TAG, *(song_tag(song_id) for song_id in song_ids))
+    return generation
+
+
+# =============================================================================
+# SONG MOODS
+# =============================================================================
+
+MOOD_COLUMNS = frozenset({"mood", "moods", "mood_confidence"})
+
+SONG_MOODS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS song_moods (
+    song_id INTEGER NOT NULL,
+    mood TEXT NOT NULL,
+    confidence REAL NOT NULL DEFAULT 1.0,
+    PRIMARY KEY (song_id, mood),
+    FOREIGN KEY (song_id) REFERENCES songs(song_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_song_moods_mood
+    ON song_moods(mood, confidence DESC, song_id);
+"""
+
+_MOOD_SEPARATORS = re.compile(r"[,;|/]")
+_SYNC_CHUNK = 500  # Stay well under SQLite's bound-parameter limit
+
+_song_moods_ready: set = set()
+
+
+def normalize_mood(mood: str) -> str:
+    """Canonical form of a mood label as stored in song_moods."""
+    return mood.strip().lower()
+
+
+def _split_moods(value: Any) -> List[str]:
+    """Mood labels in a ``mood``/``moods`` cell (may be a delimited list)."""
+    if not value or not isinstance(value, str):
+        return []
+    return [m for m in (normalize_mood(p) for p in _MOOD_SEPARATORS.split(value)) if m]
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def _has_song_moods(conn: sqlite3.Connection) -> bool:
+    return _has_table(conn, "song_moods")
+
+
+def sync_song_moods(conn: sqlite3.Connection, song_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Rebuild song_moods rows from the songs table.
+
+    ``mood`` contributes its ``mood_confidence`` (1.0 when unset), tags in
+    the legacy ``moods`` column contribute 1.0. Deleted songs lose their
+    rows. The caller commits. Databases without song_moods are left
+    alone; ``ensure_song_moods`` backfills them on first read.
+
+    Args:
+        conn: Open connection
+        song_ids: Songs to re-sync (default: whole catalog)
+
+    Returns:
+        Number of song_moods rows written
+    """
+    if not _has_song_moods(conn):
+        return 0
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(songs)")}
+    if not columns:
+        return 0
+    mood_col = "mood" if "mood" in columns else "NULL"
+    moods_col = "moods" if "moods" in columns else "NULL"
+    conf_col = "mood_confidence" if "mood_confidence" in columns else "NULL"
+    select = f"SELECT song_id, {mood_col}, {moods_col}, {conf_col} FROM songs"
+
+    if song_ids is None:
+        conn.execute("DELETE FROM song_moods")
+        batches = [conn.execute(select).fetchall()]
+    else:
+        ids = list(dict.fromkeys(song_ids))
+        if not ids:
+            return 0
+        batches = []
+        for start in range(0, len(ids), _SYNC_CHUNK):
+            chunk = ids[start:start + _SYNC_CHUNK]
+            marks = ", ".join("?" * len(chunk))
+            conn.execute(f"DELETE FROM song_moods WHERE song_id IN ({marks})", chunk)
+            batches.append(conn.execute(f"{select} WHERE song_id IN ({marks})", chunk).fetchall())
+
+    written = 0
+    for rows in batches:
+        entries: Dict[tuple, float] = {}
+        for song_id, mood, moods, confidence in rows:
+            for label in _split_moods(mood):
+                weight = 1.0 if confidence is None else float(confidence)
+                entries[(song_id, label)] = max(weight, entries.get((song_id, label), 0.0))
+            for label in _split_moods(moods):
+                entries[(song_id, label)] = 1.0
+        conn.executemany(
+            "INSERT OR REPLACE INTO song_moods (song_id, mood, confidence) VALUES (?, ?, ?)",
+            [(song_id, label, weight) for (song_id, label), weight in entries.items()]
+        )
+        written += len(entries)
+    return written
+
+
+def ensure_song_moods(conn: sqlite3.Connection, db_path: Optional[str] = None) -> None:
+    """
+    Create song_moods (backfilled from songs) if the database lacks it.
+
+    Databases without a songs table are left untouched. When ``db_path``
+    is given the check runs once per database per process.
+    """
+    if db_path is not None and db_path in _song_moods_ready:
+        return
+    exists = _has_song_moods(conn)
+    if not exists and not _has_table(conn, "songs"):
+        return
+    conn.executescript(SONG_MOODS_SCHEMA)
+    if not exists:
+        sync_song_moods(conn)
+    conn.commit()
+    if db_path is not None:
+        _song_moods_ready.add(db_path)
 
 
 class SongRepository(BaseRepository):
@@ -14,12 +176,22 @@ class SongRepository(BaseRepository):
     TABLE = "songs"
     PRIMARY_KEY = "song_id"
     
+    @contextmanager
+    def connection(self):
+        """Get a database connection context (song_moods guaranteed)"""
+        with super().connection() as conn:
+            ensure_song_moods(conn, self.db_path)
+            yield conn
+    
     def get_by_mood(self, mood: str, limit: int = 20) -> List[Dict]:
-        """Get songs filtered by mood"""
+        """Get songs filtered by mood, most confident first"""
         with self.connection() as conn:
             cursor = conn.execute(
-                f"SELECT * FROM {self.TABLE} WHERE mood = ? OR moods LIKE ? LIMIT ?",
-                (mood, f"%{mood}%", limit)
+                f"""SELECT s.* FROM song_moods sm
+                JOIN {self.TABLE} s ON s.song_id = sm.song_id
+                WHERE sm.mood = ?
+                ORDER BY sm.confidence DESC LIMIT ?""",
+                (normalize_mood(mood), limit)
             )
             return [dict(row) for row in cursor.fetchall()]
     
@@ -63,8 +235,32 @@ class SongRepository(BaseRepository):
                 VALUES (?, ?, ?, ?, ?, ?)""",
                 (name, artist, genre, suy_score, reason, moods)
             )
+            sync_song_moods(conn, [cursor.lastrowid])
+            conn.commit()
+        bump_catalog_generation()
+        return cursor.lastrowid
+    
+    def update(self, record_id: Any, **fields) -> bool:
+        """Update a song, re-sync its moods and advance the catalog generation"""
+        updated = super().update(record_id, **fields)
+        if updated:
+            if MOOD_COLUMNS.intersection(fields):
+                self._sync_moods(record_id)
+            bump_catalog_generation([record_id])
+        return updated
+    
+    def delete(self, record_id: Any) -> bool:
+        """Delete a song with its moods and advance the catalog generation"""
+        deleted = super().delete(record_id)
+        if deleted:
+            self._sync_moods(record_id)
+            bump_catalog_generation([record_id])
+        return deleted
+    
+    def _sync_moods(self, record_id: Any) -> None:
+        with self.connection() as conn:
+            sync_song_moods(conn, [record_id])
             conn.commit()
-            return cursor.lastrowid
     
     def get_random(self, limit: int = 5, mood: str = None) -> List[Dict]:
         """Get random songs, optionally filtered by mood"""
@@ -72,9 +268,9 @@ class SongRepository(BaseRepository):
             if mood:
                 cursor = conn.execute(
                     f"""SELECT * FROM {self.TABLE} 
-                    WHERE mood = ? OR moods LIKE ? 
+                    WHERE song_id IN (SELECT song_id FROM song_moods WHERE mood = ?) 
                     ORDER BY RANDOM() LIMIT ?""",
-                    (mood, f"%{mood}%", limit)
+                    (normalize_mood(mood), limit)
                 )
             else:
                 cursor = conn.execute(
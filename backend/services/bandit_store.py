@@ -0,0 +1,308 @@
+"""
+Bandit State Store
+==================
+Persistent per-user Beta posteriors for Thompson sampling.
+
+ThompsonSamplingBandit used to keep a single set of posteriors in
+process memory: a restart wiped everything learned, and every worker
+process learned its own, diverging copy. This store keeps one
+``(alpha, beta)`` pair per (user, arm) in the ``bandit_stats`` table:
+
+- Reads go through an in-process LRU of per-user numpy arrays; entries
+  are reloaded after ``max_age`` seconds so workers converge on the
+  shared state
+- Reward updates are applied to memory immediately and buffered as
+  deltas; a background thread, started with the first update, writes
+  them in one transaction per batch (write-behind)
+- Deltas are added in SQL (``alpha = alpha + ?``), so concurrent
+  workers never overwrite each other's updates
+- ``flush()`` / ``close()`` write everything still buffered
+
+Author: MusicMoodBot Team
+Version: 1.0.0
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.repositories import get_db_path
+from backend.src.database.migrations.migrate_adaptive_v5 import SQL_CREATE_BANDIT_STATS
+
+logger = logging.getLogger(__name__)
+
+
+SQL_UPSERT_DELTA = """
+INSERT INTO bandit_stats (user_id, strategy_name, alpha, beta, total_pulls, total_reward)
+VALUES (?, ?, ? + ?, ? + ?, ?, ?)
+ON CONFLICT(user_id, strategy_name) DO UPDATE SET
+    alpha = alpha + ?,
+    beta = beta + ?,
+    total_pulls = total_pulls + excluded.total_pulls,
+    total_reward = total_reward + excluded.total_reward,
+    updated_at = CURRENT_TIMESTAMP
+"""
+
+
+# =============================================================================
+# DATA CLASSES
+# =============================================================================
+
+@dataclass
+class Posterior:
+    """Beta posterior parameters of one user, aligned with the store's arms."""
+    alphas: np.ndarray
+    betas: np.ndarray
+    loaded_at: float = 0.0
+
+    def copy(self) -> "Posterior":
+        return Posterior(self.alphas.copy(), self.betas.copy(), self.loaded_at)
+
+
+# =============================================================================
+# BANDIT STATE STORE
+# =============================================================================
+
+class BanditStateStore:
+    """
+    Per-(user, arm) Beta posteriors with LRU caching and write-behind.
+
+    Usage:
+        store = get_bandit_store(arms=["emotion", "content"])
+        posterior = store.get(user_id)
+        samples = rng.beta(posterior.alphas, posterior.betas)
+        store.update(user_id, "emotion", d_alpha=1.0, d_beta=0.0, reward=1.0)
+    """
+
+    def __init__(
+        self,
+        arms: Sequence[str],
+        db_path: Optional[str] = None,
+        prior_alpha: float = 1.0,
+        prior_beta: float = 1.0,
+        capacity: int = 10000,
+        max_age: float = 30.0,
+        flush_interval: float = 1.0
+    ):
+        """
+        Initialize store (no database writes until the first update).
+
+        Args:
+            arms: Arm (strategy) names
+            db_path: Database path (default: repository default)
+            prior_alpha: Alpha of arms without stored state
+            prior_beta: Beta of arms without stored state
+            capacity: Users kept in the LRU
+            max_age: Seconds before a cached user is reloaded
+            flush_interval: Seconds between write-behind batches
+        """
+        self.arms = tuple(arms)
+        self.db_path = db_path or get_db_path()
+        self.prior_alpha = prior_alpha
+        self.prior_beta = prior_beta
+        self.capacity = capacity
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+
+        self._index = {arm: i for i, arm in enumerate(self.arms)}
+        self._cache: "OrderedDict[int, Posterior]" = OrderedDict()
+        # (user_id, arm index) -> [d_alpha, d_beta, pulls, reward]
+        self._pending: Dict[Tuple[int, int], List[float]] = {}
+        self._in_flight: Dict[Tuple[int, int], List[float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Held while a batch is written
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # =========================================================================
+    # PUBLIC API
+    # =========================================================================
+
+    def get(self, user_id: int) -> Posterior:
+        """Current posterior of a user, including unwritten updates."""
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None and time.monotonic() - cached.loaded_at < self.max_age:
+                self._cache.move_to_end(user_id)
+                return self._with_deltas(user_id, cached)
+
+        # No batch can commit between the read and the delta merge
+        with self._flush_lock:
+            loaded = self._load(user_id)
+            with self._lock:
+                self._cache[user_id] = loaded
+                self._cache.move_to_end(user_id)
+                while len(self._cache) > self.capacity:
+                    self._cache.popitem(last=False)
+                return self._with_deltas(user_id, loaded)
+
+    def update(
+        self,
+        user_id: int,
+        arm: str,
+        d_alpha: float,
+        d_beta: float,
+        reward: float
+    ) -> None:
+        """Record one pull of ``arm`` for a user (written behind)."""
+        index = self._index.get(arm)
+        if index is None:
+            return
+        self._start()
+        with self._lock:
+            delta = self._pending.setdefault((user_id, index), [0.0, 0.0, 0, 0.0])
+            delta[0] += d_alpha
+            delta[1] += d_beta
+            delta[2] += 1
+            delta[3] += reward
+
+    def flush(self) -> int:
+        """Write buffered updates now, returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+            if not batch:
+                return 0
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.warning(f"Bandit state flush failed, will retry: {e}")
+                with self._lock:
+                    for key, delta in batch.items():
+                        pending = self._pending.setdefault(key, [0.0, 0.0, 0, 0.0])
+                        for i, value in enumerate(delta):
+                            pending[i] += value
+                    self._in_flight = {}
+                return 0
+            with self._lock:
+                self._in_flight = {}
+                # Written deltas are now part of the stored state
+                for user_id in {user_id for user_id, _ in batch}:
+                    self._cache.pop(user_id, None)
+            return len(batch)
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop the writer thread and write remaining updates."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    # =========================================================================
+    # INTERNALS
+    # =========================================================================
+
+    def _start(self) -> None:
+        """Create the table and start the writer thread, once."""
+        if self._thread is not None:
+            return
+        with self._flush_lock:
+            if self._thread is not None or self._stop.is_set():
+                return
+            self._ensure_table()
+            self._thread = threading.Thread(
+                target=self._run, name="bandit-store", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10.0)
+
+    def _ensure_table(self) -> None:
+        con = self._connect()
+        try:
+            con.executescript(SQL_CREATE_BANDIT_STATS)
+        finally:
+            con.close()
+
+    def _prior(self) -> Posterior:
+        n = len(self.arms)
+        return Posterior(
+            np.full(n, self.prior_alpha, dtype=np.float64),
+            np.full(n, self.prior_beta, dtype=np.float64),
+            time.monotonic(),
+        )
+
+    def _load(self, user_id: int) -> Posterior:
+        posterior = self._prior()
+        try:
+            con = self._connect()
+            try:
+                rows = con.execute(
+                    "SELECT strategy_name, alpha, beta FROM bandit_stats WHERE user_id = ?",
+                    (user_id,)
+                ).fetchall()
+            finally:
+                con.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not load bandit state for user {user_id}: {e}")
+            return posterior
+        for arm, alpha, beta in rows:
+            index = self._index.get(arm)
+            if index is not None:
+                posterior.alphas[index] = alpha
+                posterior.betas[index] = beta
+        return posterior
+
+    def _with_deltas(self, user_id: int, base: Posterior) -> Posterior:
+        """``base`` plus in-flight and pending deltas (caller holds the lock)."""
+        posterior = base.copy()
+        for deltas in (self._in_flight, self._pending):
+            for index in range(len(self.arms)):
+                delta = deltas.get((user_id, index))
+                if delta is not None:
+                    posterior.alphas[index] += delta[0]
+                    posterior.betas[index] += delta[1]
+        return posterior
+
+    def _write(self, batch: Dict[Tuple[int, int], List[float]]) -> None:
+        rows = [
+            (
+                user_id, self.arms[index],
+                self.prior_alpha, d_alpha, self.prior_beta, d_beta, pulls, reward,
+                d_alpha, d_beta,
+            )
+            for (user_id, index), (d_alpha, d_beta, pulls, reward) in batch.items()
+        ]
+        con = self._connect()
+        try:
+            with con:
+                con.executemany(SQL_UPSERT_DELTA, rows)
+        finally:
+            con.close()
+
+
+# =============================================================================
+# SINGLETON INSTANCES
+# =============================================================================
+
+_stores: Dict[Tuple[str, Tuple[str, ...]], BanditStateStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_bandit_store(
+    arms: Sequence[str],
+    db_path: Optional[str] = None
+) -> BanditStateStore:
+    """Get or create the bandit store for a database and arm set."""
+    key = (db_path or get_db_path(), tuple(arms))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = BanditStateStore(arms, key[0])
+            atexit.register(store.close)
+        return store
@@ -0,0 +1,209 @@
+"""
+Candidate Pool Cache
+====================
+Short-TTL cache of mood candidate pools shared across users.
+
+Chip selections and mood buttons reach the chat pipeline with a small,
+fixed set of (mood, intensity) inputs, yet every request used to load
+the whole catalog and run a MoodEngine prediction per song. The
+candidate pool only depends on the mood, the intensity and the catalog
+itself, so it is computed once and shared:
+
+- Pools are keyed by (mood, intensity, catalog generation); any song
+  write advances the generation, so stale pools are never served
+- Pools are tagged ``catalog`` on the invalidation bus, so a catalog
+  write frees them right away instead of leaving them to expire
+- Entries expire after ``ttl_seconds`` to bound staleness from writers
+  outside this process (import scripts, other workers)
+- At most ``max_entries`` pools are resident (LRU)
+
+Per-user work (already-heard exclusion, personalization, curation)
+is applied on top of the shared pool by the caller.
+
+Author: MusicMoodBot Team
+Version: 1.0.0
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+from backend.repositories import CATALOG_TAG, get_catalog_generation, get_invalidation_bus
+
+
+PoolKey = Tuple[str, str, int]
+
+
+# =============================================================================
+# DATA CLASSES
+# =============================================================================
+
+@dataclass
+class CandidatePool:
+    """A cached, ranked candidate pool."""
+    songs: Tuple[Dict[str, Any], ...]
+    generation: int
+    built_at: float  # time.monotonic() when built
+
+
+@dataclass
+class CandidatePoolStats:
+    """Candidate pool cache statistics."""
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    builds: int = 0
+    evictions: int = 0
+    entries: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'builds': self.builds,
+            'evictions': self.evictions,
+            'entries': self.entries,
+            'hit_rate': round(self.hit_rate, 4),
+        }
+
+
+# =============================================================================
+# CANDIDATE POOL CACHE
+# =============================================================================
+
+class CandidatePoolCache:
+    """
+    Thread-safe TTL + LRU cache of candidate pools.
+
+    Usage:
+        pools = CandidatePoolCache(builder=build_pool, ttl_seconds=60)
+        songs = pools.get("happy", "Vừa")  # shared, do not mutate
+
+        # After a bulk catalog import outside SongRepository
+        pools.clear()
+    """
+
+    def __init__(
+        self,
+        builder: Callable[[str, str], List[Dict[str, Any]]],
+        ttl_seconds: float = 60.0,
+        max_entries: int = 64,
+        generation_fn: Callable[[], int] = get_catalog_generation
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            builder: Builds the ranked pool for (mood, intensity)
+            ttl_seconds: Maximum age of a pool
+            max_entries: Maximum number of resident pools
+            generation_fn: Returns the current catalog generation
+        """
+        self.builder = builder
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.generation_fn = generation_fn
+
+        self._pools: OrderedDict[PoolKey, CandidatePool] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = CandidatePoolStats()
+
+    # =========================================================================
+    # PUBLIC API
+    # =========================================================================
+
+    def get(self, mood: str, intensity: str) -> List[Dict[str, Any]]:
+        """
+        Get the pool for (mood, intensity), building it on miss.
+
+        The returned list is new but the song dicts are shared between
+        requests and must be treated as read-only.
+        """
+        generation = self.generation_fn()
+        key = ((mood or "").lower(), intensity or "", generation)
+
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is not None:
+                if time.monotonic() - pool.built_at <= self.ttl_seconds:
+                    self._pools.move_to_end(key)
+                    self._stats.hits += 1
+                    return list(pool.songs)
+                self._remove(key)
+                self._stats.expired += 1
+            self._stats.misses += 1
+
+        # Build outside the lock; concurrent duplicate builds are harmless
+        songs = self.builder(mood, intensity)
+
+        with self._lock:
+            self._stats.builds += 1
+            if songs and self.generation_fn() == generation:
+                self._insert(key, CandidatePool(
+                    songs=tuple(songs),
+                    generation=generation,
+                    built_at=time.monotonic()
+                ))
+
+        return list(songs)
+
+    def delete(self, key: PoolKey) -> bool:
+        """Drop one pool (invalidation hook)."""
+        with self._lock:
+            if key not in self._pools:
+                return False
+            self._remove(key)
+            return True
+
+    def clear(self) -> None:
+        """Drop all pools."""
+        with self._lock:
+            self._pools.clear()
+            get_invalidation_bus().untag_all(self)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pools)
+
+    def get_stats(self) -> CandidatePoolStats:
+        """Get cache statistics."""
+        with self._lock:
+            return CandidatePoolStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                expired=self._stats.expired,
+                builds=self._stats.builds,
+                evictions=self._stats.evictions,
+                entries=len(self._pools),
+            )
+
+    # =========================================================================
+    # INTERNALS
+    # =========================================================================
+
+    def _insert(self, key: PoolKey, pool: CandidatePool) -> None:
+        """Insert a pool, dropping older generations and LRU overflow."""
+        for stale in [k for k in self._pools if k[2] != pool.generation]:
+            self._remove(stale)
+
+        self._pools[key] = pool
+        self._pools.move_to_end(key)
+        get_invalidation_bus().tag(self, key, [CATALOG_TAG])
+
+        while len(self._pools) > self.max_entries:
+            self._remove(next(iter(self._pools)))
+            self._stats.evictions += 1
+
+    def _remove(self, key: PoolKey) -> None:
+        del self._pools[key]
+        get_invalidation_bus().untag(self, key)
@@ -5,10 +5,10 @@ The main orchestrator for the chat recommendation pipeline.
 
 Pipeline Flow:
 1. Input Classification (text → NLP mood detection, chip → direct mood)
-2. Candidate Song Selection (MoodEngine)
+2. Candidate Song Selection (MoodEngine, shared per-mood candidate pools)
 3. Personalization Re-ranking (PreferenceModel)
 4. Playlist Curation (CuratorEngine)
-5. Save & Respond
+5. Save & Respond (history writes are batched on a background writer)
 
 Author: MusicMoodBot Team
 Version: 2.0.0
@@ -17,16 +17,25 @@ Version: 2.0.0
 from __future__ import annotations
 
 import logging
+import os
 import uuid
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
 
+import numpy as np
+
 # Pipeline imports
 from backend.src.pipelines.text_mood_detector import TextMoodDetector, MoodScore
 from backend.src.pipelines.mood_engine import MoodEngine, EngineConfig
-from backend.src.pipelines.curator_engine import CuratorEngine, CuratorConfig
+from backend.src.pipelines.curator_engine import CuratorEngine, CuratorConfig, EnergyCurveTemplates
+from backend.src.pipelines.curator_types import CuratorTrack
 from backend.src.ranking.preference_model import PreferenceModel
+from backend.services.preference_cache import PreferenceModelCache
+from backend.services.candidate_pool import CandidatePoolCache
+from backend.services.implicit_als import EmbeddingService, get_embedding_service
+from backend.services.write_behind import WriteBehindWriter, get_write_behind_writer
+from backend.services.tracing import get_pipeline_tracer
 
 # Repository imports
 from backend.repositories import (
@@ -213,11 +222,21 @@ class ChatOrchestrator:
     - CuratorEngine for playlist curation
     """
     
+    # Songs kept per shared (mood, intensity) candidate pool
+    CANDIDATE_POOL_SIZE = 200
+    
+    # Recent history entries treated as "already heard"
+    HEARD_WINDOW = 100
+    
+    # Target energy (0-1) per intensity level
+    INTENSITY_ENERGY = {"Nhẹ": 0.3, "Vừa": 0.6, "Mạnh": 0.9}
+    
     def __init__(
         self,
         db_path: str = None,
         mood_config: EngineConfig = None,
-        curator_config: CuratorConfig = None
+        curator_config: CuratorConfig = None,
+        write_behind: bool = None
     ):
         """
         Initialize orchestrator with all components.
@@ -226,6 +245,8 @@ class ChatOrchestrator:
             db_path: Optional database path override
             mood_config: Optional MoodEngine configuration
             curator_config: Optional CuratorEngine configuration
+            write_behind: Persist chat history on a background writer
+                (default: MMB_WRITE_BEHIND env var, enabled)
         """
         # Initialize repositories
         self.song_repo = SongRepository(db_path)
@@ -239,10 +260,40 @@ class ChatOrchestrator:
         self.mood_engine = MoodEngine(cfg=mood_config or EngineConfig())
         self.curator_engine = CuratorEngine(cfg=curator_config or CuratorConfig())
         
-        # User preference models (cached per user)
-        self._pref_models: Dict[int, PreferenceModel] = {}
+        # User preference models (bounded LRU, invalidated by feedback writes)
+        self._pref_models = PreferenceModelCache(
+            trainer=self._train_pref_model,
+            version_fn=self.feedback_repo.get_training_version,
+            store_dir=os.environ.get(
+                "MMB_PREF_MODEL_DIR",
+                os.path.join(os.path.dirname(self.feedback_repo.db_path), "pref_models")
+            ),
+            max_models=int(os.environ.get("MMB_PREF_MODEL_CACHE_SIZE", 256))
+        )
+        
+        # Collaborative user/song embeddings (ALS), used once trained
+        self.embeddings: Optional[EmbeddingService] = get_embedding_service(
+            self.feedback_repo.db_path
+        )
+        
+        # Background persistence for chat history
+        if write_behind is None:
+            write_behind = os.environ.get("MMB_WRITE_BEHIND", "true").lower() == "true"
+        self.writer: Optional[WriteBehindWriter] = (
+            get_write_behind_writer(db_path) if write_behind else None
+        )
+        
+        # Per-stage latency tracing
+        self.tracer = get_pipeline_tracer()
+        
+        # Candidate pools shared across users, keyed by catalog generation
+        self._candidate_pools = CandidatePoolCache(
+            builder=self._build_candidate_pool,
+            ttl_seconds=float(os.environ.get("MMB_CANDIDATE_POOL_TTL", 60))
+        )
         
         # Fit mood engine with all songs
+        self._mood_engine_fitted = False
         self._fit_mood_engine()
     
     def _fit_mood_engine(self):
@@ -251,29 +302,38 @@ class ChatOrchestrator:
             songs = self.song_repo.get_all(limit=10000)
             if songs:
                 self.mood_engine.fit(songs)
+                self._mood_engine_fitted = True
                 logger.info(f"MoodEngine fitted with {len(songs)} songs")
         except Exception as e:
             logger.error(f"Failed to fit MoodEngine: {e}")
     
     def _get_pref_model(self, user_id: int) -> PreferenceModel:
-        """Get or create preference model for user."""
-        if user_id not in self._pref_models:
-            model = PreferenceModel()
-            
-            # Try to train from user's feedback history
-            feedback_data = self.feedback_repo.get_feedback_for_training(user_id)
-            if len(feedback_data) >= 5:  # Need minimum samples
-                try:
-                    songs = [dict(row) for row in feedback_data]
-                    labels = [row['label'] for row in feedback_data]
-                    model.fit(songs, labels)
-                    logger.info(f"Trained preference model for user {user_id} with {len(songs)} samples")
-                except Exception as e:
-                    logger.warning(f"Could not train preference model: {e}")
-            
-            self._pref_models[user_id] = model
+        """Get preference model for user from the model cache."""
+        return self._pref_models.get(user_id)
+    
+    def _train_pref_model(self, user_id: int) -> PreferenceModel:
+        """Train a preference model from the user's feedback history."""
+        model = PreferenceModel()
         
-        return self._pref_models[user_id]
+        feedback_data = self.feedback_repo.get_feedback_for_training(user_id)
+        if len(feedback_data) >= 5:  # Need minimum samples
+            try:
+                songs = [dict(row) for row in feedback_data]
+                labels = [row['label'] for row in feedback_data]
+                model.fit(songs, labels)
+                logger.info(f"Trained preference model for user {user_id} with {len(songs)} samples")
+            except Exception as e:
+                logger.warning(f"Could not train preference model: {e}")
+        
+        return model
+    
+    def get_pref_model_stats(self) -> Dict[str, Any]:
+        """Get preference model cache metrics (hit rate, resident models)."""
+        return self._pref_models.get_stats().to_dict()
+    
+    def get_candidate_pool_stats(self) -> Dict[str, Any]:
+        """Get shared candidate pool cache metrics."""
+        return self._candidate_pools.get_stats().to_dict()
     
     # =========================================================================
     # MAIN PIPELINE
@@ -308,76 +368,81 @@ class ChatOrchestrator:
         """
         session_id = session_id or str(uuid.uuid4())
         
-        try:
-            # Step 1: Mood Detection
-            mood_result = self._detect_mood(message, mood, intensity, input_type)
-            
-            # Handle greetings
-            if mood_result.is_greeting:
+        with self.tracer.trace("process_message", input_type=input_type):
+            try:
+                # Step 1: Mood Detection (greeting intent + mood inference)
+                with self.tracer.span("mood_detection"):
+                    mood_result = self._detect_mood(message, mood, intensity, input_type)
+                
+                # Handle greetings
+                if mood_result.is_greeting:
+                    return ChatResponse(
+                        success=True,
+                        detected_mood=mood_result,
+                        bot_message=NarrativeGenerator.generate_greeting_response(),
+                        session_id=session_id,
+                        require_mood_selection=True
+                    )
+                
+                # Step 2: Get Candidate Songs (spans recorded inside)
+                candidates = self._get_candidates(
+                    mood_result.mood, 
+                    mood_result.intensity,
+                    limit=50,  # Get more for re-ranking
+                    user_id=user_id
+                )
+                
+                if not candidates:
+                    # Fallback to popular songs
+                    with self.tracer.span("candidate_fallback"):
+                        candidates = self.song_repo.get_top_rated(limit=20)
+                        if not candidates:
+                            candidates = self.song_repo.get_random(limit=20)
+                
+                # Step 3: Personalization Re-ranking
+                with self.tracer.span("personalization"):
+                    personalized = self._personalize(candidates, user_id, mood_result)
+                
+                # Step 4: Playlist Curation
+                with self.tracer.span("curation"):
+                    curated = self._curate_playlist(
+                        personalized[:limit * 2],
+                        mood_result,
+                        songs_by_id={c.get("song_id"): c for c in candidates}
+                    )
+                
+                # Take top N and generate response text
+                with self.tracer.span("narrative"):
+                    final_songs = self._attach_reasons(curated[:limit], mood_result)
+                    bot_message = NarrativeGenerator.generate_response(
+                        mood_result.mood, mood_result.intensity
+                    )
+                
+                # Step 5: Save to history and create auto playlist
+                with self.tracer.span("persistence"):
+                    playlist_id = self._persist_results(
+                        user_id, final_songs, mood_result, input_type, message, session_id
+                    )
+                
+                self.tracer.annotate(mood=mood_result.mood, candidates=len(candidates))
+                
                 return ChatResponse(
                     success=True,
                     detected_mood=mood_result,
-                    bot_message=NarrativeGenerator.generate_greeting_response(),
-                    session_id=session_id,
-                    require_mood_selection=True
+                    bot_message=bot_message,
+                    songs=final_songs,
+                    playlist_id=playlist_id,
+                    session_id=session_id
                 )
-            
-            # Step 2: Get Candidate Songs
-            candidates = self._get_candidates(
-                mood_result.mood, 
-                mood_result.intensity,
-                limit=50  # Get more for re-ranking
-            )
-            
-            if not candidates:
-                # Fallback to popular songs
-                candidates = self.song_repo.get_top_rated(limit=20)
-                if not candidates:
-                    candidates = self.song_repo.get_random(limit=20)
-            
-            # Step 3: Personalization Re-ranking
-            personalized = self._personalize(candidates, user_id, mood_result)
-            
-            # Step 4: Playlist Curation
-            curated = self._curate_playlist(personalized[:limit * 2], mood_result)
-            
-            # Take top N
-            final_songs = curated[:limit]
-            
-            # Step 5: Save to history
-            history_ids = self._save_to_history(
-                user_id, final_songs, mood_result, input_type, message, session_id
-            )
-            
-            # Create auto playlist
-            playlist_id = None
-            if len(final_songs) >= 3:
-                song_ids = [s.song_id for s in final_songs]
-                playlist_id = self.playlist_repo.create_auto_playlist(
-                    user_id, mood_result.mood_vi, song_ids
+                
+            except Exception as e:
+                logger.error(f"Chat pipeline error: {e}", exc_info=True)
+                self.tracer.annotate(error=str(e))
+                return ChatResponse(
+                    success=False,
+                    error=f"Có lỗi xảy ra: {str(e)}",
+                    session_id=session_id
                 )
-            
-            # Generate response
-            bot_message = NarrativeGenerator.generate_response(
-                mood_result.mood, mood_result.intensity
-            )
-            
-            return ChatResponse(
-                success=True,
-                detected_mood=mood_result,
-                bot_message=bot_message,
-                songs=final_songs,
-                playlist_id=playlist_id,
-                session_id=session_id
-            )
-            
-        except Exception as e:
-            logger.error(f"Chat pipeline error: {e}", exc_info=True)
-            return ChatResponse(
-                success=False,
-                error=f"Có lỗi xảy ra: {str(e)}",
-                session_id=session_id
-            )
     
     # =========================================================================
     # PIPELINE STEPS
@@ -448,54 +513,119 @@ class ChatOrchestrator:
         self,
         mood: str,
         intensity: str,
-        limit: int = 50
+        limit: int = 50,
+        user_id: int = None
     ) -> List[Dict]:
         """
         Step 2: Get candidate songs from MoodEngine.
+        
+        The ranked pool for (mood, intensity) is shared across users and
+        cached per catalog generation. When ``user_id`` is given, songs
+        the user was recently recommended are moved behind fresh ones.
         """
         try:
-            # Get all songs for mood engine
-            all_songs = self.song_repo.get_all(limit=10000)
+            with self.tracer.span("candidate_pool"):
+                pool = self._candidate_pools.get(mood, intensity)
             
-            # Use mood engine to score and rank
-            if self.mood_engine._fitted:
-                # Score all songs
-                scored = []
-                for song in all_songs:
-                    try:
-                        prediction = self.mood_engine.predict_one(song)
-                        song_mood = prediction.get("label", "")
-                        
-                        # Calculate match score
-                        if song_mood.lower() == mood.lower():
-                            score = 1.0
-                        else:
-                            score = 0.5
-                        
-                        scored.append({
-                            **song,
-                            "mood_score": score,
-                            "predicted_mood": song_mood
-                        })
-                    except:
-                        pass
-                
-                # Sort by mood score
-                scored.sort(key=lambda x: x.get("mood_score", 0), reverse=True)
-                return scored[:limit]
+            if pool and user_id is not None:
+                with self.tracer.span("heard_exclusion"):
+                    pool = self._exclude_heard(pool, user_id, limit)
             
-            # Fallback: filter by mood field
-            mood_songs = self.song_repo.get_by_mood(mood, limit=limit)
-            if mood_songs:
-                return mood_songs
+            if pool:
+                return pool[:limit]
             
             # Last fallback: random songs
-            return self.song_repo.get_random(limit=limit)
+            with self.tracer.span("candidate_fallback"):
+                return self.song_repo.get_random(limit=limit)
             
         except Exception as e:
             logger.error(f"Error getting candidates: {e}")
             return self.song_repo.get_random(limit=limit)
     
+    def _build_candidate_pool(self, mood: str, intensity: str) -> List[Dict]:
+        """Build the ranked (mood, intensity) pool shared across users."""
+        # Get all songs for mood engine
+        with self.tracer.span("catalog_fetch"):
+            all_songs = self.song_repo.get_all(limit=10000)
+        
+        # Use mood engine to score and rank
+        if self._mood_engine_fitted and all_songs:
+            with self.tracer.span("mood_prediction"):
+                return self._score_by_predicted_mood(
+                    all_songs, mood, intensity, self.CANDIDATE_POOL_SIZE
+                )
+        
+        # Fallback: filter by mood field
+        with self.tracer.span("candidate_fallback"):
+            return self.song_repo.get_by_mood(mood, limit=self.CANDIDATE_POOL_SIZE)
+    
+    def _score_by_predicted_mood(
+        self,
+        all_songs: List[Dict],
+        mood: str,
+        intensity: str,
+        limit: int
+    ) -> List[Dict]:
+        """
+        Score songs by whether the MoodEngine label matches ``mood``.
+        
+        Ties are broken by distance from the intensity's target energy.
+        """
+        target_energy = self.INTENSITY_ENERGY.get(intensity, 0.6) * 100
+        
+        scored = []
+        for song in all_songs:
+            try:
+                prediction = self.mood_engine.predict(song)
+                song_mood = str(prediction.get("mood", ""))
+                
+                # Calculate match score
+                if song_mood.lower() == mood.lower():
+                    score = 1.0
+                else:
+                    score = 0.5
+                
+                scored.append({
+                    **song,
+                    "mood_score": score,
+                    "predicted_mood": song_mood
+                })
+            except Exception:
+                pass
+        
+        # Sort by mood score, then closeness to the target energy
+        scored.sort(key=lambda x: (
+            -x.get("mood_score", 0),
+            abs(float(50 if x.get("energy") is None else x["energy"]) - target_energy)
+        ))
+        return scored[:limit]
+    
+    def _exclude_heard(
+        self,
+        pool: List[Dict],
+        user_id: int,
+        limit: int
+    ) -> List[Dict]:
+        """
+        Move songs the user was recently recommended behind fresh ones.
+        
+        Heard songs are dropped entirely when at least ``limit`` fresh
+        songs remain. Pending (not yet committed) history writes count
+        as heard too.
+        """
+        heard = set(self.history_repo.get_recent_chat_song_ids(
+            user_id, limit=self.HEARD_WINDOW
+        ))
+        if self.writer is not None:
+            heard.update(self.writer.pending_song_ids(user_id))
+        if not heard:
+            return pool
+        
+        fresh = [song for song in pool if song.get("song_id") not in heard]
+        if len(fresh) >= limit:
+            return fresh
+        return fresh + [song for song in pool if song.get("song_id") in heard]
+    
     def _personalize(
         self,
         candidates: List[Dict],
@@ -506,62 +636,82 @@ class ChatOrchestrator:
         Step 3: Re-rank candidates using preference model.
         
         Final score = 0.6 * mood_score + 0.4 * preference_score
+        
+        All candidates are scored together: the learned preference
+        weights are gathered into one vector, the ML model runs a
+        single batched ``predict_proba`` over the candidate matrix, and
+        trained ALS embeddings add one dot product per candidate.
+        Reasons are left empty here and filled in by ``_attach_reasons``
+        once the final playlist is known.
         """
+        if not candidates:
+            return []
+        
         # Get user preferences
         user_prefs = self.prefs_repo.get_user_preferences(user_id)
         pref_model = self._get_pref_model(user_id)
         
-        recommendations = []
+        mood_prefs = user_prefs.get("mood", {})
+        genre_prefs = user_prefs.get("genre", {})
+        artist_prefs = user_prefs.get("artist", {})
         
-        for song in candidates:
-            mood_score = song.get("mood_score", 0.5)
-            
-            # Calculate preference score
-            pref_score = 1.0
-            
-            # Boost from learned preferences
-            song_mood = song.get("mood") or song.get("predicted_mood", "")
-            song_genre = song.get("genre", "")
-            song_artist = song.get("artist", "")
-            
-            if song_mood and song_mood in user_prefs.get("mood", {}):
-                pref_score *= user_prefs["mood"][song_mood]
-            
-            if song_genre and song_genre in user_prefs.get("genre", {}):
-                pref_score *= user_prefs["genre"][song_genre]
-            
-            if song_artist and song_artist in user_prefs.get("artist", {}):
-                pref_score *= user_prefs["artist"][song_artist]
-            
-            # Use ML model if fitted
-            if pref_model.is_fitted:
-                try:
-                    _, like_prob = pref_model.predict_proba(song)
-                    pref_score *= (0.5 + like_prob)  # Scale to 0.5-1.5
-                except:
-                    pass
-            
-            # Normalize pref_score
-            pref_score = min(2.0, pref_score)
-            
-            # Final score
-            final_score = 0.6 * mood_score + 0.4 * pref_score
-            
-            # Generate reason
-            reason = NarrativeGenerator.generate_song_reason(
-                song, mood_result.mood, mood_result.intensity
-            )
-            
+        song_moods = [song.get("mood") or song.get("predicted_mood", "") for song in candidates]
+        
+        mood_scores = np.array(
+            [song.get("mood_score", 0.5) for song in candidates], dtype=float
+        )
+        
+        # Boost from learned preferences (missing entries count as 1.0)
+        pref_scores = np.array([
+            mood_prefs.get(song_mood, 1.0) if song_mood else 1.0
+            for song_mood in song_moods
+        ], dtype=float)
+        pref_scores *= np.array([
+            genre_prefs.get(song.get("genre"), 1.0) if song.get("genre") else 1.0
+            for song in candidates
+        ], dtype=float)
+        pref_scores *= np.array([
+            artist_prefs.get(song.get("artist"), 1.0) if song.get("artist") else 1.0
+            for song in candidates
+        ], dtype=float)
+        
+        # Use ML model if fitted: one predict_proba for the whole batch
+        if pref_model.is_fitted:
+            try:
+                like_probs = pref_model.predict_like_proba(candidates)
+                pref_scores *= (0.5 + like_probs)  # Scale to 0.5-1.5
+            except Exception as e:
+                logger.warning(f"Batch preference prediction failed: {e}")
+        
+        # Collaborative affinity from ALS embeddings (songs not seen in training count as 1.0)
+        embeddings = self.embeddings.model() if self.embeddings is not None else None
+        if embeddings is not None and embeddings.user_vector(user_id) is not None:
+            song_ids = [song.get("song_id") for song in candidates]
+            affinity = np.clip(embeddings.score(user_id, song_ids), 0.0, 1.0)
+            pref_scores *= np.where(embeddings.rows(song_ids) >= 0, 0.5 + affinity, 1.0)
+        
+        # Normalize pref_score
+        pref_scores = np.minimum(pref_scores, 2.0)
+        
+        # Final score
+        final_scores = 0.6 * mood_scores + 0.4 * pref_scores
+        
+        # Sort by final score (stable, matching list.sort(reverse=True))
+        order = np.argsort(-final_scores, kind="stable")
+        
+        recommendations = []
+        for idx in order:
+            song = candidates[idx]
             recommendations.append(SongRecommendation(
                 song_id=song.get("song_id", 0),
                 name=song.get("song_name") or song.get("name", "Unknown"),
                 artist=song.get("artist", "Unknown"),
                 genre=song.get("genre", ""),
-                mood=song_mood,
-                mood_match_score=mood_score,
-                pref_score=pref_score,
-                final_score=final_score,
-                reason=reason,
+                mood=song_moods[idx],
+                mood_match_score=float(mood_scores[idx]),
+                pref_score=float(pref_scores[idx]),
+                final_score=float(final_scores[idx]),
+                reason="",
                 audio_features={
                     "energy": song.get("energy", 50),
                     "valence": song.get("valence", 50),
@@ -569,15 +719,28 @@ class ChatOrchestrator:
                 }
             ))
         
-        # Sort by final score
-        recommendations.sort(key=lambda x: x.final_score, reverse=True)
-        
         return recommendations
     
-    def _curate_playlist(
+    def _attach_reasons(
         self,
         songs: List[SongRecommendation],
         mood_result: MoodResult
+    ) -> List[SongRecommendation]:
+        """Generate recommendation reasons for the final playlist only."""
+        for song in songs:
+            if not song.reason:
+                song.reason = NarrativeGenerator.generate_song_reason(
+                    {"genre": song.genre, "artist": song.artist},
+                    mood_result.mood,
+                    mood_result.intensity
+                )
+        return songs
+    
+    def _curate_playlist(
+        self,
+        songs: List[SongRecommendation],
+        mood_result: MoodResult,
+        songs_by_id: Dict[int, Dict] = None
     ) -> List[SongRecommendation]:
         """
         Step 4: Use CuratorEngine to create smooth playlist.
@@ -586,47 +749,94 @@ class ChatOrchestrator:
         - Energy flow
         - Harmonic compatibility (Camelot)
         - Texture transitions
+        
+        The best personalized match opens the playlist; the rest are
+        sequenced by the curator around the intensity's target energy.
+        
+        Args:
+            songs: Personalized recommendations, best first
+            mood_result: Detected mood (intensity sets the target energy)
+            songs_by_id: Optional full song rows (key, mode, acousticness)
         """
         if len(songs) < 3:
             return songs
         
         try:
-            # Convert to dict format for curator
-            song_dicts = []
+            songs_by_id = songs_by_id or {}
+            song_lookup = {s.song_id: s for s in songs}
+            
+            tracks = []
             for s in songs:
-                song_dicts.append({
+                row = songs_by_id.get(s.song_id) or {
                     "song_id": s.song_id,
-                    "name": s.name,
+                    "song_name": s.name,
                     "artist": s.artist,
-                    "energy": s.audio_features.get("energy", 50),
-                    "valence": s.audio_features.get("valence", 50),
-                    "tempo": s.audio_features.get("tempo", 120),
-                    "camelot_key": "8A",  # Default if not available
-                    "_recommendation": s
-                })
-            
-            # Create song lookup
-            song_lookup = {s["song_id"]: s["_recommendation"] for s in song_dicts}
-            
-            # For now, apply simple energy-based ordering
-            # Full curator integration would use CuratorEngine.curate()
+                    "genre": s.genre,
+                    **s.audio_features
+                }
+                tracks.append(CuratorTrack.from_song_dict(row))
             
-            # Sort by energy to create flow
-            intensity_map = {"Nhẹ": 0.3, "Vừa": 0.6, "Mạnh": 0.9}
-            target_energy = intensity_map.get(mood_result.intensity, 0.6) * 100
+            target_energy = self.INTENSITY_ENERGY.get(mood_result.intensity, 0.6) * 100
+            energy_curve = EnergyCurveTemplates.focus_steady(
+                len(tracks) - 1, level=target_energy
+            )
             
-            # Sort by distance from target energy
-            song_dicts.sort(
-                key=lambda x: abs(x.get("energy", 50) - target_energy)
+            playlist = self.curator_engine.generate_playlist(
+                tracks[0], energy_curve, tracks[1:]
             )
             
-            # Return reordered songs
-            return [song_lookup[s["song_id"]] for s in song_dicts if s["song_id"] in song_lookup]
+            # Return reordered songs (anything the curator left out goes last)
+            curated = [song_lookup[t.song_id] for t in playlist if t.song_id in song_lookup]
+            seen = {s.song_id for s in curated}
+            curated.extend(s for s in songs if s.song_id not in seen)
+            return curated
             
         except Exception as e:
             logger.warning(f"Curation failed, returning original order: {e}")
             return songs
     
+    def _persist_results(
+        self,
+        user_id: int,
+        songs: List[SongRecommendation],
+        mood_result: MoodResult,
+        input_type: str,
+        input_text: str,
+        session_id: str
+    ) -> Optional[int]:
+        """
+        Step 5: Save history entries and the auto playlist.
+        
+        With write-behind enabled the history rows are handed to the
+        background writer. The auto playlist is always created
+        synchronously (one transaction) so its id can be returned.
+        
+        Returns:
+            playlist_id of the auto playlist, or None if none was created
+        """
+        if self.writer is not None:
+            self.writer.enqueue_history(user_id, session_id, [
+                {
+                    "mood": mood_result.mood_vi,
+                    "intensity": mood_result.intensity,
+                    "song_id": song.song_id,
+                    "reason": song.reason
+                }
+                for song in songs
+            ])
+        else:
+            self._save_to_history(
+                user_id, songs, mood_result, input_type, input_text, session_id
+            )
+        
+        playlist_id = None
+        if len(songs) >= 3:
+            song_ids = [s.song_id for s in songs]
+            playlist_id = self.playlist_repo.create_auto_playlist(
+                user_id, mood_result.mood_vi, song_ids
+            )
+        return playlist_id
+    
     def _save_to_history(
         self,
         user_id: int,
@@ -692,88 +902,90 @@ class ChatOrchestrator:
         """
         session_id = session_id or str(uuid.uuid4())
         
-        try:
-            # Extract mood data
-            mood_en = enriched_data.get('final_mood', 'happy')
-            intensity_raw = enriched_data.get('final_intensity', 0.5)
-            clarity = enriched_data.get('clarity_score', 0.5)
-            valence = enriched_data.get('valence', 0.0)
-            arousal = enriched_data.get('arousal', 0.5)
-            context = enriched_data.get('context', {})
-            
-            # Map intensity to Vietnamese level
-            if intensity_raw < 0.4:
-                intensity_vi = "Nhẹ"
-            elif intensity_raw < 0.7:
-                intensity_vi = "Vừa"
-            else:
-                intensity_vi = "Mạnh"
-            
-            # Create MoodResult
-            mood_vi = MOOD_EN_TO_VI.get(mood_en, mood_en.capitalize())
-            mood_result = MoodResult(
-                mood=mood_en,
-                mood_vi=mood_vi,
-                confidence=clarity,
-                intensity=intensity_vi,
-                source="conversation"
-            )
-            
-            # Get candidates with context-aware adjustments
-            candidates = self._get_candidates_enriched(
-                mood=mood_en,
-                intensity=intensity_vi,
-                valence=valence,
-                arousal=arousal,
-                context=context,
-                limit=50
-            )
-            
-            if not candidates:
-                candidates = self.song_repo.get_random(limit=20)
-            
-            # Personalization
-            personalized = self._personalize(candidates, user_id, mood_result)
-            
-            # Curation
-            curated = self._curate_playlist(personalized[:limit * 2], mood_result)
-            final_songs = curated[:limit]
-            
-            # Save to history
-            self._save_to_history(
-                user_id, final_songs, mood_result, 
-                "conversation", None, session_id
-            )
-            
-            # Create playlist
-            playlist_id = None
-            if len(final_songs) >= 3:
-                song_ids = [s.song_id for s in final_songs]
-                playlist_id = self.playlist_repo.create_auto_playlist(
-                    user_id, mood_result.mood_vi, song_ids
+        with self.tracer.trace("process_enriched_request", input_type="conversation"):
+            try:
+                # Extract mood data
+                mood_en = enriched_data.get('final_mood', 'happy')
+                intensity_raw = enriched_data.get('final_intensity', 0.5)
+                clarity = enriched_data.get('clarity_score', 0.5)
+                valence = enriched_data.get('valence', 0.0)
+                arousal = enriched_data.get('arousal', 0.5)
+                context = enriched_data.get('context', {})
+                
+                # Map intensity to Vietnamese level
+                if intensity_raw < 0.4:
+                    intensity_vi = "Nhẹ"
+                elif intensity_raw < 0.7:
+                    intensity_vi = "Vừa"
+                else:
+                    intensity_vi = "Mạnh"
+                
+                # Create MoodResult
+                mood_vi = MOOD_EN_TO_VI.get(mood_en, mood_en.capitalize())
+                mood_result = MoodResult(
+                    mood=mood_en,
+                    mood_vi=mood_vi,
+                    confidence=clarity,
+                    intensity=intensity_vi,
+                    source="conversation"
+                )
+                
+                # Get candidates with context-aware adjustments
+                with self.tracer.span("candidate_enrichment"):
+                    candidates = self._get_candidates_enriched(
+                        mood=mood_en,
+                        intensity=intensity_vi,
+                        valence=valence,
+                        arousal=arousal,
+                        context=context,
+                        limit=50
+                    )
+                    
+                    if not candidates:
+                        candidates = self.song_repo.get_random(limit=20)
+                
+                # Personalization
+                with self.tracer.span("personalization"):
+                    personalized = self._personalize(candidates, user_id, mood_result)
+                
+                # Curation
+                with self.tracer.span("curation"):
+                    curated = self._curate_playlist(
+                        personalized[:limit * 2],
+                        mood_result,
+                        songs_by_id={c.get("song_id"): c for c in candidates}
+                    )
+                
+                # Generate reasons and response
+                with self.tracer.span("narrative"):
+                    final_songs = self._attach_reasons(curated[:limit], mood_result)
+                    bot_message = NarrativeGenerator.generate_response(
+                        mood_result.mood, mood_result.intensity
+                    )
+                
+                # Save to history and create playlist
+                with self.tracer.span("persistence"):
+                    playlist_id = self._persist_results(
+                        user_id, final_songs, mood_result,
+                        "conversation", None, session_id
+                    )
+                
+                return ChatResponse(
+                    success=True,
+                    detected_mood=mood_result,
+                    bot_message=bot_message,
+                    songs=final_songs,
+                    playlist_id=playlist_id,
+                    session_id=session_id
+                )
+                
+            except Exception as e:
+                logger.error(f"Enriched request pipeline error: {e}", exc_info=True)
+                return ChatResponse(
+                    success=False,
+                    error=f"Có lỗi xảy ra: {str(e)}",
+                    session_id=session_id
                 )
-            
-            # Generate response
-            bot_message = NarrativeGenerator.generate_response(
-                mood_result.mood, mood_result.intensity
-            )
-            
-            return ChatResponse(
-                success=True,
-                detected_mood=mood_result,
-                bot_message=bot_message,
-                songs=final_songs,
-                playlist_id=playlist_id,
-                session_id=session_id
-            )
-            
-        except Exception as e:
-            logger.error(f"Enriched request pipeline error: {e}", exc_info=True)
-            return ChatResponse(
-                success=False,
-                error=f"Có lỗi xảy ra: {str(e)}",
-                session_id=session_id
-            )
     
     def _get_candidates_enriched(
         self,
@@ -880,7 +1092,7 @@ class ChatOrchestrator:
         
         try:
             # 1. Save feedback
-            self.feedback_repo.add(
+            feedback_id = self.feedback_repo.add(
                 user_id=user_id,
                 song_id=song_id,
                 feedback_type=feedback_type,
@@ -908,9 +1120,9 @@ class ChatOrchestrator:
                 except:
                     pass
             
-            # 5. Invalidate cached preference model
-            if user_id in self._pref_models:
-                del self._pref_models[user_id]
+            # 5. Advance the training version so the cached model is refreshed
+            if feedback_type in ('like', 'dislike'):
+                self._pref_models.record_write(user_id, feedback_id)
             
             # Generate response message
             messages = {
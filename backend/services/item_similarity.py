@@ -0,0 +1,412 @@
+"""
+Item Similarity
+===============
+Sparse item-item co-occurrence model for collaborative filtering.
+
+CollaborativeStrategy fell back to plain popularity whenever no
+``user_similarity_fn`` was supplied, which is the normal case. This
+module builds the missing signal offline:
+
+- A sparse user x song matrix of implicit feedback is read from
+  listening history (``log1p(play_count)``, plus a bonus for liked
+  rows) and the ``feedback`` table (likes add, dislikes remove)
+- Song vectors are L2-normalized and multiplied in column blocks, so
+  the full song x song product is never materialized
+- Each song keeps only its ``top_n`` most similar neighbours (cosine),
+  stored as one CSR matrix and persisted to an ``.npz`` file
+- At request time a user's score for a candidate is the sum of its
+  similarity to the songs the user has heard: one sparse row lookup
+  and sum
+
+Build offline with:
+    python -m backend.services.item_similarity --db-path path/to/music.db
+
+Author: MusicMoodBot Team
+Version: 1.0.0
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from backend.repositories import get_db_path
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# DATA CLASSES
+# =============================================================================
+
+@dataclass(frozen=True)
+class ItemSimilarityModel:
+    """
+    Truncated song x song cosine similarities.
+
+    Row ``i`` of ``matrix`` holds the nearest neighbours of
+    ``song_ids[i]`` (columns use the same order). The diagonal is empty.
+    """
+    song_ids: np.ndarray        # int64, sorted
+    matrix: sparse.csr_matrix   # float64, at most top_n entries per row
+    built_at: datetime
+
+    def __len__(self) -> int:
+        return int(self.song_ids.size)
+
+    @property
+    def nnz(self) -> int:
+        return int(self.matrix.nnz)
+
+    def rows(self, song_ids: Iterable) -> np.ndarray:
+        """Row index of each song id, -1 for songs not in the model."""
+        ids = np.fromiter(
+            (i if isinstance(i, (int, np.integer)) else -1 for i in song_ids),
+            dtype=np.int64
+        )
+        return id_positions(self.song_ids, ids)
+
+    def neighbours(self, song_id: int, k: int = 10) -> Dict[int, float]:
+        """Most similar songs of one song, by similarity."""
+        row = int(self.rows([song_id])[0])
+        if row < 0:
+            return {}
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        cols = self.matrix.indices[start:end]
+        sims = self.matrix.data[start:end]
+        order = np.argsort(-sims, kind='stable')[:k]
+        return {int(self.song_ids[cols[i]]): float(sims[i]) for i in order}
+
+    def score(
+        self,
+        seed_song_ids: Iterable,
+        candidate_ids: Iterable,
+        mean: bool = False
+    ) -> np.ndarray:
+        """
+        Summed similarity of each candidate to the seed songs.
+
+        With ``mean`` the sum is divided by the number of seeds found in
+        the model, which keeps scores in [0, 1]. Seeds and candidates not
+        in the model contribute / score 0.
+        """
+        candidates = self.rows(candidate_ids)
+        out = np.zeros(candidates.size)
+        seeds = self.rows(set(seed_song_ids))
+        seeds = seeds[seeds >= 0]
+        if not seeds.size:
+            return out
+        totals = np.asarray(self.matrix[seeds].sum(axis=0)).ravel()
+        if mean:
+            totals /= seeds.size
+        known = candidates >= 0
+        out[known] = totals[candidates[known]]
+        return out
+
+    def save(self, path: str) -> None:
+        """Write the model atomically (temp file + rename)."""
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp,
+            song_ids=self.song_ids,
+            data=self.matrix.data,
+            indices=self.matrix.indices,
+            indptr=self.matrix.indptr,
+            built_at=np.array(self.built_at.timestamp()),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ItemSimilarityModel":
+        with np.load(path) as data:
+            song_ids = data['song_ids']
+            n = song_ids.size
+            matrix = sparse.csr_matrix(
+                (data['data'], data['indices'], data['indptr']), shape=(n, n)
+            )
+            built_at = datetime.fromtimestamp(float(data['built_at']))
+        return cls(song_ids=song_ids, matrix=matrix, built_at=built_at)
+
+
+# =============================================================================
+# OFFLINE BUILD
+# =============================================================================
+
+def build_item_similarity(
+    db_path: Optional[str] = None,
+    top_n: int = 50,
+    like_weight: float = 1.0,
+    min_similarity: float = 0.01,
+    block_size: int = 2048
+) -> ItemSimilarityModel:
+    """
+    Build the model from listening history and feedback.
+
+    Args:
+        db_path: Database path (default: repository default)
+        top_n: Neighbours kept per song
+        like_weight: Interaction weight added per like
+        min_similarity: Similarities below this are dropped
+        block_size: Songs per block of the similarity product
+    """
+    con = sqlite3.connect(db_path or get_db_path(), timeout=10.0)
+    try:
+        song_ids = np.array(
+            [r[0] for r in con.execute("SELECT song_id FROM songs ORDER BY song_id")],
+            dtype=np.int64
+        )
+        users, songs, weights = read_interactions(con, like_weight)
+    finally:
+        con.close()
+
+    n = song_ids.size
+    _, interactions = interaction_matrix(song_ids, users, songs, weights)
+    # Column-normalize so X^T X is cosine similarity
+    norms = np.sqrt(np.asarray(interactions.multiply(interactions).sum(axis=0)).ravel())
+    scale = np.divide(1.0, norms, out=np.zeros(n), where=norms > 0)
+    normalized = (interactions @ sparse.diags(scale)).tocsc()
+
+    blocks = []
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        product = (normalized[:, start:end].T @ normalized).tocsr()
+        blocks.append(_truncate_rows(product, start, top_n, min_similarity))
+    matrix = (
+        sparse.vstack(blocks, format='csr') if blocks
+        else sparse.csr_matrix((0, 0))
+    )
+    matrix.sort_indices()
+
+    model = ItemSimilarityModel(song_ids=song_ids, matrix=matrix, built_at=datetime.now())
+    logger.info(f"Built item similarity: {n} songs, {model.nnz} pairs (top {top_n})")
+    return model
+
+
+def read_interactions(
+    con: sqlite3.Connection,
+    like_weight: float = 1.0
+) -> Tuple[List[int], List[int], List[float]]:
+    """
+    Implicit feedback as parallel (user, song, weight) lists.
+
+    History rows weigh ``log1p(play_count)`` plus ``like_weight`` if
+    liked; feedback likes add and dislikes subtract ``like_weight``.
+    """
+    users, songs, weights = [], [], []
+
+    history = {row[1] for row in con.execute("PRAGMA table_info(listening_history)")}
+    if {'user_id', 'song_id'} <= history:
+        plays = "COALESCE(play_count, 1)" if 'play_count' in history else "1"
+        liked = "COALESCE(liked, 0)" if 'liked' in history else "0"
+        for user_id, song_id, count, is_liked in con.execute(
+            f"SELECT user_id, song_id, {plays}, {liked} FROM listening_history "
+            f"WHERE user_id IS NOT NULL AND song_id IS NOT NULL"
+        ):
+            users.append(user_id)
+            songs.append(song_id)
+            weights.append(np.log1p(max(count, 1)) + (like_weight if is_liked else 0.0))
+
+    feedback = {row[1] for row in con.execute("PRAGMA table_info(feedback)")}
+    if {'user_id', 'song_id', 'feedback_type'} <= feedback:
+        for user_id, song_id, kind in con.execute(
+            "SELECT user_id, song_id, feedback_type FROM feedback "
+            "WHERE feedback_type IN ('like', 'dislike')"
+        ):
+            users.append(user_id)
+            songs.append(song_id)
+            weights.append(like_weight if kind == 'like' else -like_weight)
+
+    return users, songs, weights
+
+
+def id_positions(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Index of each id in ``sorted_ids``, -1 where absent."""
+    if not sorted_ids.size:
+        return np.full(ids.size, -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(sorted_ids, ids), sorted_ids.size - 1)
+    return np.where(sorted_ids[pos] == ids, pos, -1)
+
+
+def interaction_matrix(
+    song_ids: np.ndarray,
+    users: Sequence[int],
+    songs: Sequence[int],
+    weights: Sequence[float]
+) -> Tuple[np.ndarray, sparse.csr_matrix]:
+    """
+    User x song matrix of summed positive weights.
+
+    Columns are aligned with ``song_ids`` (songs outside it are dropped);
+    returns the sorted user ids of the rows and the matrix.
+    """
+    n = song_ids.size
+    songs = np.asarray(songs, dtype=np.int64)
+    if not songs.size or not n:
+        return np.empty(0, dtype=np.int64), sparse.csr_matrix((0, n))
+    pos = id_positions(song_ids, songs)
+    known = pos >= 0
+    user_ids, user_rows = np.unique(np.asarray(users, dtype=np.int64)[known], return_inverse=True)
+    matrix = sparse.coo_matrix(
+        (np.asarray(weights, dtype=np.float64)[known], (user_rows, pos[known])),
+        shape=(user_ids.size, n)
+    ).tocsr()  # Sums duplicate (user, song) entries
+    # Net-negative pairs (more dislikes than listening) carry no co-occurrence
+    matrix.data = np.maximum(matrix.data, 0.0)
+    matrix.eliminate_zeros()
+    return user_ids, matrix
+
+
+def _truncate_rows(
+    block: sparse.csr_matrix,
+    offset: int,
+    top_n: int,
+    min_similarity: float
+) -> sparse.csr_matrix:
+    """Keep the ``top_n`` largest off-diagonal entries of each row."""
+    indptr = [0]
+    indices, data = [], []
+    for row in range(block.shape[0]):
+        start, end = block.indptr[row], block.indptr[row + 1]
+        cols = block.indices[start:end]
+        sims = block.data[start:end]
+        keep = (cols != row + offset) & (sims >= min_similarity)
+        cols, sims = cols[keep], sims[keep]
+        if sims.size > top_n:
+            top = np.argpartition(-sims, top_n - 1)[:top_n]
+            cols, sims = cols[top], sims[top]
+        indices.append(cols)
+        data.append(sims)
+        indptr.append(indptr[-1] + cols.size)
+    return sparse.csr_matrix(
+        (
+            np.concatenate(data) if data else np.empty(0),
+            np.concatenate(indices) if indices else np.empty(0, dtype=np.int32),
+            np.array(indptr),
+        ),
+        shape=block.shape
+    )
+
+
+# =============================================================================
+# ITEM SIMILARITY SERVICE
+# =============================================================================
+
+class ItemSimilarityService:
+    """
+    Serves the persisted model, reloading it when the file changes.
+
+    Usage:
+        service = get_item_similarity_service()
+        model = service.model()  # None until a model has been built
+        if model is not None:
+            scores = model.score(history_song_ids, candidate_ids)
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        model_path: Optional[str] = None,
+        check_interval: float = 60.0
+    ):
+        """
+        Initialize service (the model is loaded on first use).
+
+        Args:
+            db_path: Database path (default: repository default)
+            model_path: Persisted model (default: item_similarity.npz next to the database)
+            check_interval: Seconds between checks for a newer model file
+        """
+        self.db_path = db_path or get_db_path()
+        self.model_path = model_path or default_model_path(self.db_path)
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._model: Optional[ItemSimilarityModel] = None
+        self._mtime: Optional[float] = None
+        self._checked_at: Optional[float] = None
+
+    def model(self) -> Optional[ItemSimilarityModel]:
+        """Current model, or None if none has been built yet."""
+        now = time.monotonic()
+        checked = self._checked_at
+        if checked is not None and now - checked < self.check_interval:
+            return self._model
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.model_path)
+            except OSError:
+                return self._model
+            if mtime != self._mtime:
+                try:
+                    self._model = ItemSimilarityModel.load(self.model_path)
+                    self._mtime = mtime
+                except Exception as e:
+                    logger.warning(f"Could not load item similarity model: {e}")
+            return self._model
+
+    def rebuild(self, **kwargs) -> ItemSimilarityModel:
+        """Build, persist and serve a fresh model (see build_item_similarity)."""
+        model = build_item_similarity(self.db_path, **kwargs)
+        model.save(self.model_path)
+        with self._lock:
+            self._model = model
+            self._mtime = os.path.getmtime(self.model_path)
+            self._checked_at = time.monotonic()
+        return model
+
+
+def default_model_path(db_path: str) -> str:
+    """Where the model of a database is persisted."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "item_similarity.npz")
+
+
+# =============================================================================
+# SINGLETON INSTANCES
+# =============================================================================
+
+_services: Dict[str, ItemSimilarityService] = {}
+_services_lock = threading.Lock()
+
+
+def get_item_similarity_service(db_path: Optional[str] = None) -> ItemSimilarityService:
+    """Get or create the item similarity service for a database."""
+    path = db_path or get_db_path()
+    with _services_lock:
+        service = _services.get(path)
+        if service is None:
+            service = _services[path] = ItemSimilarityService(path)
+        return service
+
+
+# =============================================================================
+# CLI INTERFACE
+# =============================================================================
+
+def main():
+    """CLI entry point."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the item similarity model")
+    parser.add_argument("--db-path", default=None, help="Path to SQLite database")
+    parser.add_argument("--output", default=None, help="Model file (default: next to database)")
+    parser.add_argument("--top-n", type=int, default=50, help="Neighbours kept per song")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    service = ItemSimilarityService(args.db_path, args.output)
+    model = service.rebuild(top_n=args.top_n)
+    print(f"Saved {len(model)} songs / {model.nnz} pairs to {service.model_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+Popularity Statistics
+=====================
+Catalog-wide popularity arrays shared by the recommendation engines.
+
+Popularity used to be normalized against whatever candidate list a
+request happened to pass in (``max(play_count)`` of the candidates), so
+the same song scored differently from one request to the next and the
+statistics were recomputed on every call. This service keeps them once
+for the whole catalog:
+
+- Play counts come from listening history and are decayed
+  exponentially (``half_life_days``), so recent plays count more
+- Percentiles rank every catalog song against the whole catalog, for
+  both decayed plays and the static ``songs.popularity`` column
+- Refreshes are incremental: only history rows above the row id
+  high-water mark (plus songs whose rows were updated in place since
+  the last timestamp watermark) are read, existing totals are decayed
+  forward in place, and new catalog songs are merged in
+- A background thread refreshes every ``refresh_interval`` seconds;
+  readers get an immutable ``PopularitySnapshot`` of aligned numpy
+  arrays and never wait on a refresh
+
+Both listening history layouts are supported: one row per (user, song)
+with ``play_count``/``last_played``, and one row per listen with
+``listened_at``.
+
+Author: MusicMoodBot Team
+Version: 1.0.0
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.repositories import get_db_path
+from backend.services.item_similarity import id_positions
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# DATA CLASSES
+# =============================================================================
+
+@dataclass(frozen=True)
+class PopularitySnapshot:
+    """
+    Immutable popularity arrays, aligned by ``song_ids`` (ascending).
+
+    Percentiles are the fraction of other catalog songs with a strictly
+    lower value, so unplayed songs sit at 0 and the top song at 1.
+    """
+    song_ids: np.ndarray              # int64, sorted
+    play_counts: np.ndarray           # Total plays from listening history
+    decayed_plays: np.ndarray         # Plays with exponential time decay
+    play_percentiles: np.ndarray      # [0, 1] rank of decayed plays
+    catalog_percentiles: np.ndarray   # [0, 1] rank of songs.popularity
+    version: int
+    built_at: datetime
+
+    def __len__(self) -> int:
+        return int(self.song_ids.size)
+
+    @property
+    def has_plays(self) -> bool:
+        """Whether any listening history has been seen."""
+        return bool(self.play_counts.size) and float(self.play_counts.max()) > 0
+
+    def rows(self, song_ids: Iterable) -> np.ndarray:
+        """Row index of each song id, -1 for songs not in the snapshot."""
+        ids = np.fromiter(
+            (i if isinstance(i, (int, np.integer)) else -1 for i in song_ids),
+            dtype=np.int64
+        )
+        return id_positions(self.song_ids, ids)
+
+    def lookup(
+        self,
+        song_ids: Iterable,
+        column: str = 'play_percentiles',
+        default: float = 0.0
+    ) -> np.ndarray:
+        """Values of ``column`` for the given song ids (``default`` if unknown)."""
+        values = getattr(self, column)
+        rows = self.rows(song_ids)
+        out = np.full(rows.size, default, dtype=np.float64)
+        known = rows >= 0
+        out[known] = values[rows[known]]
+        return out
+
+    def top(self, k: int) -> List[int]:
+        """
+        Most popular song ids.
+
+        Ordered by decayed plays, then catalog popularity, then song id.
+        """
+        if k <= 0 or not len(self):
+            return []
+        order = np.lexsort((self.song_ids, -self.catalog_percentiles, -self.decayed_plays))
+        return self.song_ids[order[:k]].tolist()
+
+
+def _percentiles(values: np.ndarray) -> np.ndarray:
+    """Fraction of the other values strictly below each value."""
+    n = values.size
+    if n <= 1:
+        return np.zeros(n)
+    below = np.searchsorted(np.sort(values), values, side='left')
+    return below / (n - 1)
+
+
+# =============================================================================
+# POPULARITY STATS SERVICE
+# =============================================================================
+
+class PopularityStatsService:
+    """
+    Maintains catalog popularity statistics with incremental refreshes.
+
+    Usage:
+        stats = get_popularity_service()
+        snapshot = stats.snapshot()
+        plays_score = snapshot.lookup(song_ids)  # catalog percentiles
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        half_life_days: float = 14.0,
+        refresh_interval: float = 300.0
+    ):
+        """
+        Initialize service (no database access until first use).
+
+        Args:
+            db_path: Database path (default: repository default)
+            half_life_days: Half-life of a play's weight
+            refresh_interval: Seconds between scheduled refreshes
+        """
+        self.db_path = db_path or get_db_path()
+        self.half_life_days = half_life_days
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()  # Serializes refreshes
+        self._snapshot: Optional[PopularitySnapshot] = None
+
+        # Incremental state, owned by the refreshing thread
+        self._song_ids = np.empty(0, dtype=np.int64)
+        self._plays = np.empty(0)
+        self._decayed = np.empty(0)
+        self._as_of: Optional[float] = None      # julianday of last refresh
+        self._watermark: Optional[float] = None  # Latest history timestamp read
+        self._high_water: Optional[int] = None   # Largest history row id read
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # =========================================================================
+    # PUBLIC API
+    # =========================================================================
+
+    def snapshot(self) -> PopularitySnapshot:
+        """Current snapshot, built synchronously on first use."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh()
+        return snapshot
+
+    def played_snapshot(self) -> Optional[PopularitySnapshot]:
+        """Current snapshot, or None while no listening history has been seen."""
+        snapshot = self.snapshot()
+        return snapshot if snapshot.has_plays else None
+
+    def refresh(self) -> PopularitySnapshot:
+        """Apply catalog and history changes since the last refresh."""
+        with self._lock:
+            con = sqlite3.connect(self.db_path, timeout=10.0)
+            try:
+                now = con.execute("SELECT julianday('now')").fetchone()[0]
+                catalog_ids, catalog_popularity = self._read_catalog(con)
+                self._merge_catalog(catalog_ids)
+                self._decay_to(now)
+                self._apply_history(con, now)
+            finally:
+                con.close()
+
+            previous = self._snapshot
+            self._snapshot = PopularitySnapshot(
+                song_ids=self._song_ids.copy(),
+                play_counts=self._plays.copy(),
+                decayed_plays=self._decayed.copy(),
+                play_percentiles=_percentiles(self._decayed),
+                catalog_percentiles=_percentiles(catalog_popularity),
+                version=previous.version + 1 if previous else 1,
+                built_at=datetime.now(),
+            )
+            return self._snapshot
+
+    def start(self) -> None:
+        """Start scheduled background refreshes."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="popularity-stats", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop scheduled refreshes."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    # =========================================================================
+    # INTERNALS
+    # =========================================================================
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Popularity refresh failed: {e}")
+
+    def _read_catalog(self, con: sqlite3.Connection) -> Tuple[np.ndarray, np.ndarray]:
+        """Catalog song ids (ascending) and static popularity (NULL -> 50)."""
+        columns = {row[1] for row in con.execute("PRAGMA table_info(songs)")}
+        if not columns:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        popularity = "COALESCE(popularity, 50)" if 'popularity' in columns else "50"
+        rows = con.execute(
+            f"SELECT song_id, {popularity} FROM songs ORDER BY song_id"
+        ).fetchall()
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        values = np.array([r[1] for r in rows], dtype=np.float64)
+        return ids, values
+
+    def _merge_catalog(self, catalog_ids: np.ndarray) -> None:
+        """Realign state arrays to the current catalog."""
+        if np.array_equal(catalog_ids, self._song_ids):
+            return
+        plays = np.zeros(catalog_ids.size)
+        decayed = np.zeros(catalog_ids.size)
+        pos = id_positions(catalog_ids, self._song_ids)
+        kept = pos >= 0
+        plays[pos[kept]] = self._plays[kept]
+        decayed[pos[kept]] = self._decayed[kept]
+        self._song_ids = catalog_ids
+        self._plays = plays
+        self._decayed = decayed
+
+    def _decay_to(self, now: float) -> None:
+        """Decay accumulated plays forward to ``now`` (julianday)."""
+        if self._as_of is not None and now > self._as_of:
+            self._decayed *= math.exp(-math.log(2) * (now - self._as_of) / self.half_life_days)
+        self._as_of = now
+
+    def _history_columns(self, con: sqlite3.Connection) -> Optional[Tuple[str, str, Optional[str]]]:
+        """(row id, timestamp, play count) columns of listening_history."""
+        columns = {row[1] for row in con.execute("PRAGMA table_info(listening_history)")}
+        if not columns or 'song_id' not in columns:
+            return None
+        id_col = 'id' if 'id' in columns else 'history_id'
+        time_col = 'last_played' if 'last_played' in columns else 'listened_at'
+        count_col = 'play_count' if 'play_count' in columns else None
+        if id_col not in columns or time_col not in columns:
+            return None
+        return id_col, time_col, count_col
+
+    def _apply_history(self, con: sqlite3.Connection, now: float) -> None:
+        """
+        Add plays from history rows changed since the last refresh.
+
+        Rows above the row id high-water mark are new and count in full.
+        In the per-(user, song) layout rows are also updated in place;
+        songs with rows touched since the timestamp watermark are
+        recounted and the difference to their running total applied.
+        """
+        layout = self._history_columns(con)
+        if layout is None:
+            return
+        id_col, time_col, count_col = layout
+        plays_col = count_col or '1'
+
+        song_rows: List[int] = []
+        deltas: List[float] = []
+        ages: List[float] = []
+        watermark = self._watermark
+        high_water = self._high_water
+
+        if count_col and high_water is not None and watermark is not None:
+            totals = con.execute(
+                f"SELECT song_id, SUM({count_col}), MAX(julianday({time_col})) "
+                f"FROM listening_history "
+                f"WHERE {id_col} <= ? AND {time_col} IS NOT NULL AND song_id IN ("
+                f"  SELECT song_id FROM listening_history "
+                f"  WHERE {id_col} <= ? AND julianday({time_col}) >= ?"
+                f") GROUP BY song_id",
+                (high_water, high_water, watermark)
+            ).fetchall()
+            if totals:
+                pos = id_positions(self._song_ids, np.array([r[0] for r in totals], dtype=np.int64))
+                counted = np.zeros(pos.size)
+                counted[pos >= 0] = self._plays[pos[pos >= 0]]
+                for (song_id, total, played_at), before in zip(totals, counted.tolist()):
+                    delta = int(total or 0) - before
+                    watermark = max(watermark, played_at)
+                    if delta:
+                        song_rows.append(song_id)
+                        deltas.append(delta)
+                        ages.append(max(now - played_at, 0.0))
+
+        query = (
+            f"SELECT {id_col}, song_id, {plays_col}, julianday({time_col}) "
+            f"FROM listening_history"
+        )
+        params: list = []
+        if high_water is not None:
+            query += f" WHERE {id_col} > ?"
+            params.append(high_water)
+        for row_id, song_id, plays, played_at in con.execute(query, params):
+            high_water = row_id if high_water is None else max(high_water, row_id)
+            if played_at is None:
+                continue
+            watermark = played_at if watermark is None else max(watermark, played_at)
+            plays = int(plays or 0)
+            if plays:
+                song_rows.append(song_id)
+                deltas.append(plays)
+                ages.append(max(now - played_at, 0.0))
+        self._watermark = watermark
+        self._high_water = high_water
+
+        if not song_rows:
+            return
+
+        pos = id_positions(self._song_ids, np.array(song_rows, dtype=np.int64))
+        known = pos >= 0
+        if not known.any():
+            return
+
+        delta = np.array(deltas)[known]
+        weight = np.exp(-math.log(2) * np.array(ages)[known] / self.half_life_days)
+        np.add.at(self._plays, pos[known], delta)
+        np.add.at(self._decayed, pos[known], delta * weight)
+
+
+# =============================================================================
+# SINGLETON INSTANCES
+# =============================================================================
+
+_services: Dict[str, PopularityStatsService] = {}
+_services_lock = threading.Lock()
+
+
+def get_popularity_service(db_path: Optional[str] = None) -> PopularityStatsService:
+    """Get or create the (scheduled) popularity service for a database."""
+    path = db_path or get_db_path()
+    with _services_lock:
+        service = _services.get(path)
+        if service is None:
+            service = _services[path] = PopularityStatsService(path)
+            service.start()
+        return service
@@ -0,0 +1,338 @@
+"""
+Preference Model Cache
+======================
+Bounded, version-checked cache of per-user PreferenceModel instances.
+
+The chat pipeline needs one fitted PreferenceModel per user. Keeping them
+in a plain dict grows without bound and serves stale models after new
+feedback arrives. This cache:
+
+- Keeps at most ``max_models`` models and ``max_bytes`` of serialized
+  model state resident, evicting least-recently-used users first
+- Lazily loads models from a persisted store (one pickle per user)
+  before falling back to training from feedback
+- Tags every model with the feedback write-version it was trained at,
+  so a newer feedback write makes the cached model stale
+- Subscribes every known user's ``feedback:<id>`` tag on the
+  invalidation bus, so feedback changes that keep the newest
+  feedback_id (e.g. a like turned into a dislike) also make the model
+  stale; chat history and preference writes do not
+- Tracks hit rate, loads, trainings and resident models
+
+Author: MusicMoodBot Team
+Version: 1.0.0
+"""
+
+from __future__ import annotations
+
+import glob
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Any
+
+from backend.repositories import feedback_tag, get_invalidation_bus
+from backend.src.ranking.preference_model import PreferenceModel
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# DATA CLASSES
+# =============================================================================
+
+@dataclass
+class CachedModel:
+    """A resident model together with its version and size estimate."""
+    model: PreferenceModel
+    version: int
+    size_bytes: int
+
+
+@dataclass
+class PreferenceCacheStats:
+    """Preference model cache statistics."""
+    hits: int = 0
+    misses: int = 0
+    stale: int = 0
+    store_loads: int = 0
+    trainings: int = 0
+    evictions: int = 0
+    resident_models: int = 0
+    resident_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'store_loads': self.store_loads,
+            'trainings': self.trainings,
+            'evictions': self.evictions,
+            'resident_models': self.resident_models,
+            'resident_bytes': self.resident_bytes,
+            'hit_rate': round(self.hit_rate, 4),
+        }
+
+
+# =============================================================================
+# PREFERENCE MODEL CACHE
+# =============================================================================
+
+class PreferenceModelCache:
+    """
+    Thread-safe LRU cache of per-user preference models.
+
+    A model is served from memory only while its version matches the
+    user's current feedback write-version. ``version_fn`` is read on
+    every ``get``, so feedback stored through any path (feedback API,
+    history ratings, direct repository calls) makes the model stale.
+    ``record_write`` can advance the version ahead of the store, and a
+    published ``feedback:<id>`` tag does the same through ``delete``.
+
+    Usage:
+        cache = PreferenceModelCache(
+            trainer=train_from_feedback,
+            version_fn=feedback_repo.get_training_version,
+            store_dir="models/preferences",
+        )
+        model = cache.get(user_id)
+
+        # After a like/dislike is saved
+        cache.record_write(user_id, feedback_id)
+    """
+
+    def __init__(
+        self,
+        trainer: Callable[[int], PreferenceModel],
+        version_fn: Callable[[int], int],
+        store_dir: Optional[str] = None,
+        max_models: int = 256,
+        max_bytes: int = 32 * 1024 * 1024
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            trainer: Builds a model for a user from their feedback
+            version_fn: Returns the user's current feedback write-version
+            store_dir: Directory for persisted models (None disables)
+            max_models: Maximum number of resident models
+            max_bytes: Maximum estimated bytes of resident models
+        """
+        self.trainer = trainer
+        self.version_fn = version_fn
+        self.store_dir = store_dir
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+
+        self._models: OrderedDict[int, CachedModel] = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._resident_bytes = 0
+        self._lock = threading.RLock()
+        self._stats = PreferenceCacheStats()
+
+        if self.store_dir:
+            os.makedirs(self.store_dir, exist_ok=True)
+
+    # =========================================================================
+    # PUBLIC API
+    # =========================================================================
+
+    def get(self, user_id: int) -> PreferenceModel:
+        """Get an up-to-date model for a user, loading or training on miss."""
+        stored_version = self._read_version(user_id)
+        with self._lock:
+            if user_id not in self._versions:
+                self._subscribe(user_id)
+            version = max(stored_version, self._versions.get(user_id, 0))
+            self._versions[user_id] = version
+            entry = self._models.get(user_id)
+
+            if entry is not None and entry.version == version:
+                self._models.move_to_end(user_id)
+                self._stats.hits += 1
+                return entry.model
+
+            self._stats.misses += 1
+            if entry is not None:
+                self._stats.stale += 1
+                self._remove(user_id)
+
+        # Load or train outside the lock; a concurrent duplicate load is
+        # harmless and cheaper than serializing every user's training.
+        model = self._load_from_store(user_id, version)
+        if model is None:
+            model = self.trainer(user_id)
+            with self._lock:
+                self._stats.trainings += 1
+            self._save_to_store(user_id, version, model)
+
+        with self._lock:
+            if self._versions.get(user_id) == version:
+                self._insert(user_id, CachedModel(
+                    model=model,
+                    version=version,
+                    size_bytes=self._estimate_size(model)
+                ))
+
+        return model
+
+    def record_write(self, user_id: int, version: Optional[int] = None) -> int:
+        """
+        Advance a user's feedback write-version.
+
+        Args:
+            user_id: User whose feedback changed
+            version: New version (e.g. the new feedback_id); when omitted
+                the current version is incremented
+
+        Returns:
+            The new version
+        """
+        with self._lock:
+            if version is None:
+                version = self._versions.get(user_id, 0) + 1
+            self._versions[user_id] = version
+            self._subscribe(user_id)
+            if user_id in self._models:
+                self._remove(user_id)
+            return version
+
+    def delete(self, user_id: int) -> bool:
+        """Invalidation hook: the user's feedback changed, so their model is stale."""
+        with self._lock:
+            resident = user_id in self._models
+            self.record_write(user_id)
+            return resident
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop a user's resident model and forget its version."""
+        with self._lock:
+            self._versions.pop(user_id, None)
+            get_invalidation_bus().untag(self, user_id)
+            if user_id in self._models:
+                self._remove(user_id)
+
+    def clear(self) -> None:
+        """Drop all resident models."""
+        with self._lock:
+            self._models.clear()
+            self._versions.clear()
+            self._resident_bytes = 0
+            get_invalidation_bus().untag_all(self)
+
+    def __contains__(self, user_id: int) -> bool:
+        with self._lock:
+            return user_id in self._models
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+    def get_stats(self) -> PreferenceCacheStats:
+        """Get cache statistics."""
+        with self._lock:
+            return PreferenceCacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                stale=self._stats.stale,
+                store_loads=self._stats.store_loads,
+                trainings=self._stats.trainings,
+                evictions=self._stats.evictions,
+                resident_models=len(self._models),
+                resident_bytes=self._resident_bytes,
+            )
+
+    # =========================================================================
+    # INTERNALS
+    # =========================================================================
+
+    def _subscribe(self, user_id: int) -> None:
+        """Listen for the user's feedback writes (a publish consumes the tag)."""
+        get_invalidation_bus().tag(self, user_id, [feedback_tag(user_id)])
+
+    def _read_version(self, user_id: int) -> int:
+        """Read the user's stored feedback write-version (0 on error)."""
+        try:
+            return int(self.version_fn(user_id) or 0)
+        except Exception as e:
+            logger.warning(f"Could not read feedback version for user {user_id}: {e}")
+            return 0
+
+    def _insert(self, user_id: int, entry: CachedModel) -> None:
+        """Insert an entry and evict LRU entries beyond the caps."""
+        if user_id in self._models:
+            self._remove(user_id)
+
+        self._models[user_id] = entry
+        self._resident_bytes += entry.size_bytes
+
+        while self._models and (
+            len(self._models) > self.max_models or
+            self._resident_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._models))
+            if oldest == user_id and len(self._models) == 1:
+                break  # Always keep the model just requested
+            self._remove(oldest)
+            self._stats.evictions += 1
+
+    def _remove(self, user_id: int) -> None:
+        entry = self._models.pop(user_id)
+        self._resident_bytes -= entry.size_bytes
+
+    @staticmethod
+    def _estimate_size(model: PreferenceModel) -> int:
+        """Estimate resident size from the serialized model state."""
+        try:
+            return len(pickle.dumps((model.model, model.scaler, model.feature_names)))
+        except Exception:
+            return 4096
+
+    def _store_path(self, user_id: int, version: int) -> str:
+        return os.path.join(self.store_dir, f"user_{user_id}.v{version}.pkl")
+
+    def _load_from_store(self, user_id: int, version: int) -> Optional[PreferenceModel]:
+        """Load a persisted model trained at ``version``, if one exists."""
+        if not self.store_dir:
+            return None
+
+        path = self._store_path(user_id, version)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            model = PreferenceModel()
+            model.load(path)
+            with self._lock:
+                self._stats.store_loads += 1
+            return model
+        except Exception as e:
+            logger.warning(f"Could not load persisted preference model {path}: {e}")
+            return None
+
+    def _save_to_store(self, user_id: int, version: int, model: PreferenceModel) -> None:
+        """Persist a fitted model and remove older versions for the user."""
+        if not self.store_dir or not model.is_fitted:
+            return
+
+        path = self._store_path(user_id, version)
+        tmp_path = f"{path}.tmp"
+        try:
+            model.save(tmp_path)
+            os.replace(tmp_path, path)
+
+            for old in glob.glob(os.path.join(self.store_dir, f"user_{user_id}.v*.pkl")):
+                if old != path:
+                    os.remove(old)
+        except Exception as e:
+            logger.warning(f"Could not persist preference model for user {user_id}: {e}")
@@ -21,6 +21,7 @@ from .ranking_engine import (
     RankingResult,
     RankingExplanation,
     ScoringComponents,
+    DiversityAccumulator,
 )
 
 from .emotional_space import (
@@ -88,6 +89,7 @@ __all__ = [
     'RankingResult',
     'RankingExplanation',
     'ScoringComponents',
+    'DiversityAccumulator',
     
     # Emotional Space
     'EmotionalVectorSpace',
@@ -22,6 +22,8 @@ import sqlite3
 import math
 import os
 
+from backend.repositories import ensure_song_moods, normalize_mood
+
 
 @dataclass
 class ColdStartSong:
@@ -175,41 +177,42 @@ class ColdStartHandler:
         """
         Get recommendations based on global popularity.
         
-        Ranks songs by: (likes - 0.5 * dislikes) with time decay.
+        Ranks songs by time-decayed play counts from the catalog
+        popularity service, then by the songs.popularity column.
         """
+        from backend.services.popularity_stats import get_popularity_service
+        
         try:
+            song_ids = get_popularity_service(self.db_path).snapshot().top(limit)
+            if not song_ids:
+                return []
+            
             conn = sqlite3.connect(self.db_path)
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
-            # Try to get songs with popularity metrics
-            cursor.execute("""
-                SELECT 
-                    song_id, name, artist, genre, moods as mood,
-                    COALESCE(popularity, 50) as popularity,
-                    COALESCE(like_count, 0) as like_count
-                FROM songs
-                ORDER BY popularity DESC, like_count DESC
-                LIMIT ?
-            """, (limit * 2,))
-            
-            rows = cursor.fetchall()
+            placeholders = ",".join("?" * len(song_ids))
+            cursor.execute(
+                f"SELECT * FROM songs WHERE song_id IN ({placeholders})", song_ids
+            )
+            rows = {row["song_id"]: dict(row) for row in cursor.fetchall()}
             conn.close()
             
-            if not rows:
-                return []
-            
             songs = []
-            for i, row in enumerate(rows[:limit]):
+            for song_id in song_ids:
+                row = rows.get(song_id)
+                if row is None:
+                    continue
+                
                 # Score decays by position
-                score = 1.0 - (i * 0.05)
+                score = 1.0 - (len(songs) * 0.05)
                 
                 songs.append(ColdStartSong(
-                    song_id=row["song_id"],
-                    name=row["name"],
-                    artist=row["artist"],
-                    genre=row["genre"],
-                    mood=row["mood"],
+                    song_id=song_id,
+                    name=row.get("song_name") or row.get("name") or "Unknown",
+                    artist=row.get("artist") or "Unknown",
+                    genre=row.get("genre"),
+                    mood=row.get("mood") or row.get("moods"),
                     score=max(0.1, score),
                     strategy="popularity_baseline",
                     explanation="Trending song that many users love",
@@ -247,16 +250,24 @@ class ColdStartHandler:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
-            # Get songs matching mood or near VA centroid
+            # Get songs matching mood or near VA centroid (tagged first)
+            ensure_song_moods(conn, self.db_path)
             cursor.execute("""
                 SELECT 
                     song_id, name, artist, genre, moods as mood,
                     COALESCE(valence, 0) as valence,
                     COALESCE(energy, 0) as energy
                 FROM songs
-                WHERE moods LIKE ? OR moods IS NULL
+                WHERE song_id IN (SELECT song_id FROM song_moods WHERE mood = ?)
+                UNION ALL
+                SELECT 
+                    song_id, name, artist, genre, moods as mood,
+                    COALESCE(valence, 0) as valence,
+                    COALESCE(energy, 0) as energy
+                FROM songs s
+                WHERE NOT EXISTS (SELECT 1 FROM song_moods sm WHERE sm.song_id = s.song_id)
                 LIMIT ?
-            """, (f"%{effective_mood}%", limit * 3))
+            """, (normalize_mood(effective_mood), limit * 3))
             
             rows = cursor.fetchall()
             conn.close()
@@ -29,6 +29,7 @@ from __future__ import annotations
 
 import random
 import logging
+from collections.abc import Sequence
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple, Any
 from enum import Enum, auto
@@ -687,20 +688,67 @@ class ExplainableRecommendation:
         scores_list: List[Dict[str, float]],
         emotional_signal: EmotionalSignal = None,
         context: Dict[str, Any] = None
-    ) -> List[RecommendationExplanation]:
-        """Generate explanations for multiple recommendations."""
-        explanations = []
+    ) -> LazyExplanations:
+        """
+        Explanations for multiple recommendations.
         
-        for song, scores in zip(songs, scores_list):
-            explanation = self.explain(
+        Nothing is rendered up front: each explanation is generated the
+        first time it is read, so callers that serialize only the top
+        few results don't pay for the rest.
+        """
+        return LazyExplanations(self, songs, scores_list, emotional_signal, context)
+
+
+class LazyExplanations(Sequence):
+    """
+    Read-only sequence of explanations rendered on first access.
+    
+    Stores each song with its score vector; ``explain`` runs once per
+    index actually read and the result is kept.
+    """
+    
+    def __init__(
+        self,
+        explainer: ExplainableRecommendation,
+        songs: List[Dict[str, Any]],
+        scores_list: List[Dict[str, float]],
+        emotional_signal: EmotionalSignal = None,
+        context: Dict[str, Any] = None
+    ):
+        self._explainer = explainer
+        self._items = list(zip(songs, scores_list))
+        self._emotional_signal = emotional_signal
+        self._context = context
+        self._rendered: Dict[int, RecommendationExplanation] = {}
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError("explanation index out of range")
+        
+        explanation = self._rendered.get(index)
+        if explanation is None:
+            song, scores = self._items[index]
+            explanation = self._explainer.explain(
                 song=song,
                 scores=scores,
-                emotional_signal=emotional_signal,
-                context=context,
+                emotional_signal=self._emotional_signal,
+                context=self._context,
             )
-            explanations.append(explanation)
-        
-        return explanations
+            self._rendered[index] = explanation
+        return explanation
+    
+    @property
+    def rendered_count(self) -> int:
+        """Number of explanations generated so far."""
+        return len(self._rendered)
 
 
 # =============================================================================
@@ -39,12 +39,18 @@ import random
 import logging
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple, Any, Callable
+from typing import Dict, List, Optional, Tuple, Any, Callable, TYPE_CHECKING
 from datetime import datetime, timedelta
 from enum import Enum, auto
-from collections import defaultdict
+from collections import Counter, defaultdict
 import hashlib
 
+import numpy as np
+
+if TYPE_CHECKING:
+    from backend.services.item_similarity import ItemSimilarityService
+    from backend.services.popularity_stats import PopularityStatsService
+
 logger = logging.getLogger(__name__)
 
 
@@ -137,6 +143,102 @@ class StrategyScore:
     explanation: str = ""
 
 
+@dataclass
+class StrategyBatch:
+    """Scores from a single strategy for every candidate (aligned arrays)."""
+    strategy: StrategyType
+    scores: np.ndarray       # [0, 1] per candidate
+    confidence: np.ndarray   # [0, 1] per candidate
+    components: Dict[str, np.ndarray] = field(default_factory=dict)
+    
+    def at(self, i: int) -> StrategyScore:
+        """StrategyScore of the i-th candidate."""
+        return StrategyScore(
+            strategy=self.strategy,
+            score=float(self.scores[i]),
+            confidence=float(self.confidence[i]),
+            components={name: float(values[i]) for name, values in self.components.items()},
+        )
+
+
+@dataclass
+class CandidateFeatures:
+    """
+    Candidate feature matrix shared by all strategies.
+    
+    ``numeric`` holds one row per candidate and one column per entry of
+    NUMERIC_COLUMNS, NaN where the song has no usable value (strategies
+    apply their own defaults). Text attributes are lower-cased and
+    dictionary-encoded so per-value work runs once per distinct value.
+    """
+    NUMERIC_COLUMNS = (
+        'valence', 'arousal', 'energy', 'tempo', 'danceability',
+        'acousticness', 'play_count', 'like_count',
+    )
+    
+    songs: List[Dict[str, Any]]
+    song_ids: List[Any]
+    numeric: np.ndarray
+    genre_codes: np.ndarray
+    genres: List[str]
+    artist_codes: np.ndarray
+    artists: List[str]
+    mood_codes: np.ndarray
+    moods: List[str]
+    
+    def __len__(self) -> int:
+        return len(self.songs)
+    
+    def column(self, name: str, default: float) -> np.ndarray:
+        """Numeric column with missing values replaced by ``default``."""
+        values = self.numeric[:, self.NUMERIC_COLUMNS.index(name)]
+        return np.where(np.isnan(values), default, values)
+    
+    @classmethod
+    def from_songs(cls, songs: List[Dict[str, Any]]) -> CandidateFeatures:
+        """Build the matrix in one pass over the candidate dicts."""
+        numeric = np.full((len(songs), len(cls.NUMERIC_COLUMNS)), np.nan)
+        encoders = ({}, {}, {})
+        codes = (
+            np.empty(len(songs), dtype=np.int64),
+            np.empty(len(songs), dtype=np.int64),
+            np.empty(len(songs), dtype=np.int64),
+        )
+        song_ids = []
+        
+        for i, song in enumerate(songs):
+            song_ids.append(song.get('song_id', song.get('id', 0)))
+            row = numeric[i]
+            for j, name in enumerate(cls.NUMERIC_COLUMNS):
+                row[j] = _as_float(song.get(name))
+            for k, key in enumerate(('genre', 'artist', 'mood')):
+                value = song.get(key)
+                text = str(value).lower() if value else ''
+                codes[k][i] = encoders[k].setdefault(text, len(encoders[k]))
+        
+        return cls(
+            songs=songs,
+            song_ids=song_ids,
+            numeric=numeric,
+            genre_codes=codes[0],
+            genres=list(encoders[0]),
+            artist_codes=codes[1],
+            artists=list(encoders[1]),
+            mood_codes=codes[2],
+            moods=list(encoders[2]),
+        )
+
+
+def _as_float(value: Any) -> float:
+    """Float value of a song attribute, NaN if missing or not numeric."""
+    if value is None or isinstance(value, str):
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
 @dataclass
 class StrategyPerformance:
     """Performance tracking for a strategy."""
@@ -215,13 +317,30 @@ class RecommendationStrategy(ABC):
     strategy_type: StrategyType
     
     @abstractmethod
+    def score_batch(
+        self,
+        features: CandidateFeatures,
+        context: RecommendationContext
+    ) -> StrategyBatch:
+        """
+        Score every candidate using this strategy.
+        
+        Args:
+            features: Candidate feature matrix
+            context: Recommendation context
+            
+        Returns:
+            StrategyBatch with scores in [0, 1], one per candidate
+        """
+        pass
+    
     def score(
         self,
         song: Dict[str, Any],
         context: RecommendationContext
     ) -> StrategyScore:
         """
-        Score a song using this strategy.
+        Score a single song using this strategy.
         
         Args:
             song: Song data dictionary
@@ -230,16 +349,51 @@ class RecommendationStrategy(ABC):
         Returns:
             StrategyScore with score in [0, 1]
         """
-        pass
+        return self.score_batch(CandidateFeatures.from_songs([song]), context).at(0)
+    
+    def _batch(
+        self,
+        features: CandidateFeatures,
+        scores: np.ndarray,
+        confidence: Any,
+        **components: Any
+    ) -> StrategyBatch:
+        """Package arrays (scalars are broadcast) as a StrategyBatch."""
+        n = len(features)
+        return StrategyBatch(
+            strategy=self.strategy_type,
+            scores=scores,
+            confidence=np.broadcast_to(np.asarray(confidence, dtype=np.float64), (n,)),
+            components={
+                name: np.broadcast_to(np.asarray(values, dtype=np.float64), (n,))
+                for name, values in components.items()
+            },
+        )
     
-    @abstractmethod
     def explain(
         self,
         song: Dict[str, Any],
         score: StrategyScore,
         context: RecommendationContext
     ) -> str:
-        """Generate natural language explanation for this strategy's contribution."""
+        """
+        Natural language explanation for this strategy's contribution.
+        
+        Rendered on first request and stored on the score, so only
+        songs that are actually explained pay for the text.
+        """
+        if not score.explanation:
+            score.explanation = self._generate_explanation(song, score, context)
+        return score.explanation
+    
+    @abstractmethod
+    def _generate_explanation(
+        self,
+        song: Dict[str, Any],
+        score: StrategyScore,
+        context: RecommendationContext
+    ) -> str:
+        """Render the explanation from the stored score components."""
         pass
 
 
@@ -279,21 +433,27 @@ class EmotionStrategy(RecommendationStrategy):
     
     MAX_DISTANCE = math.sqrt(8)  # Diagonal of 2x2 space
     
-    def score(
+    def score_batch(
         self,
-        song: Dict[str, Any],
+        features: CandidateFeatures,
         context: RecommendationContext
-    ) -> StrategyScore:
+    ) -> StrategyBatch:
         """Score based on emotional distance in VA space."""
         
-        # Get song's VA coordinates
-        song_valence = song.get('valence', 0.0)
-        song_arousal = song.get('arousal', song.get('energy', 0.0))
+        # Get songs' VA coordinates (arousal falls back to energy)
+        song_valence = features.column('valence', 0.0)
+        song_arousal = features.column('arousal', math.nan)
+        song_arousal = np.where(
+            np.isnan(song_arousal), features.column('energy', 0.0), song_arousal
+        )
         
-        # If song has categorical mood, use it as fallback
-        if song_valence == 0.0 and song_arousal == 0.0:
-            song_mood = song.get('mood', 'neutral').lower()
-            song_valence, song_arousal = self.MOOD_VA_MAP.get(song_mood, (0.0, 0.0))
+        # If a song has no VA coordinates, use its categorical mood
+        mood_va = np.array(
+            [self.MOOD_VA_MAP.get(mood or 'neutral', (0.0, 0.0)) for mood in features.moods]
+        ).reshape(-1, 2)
+        unplaced = (song_valence == 0.0) & (song_arousal == 0.0)
+        song_valence = np.where(unplaced, mood_va[features.mood_codes, 0], song_valence)
+        song_arousal = np.where(unplaced, mood_va[features.mood_codes, 1], song_arousal)
         
         # Get target VA (from context or derived from mood)
         target_valence = context.target_valence
@@ -305,39 +465,34 @@ class EmotionStrategy(RecommendationStrategy):
             )
         
         # Compute Euclidean distance
-        distance = math.sqrt(
+        distance = np.sqrt(
             (song_valence - target_valence) ** 2 +
             (song_arousal - target_arousal) ** 2
         )
         
         # Normalize to [0, 1] where 1 = perfect match
-        score = 1.0 - (distance / self.MAX_DISTANCE)
-        score = max(0.0, min(1.0, score))
-        
-        # Confidence based on how well-defined the song's VA coordinates are
-        confidence = 0.9 if (song_valence != 0.0 or song_arousal != 0.0) else 0.6
-        
-        return StrategyScore(
-            strategy=self.strategy_type,
-            score=score,
-            confidence=confidence,
-            components={
-                'va_distance': distance,
-                'song_valence': song_valence,
-                'song_arousal': song_arousal,
-                'target_valence': target_valence,
-                'target_arousal': target_arousal,
-            },
-            explanation=self._generate_explanation(score, song, context)
+        score = np.clip(1.0 - (distance / self.MAX_DISTANCE), 0.0, 1.0)
+        
+        # Confidence based on how well-defined the songs' VA coordinates are
+        confidence = np.where((song_valence != 0.0) | (song_arousal != 0.0), 0.9, 0.6)
+        
+        return self._batch(
+            features, score, confidence,
+            va_distance=distance,
+            song_valence=song_valence,
+            song_arousal=song_arousal,
+            target_valence=target_valence,
+            target_arousal=target_arousal,
         )
     
     def _generate_explanation(
         self,
-        score: float,
         song: Dict[str, Any],
+        score: StrategyScore,
         context: RecommendationContext
     ) -> str:
         """Generate explanation for emotion matching."""
+        score = score.score
         if score >= 0.8:
             return f"closely matches your {context.target_mood} mood"
         elif score >= 0.6:
@@ -346,14 +501,6 @@ class EmotionStrategy(RecommendationStrategy):
             return f"offers a gentle transition from {context.target_mood}"
         else:
             return f"provides emotional contrast to {context.target_mood}"
-    
-    def explain(
-        self,
-        song: Dict[str, Any],
-        score: StrategyScore,
-        context: RecommendationContext
-    ) -> str:
-        return score.explanation
 
 
 # =============================================================================
@@ -383,52 +530,51 @@ class ContentStrategy(RecommendationStrategy):
         ('indie', 'alternative'): 0.8,
     }
     
-    def score(
+    def score_batch(
         self,
-        song: Dict[str, Any],
+        features: CandidateFeatures,
         context: RecommendationContext
-    ) -> StrategyScore:
+    ) -> StrategyBatch:
         """Score based on content similarity to user preferences."""
         
-        components = {}
-        
-        # Genre similarity
-        song_genre = song.get('genre', '').lower()
+        # Genre similarity, computed once per distinct genre
         preferred_genres = context.user_preferences.get('genres', {})
         
-        genre_score = 0.0
         if preferred_genres:
-            genre_score = preferred_genres.get(song_genre, 0.0)
-            # Check for similar genres
-            for pref_genre, pref_weight in preferred_genres.items():
-                sim = self._genre_similarity(song_genre, pref_genre)
-                genre_score = max(genre_score, pref_weight * sim)
+            genre_values = []
+            for song_genre in features.genres:
+                genre_score = preferred_genres.get(song_genre, 0.0)
+                # Check for similar genres
+                for pref_genre, pref_weight in preferred_genres.items():
+                    sim = self._genre_similarity(song_genre, pref_genre)
+                    genre_score = max(genre_score, pref_weight * sim)
+                genre_values.append(genre_score)
+            genre_score = np.array(genre_values, dtype=np.float64)[features.genre_codes]
         else:
-            genre_score = 0.5  # Neutral if no preferences
-        
-        components['genre_score'] = genre_score
+            genre_score = np.full(len(features), 0.5)  # Neutral if no preferences
         
         # Artist similarity
-        song_artist = song.get('artist', '').lower()
         preferred_artists = context.user_preferences.get('artists', {})
-        artist_score = preferred_artists.get(song_artist, 0.3)
-        components['artist_score'] = artist_score
+        artist_score = np.array(
+            [preferred_artists.get(artist, 0.3) for artist in features.artists],
+            dtype=np.float64
+        )[features.artist_codes]
         
         # Tempo similarity (if target tempo known)
-        song_tempo = song.get('tempo', 120)
         target_tempo = context.explicit_constraints.get('tempo', 120)
-        tempo_score = 1.0 - min(abs(song_tempo - target_tempo) / 60, 1.0)
-        components['tempo_score'] = tempo_score
+        tempo_score = 1.0 - np.minimum(
+            np.abs(features.column('tempo', 120) - target_tempo) / 60, 1.0
+        )
         
         # Audio features (energy, danceability, acousticness)
-        feature_scores = []
-        for feature in ['energy', 'danceability', 'acousticness']:
-            song_val = song.get(feature, 0.5)
-            target_val = context.explicit_constraints.get(feature, 0.5)
-            feature_scores.append(1.0 - abs(song_val - target_val))
-        
-        audio_score = sum(feature_scores) / len(feature_scores) if feature_scores else 0.5
-        components['audio_features_score'] = audio_score
+        audio_features = ['energy', 'danceability', 'acousticness']
+        audio_score = sum(
+            1.0 - np.abs(
+                features.column(feature, 0.5) -
+                context.explicit_constraints.get(feature, 0.5)
+            )
+            for feature in audio_features
+        ) / len(audio_features)
         
         # Weighted combination
         final_score = (
@@ -438,12 +584,12 @@ class ContentStrategy(RecommendationStrategy):
             0.25 * audio_score
         )
         
-        return StrategyScore(
-            strategy=self.strategy_type,
-            score=final_score,
-            confidence=0.85,
-            components=components,
-            explanation=self._generate_explanation(components, song)
+        return self._batch(
+            features, final_score, 0.85,
+            genre_score=genre_score,
+            artist_score=artist_score,
+            tempo_score=tempo_score,
+            audio_features_score=audio_score,
         )
     
     def _genre_similarity(self, genre1: str, genre2: str) -> float:
@@ -456,10 +602,12 @@ class ContentStrategy(RecommendationStrategy):
     
     def _generate_explanation(
         self,
-        components: Dict[str, float],
-        song: Dict[str, Any]
+        song: Dict[str, Any],
+        score: StrategyScore,
+        context: RecommendationContext
     ) -> str:
         """Generate content-based explanation."""
+        components = score.components
         reasons = []
         
         if components.get('genre_score', 0) > 0.6:
@@ -474,14 +622,6 @@ class ContentStrategy(RecommendationStrategy):
         if reasons:
             return " and ".join(reasons)
         return "matches your listening profile"
-    
-    def explain(
-        self,
-        song: Dict[str, Any],
-        score: StrategyScore,
-        context: RecommendationContext
-    ) -> str:
-        return score.explanation
 
 
 # =============================================================================
@@ -492,71 +632,123 @@ class CollaborativeStrategy(RecommendationStrategy):
     """
     Collaborative filtering based on similar users' preferences.
     
-    Uses item-based collaborative filtering with implicit feedback.
+    Uses item-based collaborative filtering with implicit feedback:
+    a candidate's co-occurrence score is its mean similarity to the songs
+    in the user's history, in [0, 1]. When the user's history is known to
+    the model, that score is blended with popularity; otherwise
+    popularity is used alone.
     """
     
     strategy_type = StrategyType.COLLABORATIVE
     
-    def __init__(self, user_similarity_fn: Callable = None):
+    # Share of co-occurrence in the blended score
+    CO_OCCURRENCE_WEIGHT = 0.7
+    
+    def __init__(
+        self,
+        user_similarity_fn: Callable = None,
+        popularity: Optional[PopularityStatsService] = None,
+        item_similarity: Optional[ItemSimilarityService] = None
+    ):
         """
         Initialize with optional user similarity function.
         
         Args:
             user_similarity_fn: Function(user_id, song_id) -> score
+            popularity: Catalog popularity statistics for the fallback
+            item_similarity: Persisted item-item co-occurrence model
         """
         self.user_similarity_fn = user_similarity_fn
+        self.popularity = popularity
+        self.item_similarity = item_similarity
     
-    def score(
+    def score_batch(
         self,
-        song: Dict[str, Any],
+        features: CandidateFeatures,
         context: RecommendationContext
-    ) -> StrategyScore:
+    ) -> StrategyBatch:
         """Score based on collaborative signals."""
         
-        song_id = song.get('song_id', song.get('id', 0))
+        play_count = features.column('play_count', 0.0)
+        like_count = features.column('like_count', 0.0)
         
         # Use external similarity function if provided
         if self.user_similarity_fn:
-            collab_score = self.user_similarity_fn(context.user_id, song_id)
+            collab_score = np.fromiter(
+                (self.user_similarity_fn(context.user_id, song_id) for song_id in features.song_ids),
+                dtype=np.float64, count=len(features)
+            )
+            return self._batch(
+                features, np.minimum(1.0, collab_score), 0.7,
+                collaborative_score=collab_score,
+                play_count=play_count,
+                like_count=like_count,
+            )
+        
+        # Fallback to popularity-based scoring
+        snapshot = self.popularity.played_snapshot() if self.popularity is not None else None
+        if snapshot is not None:
+            # Catalog-wide percentile of decayed plays
+            popularity = snapshot.lookup(features.song_ids)
         else:
-            # Fallback to popularity-based scoring
-            play_count = song.get('play_count', 0)
-            like_count = song.get('like_count', 0)
-            
             # Normalize with log scaling
-            popularity = math.log1p(play_count) / math.log1p(10000)
-            like_ratio = like_count / max(play_count, 1)
-            
-            collab_score = 0.6 * min(popularity, 1.0) + 0.4 * like_ratio
+            popularity = np.log1p(play_count) / math.log1p(10000)
+        like_ratio = like_count / np.maximum(play_count, 1)
         
-        return StrategyScore(
-            strategy=self.strategy_type,
-            score=min(1.0, collab_score),
-            confidence=0.7,
-            components={
-                'collaborative_score': collab_score,
-                'play_count': song.get('play_count', 0),
-                'like_count': song.get('like_count', 0),
-            },
-            explanation=self._generate_explanation(collab_score, song)
+        collab_score = 0.6 * np.minimum(popularity, 1.0) + 0.4 * like_ratio
+        
+        # Item-item co-occurrence with the user's history, where known
+        co_occurrence = self._co_occurrence(features, context)
+        if co_occurrence is None:
+            co_occurrence = np.zeros(len(features))
+        else:
+            w = self.CO_OCCURRENCE_WEIGHT
+            collab_score = w * co_occurrence + (1 - w) * np.minimum(collab_score, 1.0)
+        has_signal = co_occurrence > 0
+        
+        return self._batch(
+            features, np.minimum(1.0, collab_score), np.where(has_signal, 0.8, 0.7),
+            collaborative_score=collab_score,
+            co_occurrence=co_occurrence,
+            play_count=play_count,
+            like_count=like_count,
         )
     
-    def _generate_explanation(self, score: float, song: Dict) -> str:
+    def _co_occurrence(
+        self,
+        features: CandidateFeatures,
+        context: RecommendationContext
+    ) -> Optional[np.ndarray]:
+        """
+        Mean similarity of each candidate to the user's heard songs.
+        
+        None without a model or when none of the heard songs is in it.
+        """
+        model = self.item_similarity.model() if self.item_similarity is not None else None
+        if model is None:
+            return None
+        heard = {h.get('song_id') for h in context.user_history}
+        heard.update(context.session_songs)
+        if not (model.rows(heard) >= 0).any():
+            return None
+        return model.score(heard, features.song_ids, mean=True)
+    
+    def _generate_explanation(
+        self,
+        song: Dict[str, Any],
+        score: StrategyScore,
+        context: RecommendationContext
+    ) -> str:
         """Generate collaborative explanation."""
+        if score.components.get('co_occurrence', 0) > 0:
+            return "often played alongside songs you listen to"
+        score = score.components.get('collaborative_score', score.score)
         if score > 0.7:
             return "loved by listeners with similar taste"
         elif score > 0.5:
             return "popular among users like you"
         else:
             return "discovered by the community"
-    
-    def explain(
-        self,
-        song: Dict[str, Any],
-        score: StrategyScore,
-        context: RecommendationContext
-    ) -> str:
-        return score.explanation
 
 
 # =============================================================================
@@ -579,83 +771,72 @@ class DiversityStrategy(RecommendationStrategy):
     def __init__(self, config: StrategyConfig = None):
         self.config = config or StrategyConfig()
     
-    def score(
+    def score_batch(
         self,
-        song: Dict[str, Any],
+        features: CandidateFeatures,
         context: RecommendationContext
-    ) -> StrategyScore:
+    ) -> StrategyBatch:
         """Score based on diversity from recent recommendations."""
         
         session_songs = context.session_songs
         user_history = context.user_history[-self.config.diversity_window_size:]
+        n = len(features)
         
         if not session_songs and not user_history:
             # No history = maximum diversity score
-            return StrategyScore(
-                strategy=self.strategy_type,
-                score=1.0,
-                confidence=1.0,
-                components={'diversity_type': 'no_history'},
-                explanation="offers a fresh listening experience"
-            )
-        
-        diversity_penalties = []
+            return self._batch(features, np.ones(n), 1.0, no_history=1.0)
         
         # Artist diversity
-        song_artist = song.get('artist', '').lower()
-        recent_artists = [
-            h.get('artist', '').lower() 
+        recent_artists = Counter(
+            h.get('artist', '').lower()
             for h in user_history if h.get('artist')
-        ]
-        artist_penalty = recent_artists.count(song_artist) * 0.3
-        diversity_penalties.append(min(artist_penalty, 1.0))
+        )
+        artist_penalty = np.minimum(
+            np.array([recent_artists[a] * 0.3 for a in features.artists])[features.artist_codes], 1.0
+        )
         
         # Genre diversity
-        song_genre = song.get('genre', '').lower()
-        recent_genres = [
+        recent_genres = Counter(
             h.get('genre', '').lower()
             for h in user_history if h.get('genre')
-        ]
-        genre_penalty = recent_genres.count(song_genre) * 0.15
-        diversity_penalties.append(min(genre_penalty, 1.0))
+        )
+        genre_penalty = np.minimum(
+            np.array([recent_genres[g] * 0.15 for g in features.genres])[features.genre_codes], 1.0
+        )
         
         # Session song diversity (higher penalty for songs in current session)
-        song_id = song.get('song_id', song.get('id', 0))
-        if song_id in context.session_songs:
-            diversity_penalties.append(1.0)  # Already in session
+        session = set(session_songs)
+        in_session = np.fromiter(
+            (song_id in session for song_id in features.song_ids), dtype=bool, count=n
+        )
         
         # Calculate diversity score (inverse of penalty)
-        avg_penalty = sum(diversity_penalties) / len(diversity_penalties)
-        diversity_score = max(self.config.min_diversity_score, 1.0 - avg_penalty)
-        
-        return StrategyScore(
-            strategy=self.strategy_type,
-            score=diversity_score,
-            confidence=0.9,
-            components={
-                'artist_penalty': diversity_penalties[0] if diversity_penalties else 0,
-                'genre_penalty': diversity_penalties[1] if len(diversity_penalties) > 1 else 0,
-                'average_penalty': avg_penalty,
-            },
-            explanation=self._generate_explanation(diversity_score, song)
+        avg_penalty = (artist_penalty + genre_penalty + in_session) / np.where(in_session, 3, 2)
+        diversity_score = np.maximum(self.config.min_diversity_score, 1.0 - avg_penalty)
+        
+        return self._batch(
+            features, diversity_score, 0.9,
+            artist_penalty=artist_penalty,
+            genre_penalty=genre_penalty,
+            average_penalty=avg_penalty,
         )
     
-    def _generate_explanation(self, score: float, song: Dict) -> str:
+    def _generate_explanation(
+        self,
+        song: Dict[str, Any],
+        score: StrategyScore,
+        context: RecommendationContext
+    ) -> str:
         """Generate diversity explanation."""
+        if score.components.get('no_history'):
+            return "offers a fresh listening experience"
+        score = score.score
         if score > 0.8:
             return "brings something new to your session"
         elif score > 0.5:
             return "adds variety to your playlist"
         else:
             return "familiar but still enjoyable"
-    
-    def explain(
-        self,
-        song: Dict[str, Any],
-        score: StrategyScore,
-        context: RecommendationContext
-    ) -> str:
-        return score.explanation
 
 
 # =============================================================================
@@ -674,35 +855,53 @@ class ExplorationStrategy(RecommendationStrategy):
     
     strategy_type = StrategyType.EXPLORATION
     
-    def score(
+    def __init__(
         self,
-        song: Dict[str, Any],
+        popularity: Optional[PopularityStatsService] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            popularity: Catalog popularity statistics for exposure
+            seed: Seed for the random exploration boost
+        """
+        self.popularity = popularity
+        self._rng = np.random.default_rng(seed)
+    
+    def score_batch(
+        self,
+        features: CandidateFeatures,
         context: RecommendationContext
-    ) -> StrategyScore:
+    ) -> StrategyBatch:
         """Score based on exploration potential."""
         
-        components = {}
+        n = len(features)
         
         # Novelty: has user heard this before?
-        song_id = song.get('song_id', song.get('id', 0))
         heard_songs = {h.get('song_id') for h in context.user_history}
-        novelty_score = 0.0 if song_id in heard_songs else 1.0
-        components['novelty'] = novelty_score
+        novelty_score = np.fromiter(
+            (0.0 if song_id in heard_songs else 1.0 for song_id in features.song_ids),
+            dtype=np.float64, count=n
+        )
         
         # Discovery: is this outside user's typical preferences?
         preferred_genres = set(context.user_preferences.get('genres', {}).keys())
-        song_genre = song.get('genre', '').lower()
-        discovery_score = 0.8 if song_genre not in preferred_genres else 0.3
-        components['discovery'] = discovery_score
+        discovery_score = np.array(
+            [0.8 if genre not in preferred_genres else 0.3 for genre in features.genres]
+        )[features.genre_codes]
         
         # Low exposure in system (hidden gems)
-        play_count = song.get('play_count', 0)
-        exposure_score = 1.0 - min(math.log1p(play_count) / math.log1p(1000), 1.0)
-        components['low_exposure'] = exposure_score
+        snapshot = self.popularity.played_snapshot() if self.popularity is not None else None
+        if snapshot is not None:
+            exposure = snapshot.lookup(features.song_ids)
+        else:
+            exposure = np.minimum(
+                np.log1p(features.column('play_count', 0.0)) / math.log1p(1000), 1.0
+            )
+        exposure_score = 1.0 - exposure
         
         # Random boost for true exploration
-        random_boost = random.random() * 0.2
-        components['random_boost'] = random_boost
+        random_boost = self._rng.random(n) * 0.2
         
         # Weighted combination
         exploration_score = (
@@ -712,16 +911,22 @@ class ExplorationStrategy(RecommendationStrategy):
             0.1 * random_boost
         )
         
-        return StrategyScore(
-            strategy=self.strategy_type,
-            score=exploration_score,
-            confidence=0.6,  # Lower confidence for exploration
-            components=components,
-            explanation=self._generate_explanation(components, song)
+        return self._batch(
+            features, exploration_score, 0.6,  # Lower confidence for exploration
+            novelty=novelty_score,
+            discovery=discovery_score,
+            low_exposure=exposure_score,
+            random_boost=random_boost,
         )
     
-    def _generate_explanation(self, components: Dict, song: Dict) -> str:
+    def _generate_explanation(
+        self,
+        song: Dict[str, Any],
+        score: StrategyScore,
+        context: RecommendationContext
+    ) -> str:
         """Generate exploration explanation."""
+        components = score.components
         if components.get('novelty', 0) > 0.5:
             return "a new discovery for you"
         elif components.get('discovery', 0) > 0.5:
@@ -730,14 +935,6 @@ class ExplorationStrategy(RecommendationStrategy):
             return "a hidden gem worth exploring"
         else:
             return "something different to try"
-    
-    def explain(
-        self,
-        song: Dict[str, Any],
-        score: StrategyScore,
-        context: RecommendationContext
-    ) -> str:
-        return score.explanation
 
 
 # =============================================================================
@@ -755,11 +952,14 @@ class ExplorationExploitationBalancer:
     - Softmax (Boltzmann)
     """
     
-    def __init__(self, config: StrategyConfig = None):
+    STRATEGIES = tuple(StrategyType)
+    
+    def __init__(self, config: StrategyConfig = None, seed: Optional[int] = None):
         self.config = config or StrategyConfig()
         self.strategy_performance: Dict[StrategyType, StrategyPerformance] = {
             st: StrategyPerformance(strategy=st) for st in StrategyType
         }
+        self._rng = np.random.default_rng(seed)
     
     def select_weights(
         self,
@@ -776,6 +976,14 @@ class ExplorationExploitationBalancer:
         Returns:
             Dictionary of strategy weights
         """
+        return dict(zip(self.STRATEGIES, self.select_weight_vector(method, context).tolist()))
+    
+    def select_weight_vector(
+        self,
+        method: ExplorationMethod,
+        context: RecommendationContext
+    ) -> np.ndarray:
+        """Strategy weights as an array aligned with STRATEGIES."""
         if method == ExplorationMethod.EPSILON_GREEDY:
             return self._epsilon_greedy()
         elif method == ExplorationMethod.UCB1:
@@ -785,92 +993,79 @@ class ExplorationExploitationBalancer:
         elif method == ExplorationMethod.SOFTMAX:
             return self._softmax()
         else:
-            return self._default_weights()
+            return self._default_vector()
+    
+    def _performance_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(successes, failures, pulls, average reward) per strategy."""
+        perfs = [self.strategy_performance[st] for st in self.STRATEGIES]
+        return (
+            np.array([p.successes for p in perfs], dtype=np.float64),
+            np.array([p.failures for p in perfs], dtype=np.float64),
+            np.array([p.total_pulls for p in perfs], dtype=np.float64),
+            np.array([p.average_reward for p in perfs], dtype=np.float64),
+        )
     
-    def _epsilon_greedy(self) -> Dict[StrategyType, float]:
+    def _epsilon_greedy(self) -> np.ndarray:
         """ε-greedy strategy selection."""
-        weights = {}
+        n = len(self.STRATEGIES)
         
-        if random.random() < self.config.exploration_rate:
+        if self._rng.random() < self.config.exploration_rate:
             # Explore: equal weights
-            for st in StrategyType:
-                weights[st] = 1.0 / len(StrategyType)
-        else:
-            # Exploit: weight by performance
-            total_reward = sum(
-                perf.average_reward 
-                for perf in self.strategy_performance.values()
-            )
-            
-            for st in StrategyType:
-                if total_reward > 0:
-                    weights[st] = self.strategy_performance[st].average_reward / total_reward
-                else:
-                    weights[st] = 1.0 / len(StrategyType)
+            return np.full(n, 1.0 / n)
         
-        return self._normalize_weights(weights)
+        # Exploit: weight by performance
+        rewards = self._performance_arrays()[3]
+        total_reward = rewards.sum()
+        if total_reward > 0:
+            return rewards / total_reward
+        return np.full(n, 1.0 / n)
     
-    def _ucb1(self) -> Dict[StrategyType, float]:
+    def _ucb1(self) -> np.ndarray:
         """UCB1 (Upper Confidence Bound) strategy selection."""
-        weights = {}
-        total_pulls = sum(perf.total_pulls for perf in self.strategy_performance.values())
+        _, _, pulls, rewards = self._performance_arrays()
         
-        for st in StrategyType:
-            perf = self.strategy_performance[st]
-            
-            if perf.total_pulls == 0:
-                # Encourage trying untried strategies
-                ucb_value = float('inf')
-            else:
-                # UCB1 formula: avg_reward + c * sqrt(ln(t) / n_i)
-                exploitation = perf.average_reward
-                exploration = self.config.ucb_confidence * math.sqrt(
-                    math.log(max(total_pulls, 1)) / perf.total_pulls
-                )
-                ucb_value = exploitation + exploration
-            
-            weights[st] = ucb_value
+        untried = pulls == 0
+        if untried.any():
+            # Untried strategies have an unbounded UCB and share the weight
+            return untried / untried.sum()
         
-        return self._normalize_weights(weights)
+        # UCB1 formula: avg_reward + c * sqrt(ln(t) / n_i)
+        total_pulls = pulls.sum()
+        exploration = self.config.ucb_confidence * np.sqrt(
+            math.log(max(total_pulls, 1)) / pulls
+        )
+        return self._normalize_vector(rewards + exploration)
     
-    def _thompson_sampling(self) -> Dict[StrategyType, float]:
+    def _thompson_sampling(self) -> np.ndarray:
         """Thompson Sampling using Beta distribution."""
-        weights = {}
+        successes, failures, _, _ = self._performance_arrays()
         
-        for st in StrategyType:
-            perf = self.strategy_performance[st]
-            
-            # Beta distribution parameters
-            alpha = self.config.thompson_alpha + perf.successes
-            beta = self.config.thompson_beta + perf.failures
-            
-            # Sample from Beta distribution
-            sampled_value = random.betavariate(alpha, beta)
-            weights[st] = sampled_value
-        
-        return self._normalize_weights(weights)
+        # Sample every strategy's Beta posterior at once
+        sampled = self._rng.beta(
+            self.config.thompson_alpha + successes,
+            self.config.thompson_beta + failures
+        )
+        return self._normalize_vector(sampled)
     
-    def _softmax(self, temperature: float = 1.0) -> Dict[StrategyType, float]:
+    def _softmax(self, temperature: float = 1.0) -> np.ndarray:
         """Softmax (Boltzmann) exploration."""
-        weights = {}
-        
-        # Get average rewards
-        rewards = {
-            st: self.strategy_performance[st].average_reward
-            for st in StrategyType
-        }
+        rewards = self._performance_arrays()[3]
         
         # Softmax with temperature
-        max_reward = max(rewards.values()) if rewards else 0
-        exp_sum = sum(
-            math.exp((r - max_reward) / temperature)
-            for r in rewards.values()
-        )
-        
-        for st, reward in rewards.items():
-            weights[st] = math.exp((reward - max_reward) / temperature) / exp_sum
-        
-        return weights
+        exp = np.exp((rewards - rewards.max()) / temperature)
+        return exp / exp.sum()
+    
+    def _default_vector(self) -> np.ndarray:
+        """Default strategy weights from config as an array."""
+        defaults = self._default_weights()
+        return np.array([defaults[st] for st in self.STRATEGIES], dtype=np.float64)
+    
+    def _normalize_vector(self, weights: np.ndarray) -> np.ndarray:
+        """Normalize weights to sum to 1.0."""
+        total = weights.sum()
+        if total > 0:
+            return weights / total
+        return self._default_vector()
     
     def _default_weights(self) -> Dict[StrategyType, float]:
         """Default strategy weights from config."""
@@ -882,13 +1077,6 @@ class ExplorationExploitationBalancer:
             StrategyType.EXPLORATION: self.config.exploration_weight,
         }
     
-    def _normalize_weights(self, weights: Dict[StrategyType, float]) -> Dict[StrategyType, float]:
-        """Normalize weights to sum to 1.0."""
-        total = sum(weights.values())
-        if total > 0:
-            return {k: v / total for k, v in weights.items()}
-        return self._default_weights()
-    
     def update_performance(
         self,
         strategy: StrategyType,
@@ -920,7 +1108,7 @@ class MultiStrategyEngine:
     to generate diverse, personalized recommendations.
     
     Usage:
-        engine = MultiStrategyEngine()
+        engine = create_multi_strategy_engine()  # shared popularity + item similarity
         
         context = RecommendationContext(
             user_id=user_id,
@@ -938,7 +1126,9 @@ class MultiStrategyEngine:
     def __init__(
         self,
         config: StrategyConfig = None,
-        exploration_method: ExplorationMethod = ExplorationMethod.THOMPSON_SAMPLING
+        exploration_method: ExplorationMethod = ExplorationMethod.THOMPSON_SAMPLING,
+        popularity: Optional[PopularityStatsService] = None,
+        item_similarity: Optional[ItemSimilarityService] = None
     ):
         self.config = config or StrategyConfig()
         self.config.validate()
@@ -950,9 +1140,11 @@ class MultiStrategyEngine:
         self.strategies: Dict[StrategyType, RecommendationStrategy] = {
             StrategyType.EMOTION: EmotionStrategy(),
             StrategyType.CONTENT: ContentStrategy(),
-            StrategyType.COLLABORATIVE: CollaborativeStrategy(),
+            StrategyType.COLLABORATIVE: CollaborativeStrategy(
+                popularity=popularity, item_similarity=item_similarity
+            ),
             StrategyType.DIVERSITY: DiversityStrategy(self.config),
-            StrategyType.EXPLORATION: ExplorationStrategy(),
+            StrategyType.EXPLORATION: ExplorationStrategy(popularity),
         }
     
     def recommend(
@@ -985,49 +1177,51 @@ class MultiStrategyEngine:
             strategy_weights, context_modifiers
         )
         
-        # Score all candidates
-        scored_candidates = []
+        # Score all candidates: one array per strategy
+        features = CandidateFeatures.from_songs(candidates)
+        batches = {
+            strategy_type: strategy.score_batch(features, context)
+            for strategy_type, strategy in self.strategies.items()
+        }
+        
+        # Fuse weighted strategy scores
+        final_score = np.zeros(len(features))
+        final_confidence = np.zeros(len(features))
+        contributions = []
+        for strategy_type, batch in batches.items():
+            weight = strategy_weights.get(strategy_type, 0.0)
+            contribution = weight * batch.scores
+            final_score += contribution
+            final_confidence += weight * batch.confidence
+            contributions.append(contribution)
+        
+        # Dominant strategy per candidate, for explanation
+        strategy_types = list(batches)
+        dominant = (
+            np.argmax(np.vstack(contributions), axis=0)
+            if contributions else np.zeros(len(features), dtype=np.int64)
+        )
         
-        for song in candidates:
+        # Select top_k by score; only these become CandidateSong objects
+        top_candidates = []
+        for i in np.argsort(-final_score, kind='stable')[:top_k].tolist():
             candidate = CandidateSong(
-                song_id=song.get('song_id', song.get('id', 0)),
-                song_data=song
+                song_id=features.song_ids[i],
+                song_data=features.songs[i],
+                strategy_scores={st: batch.at(i) for st, batch in batches.items()},
+                final_score=float(final_score[i]),
+                final_confidence=float(final_confidence[i]),
             )
-            
-            # Score with each strategy
-            weighted_score = 0.0
-            weighted_confidence = 0.0
-            
-            for strategy_type, strategy in self.strategies.items():
-                score = strategy.score(song, context)
-                candidate.strategy_scores[strategy_type] = score
-                
-                weight = strategy_weights.get(strategy_type, 0.0)
-                weighted_score += weight * score.score
-                weighted_confidence += weight * score.confidence
-            
-            candidate.final_score = weighted_score
-            candidate.final_confidence = weighted_confidence
-            
-            # Determine dominant strategy for explanation
-            if candidate.strategy_scores:
-                dominant = max(
-                    candidate.strategy_scores.items(),
-                    key=lambda x: x[1].score * strategy_weights.get(x[0], 0.0)
-                )
-                candidate.selected_strategy = dominant[0]
-            
-            # Generate explanation
-            if explain:
+            if strategy_types:
+                candidate.selected_strategy = strategy_types[dominant[i]]
+            top_candidates.append(candidate)
+        
+        # Explanations are only rendered for returned songs
+        if explain:
+            for candidate in top_candidates:
                 candidate.explanation_components = self._generate_explanation(
                     candidate, context, strategy_weights
                 )
-            
-            scored_candidates.append(candidate)
-        
-        # Sort by score and select top_k
-        scored_candidates.sort(key=lambda c: c.final_score, reverse=True)
-        top_candidates = scored_candidates[:top_k]
         
         return RecommendationResult(
             songs=top_candidates,
@@ -1103,14 +1297,17 @@ class MultiStrategyEngine:
         
         # Get top contributing strategies
         contributions = [
-            (st, score.score * weights.get(st, 0.0), score.explanation)
+            (st, score.score * weights.get(st, 0.0), score)
             for st, score in candidate.strategy_scores.items()
             if score.score > 0.3
         ]
         contributions.sort(key=lambda x: x[1], reverse=True)
         
         # Take top 2-3 explanations
-        for strategy_type, _, explanation in contributions[:3]:
+        for strategy_type, _, score in contributions[:3]:
+            explanation = self.strategies[strategy_type].explain(
+                candidate.song_data, score, context
+            )
             if explanation:
                 explanations.append(explanation)
         
@@ -1155,9 +1352,23 @@ class MultiStrategyEngine:
 
 def create_multi_strategy_engine(
     config: StrategyConfig = None,
-    exploration_method: str = "thompson"
+    exploration_method: str = "thompson",
+    popularity: Optional[PopularityStatsService] = None,
+    item_similarity: Optional[ItemSimilarityService] = None
 ) -> MultiStrategyEngine:
-    """Create a MultiStrategyEngine instance."""
+    """
+    Create a MultiStrategyEngine instance.
+    
+    Uses the shared popularity and item similarity services unless
+    others are injected.
+    """
+    if popularity is None:
+        from backend.services.popularity_stats import get_popularity_service
+        popularity = get_popularity_service()
+    if item_similarity is None:
+        from backend.services.item_similarity import get_item_similarity_service
+        item_similarity = get_item_similarity_service()
+    
     method_map = {
         "epsilon": ExplorationMethod.EPSILON_GREEDY,
         "ucb": ExplorationMethod.UCB1,
@@ -1166,4 +1377,4 @@ def create_multi_strategy_engine(
     }
     
     method = method_map.get(exploration_method.lower(), ExplorationMethod.THOMPSON_SAMPLING)
-    return MultiStrategyEngine(config, method)
+    return MultiStrategyEngine(config, method, popularity, item_similarity)
@@ -32,17 +32,25 @@ import hashlib
 import json
 import logging
 import math
+import pickle
+import random
 import sqlite3
 import threading
 import time
+import zlib
 from abc import ABC, abstractmethod
 from collections import OrderedDict, defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any, Callable, TypeVar, Generic
+from typing import Dict, Iterable, List, Optional, Tuple, Any, Callable, TypeVar, Generic
 from contextlib import contextmanager
 from functools import wraps
 
+import numpy as np
+
+from backend.repositories.invalidation import get_invalidation_bus
+from backend.src.ranking.clustering import assign_clusters, minibatch_kmeans
+
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
@@ -66,6 +74,10 @@ class CacheConfig:
     l2_ttl_seconds: float = 3600.0  # 1 hour
     l2_max_size: int = 10000
     
+    # Request coalescing
+    early_refresh_beta: float = 1.0  # 0 disables probabilistic early refresh
+    flight_timeout_seconds: float = 30.0
+    
     # Precomputation
     cluster_update_interval_hours: int = 24
     similarity_matrix_size: int = 100
@@ -83,6 +95,7 @@ class CacheEntry(Generic[T]):
     created_at: datetime
     expires_at: datetime
     hits: int = 0
+    compute_seconds: float = 0.0  # Time it took to produce the value
     
     @property
     def is_expired(self) -> bool:
@@ -121,6 +134,31 @@ class CacheStats:
         }
 
 
+@dataclass
+class CoalescingStats:
+    """Single-flight and early refresh statistics."""
+    computes: int = 0          # Values computed (misses and refreshes)
+    coalesced: int = 0         # Callers that waited on another caller's compute
+    early_refreshes: int = 0   # Recomputes started before TTL expiry
+    errors: int = 0            # Computes that raised
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'computes': self.computes,
+            'coalesced': self.coalesced,
+            'early_refreshes': self.early_refreshes,
+            'errors': self.errors,
+        }
+
+
+@dataclass
+class _Flight:
+    """An in-progress compute that other callers can wait on."""
+    done: threading.Event = field(default_factory=threading.Event)
+    value: Any = None
+    error: Optional[BaseException] = None
+
+
 # =============================================================================
 # LRU CACHE (L1 - MEMORY)
 # =============================================================================
@@ -154,6 +192,11 @@ class LRUCache(Generic[T]):
     
     def get(self, key: str) -> Optional[T]:
         """Get value from cache."""
+        entry = self.get_entry(key)
+        return entry.value if entry is not None else None
+    
+    def get_entry(self, key: str) -> Optional[CacheEntry[T]]:
+        """Get entry (value and metadata) from cache."""
         with self._lock:
             entry = self._cache.get(key)
             
@@ -162,7 +205,7 @@ class LRUCache(Generic[T]):
                 return None
             
             if entry.is_expired:
-                del self._cache[key]
+                self._remove(key)
                 self._stats.misses += 1
                 return None
             
@@ -171,10 +214,17 @@ class LRUCache(Generic[T]):
             entry.hits += 1
             self._stats.hits += 1
             
-            return entry.value
+            return entry
     
-    def put(self, key: str, value: T, ttl: float = None) -> None:
-        """Put value in cache."""
+    def put(
+        self,
+        key: str,
+        value: T,
+        ttl: float = None,
+        compute_seconds: float = 0.0,
+        tags: Iterable[str] = ()
+    ) -> None:
+        """Put value in cache, optionally tagged for invalidation."""
         ttl = ttl or self.ttl_seconds
         
         with self._lock:
@@ -184,7 +234,7 @@ class LRUCache(Generic[T]):
             
             # Evict if at capacity
             while len(self._cache) >= self.max_size:
-                self._cache.popitem(last=False)
+                self._remove(next(iter(self._cache)))
                 self._stats.evictions += 1
             
             # Add new entry
@@ -194,14 +244,16 @@ class LRUCache(Generic[T]):
                 value=value,
                 created_at=now,
                 expires_at=now + timedelta(seconds=ttl),
+                compute_seconds=compute_seconds,
             )
             self._stats.size = len(self._cache)
+            get_invalidation_bus().tag(self, key, tags)
     
     def delete(self, key: str) -> bool:
         """Delete entry from cache."""
         with self._lock:
             if key in self._cache:
-                del self._cache[key]
+                self._remove(key)
                 self._stats.size = len(self._cache)
                 return True
             return False
@@ -211,6 +263,12 @@ class LRUCache(Generic[T]):
         with self._lock:
             self._cache.clear()
             self._stats.size = 0
+            get_invalidation_bus().untag_all(self)
+    
+    def _remove(self, key: str) -> None:
+        """Drop an entry and its tags (caller holds the lock)."""
+        del self._cache[key]
+        get_invalidation_bus().untag(self, key)
     
     def get_stats(self) -> CacheStats:
         """Get cache statistics."""
@@ -235,132 +293,321 @@ class PersistentCache:
     - Survives restarts
     - Configurable TTL
     - Automatic cleanup
+    
+    Reads must stay cheap, so:
+    - One WAL-mode connection is opened once and shared under a lock
+    - Values are pickled (zlib-compressed above ``compress_min_bytes``)
+      into a BLOB instead of JSON text
+    - Hit counters accumulate in memory and are written in one batch
+      every ``hit_flush_size`` hits (and on ``flush()`` / ``close()``),
+      so a hit is not also a write
+    - The entry count is maintained in memory (read once at startup);
+      eviction deletes the oldest entries in batches of ``evict_batch``
+      instead of running COUNT(*) on every put
+    
+    Invalidation tags are stored with the entries in ``l2_cache_tags``.
+    The cache subscribes to the invalidation bus and resolves published
+    tags through that table, so entries written before a restart or by
+    another process sharing the file are invalidated precisely. Each entry also keeps the
+    ``compute_seconds`` it took to produce, so a value promoted back to
+    L1 keeps its early-refresh weight.
     """
     
-    def __init__(self, db_path: str, ttl_seconds: float = 3600.0, max_size: int = 10000):
+    TABLE = "l2_cache"
+    TAGS_TABLE = "l2_cache_tags"
+    
+    # Value encodings (first byte of the stored blob)
+    _RAW = b"p"
+    _ZLIB = b"z"
+    
+    def __init__(
+        self,
+        db_path: str,
+        ttl_seconds: float = 3600.0,
+        max_size: int = 10000,
+        hit_flush_size: int = 256,
+        evict_batch: int = 100,
+        compress_min_bytes: int = 1024
+    ):
         self.db_path = db_path
         self.ttl_seconds = ttl_seconds
         self.max_size = max_size
+        self.hit_flush_size = hit_flush_size
+        self.evict_batch = evict_batch
+        self.compress_min_bytes = compress_min_bytes
+        
+        self._lock = threading.RLock()
+        self._stats = CacheStats()
+        self._pending_hits: Dict[str, int] = {}
+        self._pending_total = 0
+        self._conn = self._open()
         self._init_db()
     
+    def _open(self) -> sqlite3.Connection:
+        """Open the shared connection."""
+        conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
     def _init_db(self):
         """Initialize cache database."""
-        with self._connection() as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS cache (
+        with self._lock:
+            conn = self._conn
+            # Pre-binary layout (JSON text, ISO timestamps); cached data only
+            if self._has_legacy_table(conn):
+                conn.execute("DROP TABLE cache")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.TABLE} (
                     key TEXT PRIMARY KEY,
-                    value TEXT,
-                    created_at TEXT,
-                    expires_at TEXT,
-                    hits INTEGER DEFAULT 0
+                    value BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    hits INTEGER DEFAULT 0,
+                    compute_seconds REAL NOT NULL DEFAULT 0
                 )
             """)
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache(expires_at)")
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({self.TABLE})")}
+            if "compute_seconds" not in columns:
+                conn.execute(
+                    f"ALTER TABLE {self.TABLE} ADD COLUMN compute_seconds REAL NOT NULL DEFAULT 0"
+                )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_l2_cache_expires ON {self.TABLE}(expires_at)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_l2_cache_created ON {self.TABLE}(created_at)")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.TAGS_TABLE} (
+                    key TEXT NOT NULL,
+                    tag TEXT NOT NULL,
+                    PRIMARY KEY (key, tag)
+                ) WITHOUT ROWID
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_l2_cache_tags_tag ON {self.TAGS_TABLE}(tag)")
             conn.commit()
+            self._stats.size = conn.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+        get_invalidation_bus().subscribe(self)
     
-    @contextmanager
-    def _connection(self):
-        """Get database connection."""
-        conn = sqlite3.connect(self.db_path, timeout=10.0)
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-        finally:
-            conn.close()
+    # Columns of the pre-binary ``cache`` table (JSON text, ISO timestamps)
+    _LEGACY_COLUMNS = {
+        "key": "TEXT", "value": "TEXT", "created_at": "TEXT",
+        "expires_at": "TEXT", "hits": "INTEGER",
+    }
+    
+    @classmethod
+    def _has_legacy_table(cls, conn: sqlite3.Connection) -> bool:
+        """Whether ``conn`` has the old JSON ``cache`` table, not an unrelated table of that name."""
+        columns = {row[1]: row[2].upper() for row in conn.execute("PRAGMA table_info(cache)")}
+        return columns == cls._LEGACY_COLUMNS
+    
+    def _encode(self, value: Any) -> bytes:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) >= self.compress_min_bytes:
+            return self._ZLIB + zlib.compress(data, 1)
+        return self._RAW + data
+    
+    def _decode(self, blob: bytes) -> Any:
+        data = blob[1:]
+        if blob[:1] == self._ZLIB:
+            data = zlib.decompress(data)
+        return pickle.loads(data)
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from persistent cache."""
-        with self._connection() as conn:
-            cursor = conn.execute(
-                "SELECT value, expires_at FROM cache WHERE key = ?",
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+    
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Get ``(value, compute_seconds)`` from persistent cache."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at, compute_seconds FROM {self.TABLE} WHERE key = ?",
                 (key,)
-            )
-            row = cursor.fetchone()
+            ).fetchone()
             
             if row is None:
+                self._stats.misses += 1
                 return None
             
             # Check expiration
-            expires_at = datetime.fromisoformat(row['expires_at'])
-            if datetime.now() > expires_at:
-                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
-                conn.commit()
+            if time.time() > row[1]:
+                self._delete_keys([key])
+                self._conn.commit()
+                self._stats.misses += 1
                 return None
             
-            # Update hits
-            conn.execute("UPDATE cache SET hits = hits + 1 WHERE key = ?", (key,))
-            conn.commit()
+            # Count the hit, written with the next batch
+            self._stats.hits += 1
+            self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+            self._pending_total += 1
+            if self._pending_total >= self.hit_flush_size:
+                self._flush_hits()
+                self._conn.commit()
             
-            return json.loads(row['value'])
+            blob, compute_seconds = row[0], row[2]
+        return self._decode(blob), compute_seconds
     
-    def put(self, key: str, value: Any, ttl: float = None) -> None:
-        """Put value in persistent cache."""
+    def put(
+        self,
+        key: str,
+        value: Any,
+        ttl: float = None,
+        tags: Iterable[str] = (),
+        compute_seconds: float = 0.0
+    ) -> None:
+        """Put value in persistent cache, optionally tagged for invalidation."""
         ttl = ttl or self.ttl_seconds
-        now = datetime.now()
-        expires_at = now + timedelta(seconds=ttl)
+        now = time.time()
+        blob = self._encode(value)
+        tags = tuple(dict.fromkeys(tags))
         
-        with self._connection() as conn:
-            # Enforce max size
-            cursor = conn.execute("SELECT COUNT(*) as count FROM cache")
-            count = cursor.fetchone()['count']
-            
-            if count >= self.max_size:
-                # Delete oldest entries
-                conn.execute("""
-                    DELETE FROM cache
-                    WHERE key IN (
-                        SELECT key FROM cache
-                        ORDER BY created_at ASC
-                        LIMIT ?
-                    )
-                """, (count - self.max_size + 100,))
+        with self._lock:
+            conn = self._conn
+            # Replacing an entry resets its hit count and tags
+            self._forget_hits(key)
+            replaced = conn.execute(f"DELETE FROM {self.TABLE} WHERE key = ?", (key,)).rowcount
+            conn.execute(f"DELETE FROM {self.TAGS_TABLE} WHERE key = ?", (key,))
+            conn.execute(
+                f"INSERT INTO {self.TABLE} "
+                f"(key, value, created_at, expires_at, hits, compute_seconds) "
+                f"VALUES (?, ?, ?, ?, 0, ?)",
+                (key, blob, now, now + ttl, compute_seconds)
+            )
+            if tags:
+                conn.executemany(
+                    f"INSERT INTO {self.TAGS_TABLE} (key, tag) VALUES (?, ?)",
+                    [(key, tag) for tag in tags]
+                )
+            self._stats.size += 1 - replaced
             
-            # Insert or replace
-            conn.execute("""
-                INSERT OR REPLACE INTO cache (key, value, created_at, expires_at, hits)
-                VALUES (?, ?, ?, ?, 0)
-            """, (key, json.dumps(value), now.isoformat(), expires_at.isoformat()))
+            # Enforce max size
+            if self._stats.size > self.max_size:
+                self._evict(self._stats.size - self.max_size + self.evict_batch, keep=key)
             
             conn.commit()
     
     def delete(self, key: str) -> bool:
         """Delete entry from cache."""
-        with self._connection() as conn:
-            cursor = conn.execute("DELETE FROM cache WHERE key = ?", (key,))
-            conn.commit()
-            return cursor.rowcount > 0
+        with self._lock:
+            deleted = self._delete_keys([key])
+            self._conn.commit()
+            return deleted > 0
+    
+    def tags_of(self, key: str) -> Tuple[str, ...]:
+        """Invalidation tags stored with an entry."""
+        with self._lock:
+            return tuple(
+                row[0] for row in self._conn.execute(
+                    f"SELECT tag FROM {self.TAGS_TABLE} WHERE key = ?", (key,)
+                )
+            )
+    
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Delete every entry carrying any of ``tags`` (invalidation bus hook)."""
+        tags = list(tags)
+        with self._lock:
+            if self._conn is None or not tags:
+                return 0
+            tagged = (
+                f"SELECT key FROM {self.TAGS_TABLE} "
+                f"WHERE tag IN ({','.join('?' * len(tags))})"
+            )
+            deleted = self._conn.execute(
+                f"DELETE FROM {self.TABLE} WHERE key IN ({tagged})", tags
+            ).rowcount
+            self._conn.execute(f"DELETE FROM {self.TAGS_TABLE} WHERE key IN ({tagged})", tags)
+            self._conn.commit()
+            self._stats.size -= deleted
+            return deleted
     
     def cleanup_expired(self) -> int:
         """Remove expired entries."""
-        with self._connection() as conn:
-            cursor = conn.execute(
-                "DELETE FROM cache WHERE expires_at < ?",
-                (datetime.now().isoformat(),)
-            )
-            conn.commit()
-            return cursor.rowcount
+        with self._lock:
+            keys = [
+                row[0] for row in self._conn.execute(
+                    f"SELECT key FROM {self.TABLE} WHERE expires_at < ?", (time.time(),)
+                )
+            ]
+            deleted = self._delete_keys(keys)
+            self._conn.commit()
+            return deleted
     
     def clear(self) -> None:
         """Clear all entries."""
-        with self._connection() as conn:
-            conn.execute("DELETE FROM cache")
-            conn.commit()
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.TABLE}")
+            self._conn.execute(f"DELETE FROM {self.TAGS_TABLE}")
+            self._conn.commit()
+            self._pending_hits.clear()
+            self._pending_total = 0
+            self._stats.size = 0
+    
+    def flush(self) -> int:
+        """Write accumulated hit counters, returns the number of entries updated."""
+        with self._lock:
+            updated = self._flush_hits()
+            self._conn.commit()
+            return updated
+    
+    def close(self) -> None:
+        """Flush hit counters and close the connection (tags stay on disk)."""
+        with self._lock:
+            if self._conn is None:
+                return
+            get_invalidation_bus().unsubscribe(self)
+            self.flush()
+            self._conn.close()
+            self._conn = None
     
     def get_stats(self) -> CacheStats:
-        """Get cache statistics."""
-        with self._connection() as conn:
-            cursor = conn.execute("""
-                SELECT 
-                    COUNT(*) as size,
-                    SUM(hits) as total_hits
-                FROM cache
-            """)
-            row = cursor.fetchone()
-            
+        """Get cache statistics (hits and misses since startup)."""
+        with self._lock:
             return CacheStats(
-                hits=row['total_hits'] or 0,
-                size=row['size'] or 0,
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                size=self._stats.size,
             )
+    
+    def _flush_hits(self) -> int:
+        """Write pending hit counters (caller holds the lock and commits)."""
+        if not self._pending_hits:
+            return 0
+        pending = self._pending_hits
+        self._pending_hits = {}
+        self._pending_total = 0
+        self._conn.executemany(
+            f"UPDATE {self.TABLE} SET hits = hits + ? WHERE key = ?",
+            [(hits, key) for key, hits in pending.items()]
+        )
+        return len(pending)
+    
+    def _forget_hits(self, key: str) -> None:
+        hits = self._pending_hits.pop(key, 0)
+        self._pending_total -= hits
+    
+    def _delete_keys(self, keys: List[str]) -> int:
+        """Delete entries and keep the size counter (caller holds the lock and commits)."""
+        for key in keys:
+            self._forget_hits(key)
+        deleted = 0
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            deleted += self._conn.execute(
+                f"DELETE FROM {self.TABLE} WHERE key IN ({placeholders})", chunk
+            ).rowcount
+            self._conn.execute(f"DELETE FROM {self.TAGS_TABLE} WHERE key IN ({placeholders})", chunk)
+        self._stats.size -= deleted
+        return deleted
+    
+    def _evict(self, count: int, keep: str) -> None:
+        """Delete the ``count`` oldest entries, never ``keep``."""
+        keys = [
+            row[0] for row in self._conn.execute(
+                f"SELECT key FROM {self.TABLE} WHERE key != ? ORDER BY created_at ASC LIMIT ?",
+                (keep, count)
+            )
+        ]
+        self._stats.evictions += self._delete_keys(keys)
 
 
 # =============================================================================
@@ -376,12 +623,25 @@ class MultiLevelCache:
     2. L2 (slower, larger)
     
     On miss: Fetch and populate both levels
-    On hit at L2: Promote to L1
+    On hit at L2: Promote to L1 (keeping its invalidation tags)
+    
+    ``get_or_compute`` adds request coalescing:
+    - Single flight: on a miss, one caller computes the value and
+      concurrent callers for the same key wait for its result
+    - Early refresh: an L1 hit recomputes with probability rising as the
+      entry nears expiry, scaled by how long the value took to compute
+      (``-compute_seconds * beta * ln(U) >= remaining TTL``), so popular
+      keys are refreshed by one caller before they expire for everyone
     """
     
     def __init__(self, config: CacheConfig = None):
         self.config = config or CacheConfig()
         
+        self._flights: Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        self._coalescing = CoalescingStats()
+        self._rng = random.Random()
+        
         self.l1 = LRUCache(
             max_size=self.config.l1_max_size,
             ttl_seconds=self.config.l1_ttl_seconds,
@@ -403,21 +663,121 @@ class MultiLevelCache:
             return value
         
         # Try L2
-        if self.l2:
-            value = self.l2.get(key)
-            if value is not None:
-                # Promote to L1
-                self.l1.put(key, value)
-                return value
+        return self._get_l2(key)
+    
+    def _get_l2(self, key: str) -> Optional[Any]:
+        """Get value from L2, promoting hits to L1 (with tags and compute cost)."""
+        if not self.l2:
+            return None
+        value, compute_seconds = self.l2.get_entry(key) or (None, 0.0)
+        if value is None:
+            return None
+        tags = self.l2.tags_of(key)
+        self.l1.put(key, value, compute_seconds=compute_seconds, tags=tags)
+        return value
+    
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: float = None,
+        tags: Iterable[str] = ()
+    ) -> Any:
+        """
+        Get value from cache, computing it at most once per key on a miss.
         
-        return None
+        Args:
+            key: Cache key
+            compute: Produces the value on a miss or early refresh
+            ttl: TTL for the computed value (default: per-level TTLs)
+            tags: Invalidation tags of the computed value
+        """
+        entry = self.l1.get_entry(key)
+        if entry is not None:
+            if not self._should_refresh(entry):
+                return entry.value
+            with self._flights_lock:
+                if key in self._flights:
+                    return entry.value  # Already being refreshed
+                flight = self._flights[key] = _Flight()
+                self._coalescing.early_refreshes += 1
+            try:
+                return self._run_flight(key, flight, compute, ttl, tags)
+            except Exception as e:
+                logger.warning(f"Early refresh of {key} failed, serving cached value: {e}")
+                return entry.value
+        
+        value = self._get_l2(key)
+        if value is not None:
+            return value
+        
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._coalescing.coalesced += 1
+        
+        if leader:
+            return self._run_flight(key, flight, compute, ttl, tags)
+        
+        if not flight.done.wait(self.config.flight_timeout_seconds):
+            logger.warning(f"Timed out waiting for {key}, computing directly")
+            return compute()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
     
-    def put(self, key: str, value: Any, ttl: float = None) -> None:
-        """Put value in both cache levels."""
-        self.l1.put(key, value, ttl or self.config.l1_ttl_seconds)
+    def _should_refresh(self, entry: CacheEntry) -> bool:
+        """Probabilistic early expiration (never for values of unknown cost)."""
+        beta = self.config.early_refresh_beta
+        if beta <= 0 or entry.compute_seconds <= 0:
+            return False
+        remaining = (entry.expires_at - datetime.now()).total_seconds()
+        return -entry.compute_seconds * beta * math.log(1.0 - self._rng.random()) >= remaining
+    
+    def _run_flight(
+        self,
+        key: str,
+        flight: _Flight,
+        compute: Callable[[], Any],
+        ttl: Optional[float],
+        tags: Iterable[str]
+    ) -> Any:
+        """Compute as the flight leader, publish the result and release waiters."""
+        try:
+            start = time.perf_counter()
+            value = compute()
+            self.put(key, value, ttl, compute_seconds=time.perf_counter() - start, tags=tags)
+            flight.value = value
+            with self._flights_lock:
+                self._coalescing.computes += 1
+            return value
+        except BaseException as e:
+            flight.error = e
+            with self._flights_lock:
+                self._coalescing.errors += 1
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+    
+    def put(
+        self,
+        key: str,
+        value: Any,
+        ttl: float = None,
+        compute_seconds: float = 0.0,
+        tags: Iterable[str] = ()
+    ) -> None:
+        """Put value in both cache levels, optionally tagged for invalidation."""
+        tags = tuple(tags)
+        self.l1.put(key, value, ttl or self.config.l1_ttl_seconds, compute_seconds, tags)
         
         if self.l2:
-            self.l2.put(key, value, ttl or self.config.l2_ttl_seconds)
+            self.l2.put(key, value, ttl or self.config.l2_ttl_seconds, tags, compute_seconds)
     
     def delete(self, key: str) -> bool:
         """Delete from both levels."""
@@ -431,11 +791,18 @@ class MultiLevelCache:
         if self.l2:
             self.l2.clear()
     
-    def get_stats(self) -> Dict[str, CacheStats]:
-        """Get statistics for both levels."""
-        stats = {'l1': self.l1.get_stats()}
+    def close(self) -> None:
+        """Flush and close the persistent level."""
+        if self.l2:
+            self.l2.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get statistics for both levels and for request coalescing."""
+        stats: Dict[str, Any] = {'l1': self.l1.get_stats()}
         if self.l2:
             stats['l2'] = self.l2.get_stats()
+        with self._flights_lock:
+            stats['coalescing'] = CoalescingStats(**self._coalescing.to_dict())
         return stats
 
 
@@ -449,7 +816,7 @@ class EmotionCluster:
     cluster_id: int
     centroid_valence: float
     centroid_arousal: float
-    song_ids: List[int]
+    song_ids: List[int]  # Closest to the centroid first
     representative_mood: str
     
     def distance_to(self, valence: float, arousal: float) -> float:
@@ -464,8 +831,11 @@ class ClusterManager:
     """
     Manages precomputed emotion clusters for efficient retrieval.
     
-    Uses simplified K-means clustering on VA space to group songs
-    by emotional similarity. Clusters are precomputed and cached.
+    Songs are clustered with mini-batch k-means in VA space (valence and
+    energy mapped to [-1, 1]). Cluster ids and centroids are persisted
+    (``song_clusters`` / ``song_cluster_centroids``); on load, songs added
+    since the last build are assigned to the nearest stored centroid, so
+    the catalog can grow without re-clustering.
     """
     
     MOOD_CENTROIDS = {
@@ -483,9 +853,12 @@ class ClusterManager:
         'neutral': (0.0, 0.0),
     }
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, n_clusters: int = None, seed: int = 42):
         self.db_path = db_path
-        self.clusters: Dict[str, EmotionCluster] = {}
+        self.n_clusters = n_clusters or len(self.MOOD_CENTROIDS)
+        self.seed = seed
+        self.clusters: Dict[int, EmotionCluster] = {}
+        self._mood_clusters: Dict[str, EmotionCluster] = {}  # mood -> union of its clusters
         self._last_update: Optional[datetime] = None
     
     @contextmanager
@@ -498,77 +871,205 @@ class ClusterManager:
         finally:
             conn.close()
     
+    def _ensure_tables(self, conn: sqlite3.Connection) -> None:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS song_clusters (
+                song_id INTEGER PRIMARY KEY,
+                cluster_id INTEGER NOT NULL,
+                distance REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS song_cluster_centroids (
+                cluster_id INTEGER PRIMARY KEY,
+                valence REAL NOT NULL,
+                arousal REAL NOT NULL,
+                representative_mood TEXT NOT NULL,
+                built_at TEXT NOT NULL
+            )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_song_clusters_cluster ON song_clusters(cluster_id, distance)"
+        )
+    
+    @staticmethod
+    def _to_va(value: Optional[float]) -> float:
+        """Map a 0-100 feature to [-1, 1] (missing -> 0)."""
+        if value is None:
+            return 0.0
+        return max(-1.0, min(1.0, value / 50.0 - 1.0))
+    
+    def _fetch_points(self, conn: sqlite3.Connection, where: str = "") -> Tuple[List[int], List[str], np.ndarray]:
+        cursor = conn.execute(f"""
+            SELECT s.song_id, s.valence, s.energy AS arousal, s.mood
+            FROM songs s
+            {where}
+        """)
+        rows = cursor.fetchall()
+        song_ids = [row['song_id'] for row in rows]
+        moods = [(row['mood'] or '').lower() for row in rows]
+        points = np.array(
+            [(self._to_va(row['valence']), self._to_va(row['arousal'])) for row in rows],
+            dtype=np.float64
+        ).reshape(len(rows), 2)
+        return song_ids, moods, points
+    
+    def _nearest_mood(self, valence: float, arousal: float) -> str:
+        return min(
+            self.MOOD_CENTROIDS,
+            key=lambda m: (self.MOOD_CENTROIDS[m][0] - valence) ** 2 + (self.MOOD_CENTROIDS[m][1] - arousal) ** 2
+        )
+    
     def build_clusters(self) -> None:
         """
-        Build emotion clusters from song database.
+        Build emotion clusters from song database and persist them.
         
-        Assigns each song to the nearest mood centroid.
+        Each cluster is labelled with the most common mood among its
+        songs, or the nearest mood centroid when none are labelled.
         """
         logger.info("Building emotion clusters...")
         
         with self._connection() as conn:
-            cursor = conn.execute("""
-                SELECT song_id, valence, energy as arousal, mood
-                FROM songs
-                WHERE valence IS NOT NULL OR mood IS NOT NULL
-            """)
+            self._ensure_tables(conn)
+            song_ids, moods, points = self._fetch_points(conn)
+            result = minibatch_kmeans(points, self.n_clusters, seed=self.seed)
             
-            # Initialize clusters
-            clusters: Dict[str, List[int]] = {mood: [] for mood in self.MOOD_CENTROIDS}
+            labels = result.labels.tolist()
+            mood_votes: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+            for label, mood in zip(labels, moods):
+                if mood in self.MOOD_CENTROIDS:
+                    mood_votes[label][mood] += 1
             
-            for row in cursor.fetchall():
-                song_id = row['song_id']
-                valence = row['valence'] or 0.0
-                arousal = row['arousal'] or 0.0
-                mood = (row['mood'] or 'neutral').lower()
-                
-                # If song has mood label, prefer that
-                if mood in clusters:
-                    clusters[mood].append(song_id)
-                else:
-                    # Find nearest centroid
-                    min_dist = float('inf')
-                    nearest_mood = 'neutral'
-                    
-                    for m, (cv, ca) in self.MOOD_CENTROIDS.items():
-                        dist = math.sqrt((valence - cv) ** 2 + (arousal - ca) ** 2)
-                        if dist < min_dist:
-                            min_dist = dist
-                            nearest_mood = m
-                    
-                    clusters[nearest_mood].append(song_id)
+            built_at = datetime.now().isoformat()
+            centroid_rows = []
+            for cluster_id, (cv, ca) in enumerate(result.centroids.tolist()):
+                votes = mood_votes.get(cluster_id)
+                mood = max(votes, key=votes.get) if votes else self._nearest_mood(cv, ca)
+                centroid_rows.append((cluster_id, cv, ca, mood, built_at))
             
-            # Create EmotionCluster objects
-            for i, (mood, song_ids) in enumerate(clusters.items()):
-                cv, ca = self.MOOD_CENTROIDS[mood]
-                self.clusters[mood] = EmotionCluster(
-                    cluster_id=i,
-                    centroid_valence=cv,
-                    centroid_arousal=ca,
-                    song_ids=song_ids,
-                    representative_mood=mood,
+            with conn:
+                conn.execute("DELETE FROM song_clusters")
+                conn.execute("DELETE FROM song_cluster_centroids")
+                conn.executemany(
+                    "INSERT INTO song_cluster_centroids VALUES (?, ?, ?, ?, ?)",
+                    centroid_rows
                 )
+                conn.executemany(
+                    "INSERT INTO song_clusters VALUES (?, ?, ?)",
+                    zip(song_ids, labels, result.distances.tolist())
+                )
+            
+            self._load_from(conn)
         
-        self._last_update = datetime.now()
         logger.info(f"Built {len(self.clusters)} clusters with "
-                   f"{sum(len(c.song_ids) for c in self.clusters.values())} songs")
+                   f"{sum(len(c.song_ids) for c in self.clusters.values())} songs "
+                   f"({result.n_iter} iterations)")
+    
+    def load_clusters(self) -> bool:
+        """
+        Load persisted clusters, assigning songs added since the last build.
+        
+        Returns:
+            False if no clusters were persisted
+        """
+        with self._connection() as conn:
+            self._ensure_tables(conn)
+            centroids = conn.execute(
+                "SELECT cluster_id, valence, arousal FROM song_cluster_centroids ORDER BY cluster_id"
+            ).fetchall()
+            if not centroids:
+                return False
+            
+            with conn:
+                removed = conn.execute(
+                    "DELETE FROM song_clusters WHERE song_id NOT IN (SELECT song_id FROM songs)"
+                ).rowcount
+            if removed:
+                logger.info(f"Dropped {removed} deleted songs from clusters")
+            
+            song_ids, _, points = self._fetch_points(
+                conn,
+                "LEFT JOIN song_clusters c ON c.song_id = s.song_id WHERE c.song_id IS NULL"
+            )
+            if song_ids:
+                centers = np.array([(r['valence'], r['arousal']) for r in centroids])
+                labels, distances = assign_clusters(points, centers)
+                cluster_ids = [centroids[i]['cluster_id'] for i in labels.tolist()]
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO song_clusters VALUES (?, ?, ?)",
+                        zip(song_ids, cluster_ids, distances.tolist())
+                    )
+                logger.info(f"Assigned {len(song_ids)} new songs to existing clusters")
+            
+            self._load_from(conn)
+        return True
+    
+    def _load_from(self, conn: sqlite3.Connection) -> None:
+        """Rebuild the in-memory cluster and mood maps from the tables."""
+        members: Dict[int, List[int]] = defaultdict(list)
+        ranked: List[Tuple[float, int, int]] = []
+        for row in conn.execute("""
+            SELECT c.song_id, c.cluster_id, c.distance
+            FROM song_clusters c
+            JOIN songs s ON s.song_id = c.song_id
+            ORDER BY c.cluster_id, c.distance
+        """):
+            members[row['cluster_id']].append(row['song_id'])
+            ranked.append((row['distance'], row['cluster_id'], row['song_id']))
+        
+        clusters: Dict[int, EmotionCluster] = {}
+        for row in conn.execute("SELECT * FROM song_cluster_centroids ORDER BY cluster_id"):
+            clusters[row['cluster_id']] = EmotionCluster(
+                cluster_id=row['cluster_id'],
+                centroid_valence=row['valence'],
+                centroid_arousal=row['arousal'],
+                song_ids=members.get(row['cluster_id'], []),
+                representative_mood=row['representative_mood'],
+            )
+        
+        # A mood may label several clusters; its lookup covers all of them,
+        # closest to their own centroid first.
+        by_mood: Dict[str, List[EmotionCluster]] = defaultdict(list)
+        for cluster in clusters.values():
+            by_mood[cluster.representative_mood].append(cluster)
+        mood_songs: Dict[str, List[int]] = defaultdict(list)
+        for _, cluster_id, song_id in sorted(ranked):
+            if cluster_id in clusters:
+                mood_songs[clusters[cluster_id].representative_mood].append(song_id)
+        
+        mood_clusters: Dict[str, EmotionCluster] = {}
+        for mood, group in by_mood.items():
+            if len(group) == 1:
+                mood_clusters[mood] = group[0]
+                continue
+            weights = np.array([max(len(c.song_ids), 1) for c in group], dtype=np.float64)
+            largest = max(group, key=lambda c: len(c.song_ids))
+            mood_clusters[mood] = EmotionCluster(
+                cluster_id=largest.cluster_id,
+                centroid_valence=float(np.average([c.centroid_valence for c in group], weights=weights)),
+                centroid_arousal=float(np.average([c.centroid_arousal for c in group], weights=weights)),
+                song_ids=mood_songs[mood],
+                representative_mood=mood,
+            )
+        
+        self.clusters = clusters
+        self._mood_clusters = mood_clusters
+        self._last_update = datetime.now()
     
     def get_cluster(self, mood: str) -> Optional[EmotionCluster]:
-        """Get cluster for a mood."""
-        return self.clusters.get(mood.lower())
+        """Get all songs labelled with a mood (nearest cluster to its centroid if none)."""
+        mood = mood.lower()
+        cluster = self._mood_clusters.get(mood)
+        if cluster is not None:
+            return cluster
+        if mood in self.MOOD_CENTROIDS and self.clusters:
+            return self.get_nearest_cluster(*self.MOOD_CENTROIDS[mood])
+        return None
     
     def get_nearest_cluster(self, valence: float, arousal: float) -> EmotionCluster:
         """Get cluster nearest to VA coordinates."""
-        min_dist = float('inf')
-        nearest = list(self.clusters.values())[0]
-        
-        for cluster in self.clusters.values():
-            dist = cluster.distance_to(valence, arousal)
-            if dist < min_dist:
-                min_dist = dist
-                nearest = cluster
-        
-        return nearest
+        return min(self.clusters.values(), key=lambda c: c.distance_to(valence, arousal))
     
     def get_candidate_songs(
         self,
@@ -580,11 +1081,15 @@ class ClusterManager:
         """
         Get candidate song IDs for recommendation.
         
-        Efficiently retrieves songs from relevant clusters.
+        Efficiently retrieves songs from relevant clusters, closest to
+        the cluster centroid first.
         """
-        if not self.clusters:
+        if not self.clusters and not self.load_clusters():
             self.build_clusters()
         
+        if not self.clusters:
+            return []
+        
         if mood:
             cluster = self.get_cluster(mood)
         elif valence is not None and arousal is not None:
@@ -699,15 +1204,20 @@ class QueryOptimizer:
 def cached(
     cache: MultiLevelCache,
     ttl: float = None,
-    key_prefix: str = ""
+    key_prefix: str = "",
+    tags: Any = ()
 ):
     """
     Decorator to cache function results.
     
+    ``tags`` is a list of invalidation tags or a function of the call's
+    arguments returning them.
+    
     Usage:
         cache = MultiLevelCache()
         
-        @cached(cache, ttl=300, key_prefix="recommendations")
+        @cached(cache, ttl=300, key_prefix="recommendations",
+                tags=lambda user_id, mood: [user_tag(user_id), CATALOG_TAG])
         def get_recommendations(user_id, mood):
             # Expensive computation
             return recommendations
@@ -724,16 +1234,10 @@ def cached(
             }, sort_keys=True, default=str)
             key = hashlib.md5(key_data.encode()).hexdigest()
             
-            # Try cache
-            cached_result = cache.get(key)
-            if cached_result is not None:
-                return cached_result
-            
-            # Compute and cache
-            result = func(*args, **kwargs)
-            cache.put(key, result, ttl)
+            entry_tags = tags(*args, **kwargs) if callable(tags) else tags
             
-            return result
+            # Concurrent misses for the same key share one call
+            return cache.get_or_compute(key, lambda: func(*args, **kwargs), ttl, entry_tags)
         
         return wrapper
     return decorator
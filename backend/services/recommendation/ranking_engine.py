@@ -19,7 +19,8 @@ Components:
 Mathematical Foundation:
 - Each component is normalized to [0, 1]
 - Weights are configurable and sum to 1.0
-- Explanations generated for each recommendation
+- Candidates are scored in batch from column arrays
+- Explanations generated for each returned recommendation
 
 Author: MusicMoodBot Team
 Version: 3.1.0
@@ -30,10 +31,18 @@ from __future__ import annotations
 
 import math
 import logging
+import numbers
+from collections import Counter, deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, TYPE_CHECKING
 from datetime import datetime, timedelta
 from enum import Enum
+from functools import lru_cache
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from backend.services.popularity_stats import PopularityStatsService
 
 logger = logging.getLogger(__name__)
 
@@ -112,55 +121,212 @@ class ScoringComponents:
         }
 
 
+# Factor order of the weighted contribution vector
+CONTRIBUTION_KEYS = ('mood', 'intensity', 'preference', 'novelty', 'diversity', 'popularity')
+
+# Reason text per language, keyed by factor signature entries
+REASON_TEXTS = {
+    'vi': {
+        'mood': 'phù hợp tâm trạng {mood}',
+        'intensity_low': 'cường độ nhẹ nhàng',
+        'intensity_medium': 'cường độ vừa phải',
+        'intensity_high': 'cường độ mạnh mẽ',
+        'preference': 'phù hợp sở thích của bạn',
+        'novelty': 'bài hát mới lạ',
+        'diversity': 'tạo đa dạng playlist',
+        'popularity': 'được nhiều người yêu thích',
+        'overall': 'điểm tổng hợp cao',
+    },
+    'en': {
+        'mood': 'matches your {mood} mood',
+        'intensity_low': 'gentle intensity',
+        'intensity_medium': 'moderate intensity',
+        'intensity_high': 'powerful intensity',
+        'preference': 'fits your taste',
+        'novelty': 'something new for you',
+        'diversity': 'adds variety to the playlist',
+        'popularity': 'loved by many listeners',
+        'overall': 'high overall score',
+    },
+}
+
+EXPLANATION_HEADERS = {
+    'vi': 'Gợi ý "{song_name}" của {artist} vì: ',
+    'en': 'Recommended "{song_name}" by {artist} because: ',
+}
+
+
+@lru_cache(maxsize=512)
+def _reason_templates(reason_keys: Tuple[str, ...], lang: str) -> Tuple[str, ...]:
+    """Reason templates for a factor signature (memoized)."""
+    texts = REASON_TEXTS.get(lang, REASON_TEXTS['en'])
+    return tuple(texts[key] for key in reason_keys)
+
+
+@lru_cache(maxsize=512)
+def _explanation_template(reason_keys: Tuple[str, ...], lang: str) -> str:
+    """Full explanation template for a factor signature (memoized)."""
+    header = EXPLANATION_HEADERS.get(lang, EXPLANATION_HEADERS['en'])
+    return header + "; ".join(_reason_templates(reason_keys[:3], lang)) + "."
+
+
 @dataclass
 class RankingExplanation:
     """
     Human-readable explanation for why a song was recommended.
     
-    Provides transparency into the ranking decision.
+    Only the factor signature (``reason_keys``) and the weighted
+    contribution vector are stored; reason text and percentages are
+    rendered on access from templates memoized per (signature, language).
     """
     song_id: int
     song_name: str
     artist: str
     
-    primary_reason: str
-    secondary_reasons: List[str] = field(default_factory=list)
+    # Factor signature, most important first (keys of REASON_TEXTS)
+    reason_keys: Tuple[str, ...] = ('overall',)
+    target_mood: str = ''
     
     # Score breakdown
     final_score: float = 0.0
     components: ScoringComponents = field(default_factory=ScoringComponents)
     
-    # Contribution analysis
-    top_contributor: str = ""
-    contribution_percentages: Dict[str, float] = field(default_factory=dict)
+    # Weighted contribution per factor, in CONTRIBUTION_KEYS order
+    contributions: Tuple[float, ...] = ()
+    
+    def reasons(self, lang: str = 'vi') -> List[str]:
+        """Rendered reasons, most important first."""
+        return [
+            template.format(mood=self.target_mood)
+            for template in _reason_templates(self.reason_keys, lang)
+        ]
+    
+    @property
+    def primary_reason(self) -> str:
+        return self.reasons()[0] if self.reason_keys else ''
+    
+    @property
+    def secondary_reasons(self) -> List[str]:
+        return self.reasons()[1:3]
+    
+    @property
+    def top_contributor(self) -> str:
+        if not self.contributions:
+            return ''
+        top = max(range(len(self.contributions)), key=self.contributions.__getitem__)
+        return CONTRIBUTION_KEYS[top]
+    
+    @property
+    def contribution_percentages(self) -> Dict[str, float]:
+        total = sum(self.contributions)
+        return {
+            key: (value / total * 100) if total > 0 else 0
+            for key, value in zip(CONTRIBUTION_KEYS, self.contributions)
+        }
     
     def to_natural_language(self, lang: str = 'vi') -> str:
         """Generate natural language explanation."""
-        if lang == 'vi':
-            return self._generate_vietnamese()
-        return self._generate_english()
+        lang = 'vi' if lang == 'vi' else 'en'
+        return _explanation_template(self.reason_keys, lang).format(
+            song_name=self.song_name,
+            artist=self.artist,
+            mood=self.target_mood
+        )
+
+
+class DiversityAccumulator:
+    """
+    Sliding-window diversity state for sequential scoring.
+    
+    Holds artist/genre/mood counters and running valence/arousal sums
+    over the last ``window`` selected songs, updated in O(1) per
+    selection, so each diversity penalty is O(1) instead of a scan
+    over all candidates.
     
-    def _generate_vietnamese(self) -> str:
-        """Vietnamese explanation."""
-        reasons = [self.primary_reason]
-        if self.secondary_reasons:
-            reasons.extend(self.secondary_reasons[:2])
+    Songs unknown to the caller (e.g. already-recommended ids missing
+    from the candidate list) are pushed as None: they occupy a window
+    slot but match nothing.
+    """
+    
+    # Weight of a mood repeat relative to an artist repeat
+    MOOD_WEIGHT = 0.25
+    # Penalty for sitting on the window's VA centroid, fading out at PROXIMITY_RADIUS
+    PROXIMITY_WEIGHT = 0.25
+    PROXIMITY_RADIUS = 0.5
+    
+    def __init__(self, window: int):
+        self.window = window
+        self._entries: deque = deque()
+        self.artists: Counter = Counter()
+        self.genres: Counter = Counter()
+        self.moods: Counter = Counter()
+        self._va_sum = [0.0, 0.0]
+        self._va_count = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def push(self, song: Optional[Dict[str, Any]]) -> None:
+        """Record a selected song, evicting the oldest beyond the window."""
+        if self.window <= 0:
+            return
+        self._entries.append(song)
+        self._apply(song, 1)
+        if len(self._entries) > self.window:
+            self._apply(self._entries.popleft(), -1)
+    
+    def _apply(self, song: Optional[Dict[str, Any]], sign: int) -> None:
+        if song is None:
+            return
+        self.artists[song.get('artist')] += sign
+        self.genres[song.get('genre')] += sign
+        if song.get('mood'):
+            self.moods[song.get('mood')] += sign
+        valence, arousal = song_va_coordinates(song)
+        if isinstance(valence, (int, float)) and isinstance(arousal, (int, float)):
+            self._va_sum[0] += sign * valence
+            self._va_sum[1] += sign * arousal
+            self._va_count += sign
+    
+    @property
+    def centroid(self) -> Optional[Tuple[float, float]]:
+        """Mean (valence, arousal) of known songs in the window."""
+        if self._va_count <= 0:
+            return None
+        return (self._va_sum[0] / self._va_count, self._va_sum[1] / self._va_count)
+    
+    def penalty(self, song: Dict[str, Any]) -> float:
+        """
+        Diversity score of ``song`` against the window.
         
-        text = f"Gợi ý \"{self.song_name}\" của {self.artist} vì: "
-        text += "; ".join(reasons) + "."
+        Formula:
+            repeats   = same_artist + 0.5 * same_genre + 0.25 * same_mood
+            proximity = max(0, 1 - |VA(song) - centroid| / 0.5) * known / window_size
+            score     = 1 - min(repeats / window_size + 0.25 * proximity, 1)
         
-        return text
-    
-    def _generate_english(self) -> str:
-        """English explanation."""
-        reasons = [self.primary_reason]
-        if self.secondary_reasons:
-            reasons.extend(self.secondary_reasons[:2])
+        Songs without a mood never count as a mood repeat.
+        """
+        window = len(self._entries)
+        if window == 0:
+            return 1.0
+        
+        same_artist = self.artists[song.get('artist', '')]
+        same_genre = self.genres[song.get('genre', '')]
+        mood = song.get('mood')
+        same_mood = self.moods[mood] if mood else 0
+        
+        penalty_raw = (
+            same_artist + same_genre * 0.5 + same_mood * self.MOOD_WEIGHT
+        ) / window
         
-        text = f"Recommended \"{self.song_name}\" by {self.artist} because: "
-        text += "; ".join(reasons) + "."
+        centroid = self.centroid
+        valence, arousal = song_va_coordinates(song)
+        if centroid is not None and isinstance(valence, (int, float)) and isinstance(arousal, (int, float)):
+            distance = math.hypot(valence - centroid[0], arousal - centroid[1])
+            proximity = max(0.0, 1.0 - distance / self.PROXIMITY_RADIUS)
+            penalty_raw += self.PROXIMITY_WEIGHT * proximity * self._va_count / window
         
-        return text
+        return 1.0 - min(penalty_raw, 1.0)
 
 
 @dataclass
@@ -174,6 +340,62 @@ class RankingResult:
     rank: int = 0
 
 
+@dataclass
+class CandidateColumns:
+    """
+    Candidate fields as column arrays for batch scoring.
+    
+    Row i describes ``songs[i]``. Moods, genres and artists are integer
+    codes into the ``moods``/``genres``/``artists`` value lists.
+    """
+    songs: List[Dict[str, Any]]
+    song_ids: List[Any]
+    valence: np.ndarray             # [-1, 1]
+    arousal: np.ndarray             # [0, 1]
+    intensity: np.ndarray           # [0, 1]
+    days_since_played: np.ndarray   # NaN if not in listening history
+    avg_rating: np.ndarray
+    play_count: np.ndarray
+    mood_codes: np.ndarray
+    genre_codes: np.ndarray
+    artist_codes: np.ndarray
+    moods: List[str]
+    genres: List[Any]
+    artists: List[Any]
+    diversity: np.ndarray           # Diversity penalty in input order
+    
+    def __len__(self) -> int:
+        return len(self.songs)
+
+
+@dataclass
+class BatchScores:
+    """Component and final score arrays aligned with ``columns.songs``."""
+    columns: CandidateColumns
+    mood_similarity: np.ndarray
+    intensity_match: np.ndarray
+    user_preference: np.ndarray
+    recency_penalty: np.ndarray
+    diversity_penalty: np.ndarray
+    popularity_boost: np.ndarray
+    categorical_mood_score: np.ndarray
+    va_space_score: np.ndarray
+    final_score: np.ndarray
+    
+    def components_at(self, i: int) -> ScoringComponents:
+        """Scoring components of the i-th candidate."""
+        return ScoringComponents(
+            mood_similarity=float(self.mood_similarity[i]),
+            intensity_match=float(self.intensity_match[i]),
+            user_preference=float(self.user_preference[i]),
+            recency_penalty=float(self.recency_penalty[i]),
+            diversity_penalty=float(self.diversity_penalty[i]),
+            popularity_boost=float(self.popularity_boost[i]),
+            categorical_mood_score=float(self.categorical_mood_score[i]),
+            va_space_score=float(self.va_space_score[i]),
+        )
+
+
 # =============================================================================
 # MOOD MAPPING
 # =============================================================================
@@ -196,6 +418,33 @@ MOOD_VA_COORDINATES = {
     'melancholic': {'valence': -0.3, 'arousal': 0.25},
 }
 
+def song_va_coordinates(song: Dict[str, Any]) -> Tuple[float, float]:
+    """
+    Song (valence, arousal) with valence in [-1, 1] and arousal in [0, 1].
+    
+    Uses valence_score/arousal_score when present, else valence/energy;
+    0-100 values are rescaled.
+    """
+    valence = song.get('valence_score') or song.get('valence', 50)
+    arousal = song.get('arousal_score') or song.get('energy', 50)
+    
+    if isinstance(valence, (int, float)) and valence > 1:
+        valence = (valence - 50) / 50  # 0-100 → -1 to 1
+    if isinstance(arousal, (int, float)) and arousal > 1:
+        arousal = arousal / 100  # 0-100 → 0 to 1
+    
+    return valence, arousal
+
+
+def _as_number(value: Any, name: str) -> float:
+    """Numeric song field as float; raises TypeError otherwise."""
+    if type(value) is float:
+        return value
+    if not isinstance(value, numbers.Real):
+        raise TypeError(f"{name} is not numeric: {value!r}")
+    return float(value)
+
+
 # Vietnamese mood mapping
 MOOD_VI_TO_EN = {
     'Vui': 'happy',
@@ -231,7 +480,7 @@ class HybridRankingEngine:
                     + w6 * popularity_boost
     
     Usage:
-        engine = HybridRankingEngine()
+        engine = create_ranking_engine()  # shared popularity service
         
         results = engine.rank_songs(
             candidates=songs,
@@ -245,16 +494,25 @@ class HybridRankingEngine:
         )
     """
     
-    def __init__(self, config: RankingConfig = None):
+    def __init__(
+        self,
+        config: RankingConfig = None,
+        popularity: Optional[PopularityStatsService] = None
+    ):
         """
         Initialize ranking engine.
         
         Args:
             config: Ranking configuration (uses defaults if None)
+            popularity: Catalog popularity statistics (see
+                ``create_ranking_engine`` for the shared service); without
+                one, or until it has seen any plays, play counts are
+                normalized against the candidate set
         """
         self.config = config or RankingConfig()
+        self.popularity = popularity
         
-        # Cache for popularity statistics
+        # Cache for candidate-set popularity statistics (no popularity service)
         self._popularity_stats: Dict[str, float] = {}
         self._popularity_cache_time: Optional[datetime] = None
         self._pop_cache_ttl = timedelta(hours=1)
@@ -278,6 +536,9 @@ class HybridRankingEngine:
         """
         Rank candidate songs using the hybrid multi-factor formula.
         
+        Candidates are scored in batch (see ``score_batch``); components,
+        explanations and results are only built for the returned songs.
+        
         Args:
             candidates: List of song dicts from database
             target_mood: Target mood category (e.g., 'sad', 'happy')
@@ -295,6 +556,65 @@ class HybridRankingEngine:
         if not candidates:
             return []
         
+        target_mood = self._normalize_mood(target_mood)
+        batch = self.score_batch(
+            candidates,
+            target_mood,
+            target_intensity=target_intensity,
+            target_valence=target_valence,
+            target_arousal=target_arousal,
+            user_prefs=user_prefs,
+            listening_history=listening_history,
+            already_recommended=already_recommended
+        )
+        
+        # Stable sort keeps input order among equal scores
+        order = np.argsort(-batch.final_score, kind='stable')[:limit]
+        
+        results = []
+        for rank, i in enumerate(order.tolist(), start=1):
+            song = batch.columns.songs[i]
+            components = batch.components_at(i)
+            final_score = float(batch.final_score[i])
+            results.append(RankingResult(
+                song_id=song.get('song_id', 0),
+                song_data=song,
+                final_score=final_score,
+                components=components,
+                explanation=self._generate_explanation(
+                    song, final_score, components, target_mood, target_intensity
+                ),
+                rank=rank
+            ))
+        
+        return results
+    
+    # =========================================================================
+    # BATCH SCORING
+    # =========================================================================
+    
+    def score_batch(
+        self,
+        candidates: List[Dict[str, Any]],
+        target_mood: str,
+        target_intensity: float = 0.5,
+        target_valence: float = None,
+        target_arousal: float = None,
+        user_prefs: Dict[str, Any] = None,
+        listening_history: List[Dict[str, Any]] = None,
+        already_recommended: List[int] = None
+    ) -> BatchScores:
+        """
+        Score all candidates as column arrays.
+        
+        Candidate fields are read once into ``CandidateColumns``; every
+        component is then one array expression over all candidates.
+        Candidates with unusable fields (e.g. NULL valence) are skipped
+        with a warning.
+        
+        Returns:
+            BatchScores aligned with ``columns.songs`` (input order)
+        """
         # Normalize inputs
         target_mood = self._normalize_mood(target_mood)
         user_prefs = user_prefs or {}
@@ -308,109 +628,135 @@ class HybridRankingEngine:
             target_arousal = target_arousal if target_arousal is not None else va['arousal']
         
         # Compute popularity statistics
-        self._update_popularity_stats(candidates)
+        if self._played_snapshot() is None:
+            self._update_popularity_stats(candidates)
         
         # Build listening history lookup
         history_map = self._build_history_map(listening_history)
         
-        # Score each candidate
-        results = []
-        for i, song in enumerate(candidates):
-            try:
-                result = self._score_song(
-                    song=song,
-                    target_mood=target_mood,
-                    target_intensity=target_intensity,
-                    target_valence=target_valence,
-                    target_arousal=target_arousal,
-                    user_prefs=user_prefs,
-                    history_map=history_map,
-                    preceding_songs=already_recommended + [r.song_id for r in results[-self.config.diversity_window:]],
-                    all_candidates=candidates
-                )
-                results.append(result)
-            except Exception as e:
-                logger.warning(f"Error scoring song {song.get('song_id')}: {e}")
-        
-        # Sort by final score
-        results.sort(key=lambda x: x.final_score, reverse=True)
+        columns = self._extract_columns(candidates, history_map, already_recommended)
         
-        # Assign ranks
-        for i, result in enumerate(results):
-            result.rank = i + 1
-        
-        return results[:limit]
-    
-    # =========================================================================
-    # SCORING IMPLEMENTATION
-    # =========================================================================
-    
-    def _score_song(
-        self,
-        song: Dict[str, Any],
-        target_mood: str,
-        target_intensity: float,
-        target_valence: float,
-        target_arousal: float,
-        user_prefs: Dict[str, Any],
-        history_map: Dict[int, datetime],
-        preceding_songs: List[int],
-        all_candidates: List[Dict]
-    ) -> RankingResult:
-        """Score a single song using all components."""
-        
-        components = ScoringComponents()
-        
-        # Component 1: Mood Similarity
-        components.mood_similarity, components.categorical_mood_score, components.va_space_score = \
-            self._compute_mood_similarity(
-                song, target_mood, target_valence, target_arousal
-            )
-        
-        # Component 2: Intensity Match
-        components.intensity_match = self._compute_intensity_match(
-            song, target_intensity
+        mood_similarity, categorical, va_space = self._compute_mood_similarity(
+            columns, target_mood, target_valence, target_arousal
         )
+        intensity_match = self._compute_intensity_match(columns, target_intensity)
+        user_preference = self._compute_user_preference(columns, user_prefs)
+        recency_penalty = self._compute_recency_penalty(columns)
+        diversity_penalty = columns.diversity
+        popularity_boost = self._compute_popularity_boost(columns)
         
-        # Component 3: User Preference Weight
-        components.user_preference = self._compute_user_preference(
-            song, user_prefs
-        )
-        
-        # Component 4: Recency Penalty
-        components.recency_penalty = self._compute_recency_penalty(
-            song, history_map
-        )
-        
-        # Component 5: Diversity Penalty
-        components.diversity_penalty = self._compute_diversity_penalty(
-            song, preceding_songs, all_candidates
-        )
-        
-        # Component 6: Popularity Boost
-        components.popularity_boost = self._compute_popularity_boost(song)
-        
-        # Compute final weighted score
         final_score = (
-            self.config.w_mood_similarity * components.mood_similarity +
-            self.config.w_intensity_match * components.intensity_match +
-            self.config.w_user_preference * components.user_preference +
-            self.config.w_recency_penalty * components.recency_penalty +
-            self.config.w_diversity_penalty * components.diversity_penalty +
-            self.config.w_popularity_boost * components.popularity_boost
+            self.config.w_mood_similarity * mood_similarity +
+            self.config.w_intensity_match * intensity_match +
+            self.config.w_user_preference * user_preference +
+            self.config.w_recency_penalty * recency_penalty +
+            self.config.w_diversity_penalty * diversity_penalty +
+            self.config.w_popularity_boost * popularity_boost
         )
         
-        # Generate explanation
-        explanation = self._generate_explanation(
-            song, final_score, components, target_mood, target_intensity
+        return BatchScores(
+            columns=columns,
+            mood_similarity=mood_similarity,
+            intensity_match=intensity_match,
+            user_preference=user_preference,
+            recency_penalty=recency_penalty,
+            diversity_penalty=diversity_penalty,
+            popularity_boost=popularity_boost,
+            categorical_mood_score=categorical,
+            va_space_score=va_space,
+            final_score=final_score
         )
+    
+    def _extract_columns(
+        self,
+        candidates: List[Dict[str, Any]],
+        history_map: Dict[int, datetime],
+        already_recommended: List[int]
+    ) -> CandidateColumns:
+        """
+        Read candidate fields into columns in a single pass.
         
-        return RankingResult(
-            song_id=song.get('song_id', 0),
-            song_data=song,
-            final_score=final_score,
-            components=components,
-            explanation=explanation
+        Moods, genres and artists are stored as integer codes into
+        per-batch value lists, so categorical components are computed
+        once per distinct value. The diversity penalty depends on the
+        preceding candidates and is accumulated here.
+        """
+        songs: List[Dict[str, Any]] = []
+        song_ids: List[Any] = []
+        numeric: List[Tuple[float, ...]] = []
+        codes: List[Tuple[int, int, int]] = []
+        diversity_scores: List[float] = []
+        
+        mood_index: Dict[str, int] = {}
+        genre_index: Dict[Any, int] = {}
+        artist_index: Dict[Any, int] = {}
+        
+        # Diversity window: already recommended songs, then each scored song
+        candidates_by_id = {c.get('song_id'): c for c in candidates}
+        diversity = DiversityAccumulator(self.config.diversity_window)
+        for song_id in already_recommended[-self.config.diversity_window:]:
+            diversity.push(candidates_by_id.get(song_id))
+        
+        now = datetime.now()
+        for song in candidates:
+            try:
+                mood = self._normalize_mood(song.get('mood', ''))
+                valence, arousal = song_va_coordinates(song)
+                
+                days_since = math.nan
+                song_id = song.get('song_id', 0)
+                if song_id in history_map:
+                    days_since = (now - history_map[song_id]).total_seconds() / 86400
+                
+                row = (
+                    _as_number(valence, 'valence'),
+                    _as_number(arousal, 'arousal'),
+                    _as_number(self._song_intensity(song), 'intensity'),
+                    days_since,
+                    _as_number(song.get('avg_rating', 0) or 0, 'avg_rating'),
+                    _as_number(
+                        song.get('play_count', 0) or song.get('listened_count', 0) or 0,
+                        'play_count'
+                    ),
+                )
+                
+                genre = song.get('genre', '')
+                artist = song.get('artist', '')
+                row_codes = (
+                    mood_index.setdefault(mood, len(mood_index)),
+                    genre_index.setdefault(genre, len(genre_index)),
+                    artist_index.setdefault(artist, len(artist_index)),
+                )
+            except Exception as e:
+                logger.warning(f"Error scoring song {song.get('song_id')}: {e}")
+                continue
+            
+            songs.append(song)
+            song_ids.append(song_id)
+            numeric.append(row)
+            codes.append(row_codes)
+            diversity_scores.append(diversity.penalty(song))
+            diversity.push(candidates_by_id.get(song_id))
+        
+        values = np.array(numeric, dtype=np.float64).reshape(len(numeric), 6)
+        code_array = np.array(codes, dtype=np.intp).reshape(len(codes), 3)
+        
+        return CandidateColumns(
+            songs=songs,
+            song_ids=song_ids,
+            valence=values[:, 0],
+            arousal=values[:, 1],
+            intensity=values[:, 2],
+            days_since_played=values[:, 3],
+            avg_rating=values[:, 4],
+            play_count=values[:, 5],
+            mood_codes=code_array[:, 0],
+            genre_codes=code_array[:, 1],
+            artist_codes=code_array[:, 2],
+            moods=list(mood_index),
+            genres=list(genre_index),
+            artists=list(artist_index),
+            diversity=np.array(diversity_scores, dtype=np.float64)
         )
     
     # =========================================================================
@@ -419,11 +765,11 @@ class HybridRankingEngine:
     
     def _compute_mood_similarity(
         self,
-        song: Dict[str, Any],
+        columns: CandidateColumns,
         target_mood: str,
         target_valence: float,
         target_arousal: float
-    ) -> Tuple[float, float, float]:
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
         Compute mood similarity combining categorical and VA space.
         
@@ -431,42 +777,29 @@ class HybridRankingEngine:
             mood_similarity = (1 - va_weight) * categorical_score + va_weight * va_score
         
         Where:
-            categorical_score = 1.0 if exact match, 0.5 if related, 0.0 otherwise
+            categorical_score = 1.0 if exact match, 0.6 if related, 0.2 otherwise
             va_score = 1 - normalized_distance in VA space
         
         Returns:
-            Tuple of (combined_score, categorical_score, va_score)
+            Tuple of (combined_score, categorical_score, va_score) arrays
         """
-        # Categorical matching
-        song_mood = self._normalize_mood(song.get('mood', ''))
-        
-        if song_mood == target_mood:
-            categorical_score = 1.0
-        elif self._are_moods_related(song_mood, target_mood):
-            categorical_score = 0.6
-        else:
-            categorical_score = 0.2
-        
-        # VA space matching
-        # Get song's VA coordinates
-        song_valence = song.get('valence_score') or song.get('valence', 50)
-        song_arousal = song.get('arousal_score') or song.get('energy', 50)
-        
-        # Normalize to [-1, 1] for valence and [0, 1] for arousal
-        if isinstance(song_valence, (int, float)) and song_valence > 1:
-            song_valence = (song_valence - 50) / 50  # 0-100 → -1 to 1
-        if isinstance(song_arousal, (int, float)) and song_arousal > 1:
-            song_arousal = song_arousal / 100  # 0-100 → 0 to 1
-        
-        # Euclidean distance in VA space
+        # Categorical matching, once per distinct mood
+        mood_scores = np.array([
+            1.0 if mood == target_mood
+            else 0.6 if self._are_moods_related(mood, target_mood)
+            else 0.2
+            for mood in columns.moods
+        ], dtype=np.float64)
+        categorical_score = mood_scores[columns.mood_codes]
+        
+        # Euclidean distance in VA space: valence in [-1, 1], arousal in [0, 1]
         # Maximum possible distance = sqrt(2^2 + 1^2) = sqrt(5) ≈ 2.236
-        distance = math.sqrt(
-            (song_valence - target_valence) ** 2 +
-            (song_arousal - target_arousal) ** 2
+        distance = np.sqrt(
+            (columns.valence - target_valence) ** 2 +
+            (columns.arousal - target_arousal) ** 2
         )
         max_distance = math.sqrt(4 + 1)  # sqrt(2^2 + 1^2)
-        va_score = 1.0 - (distance / max_distance)
-        va_score = max(0.0, va_score)
+        va_score = np.maximum(1.0 - distance / max_distance, 0.0)
         
         # Combined score
         combined = (
@@ -476,20 +809,8 @@ class HybridRankingEngine:
         
         return combined, categorical_score, va_score
     
-    def _compute_intensity_match(
-        self,
-        song: Dict[str, Any],
-        target_intensity: float
-    ) -> float:
-        """
-        Compute intensity match using Gaussian kernel.
-        
-        Formula:
-            score = exp(-((song_intensity - target_intensity)^2) / (2 * σ^2))
-        
-        This gives a smooth bell curve centered on target intensity.
-        """
-        # Get song intensity
+    def _song_intensity(self, song: Dict[str, Any]) -> float:
+        """Song intensity, falling back to energy when not set explicitly."""
         song_intensity = song.get('intensity', 0.5)
         
         # Also consider energy as intensity proxy
@@ -501,169 +822,124 @@ class HybridRankingEngine:
         if song_intensity == 0.5 and song_energy != 0.5:
             song_intensity = song_energy
         
-        # Gaussian kernel
-        sigma = self.config.intensity_gaussian_sigma
-        diff = song_intensity - target_intensity
-        score = math.exp(-(diff ** 2) / (2 * sigma ** 2))
+        return song_intensity
+    
+    def _compute_intensity_match(
+        self,
+        columns: CandidateColumns,
+        target_intensity: float
+    ) -> np.ndarray:
+        """
+        Compute intensity match using Gaussian kernel.
         
-        return score
+        Formula:
+            score = exp(-((song_intensity - target_intensity)^2) / (2 * σ^2))
+        
+        This gives a smooth bell curve centered on target intensity.
+        """
+        sigma = self.config.intensity_gaussian_sigma
+        diff = columns.intensity - target_intensity
+        return np.exp(-(diff ** 2) / (2 * sigma ** 2))
     
     def _compute_user_preference(
         self,
-        song: Dict[str, Any],
+        columns: CandidateColumns,
         user_prefs: Dict[str, Any]
-    ) -> float:
+    ) -> np.ndarray:
         """
         Compute user preference score from learned weights.
         
         Formula:
-            score = Π(preference_weights) normalized to [0, 1]
+            score = geometric mean of matching preference weights,
+                    each normalized to [0, 1]; 0.5 when none match
         
         Considers:
         - Mood preferences
         - Genre preferences
         - Artist preferences
         """
+        n = len(columns)
         if not user_prefs:
-            return 0.5  # Neutral preference
-        
-        score_factors = []
-        
-        # Mood preference
-        song_mood = self._normalize_mood(song.get('mood', ''))
-        mood_prefs = user_prefs.get('mood', {})
-        if song_mood and song_mood in mood_prefs:
-            # Weights are stored as multipliers, normalize to [0, 1]
-            weight = mood_prefs[song_mood]
-            score_factors.append(self._normalize_weight(weight))
-        
-        # Genre preference
-        song_genre = song.get('genre', '')
-        genre_prefs = user_prefs.get('genre', {})
-        if song_genre and song_genre in genre_prefs:
-            weight = genre_prefs[song_genre]
-            score_factors.append(self._normalize_weight(weight))
-        
-        # Artist preference
-        song_artist = song.get('artist', '')
-        artist_prefs = user_prefs.get('artist', {})
-        if song_artist and song_artist in artist_prefs:
-            weight = artist_prefs[song_artist]
-            score_factors.append(self._normalize_weight(weight))
-        
-        if not score_factors:
-            return 0.5
+            return np.full(n, 0.5)  # Neutral preference
+        
+        log_sum = np.zeros(n)
+        matched = np.zeros(n)
+        for key, values, codes in (
+            ('mood', columns.moods, columns.mood_codes),
+            ('genre', columns.genres, columns.genre_codes),
+            ('artist', columns.artists, columns.artist_codes),
+        ):
+            prefs = user_prefs.get(key, {})
+            if not prefs:
+                continue
+            # Factor per distinct value; NaN where no usable preference applies
+            factors = np.array([
+                self._preference_factor(key, prefs, value) for value in values
+            ], dtype=np.float64)[codes]
+            has = ~np.isnan(factors)
+            with np.errstate(divide='ignore'):
+                log_sum[has] += np.log(factors[has])
+            matched += has
         
         # Geometric mean of factors
-        product = 1.0
-        for f in score_factors:
-            product *= f
-        
-        return product ** (1 / len(score_factors))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.exp(log_sum / matched)
+        return np.where(matched > 0, mean, 0.5)
     
-    def _compute_recency_penalty(
-        self,
-        song: Dict[str, Any],
-        history_map: Dict[int, datetime]
-    ) -> float:
+    def _compute_recency_penalty(self, columns: CandidateColumns) -> np.ndarray:
         """
         Compute recency penalty to avoid repetition.
         
         Formula:
             score = 1 - exp(-days_since_last / half_life)
         
-        Returns higher scores for songs not recently played.
+        Returns higher scores for songs not recently played
+        (1.0 for songs never played).
         """
-        song_id = song.get('song_id', 0)
-        
-        if song_id not in history_map:
-            return 1.0  # Never played → maximum novelty
-        
-        last_played = history_map[song_id]
-        days_since = (datetime.now() - last_played).total_seconds() / 86400
-        
-        # Exponential decay
+        days_since = columns.days_since_played
         half_life = self.config.recency_decay_days
-        score = 1.0 - math.exp(-days_since / half_life)
-        
-        return score
-    
-    def _compute_diversity_penalty(
-        self,
-        song: Dict[str, Any],
-        preceding_songs: List[int],
-        all_candidates: List[Dict]
-    ) -> float:
-        """
-        Compute diversity penalty to ensure variety.
-        
-        Formula:
-            penalty = 1 - (same_artist_count + same_genre_count * 0.5) / window_size
-        
-        Returns higher scores for songs different from recently recommended.
-        """
-        if not preceding_songs:
-            return 1.0  # No context → maximum diversity
-        
-        # Build lookup for preceding songs
-        preceding_lookup = {}
-        for candidate in all_candidates:
-            if candidate.get('song_id') in preceding_songs:
-                preceding_lookup[candidate['song_id']] = candidate
-        
-        song_artist = song.get('artist', '')
-        song_genre = song.get('genre', '')
-        
-        same_artist = 0
-        same_genre = 0
-        
-        for song_id in preceding_songs[-self.config.diversity_window:]:
-            if song_id in preceding_lookup:
-                other = preceding_lookup[song_id]
-                if other.get('artist') == song_artist:
-                    same_artist += 1
-                if other.get('genre') == song_genre:
-                    same_genre += 1
-        
-        window = min(len(preceding_songs), self.config.diversity_window)
-        if window == 0:
-            return 1.0
-        
-        penalty_raw = (same_artist + same_genre * 0.5) / window
-        score = 1.0 - min(penalty_raw, 1.0)
-        
-        return score
+        score = 1.0 - np.exp(-np.nan_to_num(days_since) / half_life)
+        return np.where(np.isnan(days_since), 1.0, score)
     
-    def _compute_popularity_boost(self, song: Dict[str, Any]) -> float:
+    def _compute_popularity_boost(self, columns: CandidateColumns) -> np.ndarray:
         """
         Compute popularity boost for social proof.
         
         Formula:
             score = min(percentile_rank / cap, 1.0)
         
-        Uses average ratings and play counts.
+        Uses average ratings and play counts. With a popularity service
+        the play component is the song's catalog-wide percentile of
+        decayed plays, so it doesn't depend on the candidate set.
         """
-        # Get popularity metrics
-        avg_rating = song.get('avg_rating', 0) or 0
-        play_count = song.get('play_count', 0) or song.get('listened_count', 0) or 0
-        
         # Normalize rating (assume 0-5 scale)
-        rating_score = avg_rating / 5.0 if avg_rating else 0.5
+        avg_rating = columns.avg_rating
+        rating_score = np.where(avg_rating != 0, avg_rating / 5.0, 0.5)
         
-        # Normalize play count using cached stats
+        # Normalize play count
         max_plays = self._popularity_stats.get('max_plays', 1000)
-        plays_score = min(play_count / max_plays, 1.0) if max_plays > 0 else 0.5
+        snapshot = self._played_snapshot()
+        if snapshot is not None:
+            plays_score = snapshot.lookup(columns.song_ids)
+        elif max_plays > 0:
+            plays_score = np.minimum(columns.play_count / max_plays, 1.0)
+        else:
+            plays_score = np.full(len(columns), 0.5)
         
         # Combined popularity
         score = 0.6 * rating_score + 0.4 * plays_score
         
         # Apply cap
-        return min(score / self.config.popularity_percentile_cap, 1.0)
+        return np.minimum(score / self.config.popularity_percentile_cap, 1.0)
     
     # =========================================================================
     # HELPER METHODS
     # =========================================================================
     
+    def _played_snapshot(self):
+        """Catalog-wide play statistics, None without plays or a service."""
+        return self.popularity.played_snapshot() if self.popularity is not None else None
+    
     def _normalize_mood(self, mood: str) -> str:
         """Normalize mood to English lowercase."""
         if not mood:
@@ -685,6 +961,19 @@ class HybridRankingEngine:
                 return True
         return False
     
+    def _preference_factor(self, key: str, prefs: Dict[str, Any], value: Any) -> float:
+        """Normalized weight of one preference entry; NaN if absent or not numeric."""
+        if not value or value not in prefs:
+            return math.nan
+        try:
+            weight = float(prefs[value])
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring non-numeric {key} preference weight for {value!r}: {prefs[value]!r}")
+            return math.nan
+        if math.isnan(weight):
+            return math.nan
+        return self._normalize_weight(weight)
+    
     def _normalize_weight(self, weight: float) -> float:
         """Normalize preference weight to [0, 1]."""
         # Weights are typically in [0.5, 2.0] range
@@ -736,71 +1025,74 @@ class HybridRankingEngine:
         target_mood: str,
         target_intensity: float
     ) -> RankingExplanation:
-        """Generate human-readable explanation."""
-        
-        # Calculate contributions
-        contributions = {
-            'mood': self.config.w_mood_similarity * components.mood_similarity,
-            'intensity': self.config.w_intensity_match * components.intensity_match,
-            'preference': self.config.w_user_preference * components.user_preference,
-            'novelty': self.config.w_recency_penalty * components.recency_penalty,
-            'diversity': self.config.w_diversity_penalty * components.diversity_penalty,
-            'popularity': self.config.w_popularity_boost * components.popularity_boost,
-        }
-        
-        # Find top contributor
-        top_key = max(contributions, key=contributions.get)
-        
-        # Calculate percentages
-        total = sum(contributions.values())
-        percentages = {
-            k: (v / total * 100) if total > 0 else 0
-            for k, v in contributions.items()
-        }
+        """Build the (lazily rendered) explanation of a ranked song."""
+        
+        # Weighted contributions, in CONTRIBUTION_KEYS order
+        contributions = (
+            self.config.w_mood_similarity * components.mood_similarity,
+            self.config.w_intensity_match * components.intensity_match,
+            self.config.w_user_preference * components.user_preference,
+            self.config.w_recency_penalty * components.recency_penalty,
+            self.config.w_diversity_penalty * components.diversity_penalty,
+            self.config.w_popularity_boost * components.popularity_boost,
+        )
         
-        # Generate reasons
-        reasons = []
+        return RankingExplanation(
+            song_id=song.get('song_id', 0),
+            song_name=song.get('song_name') or song.get('name', 'Unknown'),
+            artist=song.get('artist', 'Unknown'),
+            reason_keys=self._reason_keys(components, target_intensity),
+            target_mood=target_mood,
+            final_score=final_score,
+            components=components,
+            contributions=contributions
+        )
+    
+    def _reason_keys(
+        self,
+        components: ScoringComponents,
+        target_intensity: float
+    ) -> Tuple[str, ...]:
+        """Factor signature: the components strong enough to cite."""
+        keys = []
         
         if components.mood_similarity > 0.7:
-            reasons.append(f"phù hợp tâm trạng {target_mood}")
+            keys.append('mood')
         
         if components.intensity_match > 0.8:
-            intensity_word = 'nhẹ nhàng' if target_intensity < 0.4 else ('mạnh mẽ' if target_intensity > 0.7 else 'vừa phải')
-            reasons.append(f"cường độ {intensity_word}")
+            if target_intensity < 0.4:
+                keys.append('intensity_low')
+            elif target_intensity > 0.7:
+                keys.append('intensity_high')
+            else:
+                keys.append('intensity_medium')
         
         if components.user_preference > 0.7:
-            reasons.append("phù hợp sở thích của bạn")
+            keys.append('preference')
         
         if components.recency_penalty > 0.9:
-            reasons.append("bài hát mới lạ")
+            keys.append('novelty')
         
         if components.diversity_penalty > 0.8:
-            reasons.append("tạo đa dạng playlist")
+            keys.append('diversity')
         
         if components.popularity_boost > 0.7:
-            reasons.append("được nhiều người yêu thích")
+            keys.append('popularity')
         
         # Fallback reason
-        if not reasons:
-            reasons.append("điểm tổng hợp cao")
-        
-        return RankingExplanation(
-            song_id=song.get('song_id', 0),
-            song_name=song.get('song_name') or song.get('name', 'Unknown'),
-            artist=song.get('artist', 'Unknown'),
-            primary_reason=reasons[0] if reasons else '',
-            secondary_reasons=reasons[1:3] if len(reasons) > 1 else [],
-            final_score=final_score,
-            components=components,
-            top_contributor=top_key,
-            contribution_percentages=percentages
-        )
+        return tuple(keys) or ('overall',)
 
 
 # =============================================================================
 # FACTORY FUNCTION
 # =============================================================================
 
-def create_ranking_engine(config: RankingConfig = None) -> HybridRankingEngine:
-    """Create a HybridRankingEngine instance."""
-    return HybridRankingEngine(config)
+def create_ranking_engine(
+    config: RankingConfig = None,
+    popularity: Optional[PopularityStatsService] = None
+) -> HybridRankingEngine:
+    """Create a HybridRankingEngine instance (default: the shared popularity service)."""
+    if popularity is None:
+        from backend.services.popularity_stats import get_popularity_service
+        popularity = get_popularity_service()
+    return HybridRankingEngine(config, popularity)
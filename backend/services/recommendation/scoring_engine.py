@@ -16,14 +16,23 @@ Version: 5.0.0
 =============================================================================
 """
 
+from __future__ import annotations
+
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Optional, Any, Tuple, TYPE_CHECKING
 from datetime import datetime
 import math
 import random
 import sqlite3
 import os
 
+import numpy as np
+
+from backend.repositories import ensure_song_moods, normalize_mood
+
+if TYPE_CHECKING:
+    from backend.services.bandit_store import BanditStateStore
+
 
 @dataclass
 class ScoredSong:
@@ -68,67 +77,94 @@ class ThompsonSamplingBandit:
     """
     Thompson Sampling for strategy selection.
     
-    Maintains Beta distribution priors for each strategy.
+    Maintains Beta distribution priors for each strategy. With a ``store``
+    the posteriors are kept per user in the database (shared across
+    restarts and workers); without one, a single in-memory posterior is
+    shared by all users. All arms are sampled in one ``numpy`` call.
     """
     
-    def __init__(self, strategies: List[str], prior_alpha: float = 1.0, prior_beta: float = 1.0):
-        self.strategies = strategies
-        self._alphas = {s: prior_alpha for s in strategies}
-        self._betas = {s: prior_beta for s in strategies}
+    def __init__(
+        self,
+        strategies: List[str],
+        prior_alpha: float = 1.0,
+        prior_beta: float = 1.0,
+        store: Optional["BanditStateStore"] = None,
+        seed: Optional[int] = None,
+    ):
+        self.strategies = list(strategies)
+        if store is not None and store.arms != tuple(self.strategies):
+            raise ValueError("Bandit store arms do not match strategies")
+        self.store = store
+        self._index = {s: i for i, s in enumerate(self.strategies)}
+        self._alphas = np.full(len(self.strategies), prior_alpha, dtype=np.float64)
+        self._betas = np.full(len(self.strategies), prior_beta, dtype=np.float64)
+        self._rng = np.random.default_rng(seed)
+    
+    def _posterior(self, user_id: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        if self.store is not None and user_id is not None:
+            posterior = self.store.get(user_id)
+            return posterior.alphas, posterior.betas
+        return self._alphas, self._betas
     
-    def sample(self) -> Tuple[str, Dict[str, float]]:
+    def sample(self, user_id: Optional[int] = None) -> Tuple[str, Dict[str, float]]:
         """
         Sample from each strategy's distribution and return the winner.
         
+        Args:
+            user_id: User whose posteriors to sample (store only)
+        
         Returns:
             Tuple of (winning_strategy, all_samples)
         """
-        samples = {}
-        for strategy in self.strategies:
-            # Sample from Beta(alpha, beta)
-            samples[strategy] = random.betavariate(
-                self._alphas[strategy],
-                self._betas[strategy]
-            )
-        
-        winner = max(samples.keys(), key=lambda k: samples[k])
-        return winner, samples
+        alphas, betas = self._posterior(user_id)
+        draws = self._rng.beta(alphas, betas)
+        winner = self.strategies[int(np.argmax(draws))]
+        return winner, dict(zip(self.strategies, draws.tolist()))
     
-    def update(self, strategy: str, reward: float):
+    def update(self, strategy: str, reward: float, user_id: Optional[int] = None):
         """
         Update strategy's distribution based on reward.
         
         Args:
             strategy: Strategy that was used
             reward: Reward value (0 to 1)
+            user_id: User who gave the reward (store only)
         """
-        if strategy not in self.strategies:
+        index = self._index.get(strategy)
+        if index is None:
             return
         
         # Update based on reward (treat as Bernoulli)
         if reward >= 0.5:
-            self._alphas[strategy] += reward
+            d_alpha, d_beta = reward, 0.0
+        else:
+            d_alpha, d_beta = 0.0, 1.0 - reward
+        
+        if self.store is not None and user_id is not None:
+            self.store.update(user_id, strategy, d_alpha, d_beta, reward)
         else:
-            self._betas[strategy] += (1.0 - reward)
+            self._alphas[index] += d_alpha
+            self._betas[index] += d_beta
     
-    def get_expected_rewards(self) -> Dict[str, float]:
+    def get_expected_rewards(self, user_id: Optional[int] = None) -> Dict[str, float]:
         """Get expected reward (mean of Beta distribution) for each strategy."""
-        return {
-            s: self._alphas[s] / (self._alphas[s] + self._betas[s])
-            for s in self.strategies
-        }
+        alphas, betas = self._posterior(user_id)
+        return dict(zip(self.strategies, (alphas / (alphas + betas)).tolist()))
     
-    def get_state(self) -> Dict[str, Dict[str, float]]:
+    def get_state(self, user_id: Optional[int] = None) -> Dict[str, Dict[str, float]]:
         """Get bandit state for serialization."""
+        alphas, betas = self._posterior(user_id)
         return {
-            "alphas": self._alphas.copy(),
-            "betas": self._betas.copy(),
+            "alphas": dict(zip(self.strategies, alphas.tolist())),
+            "betas": dict(zip(self.strategies, betas.tolist())),
         }
     
     def load_state(self, state: Dict):
-        """Load bandit state from dictionary."""
-        self._alphas = state.get("alphas", self._alphas)
-        self._betas = state.get("betas", self._betas)
+        """Load in-memory bandit state from dictionary."""
+        for key, target in (("alphas", self._alphas), ("betas", self._betas)):
+            for strategy, value in state.get(key, {}).items():
+                if strategy in self._index:
+                    target[self._index[strategy]] = value
 
 
 class ScoringEngine:
@@ -158,9 +194,19 @@ class ScoringEngine:
             os.path.dirname(__file__),
             "..", "..", "src", "database", "music.db"
         )
-        self.bandit = ThompsonSamplingBandit(self.STRATEGIES)
+        self._bandit: Optional[ThompsonSamplingBandit] = None
         self._user_weights: Dict[int, Dict[str, float]] = {}
     
+    @property
+    def bandit(self) -> ThompsonSamplingBandit:
+        """Per-user bandit over the shared store, created on first use."""
+        if self._bandit is None:
+            from backend.services.bandit_store import get_bandit_store
+            self._bandit = ThompsonSamplingBandit(
+                self.STRATEGIES, store=get_bandit_store(self.STRATEGIES, self.db_path)
+            )
+        return self._bandit
+    
     def get_user_weights(self, user_id: int) -> Dict[str, float]:
         """Get weights for a user, or default if not set."""
         return self._user_weights.get(user_id, self.DEFAULT_WEIGHTS.copy())
@@ -200,7 +246,7 @@ class ScoringEngine:
             thompson_samples = {s: 0.0 for s in self.STRATEGIES}
             thompson_samples[strategy] = 1.0
         else:
-            selected_strategy, thompson_samples = self.bandit.sample()
+            selected_strategy, thompson_samples = self.bandit.sample(user_id)
         
         # Get candidate songs
         candidates = self._get_candidate_songs(target_mood, limit * 3)
@@ -250,8 +296,10 @@ class ScoringEngine:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
-            # Get songs, optionally filtered by mood
+            # Get songs, optionally filtered by mood: tagged songs via the
+            # song_moods index first, untagged songs only to fill the limit
             if target_mood:
+                ensure_song_moods(conn, self.db_path)
                 cursor.execute("""
                     SELECT 
                         song_id, name, artist, genre, moods as mood,
@@ -260,9 +308,18 @@ class ScoringEngine:
                         COALESCE(tempo, 120) as tempo,
                         COALESCE(popularity, 50) as popularity
                     FROM songs
-                    WHERE moods LIKE ? OR moods IS NULL
+                    WHERE song_id IN (SELECT song_id FROM song_moods WHERE mood = ?)
+                    UNION ALL
+                    SELECT 
+                        song_id, name, artist, genre, moods as mood,
+                        COALESCE(valence, 0) as valence,
+                        COALESCE(energy, 0) as energy,
+                        COALESCE(tempo, 120) as tempo,
+                        COALESCE(popularity, 50) as popularity
+                    FROM songs s
+                    WHERE NOT EXISTS (SELECT 1 FROM song_moods sm WHERE sm.song_id = s.song_id)
                     LIMIT ?
-                """, (f"%{target_mood}%", limit))
+                """, (normalize_mood(target_mood), limit))
             else:
                 cursor.execute("""
                     SELECT 
@@ -450,15 +507,15 @@ class ScoringEngine:
         
         return selected
     
-    def update_bandit(self, strategy: str, reward: float):
-        """Update Thompson Sampling bandit with reward."""
-        self.bandit.update(strategy, reward)
+    def update_bandit(self, strategy: str, reward: float, user_id: Optional[int] = None):
+        """Update Thompson Sampling bandit with a user's reward."""
+        self.bandit.update(strategy, reward, user_id)
     
-    def get_bandit_state(self) -> Dict:
-        """Get current bandit state."""
+    def get_bandit_state(self, user_id: Optional[int] = None) -> Dict:
+        """Get current bandit state (per user when given)."""
         return {
-            "state": self.bandit.get_state(),
-            "expected_rewards": self.bandit.get_expected_rewards(),
+            "state": self.bandit.get_state(user_id),
+            "expected_rewards": self.bandit.get_expected_rewards(user_id),
         }
 
 
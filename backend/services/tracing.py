@@ -0,0 +1,268 @@
+"""
+Pipeline Tracing
+================
+Lightweight per-request span recorder for the chat pipeline.
+
+Each ``process_message`` call opens a RequestTrace; pipeline stages wrap
+their work in ``tracer.span("stage")``. Spans use monotonic
+``time.perf_counter`` timers and are attached to the request through a
+context variable, so nested helpers can record stages without passing
+the trace around.
+
+Finished traces are:
+- Aggregated into fixed-bucket latency histograms per stage
+- Kept in a ring buffer of recent slow traces (total above a threshold)
+
+This makes it possible to attribute p99 regressions to a specific stage
+(mood inference, candidate fetch, personalization, ...).
+
+Author: MusicMoodBot Team
+Version: 1.0.0
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+
+# Histogram bucket upper bounds in milliseconds (last bucket is +inf)
+DEFAULT_BUCKETS_MS: Tuple[float, ...] = (
+    0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000
+)
+
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar(
+    "current_trace", default=None
+)
+
+
+# =============================================================================
+# DATA CLASSES
+# =============================================================================
+
+@dataclass
+class Span:
+    """A single timed pipeline stage."""
+    name: str
+    start_ms: float  # Offset from trace start
+    duration_ms: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'start_ms': round(self.start_ms, 3),
+            'duration_ms': round(self.duration_ms, 3),
+        }
+
+
+@dataclass
+class RequestTrace:
+    """All spans recorded for one request."""
+    trace_id: str
+    name: str
+    started_at: datetime
+    start: float  # perf_counter at trace start
+    spans: List[Span] = field(default_factory=list)
+    total_ms: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'started_at': self.started_at.isoformat(),
+            'total_ms': round(self.total_ms, 3),
+            'attributes': self.attributes,
+            'spans': [s.to_dict() for s in self.spans],
+        }
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (milliseconds)."""
+
+    def __init__(self, buckets_ms: Tuple[float, ...] = DEFAULT_BUCKETS_MS):
+        self.bounds = tuple(buckets_ms)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value_ms)] += 1
+        self.count += 1
+        self.sum_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def percentile(self, q: float) -> float:
+        """Estimate a percentile as the upper bound of its bucket."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            cumulative += c
+            if cumulative >= rank:
+                return self.bounds[i] if i < len(self.bounds) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{b:g}" for b in self.bounds] + ["le_inf"]
+        return {
+            'count': self.count,
+            'mean_ms': round(self.sum_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+# =============================================================================
+# TRACER
+# =============================================================================
+
+class PipelineTracer:
+    """
+    Records per-request spans and aggregates them per stage.
+
+    Usage:
+        tracer = get_pipeline_tracer()
+
+        with tracer.trace("process_message", input_type="chip"):
+            with tracer.span("mood_detection"):
+                ...
+            with tracer.span("personalization"):
+                ...
+
+        tracer.get_stats()        # per-stage histograms
+        tracer.get_slow_traces()  # recent slow requests
+    """
+
+    def __init__(
+        self,
+        slow_threshold_ms: float = 500.0,
+        max_slow_traces: int = 100,
+        max_recent_traces: int = 50
+    ):
+        """
+        Initialize tracer.
+
+        Args:
+            slow_threshold_ms: Traces slower than this enter the slow buffer
+            max_slow_traces: Ring buffer size for slow traces
+            max_recent_traces: Ring buffer size for all recent traces
+        """
+        self.slow_threshold_ms = slow_threshold_ms
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._slow: Deque[RequestTrace] = deque(maxlen=max_slow_traces)
+        self._recent: Deque[RequestTrace] = deque(maxlen=max_recent_traces)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[RequestTrace]:
+        """Open a request trace; nested ``span`` calls attach to it."""
+        trace = RequestTrace(
+            trace_id=uuid.uuid4().hex[:16],
+            name=name,
+            started_at=datetime.now(),
+            start=time.perf_counter(),
+            attributes=dict(attributes),
+        )
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            trace.total_ms = (time.perf_counter() - trace.start) * 1000
+            _current_trace.reset(token)
+            self._finish(trace)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time a stage of the current trace (no-op outside a trace)."""
+        trace = _current_trace.get()
+        if trace is None:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            trace.spans.append(Span(
+                name=name,
+                start_ms=(start - trace.start) * 1000,
+                duration_ms=(end - start) * 1000,
+            ))
+
+    @staticmethod
+    def annotate(**attributes) -> None:
+        """Attach attributes to the current trace, if any."""
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.attributes.update(attributes)
+
+    def _finish(self, trace: RequestTrace) -> None:
+        with self._lock:
+            self._observe(f"{trace.name}.total", trace.total_ms)
+            for span in trace.spans:
+                self._observe(span.name, span.duration_ms)
+
+            self._recent.append(trace)
+            if trace.total_ms >= self.slow_threshold_ms:
+                self._slow.append(trace)
+
+    def _observe(self, name: str, value_ms: float) -> None:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = LatencyHistogram()
+        histogram.observe(value_ms)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage latency histograms."""
+        with self._lock:
+            return {name: h.to_dict() for name, h in sorted(self._histograms.items())}
+
+    def get_slow_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent slow traces, newest first."""
+        with self._lock:
+            return [t.to_dict() for t in list(self._slow)[::-1][:limit]]
+
+    def get_recent_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent traces, newest first."""
+        with self._lock:
+            return [t.to_dict() for t in list(self._recent)[::-1][:limit]]
+
+    def reset(self) -> None:
+        """Clear histograms and trace buffers."""
+        with self._lock:
+            self._histograms.clear()
+            self._slow.clear()
+            self._recent.clear()
+
+
+# =============================================================================
+# SINGLETON INSTANCE
+# =============================================================================
+
+_tracer: Optional[PipelineTracer] = None
+
+
+def get_pipeline_tracer() -> PipelineTracer:
+    """Get or create singleton PipelineTracer instance."""
+    global _tracer
+    if _tracer is None:
+        import os
+        _tracer = PipelineTracer(
+            slow_threshold_ms=float(os.environ.get("MMB_SLOW_TRACE_MS", 500))
+        )
+    return _tracer
@@ -0,0 +1,386 @@
+"""
+Write-Behind Persistence
+========================
+Background writer for chat history.
+
+Saving recommendations used to run on the response path: one connection
+and one transaction per history row. The WriteBehindWriter takes those
+writes off the request thread:
+
+- Writes are appended to a bounded in-memory buffer
+- A single background thread drains the buffer and groups many writes
+  into one transaction
+- When the buffer is full, the caller writes synchronously instead of
+  dropping data (backpressure)
+- ``barrier(session_id=...)`` / ``barrier(user_id=...)`` wait until that
+  session's or user's pending writes are committed (read-your-writes)
+- ``close()`` flushes everything before shutdown
+- ``user:<id>`` is published for the written users after each commit
+
+Auto playlists are still created synchronously (a single transaction)
+because the chat response returns their id.
+
+Author: MusicMoodBot Team
+Version: 1.0.0
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from backend.repositories import (
+    HistoryRepository,
+    get_connection,
+    get_db_path,
+    publish_invalidation,
+    user_tag,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# DATA CLASSES
+# =============================================================================
+
+@dataclass
+class PendingWrite:
+    """A single buffered write."""
+    kind: str  # "history"
+    user_id: int
+    session_id: Optional[str]
+    payload: Dict[str, Any]
+    enqueued_at: datetime = field(default_factory=datetime.now)
+
+
+@dataclass
+class WriteBehindStats:
+    """Write-behind writer statistics."""
+    enqueued: int = 0
+    written: int = 0
+    failed: int = 0
+    batches: int = 0
+    sync_fallbacks: int = 0
+    pending: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'failed': self.failed,
+            'batches': self.batches,
+            'sync_fallbacks': self.sync_fallbacks,
+            'pending': self.pending,
+            'avg_batch_size': round(self.written / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+# =============================================================================
+# WRITE-BEHIND WRITER
+# =============================================================================
+
+class WriteBehindWriter:
+    """
+    Batches chat history inserts on a background thread.
+
+    Usage:
+        writer = WriteBehindWriter(db_path)
+        writer.enqueue_history(user_id, session_id, entries)
+
+        # Before reading the same session's data
+        writer.barrier(session_id=session_id)
+
+        # On shutdown
+        writer.close()
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_pending: int = 1000,
+        batch_size: int = 200,
+        flush_interval: float = 0.05
+    ):
+        """
+        Initialize writer.
+
+        Args:
+            db_path: Database path (default: repository default)
+            max_pending: Maximum buffered writes before backpressure
+            batch_size: Maximum writes grouped into one transaction
+            flush_interval: Seconds the writer waits to collect a batch
+        """
+        self.history_repo = HistoryRepository(db_path)
+        self.db_path = self.history_repo.db_path
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._buffer: Deque[PendingWrite] = deque()
+        self._cond = threading.Condition()
+        self._pending_sessions: Counter = Counter()
+        self._pending_users: Counter = Counter()
+        self._in_flight = 0
+        self._in_flight_batch: List[PendingWrite] = []
+        self._closed = False
+        self._stats = WriteBehindStats()
+
+        self._thread = threading.Thread(
+            target=self._run, name="write-behind", daemon=True
+        )
+        self._thread.start()
+
+    # =========================================================================
+    # PUBLIC API
+    # =========================================================================
+
+    def enqueue_history(
+        self,
+        user_id: int,
+        session_id: Optional[str],
+        entries: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Buffer chat history entries.
+
+        Args:
+            user_id: User ID
+            session_id: Chat session the entries belong to
+            entries: Dicts with mood, intensity, song_id, reason
+        """
+        if not entries:
+            return
+        rows = [{**entry, "user_id": user_id} for entry in entries]
+        self._enqueue(PendingWrite("history", user_id, session_id, {"entries": rows}))
+
+    def barrier(
+        self,
+        session_id: Optional[str] = None,
+        user_id: Optional[int] = None,
+        timeout: float = 5.0
+    ) -> bool:
+        """
+        Wait until pending writes for a session and/or user are committed.
+
+        With neither argument this waits for all pending writes.
+
+        Returns:
+            True if the writes were committed within the timeout
+        """
+        def done() -> bool:
+            if session_id is None and user_id is None:
+                return not self._buffer and self._in_flight == 0
+            if session_id is not None and self._pending_sessions[session_id] > 0:
+                return False
+            if user_id is not None and self._pending_users[user_id] > 0:
+                return False
+            return True
+
+        with self._cond:
+            self._cond.notify_all()
+            return self._cond.wait_for(done, timeout=timeout)
+
+    def pending_song_ids(self, user_id: int) -> List[int]:
+        """
+        Song IDs in a user's not-yet-committed history writes.
+
+        Lets callers that exclude already-heard songs see the latest
+        recommendations without waiting on a barrier.
+        """
+        with self._cond:
+            writes = list(self._buffer) + list(self._in_flight_batch)
+        return [
+            entry["song_id"]
+            for write in writes
+            if write.kind == "history" and write.user_id == user_id
+            for entry in write.payload["entries"]
+            if entry.get("song_id") is not None
+        ]
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every buffered write is committed."""
+        return self.barrier(timeout=timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush remaining writes and stop the background thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+
+    def get_stats(self) -> WriteBehindStats:
+        """Get writer statistics."""
+        with self._cond:
+            return WriteBehindStats(
+                enqueued=self._stats.enqueued,
+                written=self._stats.written,
+                failed=self._stats.failed,
+                batches=self._stats.batches,
+                sync_fallbacks=self._stats.sync_fallbacks,
+                pending=len(self._buffer) + self._in_flight,
+            )
+
+    # =========================================================================
+    # INTERNALS
+    # =========================================================================
+
+    def _enqueue(self, write: PendingWrite) -> None:
+        with self._cond:
+            if not self._closed and len(self._buffer) < self.max_pending:
+                self._buffer.append(write)
+                self._track(write, +1)
+                self._stats.enqueued += 1
+                self._cond.notify_all()
+                return
+            self._stats.sync_fallbacks += 1
+
+        # Buffer full (or writer closed): write on the caller's thread
+        self._write_batch([write])
+
+    def _track(self, write: PendingWrite, delta: int) -> None:
+        if write.session_id is not None:
+            self._pending_sessions[write.session_id] += delta
+            if self._pending_sessions[write.session_id] <= 0:
+                del self._pending_sessions[write.session_id]
+        self._pending_users[write.user_id] += delta
+        if self._pending_users[write.user_id] <= 0:
+            del self._pending_users[write.user_id]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._buffer or self._closed)
+                if not self._buffer and self._closed:
+                    return
+
+            # Give concurrent requests a moment to join this batch
+            if not self._closed and len(self._buffer) < self.batch_size:
+                time.sleep(self.flush_interval)
+
+            with self._cond:
+                batch = []
+                while self._buffer and len(batch) < self.batch_size:
+                    batch.append(self._buffer.popleft())
+                self._in_flight = len(batch)
+                self._in_flight_batch = batch
+
+            try:
+                self._write_batch(batch)
+            finally:
+                with self._cond:
+                    for write in batch:
+                        self._track(write, -1)
+                    self._in_flight = 0
+                    self._in_flight_batch = []
+                    self._cond.notify_all()
+
+    def _write_batch(self, batch: List[PendingWrite]) -> None:
+        """Write a batch in one transaction, isolating failures per write."""
+        if not batch:
+            return
+
+        try:
+            with get_connection(self.db_path) as conn:
+                try:
+                    for write in batch:
+                        self._apply(conn, write)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            tags = self._user_tags(batch)
+            if tags:
+                publish_invalidation(*tags)
+            with self._cond:
+                self._stats.written += len(batch)
+                self._stats.batches += 1
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                logger.warning(f"Write-behind {batch[0].kind} write failed: {e}")
+                with self._cond:
+                    self._stats.failed += 1
+                return
+            logger.warning(f"Write-behind batch failed, retrying individually: {e}")
+
+        for write in batch:
+            self._write_batch([write])
+
+    @staticmethod
+    def _user_tags(batch: List[PendingWrite]) -> List[str]:
+        """Invalidation tags of the users whose rows a batch wrote."""
+        return sorted({
+            user_tag(entry["user_id"])
+            for write in batch if write.kind == "history"
+            for entry in write.payload["entries"]
+        })
+
+    def _apply(self, conn, write: PendingWrite) -> None:
+        if write.kind == "history":
+            self.history_repo.insert_chat_entries(conn, write.payload["entries"])
+        else:
+            raise ValueError(f"Unknown write kind: {write.kind}")
+
+
+# =============================================================================
+# SHARED INSTANCES
+# =============================================================================
+
+# One writer per database file
+_writers: Dict[str, WriteBehindWriter] = {}
+_writer_lock = threading.Lock()
+
+
+def _writer_key(db_path: Optional[str]) -> str:
+    return os.path.realpath(db_path or get_db_path())
+
+
+def get_write_behind_writer(db_path: Optional[str] = None) -> WriteBehindWriter:
+    """Get or create the shared WriteBehindWriter for a database."""
+    key = _writer_key(db_path)
+    with _writer_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = WriteBehindWriter(
+                key,
+                max_pending=int(os.environ.get("MMB_WRITE_BEHIND_MAX_PENDING", 1000))
+            )
+            atexit.register(writer.close)
+        return writer
+
+
+def wait_for_pending_writes(
+    session_id: Optional[str] = None,
+    user_id: Optional[int] = None,
+    timeout: float = 5.0
+) -> bool:
+    """
+    Read-your-writes barrier for API read paths.
+
+    Waits on every started writer; cheap no-op when none was started.
+    """
+    with _writer_lock:
+        writers = list(_writers.values())
+    return all(
+        writer.barrier(session_id=session_id, user_id=user_id, timeout=timeout)
+        for writer in writers
+    )
+
+
+def shutdown_write_behind(timeout: float = 10.0) -> None:
+    """Flush and stop all writers (application shutdown hook)."""
+    with _writer_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close(timeout=timeout)
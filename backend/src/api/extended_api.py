@@ -289,23 +289,38 @@ def get_similar_songs(
 ) -> Dict[str, Any]:
     """Get songs similar to a given song."""
     try:
-        from backend.src.pipelines.song_similarity import SongSimilarityEngine
-        from backend.src.repo.song_repo import connect, fetch_songs, fetch_song_by_id
+        from backend.src.pipelines.song_similarity import (
+            get_similarity_engine, get_catalog_index
+        )
+        from backend.src.repo.song_repo import connect, fetch_song_by_id
+        from backend.src.services.neighbor_service import get_neighbor_service
         
-        con = connect(get_db_path())
-        target = fetch_song_by_id(con, song_id)
+        engine = get_similarity_engine()
+        neighbors = get_neighbor_service(get_db_path()).get_neighbors(
+            song_id, limit, exclude_same_artist
+        )
         
-        if not target:
+        if neighbors is not None:
+            # Precomputed neighbours: one indexed query
+            con = connect(get_db_path())
+            target = fetch_song_by_id(con, song_id)
             con.close()
-            raise HTTPException(status_code=404, detail="Song not found")
-        
-        all_songs = fetch_songs(con)
-        con.close()
-        
-        engine = SongSimilarityEngine()
-        results = engine.find_similar_songs(
-            target, all_songs, limit, exclude_same_artist
-        )
+            
+            if not target:
+                raise HTTPException(status_code=404, detail="Song not found")
+            
+            results = [engine.calculate_similarity(target, song) for song, _ in neighbors]
+        else:
+            # Fallback: score against the cached feature matrix
+            index = get_catalog_index(get_db_path(), engine)
+            target = index.get_song(song_id)
+            
+            if not target:
+                raise HTTPException(status_code=404, detail="Song not found")
+            
+            results = engine.find_similar_songs(
+                target, None, limit, exclude_same_artist
+            )
         
         return {
             "source_song": {
@@ -330,20 +345,19 @@ def get_diverse_similar_songs(
 ) -> Dict[str, Any]:
     """Get similar songs with diversity (MMR-style selection)."""
     try:
-        from backend.src.pipelines.song_similarity import SongSimilarityEngine
-        from backend.src.repo.song_repo import connect, fetch_songs, fetch_song_by_id
+        from backend.src.pipelines.song_similarity import (
+            get_similarity_engine, get_catalog_index
+        )
         
-        con = connect(get_db_path())
-        target = fetch_song_by_id(con, song_id)
+        engine = get_similarity_engine()
+        index = get_catalog_index(get_db_path(), engine)
+        target = index.get_song(song_id)
         
         if not target:
-            con.close()
             raise HTTPException(status_code=404, detail="Song not found")
         
-        all_songs = fetch_songs(con)
-        con.close()
+        all_songs = index.songs
         
-        engine = SongSimilarityEngine()
         results = engine.find_diverse_similar(
             target, all_songs, limit, diversity_weight
         )
@@ -502,7 +516,7 @@ def get_transition_playlist(
     """Generate a playlist for mood transition."""
     try:
         from backend.src.pipelines.mood_transition import get_transition_engine, TransitionSpeed
-        from backend.src.repo.song_repo import connect, fetch_songs
+        from backend.src.pipelines.song_similarity import get_catalog_index
         
         speed_map = {
             "gradual": TransitionSpeed.GRADUAL,
@@ -510,9 +524,9 @@ def get_transition_playlist(
             "quick": TransitionSpeed.QUICK,
         }
         
-        con = connect(get_db_path())
-        all_songs = fetch_songs(con)
-        con.close()
+        # Same list object while the catalog is unchanged, so the
+        # engine's per-catalog step pools are reused across requests
+        all_songs = get_catalog_index(get_db_path()).songs
         
         engine = get_transition_engine()
         playlist = engine.get_transition_playlist(
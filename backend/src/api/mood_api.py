@@ -47,6 +47,9 @@ def get_search_engine() -> TFIDFSearchEngine:
         songs = fetch_songs(con)
         con.close()
         _search_engine = create_search_engine(songs)
+        
+        from backend.src.services.neighbor_service import get_neighbor_service
+        _search_engine.neighbor_source = get_neighbor_service(get_db_path()).get_neighbors
     return _search_engine
 
 
@@ -257,6 +260,28 @@ def search_songs(
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
+@router.get("/search/similar/{song_id}")
+def search_similar_songs(
+    song_id: int,
+    top_k: int = Query(10, ge=1, le=50)
+) -> List[Dict]:
+    """
+    "More like this": songs similar to a given song.
+    
+    Served from precomputed neighbours when available, otherwise from
+    TF-IDF similarity.
+    """
+    try:
+        search_engine = get_search_engine()
+        results = search_engine.search_similar(song_id, top_k=top_k)
+        return [
+            {**song, "relevance_score": float(score)}
+            for song, score in results
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+
 @router.get("/search/by-mood/{mood}")
 def search_by_mood(
     mood: str,
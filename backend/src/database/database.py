@@ -3,6 +3,8 @@ import os
 from datetime import datetime
 from typing import List, Dict, Optional
 
+from backend.repositories.song_repository import sync_song_moods
+
 DB_PATH = os.path.join(os.path.dirname(__file__), "music.db")
 
 def _get_connection():
@@ -61,6 +63,7 @@ def seed_sample_songs():
         ]
         for song in songs:
             cursor.execute("INSERT INTO songs (name, artist, genre, suy_score, reason, moods) VALUES (?, ?, ?, ?, ?, ?)", song)
+        sync_song_moods(conn)
         conn.commit()
         print("Sample songs seeded successfully")
     conn.close()
@@ -6,6 +6,7 @@ Contains migration scripts for the MusicMoodBot database schema evolution.
 
 Migrations:
 - migrate_conversation_v3.py: Multi-turn conversation system schema
+- migrate_song_moods.py: Normalized song_moods table for indexed mood lookups
 """
 
 from .migrate_conversation_v3 import ConversationMigration, MIGRATION_VERSION
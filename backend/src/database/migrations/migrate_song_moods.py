@@ -0,0 +1,169 @@
+"""
+=============================================================================
+SONG MOODS - DATABASE MIGRATION
+=============================================================================
+
+Migration Script for the normalized song_moods table.
+
+Mood-filtered queries used to run ``WHERE moods LIKE '%mood%'`` against
+the songs table, which no index can serve. This migration adds a
+``song_moods(song_id, mood, confidence)`` join table and backfills it
+from the existing ``mood``/``mood_confidence`` and legacy ``moods``
+columns. Mood lookups then become an index range scan.
+
+The repositories keep the table in sync on every mood write, and create
+and backfill it on first use when this migration has not been run. Running
+the migration again rebuilds the table from the songs table.
+
+Author: MusicMoodBot Team
+Date: 2025
+
+SCHEMA CHANGES:
+1. NEW TABLES:
+   - song_moods: One row per (song, mood label), labels lower-cased
+
+2. NEW INDEXES:
+   - idx_song_moods_mood (mood, confidence DESC, song_id)
+
+USAGE:
+    python -m backend.src.database.migrations.migrate_song_moods
+
+=============================================================================
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import sqlite3
+import logging
+from contextlib import contextmanager
+
+from backend.repositories.song_repository import SONG_MOODS_SCHEMA, sync_song_moods
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "music.db"
+)
+
+
+# =============================================================================
+# MIGRATION FUNCTIONS
+# =============================================================================
+
+@contextmanager
+def get_db_connection(db_path: str):
+    """Context manager for database connections."""
+    conn = sqlite3.connect(db_path)
+    try:
+        yield conn
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def run_migration(db_path: str, dry_run: bool = False) -> bool:
+    """
+    Create and backfill song_moods.
+
+    Args:
+        db_path: Path to SQLite database
+        dry_run: If True, only show what would be done
+
+    Returns:
+        True if successful, False otherwise
+    """
+    logger.info(f"Starting song_moods migration on: {db_path}")
+
+    try:
+        with get_db_connection(db_path) as conn:
+            if dry_run:
+                songs = conn.execute("SELECT COUNT(*) FROM songs").fetchone()[0]
+                logger.info(f"[DRY RUN] Would create song_moods and backfill {songs} songs")
+                return True
+
+            conn.executescript(SONG_MOODS_SCHEMA)
+            rows = sync_song_moods(conn)
+            logger.info(f"Backfilled {rows} song_moods rows")
+            return True
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return False
+
+
+def rollback_migration(db_path: str) -> bool:
+    """Drop song_moods (derived data, rebuilt on next use)."""
+    try:
+        with get_db_connection(db_path) as conn:
+            conn.execute("DROP TABLE IF EXISTS song_moods")
+            logger.info("Rollback completed")
+            return True
+
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return False
+
+
+# =============================================================================
+# CLI INTERFACE
+# =============================================================================
+
+def main():
+    """CLI entry point."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="MusicMoodBot song_moods Migration"
+    )
+    parser.add_argument(
+        "--db-path",
+        default=DEFAULT_DB_PATH,
+        help="Path to SQLite database"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show what would be done without making changes"
+    )
+    parser.add_argument(
+        "--rollback",
+        action="store_true",
+        help="Drop the song_moods table"
+    )
+
+    args = parser.parse_args()
+
+    # Resolve path
+    db_path = os.path.abspath(args.db_path)
+
+    if not os.path.exists(db_path):
+        logger.error(f"Database not found: {db_path}")
+        sys.exit(1)
+
+    if args.rollback:
+        success = rollback_migration(db_path)
+    else:
+        success = run_migration(db_path, dry_run=args.dry_run)
+
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))
 
 from backend.src.pipelines.mood_engine import MoodEngine
+from backend.repositories import sync_song_moods
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "music.db")
 
@@ -56,6 +57,7 @@ def recalculate_moods():
         print(f"   {mood_emoji.get(result['mood'], '')} {result['mood']} | Intensity: {int_label[result['intensity']]}")
         print(f"   Valence: {result['valence_score']:.1f} | Arousal: {result['arousal_score']:.1f} | Conf: {result['mood_confidence']*100:.1f}%")
 
+    sync_song_moods(con)
     con.commit()
 
     print('\n' + '=' * 60)
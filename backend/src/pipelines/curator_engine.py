@@ -7,6 +7,9 @@ MODULE 2: Core pathfinding algorithm with:
 - Dynamic re-routing on skip events
 - Breather track insertion for listener fatigue prevention
 - Energy curve following with tolerance
+- Vectorized pool scoring (precomputed Camelot/texture transition matrices)
+- Beam-search sequencing with a bounded width and time budget
+- Incremental skip re-routing (cached transition scores, lazy planning)
 
 Based on the "Adaptive DJ Graph" architecture:
 - Node = Song (Mood + Texture + Key)
@@ -16,10 +19,14 @@ Based on the "Adaptive DJ Graph" architecture:
 
 from __future__ import annotations
 
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple, Callable
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Callable, Union
 import math
 import random
+import time
+
+import numpy as np
 
 from backend.src.pipelines.curator_types import (
     CuratorTrack, PlaylistState, TextureType,
@@ -63,6 +70,11 @@ class CuratorConfig:
     # === VARIETY ===
     same_artist_penalty: float = 0.2     # Avoid same artist back-to-back
     recently_played_penalty: float = 0.3  # Avoid recently played songs
+    
+    # === SEQUENCING ===
+    beam_width: int = 4                  # Partial playlists kept per step (1 = top-5 sampling)
+    beam_expansions: int = 5             # Next-track candidates expanded per partial playlist
+    beam_time_budget_ms: float = 50.0    # Past this, finish the best beam greedily
 
 
 # =============================================================================
@@ -152,6 +164,149 @@ def _narrative_bonus_score(candidate: CuratorTrack,
         return 0.5
 
 
+# =============================================================================
+# PRECOMPUTED TRANSITION MATRICES
+# =============================================================================
+
+# 24 Camelot codes (1A..12A, 1B..12B) plus "??" for unknown keys
+CAMELOT_CODES: Tuple[str, ...] = tuple(
+    f"{num}{letter}" for letter in "AB" for num in range(1, 13)
+) + ("??",)
+CAMELOT_INDEX: Dict[str, int] = {code: i for i, code in enumerate(CAMELOT_CODES)}
+UNKNOWN_CAMELOT = CAMELOT_INDEX["??"]
+
+TEXTURE_ORDER: Tuple[TextureType, ...] = tuple(TextureType)
+TEXTURE_INDEX: Dict[TextureType, int] = {t: i for i, t in enumerate(TEXTURE_ORDER)}
+
+
+def _build_harmonic_matrix(allow_boost: bool) -> np.ndarray:
+    """Harmonic flow score for every (from, to) Camelot code pair."""
+    return np.array([
+        [_harmonic_flow_score(a, b, allow_boost) for b in CAMELOT_CODES]
+        for a in CAMELOT_CODES
+    ])
+
+
+# Indexed by allow_energy_boost_mix
+HARMONIC_MATRICES: Dict[bool, np.ndarray] = {
+    True: _build_harmonic_matrix(True),
+    False: _build_harmonic_matrix(False),
+}
+
+# Texture transition score for every (from, to) texture pair
+TEXTURE_MATRIX: np.ndarray = np.array([
+    [texture_transition_score(a, b) for b in TEXTURE_ORDER]
+    for a in TEXTURE_ORDER
+])
+
+
+class TrackPool:
+    """
+    Column-oriented view of a candidate pool.
+    
+    Built once per playlist so that every position scores the whole
+    pool with array operations instead of per-track Python calls.
+    """
+    
+    def __init__(self, tracks: Sequence[CuratorTrack]):
+        self.tracks: List[CuratorTrack] = list(tracks)
+        self.song_ids = np.array([t.song_id for t in self.tracks], dtype=np.int64)
+        self.arousal = np.array([t.arousal_score for t in self.tracks], dtype=float)
+        self.build_up = np.array([t.build_up_potential for t in self.tracks], dtype=float)
+        self.camelot_idx = np.array(
+            [CAMELOT_INDEX.get(t.camelot_code, UNKNOWN_CAMELOT) for t in self.tracks],
+            dtype=np.int64
+        )
+        self.texture_idx = np.array(
+            [TEXTURE_INDEX[t.texture_type] for t in self.tracks], dtype=np.int64
+        )
+        self._rows: Dict[int, int] = {}
+        for row, track in enumerate(self.tracks):
+            self._rows.setdefault(track.song_id, row)
+        
+        # Artists as integer codes (case-insensitive)
+        self._artist_codes: Dict[str, int] = {}
+        self.artist_idx = np.array([
+            self._artist_codes.setdefault(t.artist.lower(), len(self._artist_codes))
+            for t in self.tracks
+        ], dtype=np.int64)
+    
+    def __len__(self) -> int:
+        return len(self.tracks)
+    
+    def row_of(self, song_id: int) -> Optional[int]:
+        """Pool row of a song (None if not in the pool)."""
+        return self._rows.get(song_id)
+    
+    def artist_code(self, artist: str) -> int:
+        """Integer code of an artist (-1 if not in the pool)."""
+        return self._artist_codes.get(artist.lower(), -1)
+    
+    def mask_ids(self, song_ids: Iterable[int]) -> np.ndarray:
+        """Boolean mask of pool rows whose song_id is in ``song_ids``."""
+        ids = np.fromiter(song_ids, dtype=np.int64)
+        if ids.size == 0:
+            return np.zeros(len(self.tracks), dtype=bool)
+        return np.isin(self.song_ids, ids)
+
+
+class RerouteSession:
+    """
+    Per-playlist scoring state kept between skip events.
+    
+    Holds the pool arrays, a mask of rows already placed (or skipped),
+    the running state penalties, and an LRU of state-independent
+    transition scores keyed by (from song, target energy). A skip only
+    refreshes the penalties and re-scores the next few positions.
+    """
+    
+    def __init__(self,
+                 pool: TrackPool,
+                 source: object = None,
+                 max_cached: int = 256):
+        self.pool = pool
+        self.source = source  # The pool object the caller passed in
+        self.used = np.zeros(len(pool), dtype=bool)
+        self.penalties = np.ones(len(pool))
+        self.max_cached = max_cached
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._transitions: "OrderedDict[Tuple[int, float], np.ndarray]" = OrderedDict()
+    
+    def matches(self, pool: object) -> bool:
+        """True if ``pool`` is the pool this session was built for."""
+        return pool is self.pool or pool is self.source
+    
+    def mark(self, track: CuratorTrack, used: bool = True) -> None:
+        """Mark a track as placed (or release it back to the pool)."""
+        row = self.pool.row_of(track.song_id)
+        if row is not None:
+            self.used[row] = used
+    
+    def cached_transitions(self, song_id: int, target_energy: float) -> Optional[np.ndarray]:
+        key = (song_id, float(target_energy))
+        scores = self._transitions.get(key)
+        if scores is None:
+            self.cache_misses += 1
+            return None
+        self._transitions.move_to_end(key)
+        self.cache_hits += 1
+        return scores
+    
+    def store_transitions(self, song_id: int, target_energy: float, scores: np.ndarray) -> None:
+        self._transitions[(song_id, float(target_energy))] = scores
+        while len(self._transitions) > self.max_cached:
+            self._transitions.popitem(last=False)
+
+
+@dataclass
+class _Beam:
+    """A partial playlist kept by the beam-search sequencer."""
+    score: float
+    tracks: List[CuratorTrack]
+    used: np.ndarray  # Boolean mask over pool rows
+
+
 # =============================================================================
 # CURATOR ENGINE
 # =============================================================================
@@ -247,13 +402,117 @@ class CuratorEngine:
         
         return base_score
     
+    def _score_pool(self,
+                    current_track: CuratorTrack,
+                    pool: TrackPool,
+                    target_energy: float,
+                    state: PlaylistState) -> np.ndarray:
+        """
+        Vectorized ``_score_candidate`` over every track in the pool.
+        
+        Same components, weights and penalties, computed as one array
+        expression with Camelot/texture scores looked up from the
+        precomputed transition matrices.
+        """
+        return self._score_transitions([current_track], pool, [target_energy], state)[0]
+    
+    def _score_transitions(self,
+                           current_tracks: Sequence[CuratorTrack],
+                           pool: TrackPool,
+                           target_energies: Sequence[float],
+                           state: PlaylistState) -> np.ndarray:
+        """
+        Score transitions from several current tracks at once.
+        
+        Returns:
+            Array of shape (len(current_tracks), len(pool))
+        """
+        base = self._base_transition_scores(current_tracks, pool, target_energies)
+        return base * self._state_multipliers(pool, state)
+    
+    def _base_transition_scores(self,
+                                current_tracks: Sequence[CuratorTrack],
+                                pool: TrackPool,
+                                target_energies: Sequence[float]) -> np.ndarray:
+        """State-independent part of ``_score_transitions``."""
+        cfg = self.cfg
+        
+        current_arousal = np.array([t.arousal_score for t in current_tracks], dtype=float)
+        current_camelot = np.array(
+            [CAMELOT_INDEX.get(t.camelot_code, UNKNOWN_CAMELOT) for t in current_tracks]
+        )
+        current_texture = np.array([TEXTURE_INDEX[t.texture_type] for t in current_tracks])
+        current_artist = np.array([pool.artist_code(t.artist) for t in current_tracks])
+        targets = np.asarray(target_energies, dtype=float)
+        
+        # === COMPONENT SCORES ===
+        diff = np.abs(pool.arousal[None, :] - targets[:, None])
+        tol = cfg.energy_tolerance
+        energy_score = np.where(
+            diff <= tol,
+            1.0 - (diff / tol) * 0.3,
+            np.maximum(0.1, 0.7 * np.exp(-(diff - tol) / 20.0))
+        )
+        
+        harmonic_score = HARMONIC_MATRICES[cfg.allow_energy_boost_mix][
+            current_camelot[:, None], pool.camelot_idx[None, :]
+        ]
+        
+        energy_jump = (targets - current_arousal)[:, None]
+        texture_score = TEXTURE_MATRIX[current_texture[:, None], pool.texture_idx[None, :]]
+        texture_score = np.where(
+            np.abs(energy_jump) > 30, np.maximum(texture_score, 0.6), texture_score
+        )
+        
+        narrative_score = np.where(
+            energy_jump >= 15,
+            pool.build_up[None, :],
+            np.where(energy_jump <= -15, 1.0 - pool.build_up[None, :], 0.5)
+        )
+        
+        # === WEIGHTED COMBINATION ===
+        scores = (
+            cfg.w_energy_fit * energy_score +
+            cfg.w_harmonic_flow * harmonic_score +
+            cfg.w_texture_smooth * texture_score +
+            cfg.w_narrative_bonus * narrative_score
+        )
+        
+        # Same artist penalty (depends on the current track, not on state)
+        same_artist = pool.artist_idx[None, :] == current_artist[:, None]
+        return np.where(same_artist, scores * (1.0 - cfg.same_artist_penalty), scores)
+    
+    def _state_multipliers(self, pool: TrackPool, state: PlaylistState) -> np.ndarray:
+        """
+        Session penalties per pool track (recent plays, skipped
+        textures, recent skips) as one multiplier vector.
+        """
+        cfg = self.cfg
+        multipliers = np.ones(len(pool))
+        
+        recently_played = pool.mask_ids(state.recent_plays[-5:])
+        multipliers[recently_played] *= (1.0 - cfg.recently_played_penalty)
+        
+        texture_mult = np.array([state.get_texture_multiplier(t) for t in TEXTURE_ORDER])
+        multipliers *= texture_mult[pool.texture_idx]
+        
+        recently_skipped = pool.mask_ids(state.recent_skips)
+        multipliers[recently_skipped] *= 0.3
+        
+        return multipliers
+    
     # =========================================================================
     # CANDIDATE SELECTION
     # =========================================================================
     
+    @staticmethod
+    def _as_pool(pool: Union[List[CuratorTrack], TrackPool]) -> TrackPool:
+        """Wrap a track list as a TrackPool (no-op for TrackPool)."""
+        return pool if isinstance(pool, TrackPool) else TrackPool(pool)
+    
     def _select_next_track(self,
                            current_track: CuratorTrack,
-                           pool: List[CuratorTrack],
+                           pool: Union[List[CuratorTrack], TrackPool],
                            target_energy: float,
                            state: PlaylistState,
                            used_ids: set) -> Optional[CuratorTrack]:
@@ -262,47 +521,152 @@ class CuratorEngine:
         
         Uses weighted scoring + some randomness for variety.
         """
-        # Filter out already used songs
-        candidates = [t for t in pool if t.song_id not in used_ids]
+        pool = self._as_pool(pool)
         
-        if not candidates:
+        # Filter out already used songs
+        available = ~pool.mask_ids(used_ids)
+        if not available.any():
             return None
         
-        # Score all candidates
-        scored = []
-        for candidate in candidates:
-            score = self._score_candidate(
-                current_track, candidate, target_energy, state
-            )
-            scored.append((candidate, score))
-        
-        # Sort by score descending
-        scored.sort(key=lambda x: x[1], reverse=True)
+        # Score all candidates in one pass
+        scores = self._score_pool(current_track, pool, target_energy, state)
+        return self._choose(pool, scores, available)
+    
+    def _choose(self,
+                pool: TrackPool,
+                scores: np.ndarray,
+                available: np.ndarray) -> Optional[CuratorTrack]:
+        """Weighted random pick among the top 5 available tracks."""
+        candidates = np.flatnonzero(available)
+        if candidates.size == 0:
+            return None
+        scores = scores[candidates]
         
-        # Take top candidates and add some randomness
-        top_k = min(5, len(scored))
-        top_candidates = scored[:top_k]
+        # Take top candidates (highest score first, pool order on ties)
+        top_k = min(5, candidates.size)
+        if candidates.size > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(candidates.size)
+        top = top[np.lexsort((top, -scores[top]))]
         
-        if not top_candidates:
-            return None
+        top_tracks = [pool.tracks[i] for i in candidates[top]]
         
         # Weighted random selection from top candidates
         # Squares scores to favor higher scores more
-        weights = [s ** 2 for _, s in top_candidates]
-        total_weight = sum(weights)
+        weights = scores[top] ** 2
+        total_weight = float(weights.sum())
         
         if total_weight == 0:
-            return top_candidates[0][0]
+            return top_tracks[0]
         
         # Weighted selection
         r = random.random() * total_weight
-        cumulative = 0
-        for (track, _), w in zip(top_candidates, weights):
+        cumulative = 0.0
+        for track, w in zip(top_tracks, weights):
             cumulative += w
             if r <= cumulative:
                 return track
         
-        return top_candidates[0][0]
+        return top_tracks[0]
+    
+    # =========================================================================
+    # BEAM-SEARCH SEQUENCING
+    # =========================================================================
+    
+    def _beam_sequence(self,
+                       seed_track: CuratorTrack,
+                       energy_curve: List[float],
+                       pool: TrackPool,
+                       state: PlaylistState) -> List[CuratorTrack]:
+        """
+        Sequence a playlist with beam search over transition scores.
+        
+        Keeps the ``beam_width`` best partial playlists (by summed
+        transition score) and expands each with its ``beam_expansions``
+        best next tracks, so a slightly worse track now can win if it
+        leads to better transitions later. A song is never repeated
+        within a beam. Deterministic for a given
+        pool. Once ``beam_time_budget_ms`` is spent the best beam is
+        finished greedily, bounding the cost.
+        """
+        cfg = self.cfg
+        deadline = time.perf_counter() + cfg.beam_time_budget_ms / 1000.0
+        
+        beams = [_Beam(
+            score=0.0,
+            tracks=[seed_track],
+            used=pool.mask_ids([seed_track.song_id])
+        )]
+        
+        for target_energy in energy_curve:
+            if time.perf_counter() < deadline:
+                width, expansions = cfg.beam_width, cfg.beam_expansions
+            else:
+                width, expansions = 1, 1
+            
+            # Breather targets are per beam (they depend on its last tracks)
+            targets = [
+                self._get_breather_energy(beam.tracks[-1].arousal_score)
+                if self._needs_breather(beam.tracks) else target_energy
+                for beam in beams
+            ]
+            
+            # One (beams x pool) score matrix for the whole step
+            scores = self._score_transitions(
+                [beam.tracks[-1] for beam in beams], pool, targets, state
+            )
+            used = np.stack([beam.used for beam in beams])
+            scores = np.where(used, -np.inf, scores)
+            
+            expanded: List[Tuple[float, int, int]] = []
+            for beam_idx, beam in enumerate(beams):
+                k = min(expansions, len(pool) - int(used[beam_idx].sum()))
+                if k <= 0:
+                    continue
+                
+                row_scores = scores[beam_idx]
+                top = np.argpartition(-row_scores, k - 1)[:k]
+                expanded.extend(
+                    (beam.score + float(row_scores[row]), beam_idx, int(row)) for row in top
+                )
+            
+            if not expanded:
+                # Pool exhausted
+                break
+            
+            expanded.sort(key=lambda x: (-x[0], x[1], x[2]))
+            
+            next_beams = []
+            for score, beam_idx, row in expanded[:width]:
+                parent = beams[beam_idx]
+                # Exclude every row of this song, so duplicate pool
+                # entries cannot repeat it later in the beam
+                used = parent.used | (pool.song_ids == pool.song_ids[row])
+                next_beams.append(_Beam(
+                    score=score,
+                    tracks=parent.tracks + [pool.tracks[row]],
+                    used=used
+                ))
+            beams = next_beams
+        
+        return max(beams, key=lambda b: b.score).tracks
+    
+    def sequence_score(self,
+                       playlist: List[CuratorTrack],
+                       energy_curve: List[float],
+                       state: Optional[PlaylistState] = None) -> float:
+        """
+        Total transition score of a playlist against an energy curve.
+        
+        Sums ``_score_candidate`` over consecutive pairs, which is the
+        objective the beam-search sequencer maximizes (breathers aside).
+        """
+        state = state or PlaylistState(energy_curve=energy_curve)
+        return sum(
+            self._score_candidate(prev, nxt, target, state)
+            for prev, nxt, target in zip(playlist, playlist[1:], energy_curve)
+        )
     
     # =========================================================================
     # BREATHER TRACK LOGIC
@@ -338,10 +702,15 @@ class CuratorEngine:
     def generate_playlist(self,
                           seed_track: CuratorTrack,
                           energy_curve: List[float],
-                          pool: List[CuratorTrack]) -> List[CuratorTrack]:
+                          pool: Union[List[CuratorTrack], TrackPool]) -> List[CuratorTrack]:
         """
         Generate a playlist following the energy curve.
         
+        The playlist is sequenced by beam search (``beam_width`` 4 by
+        default, finished greedily once ``beam_time_budget_ms`` is spent).
+        With ``beam_width <= 1`` each position samples from the top 5
+        candidates instead.
+        
         Args:
             seed_track: Starting track
             energy_curve: Target energy for each position [e1, e2, e3, ...]
@@ -350,10 +719,17 @@ class CuratorEngine:
         Returns:
             Ordered playlist of CuratorTracks
         """
-        if not energy_curve or not pool:
+        if not energy_curve or not len(pool):
             return [seed_track]
         
-        # Initialize
+        # Pool arrays are built once and reused for every position
+        pool = self._as_pool(pool)
+        
+        if self.cfg.beam_width > 1:
+            state = PlaylistState(energy_curve=energy_curve)
+            return self._beam_sequence(seed_track, energy_curve, pool, state)
+        
+        # Initialize (greedy sampling)
         playlist = [seed_track]
         used_ids = {seed_track.song_id}
         state = PlaylistState(
@@ -392,12 +768,16 @@ class CuratorEngine:
     
     def handle_skip(self,
                     state: PlaylistState,
-                    pool: List[CuratorTrack]) -> Optional[CuratorTrack]:
+                    pool: Union[List[CuratorTrack], TrackPool]) -> Optional[CuratorTrack]:
         """
         Handle a skip event and re-route.
         
         Called when user skips the current track.
         Returns the replacement track.
+        
+        Scoring state is kept on ``state`` between calls (see
+        RerouteSession): a skip refreshes the running penalties once and
+        re-scores a single position, reusing cached transition scores.
         """
         skipped_track = state.current_track
         if skipped_track is None:
@@ -420,29 +800,32 @@ class CuratorEngine:
             prev_track = state.tracks[prev_idx]
         
         # Find replacement with updated preferences
-        used_ids = {t.song_id for t in state.tracks}
-        replacement = self._select_next_track(
-            prev_track,
-            pool,
-            remaining_curve[0],
-            state,
-            used_ids
-        )
+        session = self._session_for(state, pool)
+        session.penalties = self._state_multipliers(session.pool, state)
+        replacement = self._session_select(session, prev_track, remaining_curve[0])
         
         if replacement:
-            # Hot-swap in playlist
+            # Hot-swap in playlist (the skipped track stays excluded)
+            session.mark(replacement)
             state.tracks[state.current_index] = replacement
         
         return replacement
     
     def reroute_upcoming(self,
                          state: PlaylistState,
-                         pool: List[CuratorTrack],
+                         pool: Union[List[CuratorTrack], TrackPool],
                          lookahead: int = 3) -> List[CuratorTrack]:
         """
         Re-route the next N tracks based on current preferences.
         
-        Called after a skip to rebuild the upcoming segment.
+        Called after a skip to rebuild the upcoming segment. The next
+        ``lookahead`` positions are re-planned and the rest of the
+        planned tail is kept, so the playlist keeps its length. The new
+        segment excludes played, skipped and kept tracks, and the cost
+        is bounded by the lookahead rather than the playlist length.
+        
+        Returns:
+            The re-planned segment
         """
         if state.current_track is None:
             return []
@@ -451,32 +834,81 @@ class CuratorEngine:
         if len(remaining_curve) <= 1:
             return []
         
-        # Rebuild next N tracks
-        current = state.current_track
-        used_ids = {t.song_id for t in state.tracks[:state.current_index + 1]}
+        session = self._session_for(state, pool)
+        session.penalties = self._state_multipliers(session.pool, state)
+        
+        # Release the next positions back to the pool; the kept tail
+        # stays marked as used
+        start_idx = state.current_index + 1
+        end_idx = start_idx + min(lookahead, len(remaining_curve) - 1)
+        kept_tail = state.tracks[end_idx:]
+        for track in state.tracks[start_idx:end_idx]:
+            session.mark(track, used=False)
+        del state.tracks[start_idx:]
+        
+        new_segment = self._extend_plan(session, state, end_idx)
+        state.tracks.extend(kept_tail)
+        return new_segment
+    
+    def plan_ahead(self,
+                   state: PlaylistState,
+                   pool: Union[List[CuratorTrack], TrackPool],
+                   lookahead: int = 3) -> List[CuratorTrack]:
+        """
+        Lazily extend the playlist to ``lookahead`` tracks past the
+        current one (no-op if they are already planned).
+        
+        Returns:
+            Newly planned tracks
+        """
+        session = self._session_for(state, pool)
+        return self._extend_plan(session, state, state.current_index + 1 + lookahead)
+    
+    def _session_for(self,
+                     state: PlaylistState,
+                     pool: Union[List[CuratorTrack], TrackPool]) -> RerouteSession:
+        """Get the state's re-routing session, building it on first use."""
+        session = state.reroute_session
+        if session is None or not session.matches(pool):
+            session = RerouteSession(self._as_pool(pool), source=pool)
+            for track in state.tracks:
+                session.mark(track)
+            for song_id in state.recent_skips:
+                row = session.pool.row_of(song_id)
+                if row is not None:
+                    session.used[row] = True
+            session.penalties = self._state_multipliers(session.pool, state)
+            state.reroute_session = session
+        return session
+    
+    def _session_select(self,
+                        session: RerouteSession,
+                        from_track: CuratorTrack,
+                        target_energy: float) -> Optional[CuratorTrack]:
+        """Pick the next track using cached transition scores."""
+        base = session.cached_transitions(from_track.song_id, target_energy)
+        if base is None:
+            base = self._base_transition_scores([from_track], session.pool, [target_energy])[0]
+            session.store_transitions(from_track.song_id, target_energy, base)
+        return self._choose(session.pool, base * session.penalties, ~session.used)
+    
+    def _extend_plan(self,
+                     session: RerouteSession,
+                     state: PlaylistState,
+                     end_index: int) -> List[CuratorTrack]:
+        """Plan positions up to (excluding) ``end_index``."""
+        end_index = min(end_index, len(state.energy_curve))
         
         new_segment = []
-        for i in range(min(lookahead, len(remaining_curve) - 1)):
-            target = remaining_curve[i + 1] if i + 1 < len(remaining_curve) else remaining_curve[-1]
-            
-            next_track = self._select_next_track(
-                current, pool, target, state, used_ids
-            )
-            
+        while len(state.tracks) < end_index and state.tracks:
+            target = state.energy_curve[len(state.tracks)]
+            next_track = self._session_select(session, state.tracks[-1], target)
             if next_track is None:
                 break
             
+            session.mark(next_track)
+            state.tracks.append(next_track)
             new_segment.append(next_track)
-            used_ids.add(next_track.song_id)
-            current = next_track
-        
-        # Replace upcoming segment in playlist
-        start_idx = state.current_index + 1
-        for i, track in enumerate(new_segment):
-            if start_idx + i < len(state.tracks):
-                state.tracks[start_idx + i] = track
-            else:
-                state.tracks.append(track)
         
         return new_segment
 
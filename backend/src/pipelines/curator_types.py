@@ -478,6 +478,9 @@ class PlaylistState:
     energy_curve: List[float] = field(default_factory=list)
     target_mood: str = "happy"
     
+    # Incremental re-routing state (CuratorEngine.RerouteSession)
+    reroute_session: Optional[Any] = field(default=None, repr=False, compare=False)
+    
     def __post_init__(self):
         """Initialize texture preferences with neutral values."""
         if not self.texture_preferences:
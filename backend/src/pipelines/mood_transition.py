@@ -1,15 +1,25 @@
 """
 Mood transition suggestion engine.
 Provides smooth mood transitions and journey recommendations.
+
+Transition paths over the (tiny) mood graph are precomputed for every
+pair at construction, so path finding is a table lookup. Song scoring
+for transition steps runs over a per-catalog feature table, and each
+step's ranked candidate pool is cached on that table.
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple, Any
 from enum import Enum
 import logging
+import threading
+
+import numpy as np
 
+from backend.repositories import get_catalog_generation
 from backend.src.services.constants import MOODS, MOOD_EN_TO_VI, MOOD_EMOJI
 
 logger = logging.getLogger(__name__)
@@ -58,6 +68,37 @@ class TransitionPath:
         }
 
 
+# Song features scored against transition step targets
+STEP_FEATURES: Tuple[str, ...] = ("energy", "happiness", "danceability", "tempo")
+
+
+@dataclass
+class CatalogFeatures:
+    """Column view of a song list for vectorized step scoring."""
+    songs: List[Dict]
+    size: int
+    song_ids: List[Any]
+    moods: np.ndarray
+    features: Dict[str, np.ndarray]  # NaN where missing
+    step_pools: Dict[Tuple, np.ndarray] = field(default_factory=dict)
+    
+    @classmethod
+    def from_songs(cls, songs: List[Dict]) -> "CatalogFeatures":
+        def column(name: str) -> np.ndarray:
+            return np.array(
+                [np.nan if s.get(name) is None else float(s[name]) for s in songs],
+                dtype=np.float64
+            )
+        
+        return cls(
+            songs=songs,
+            size=len(songs),
+            song_ids=[s.get("song_id") for s in songs],
+            moods=np.array([s.get("mood") for s in songs], dtype=object),
+            features={name: column(name) for name in STEP_FEATURES},
+        )
+
+
 class MoodTransitionEngine:
     """
     Engine for suggesting smooth mood transitions.
@@ -93,8 +134,43 @@ class MoodTransitionEngine:
         3: {"energy": 80, "tempo": 130, "loudness": -4},   # High
     }
     
+    # Songs kept per cached step pool (grown on demand)
+    STEP_POOL_SIZE = 64
+    MAX_CATALOGS = 4
+    
     def __init__(self):
-        self._path_cache: Dict[Tuple[str, str], List[str]] = {}
+        self._paths = self._all_pairs_paths()
+        self._catalogs: "OrderedDict[Tuple[int, int], CatalogFeatures]" = OrderedDict()
+        self._catalogs_lock = threading.Lock()
+    
+    @classmethod
+    def _all_pairs_paths(cls) -> Dict[Tuple[str, str], Tuple[str, ...]]:
+        """
+        Shortest natural path for every mood pair.
+        
+        One BFS per source over NATURAL_TRANSITIONS (unweighted graph),
+        visiting neighbours in declaration order.
+        """
+        paths: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        
+        for source in cls.NATURAL_TRANSITIONS:
+            parents: Dict[str, Optional[str]] = {source: None}
+            queue = deque([source])
+            
+            while queue:
+                current = queue.popleft()
+                for neighbor in cls.NATURAL_TRANSITIONS.get(current, []):
+                    if neighbor not in parents:
+                        parents[neighbor] = current
+                        queue.append(neighbor)
+            
+            for target in parents:
+                path = [target]
+                while parents[path[-1]] is not None:
+                    path.append(parents[path[-1]])
+                paths[(source, target)] = tuple(reversed(path))
+        
+        return paths
     
     def _mood_distance(self, mood1: str, mood2: str) -> float:
         """Calculate distance between two moods in VA space."""
@@ -109,35 +185,16 @@ class MoodTransitionEngine:
         target: str,
         max_depth: int = 5
     ) -> Optional[List[str]]:
-        """Find shortest natural transition path using BFS."""
+        """Shortest natural transition path (precomputed table lookup)."""
         if source == target:
             return [source]
         
-        cache_key = (source, target)
-        if cache_key in self._path_cache:
-            return self._path_cache[cache_key]
+        path = self._paths.get((source, target))
+        if path is None or len(path) > max_depth + 1:
+            # No natural path found, use direct transition
+            return [source, target]
         
-        visited = {source}
-        queue = [(source, [source])]
-        
-        while queue:
-            current, path = queue.pop(0)
-            
-            if len(path) > max_depth:
-                continue
-            
-            for neighbor in self.NATURAL_TRANSITIONS.get(current, []):
-                if neighbor == target:
-                    result = path + [target]
-                    self._path_cache[cache_key] = result
-                    return result
-                
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    queue.append((neighbor, path + [neighbor]))
-        
-        # No natural path found, use direct transition
-        return [source, target]
+        return list(path)
     
     def _interpolate_features(
         self,
@@ -275,42 +332,98 @@ class MoodTransitionEngine:
             Ordered list of songs for the transition
         """
         path = self.calculate_transition(source_mood, target_mood, speed)
+        catalog = self._catalog_features(all_songs)
         playlist = []
+        added_ids = set()
         
         for step in path.steps:
-            target_features = step.feature_targets
-            step_mood = step.mood
-            
-            # Find best matching songs
-            candidates = []
-            for song in all_songs:
-                if song.get("song_id") in [s.get("song_id") for s in playlist]:
-                    continue  # Skip already added
-                
-                # Calculate match score
-                score = 0.0
-                
-                # Mood match bonus
-                if song.get("mood") == step_mood:
-                    score += 50
-                
-                # Feature matching
-                for feature, target in target_features.items():
-                    song_val = song.get(feature)
-                    if song_val is not None:
-                        diff = abs(float(song_val) - target)
-                        score += max(0, 25 - diff * 0.3)
-                
-                candidates.append((song, score))
-            
-            # Sort by score and take best
-            candidates.sort(key=lambda x: x[1], reverse=True)
-            for song, _ in candidates[:songs_per_step]:
-                song_with_step = {**song, "transition_step": step.description}
-                playlist.append(song_with_step)
+            picked = self._pick_step_songs(catalog, step, songs_per_step, added_ids)
+            for row in picked:
+                added_ids.add(catalog.song_ids[row])
+                playlist.append({**catalog.songs[row], "transition_step": step.description})
         
         return playlist
     
+    def _catalog_features(self, all_songs: List[Dict]) -> CatalogFeatures:
+        """
+        Feature table for a song list.
+        
+        Cached per catalog generation and song id sequence, so tables are
+        rebuilt after song writes and distinct song lists never collide.
+        The engine is shared across request threads, so the cache is
+        guarded by a lock; tables are built outside it.
+        """
+        generation = get_catalog_generation()
+        key = (generation, hash(tuple(s.get("song_id") for s in all_songs)))
+        with self._catalogs_lock:
+            catalog = self._catalogs.get(key)
+            if catalog is not None:
+                self._catalogs.move_to_end(key)
+                return catalog
+        
+        # Concurrent duplicate builds are harmless
+        catalog = CatalogFeatures.from_songs(all_songs)
+        
+        with self._catalogs_lock:
+            for stale in [k for k in self._catalogs if k[0] != generation]:
+                del self._catalogs[stale]
+            self._catalogs[key] = catalog
+            while len(self._catalogs) > self.MAX_CATALOGS:
+                self._catalogs.popitem(last=False)
+        return catalog
+    
+    def _score_step(self, catalog: CatalogFeatures, step: MoodTransition) -> np.ndarray:
+        """Match score of every song for a transition step."""
+        scores = np.where(catalog.moods == step.mood, 50.0, 0.0)
+        
+        for feature, target in step.feature_targets.items():
+            values = catalog.features.get(feature)
+            if values is None:
+                continue
+            feature_score = np.maximum(0.0, 25 - np.abs(values - target) * 0.3)
+            scores += np.where(np.isnan(values), 0.0, feature_score)
+        
+        return scores
+    
+    def _step_pool(self, catalog: CatalogFeatures, step: MoodTransition, size: int) -> np.ndarray:
+        """Best ``size`` rows for a step, highest score first (ties by row)."""
+        key = (step.mood, tuple(sorted(step.feature_targets.items())))
+        pool = catalog.step_pools.get(key)
+        if pool is not None and (len(pool) >= size or len(pool) == catalog.size):
+            return pool
+        
+        scores = self._score_step(catalog, step)
+        size = min(catalog.size, max(size, self.STEP_POOL_SIZE))
+        if size == 0:
+            pool = np.empty(0, dtype=np.int64)
+        else:
+            # Keep every row tied with the cut-off so row order breaks ties
+            cutoff = np.partition(-scores, size - 1)[size - 1]
+            rows = np.flatnonzero(-scores <= cutoff)
+            pool = rows[np.lexsort((rows, -scores[rows]))][:size]
+        
+        catalog.step_pools[key] = pool
+        return pool
+    
+    def _pick_step_songs(
+        self,
+        catalog: CatalogFeatures,
+        step: MoodTransition,
+        count: int,
+        exclude_ids: set
+    ) -> List[int]:
+        """Top ``count`` rows for a step, skipping songs already added."""
+        size = count + len(exclude_ids)
+        while True:
+            pool = self._step_pool(catalog, step, size)
+            picked = [
+                row for row in pool.tolist()
+                if catalog.song_ids[row] not in exclude_ids
+            ][:count]
+            if len(picked) == count or len(pool) == catalog.size:
+                return picked
+            size = catalog.size  # Duplicate ids used up the pool
+    
     def suggest_next_mood(
         self,
         current_mood: str,
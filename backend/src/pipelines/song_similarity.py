@@ -1,16 +1,26 @@
 """
 Song similarity engine using audio features and mood analysis.
 Provides related songs and "more like this" recommendations.
+
+For catalog-wide lookups the engine keeps a SongFeatureIndex: the
+normalized, weighted feature matrix of every song plus an id -> row map,
+built once per catalog generation. Scoring a target against the whole
+catalog is then a handful of array operations instead of one
+``calculate_similarity`` call per song.
 """
 
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple, Any
-import math
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
 import logging
+import threading
+
+import numpy as np
 
 from backend.src.services.constants import Song, MOODS
+from backend.src.ranking.clustering import minibatch_kmeans
+from backend.src.ranking.diversity import mmr_select
 
 logger = logging.getLogger(__name__)
 
@@ -65,6 +75,43 @@ class SimilarityResult:
         }
 
 
+# Numeric features in matrix column order
+FEATURE_COLUMNS: Tuple[str, ...] = (
+    "energy", "happiness", "danceability", "acousticness", "tempo", "loudness"
+)
+
+
+@dataclass
+class SongFeatureIndex:
+    """
+    Catalog feature matrix for vectorized similarity.
+    
+    - ``features``: (n, 6) normalized numeric features scaled by their
+      weights, so the weighted L1 term is one row-wise reduction
+    - ``mood_idx``: per-song index into ``moods`` (raw mood values)
+    - ``genres``: (n, vocab) binary genre-token matrix for Jaccard
+    """
+    generation: Hashable
+    songs: List[Song]
+    song_ids: np.ndarray
+    rows: Dict[int, int]
+    features: np.ndarray
+    weights: np.ndarray
+    moods: List[Optional[str]]
+    mood_idx: np.ndarray
+    genre_vocab: Dict[str, int]
+    genres: np.ndarray
+    genre_sizes: np.ndarray
+    artists: np.ndarray  # Lower-cased artist names
+    
+    def __len__(self) -> int:
+        return len(self.songs)
+    
+    def get_song(self, song_id: int) -> Optional[Song]:
+        row = self.rows.get(song_id)
+        return self.songs[row] if row is not None else None
+
+
 class SongSimilarityEngine:
     """
     Engine for calculating song similarity based on audio features.
@@ -79,6 +126,8 @@ class SongSimilarityEngine:
     def __init__(self, config: Optional[SimilarityConfig] = None):
         self.config = config or SimilarityConfig()
         self._feature_cache: Dict[int, Dict[str, float]] = {}
+        self._index: Optional[SongFeatureIndex] = None
+        self._index_lock = threading.Lock()
     
     def _normalize(self, value: Optional[float], min_val: float, max_val: float) -> float:
         """Normalize value to 0-1 range."""
@@ -221,156 +270,291 @@ class SongSimilarityEngine:
             genre_match=(genre_sim >= 0.5)
         )
     
+    # ==================== FEATURE INDEX ====================
+    
+    @property
+    def index(self) -> Optional[SongFeatureIndex]:
+        """Current catalog index (None until built)."""
+        return self._index
+    
+    def build_index(
+        self,
+        songs: List[Song],
+        generation: Hashable = None
+    ) -> SongFeatureIndex:
+        """Build a feature index over ``songs`` (does not replace the catalog index)."""
+        cfg = self.config
+        weights = np.array([
+            cfg.w_energy, cfg.w_happiness, cfg.w_danceability,
+            cfg.w_acousticness, cfg.w_tempo, cfg.w_loudness
+        ])
+        
+        features = np.empty((len(songs), len(FEATURE_COLUMNS)))
+        for row, song in enumerate(songs):
+            feats = self._extract_features(song)
+            features[row] = [feats[name] for name in FEATURE_COLUMNS]
+        
+        moods: List[Optional[str]] = []
+        mood_codes: Dict[Optional[str], int] = {}
+        mood_idx = np.empty(len(songs), dtype=np.int64)
+        for row, song in enumerate(songs):
+            mood = song.get("mood")
+            if mood not in mood_codes:
+                mood_codes[mood] = len(moods)
+                moods.append(mood)
+            mood_idx[row] = mood_codes[mood]
+        
+        song_tokens = [self._tokenize_genre(song.get("genre")) for song in songs]
+        vocab: Dict[str, int] = {}
+        for tokens in song_tokens:
+            for token in tokens:
+                vocab.setdefault(token, len(vocab))
+        genres = np.zeros((len(songs), len(vocab)), dtype=np.float32)
+        for row, tokens in enumerate(song_tokens):
+            for token in tokens:
+                genres[row, vocab[token]] = 1.0
+        
+        song_ids = np.array([song.get("song_id") or 0 for song in songs], dtype=np.int64)
+        rows: Dict[int, int] = {}
+        for row, song_id in enumerate(song_ids.tolist()):
+            rows.setdefault(song_id, row)
+        
+        return SongFeatureIndex(
+            generation=generation,
+            songs=list(songs),
+            song_ids=song_ids,
+            rows=rows,
+            features=features * weights,
+            weights=weights,
+            moods=moods,
+            mood_idx=mood_idx,
+            genre_vocab=vocab,
+            genres=genres,
+            genre_sizes=genres.sum(axis=1),
+            artists=np.array([(song.get("artist") or "").lower() for song in songs], dtype=object),
+        )
+    
+    def ensure_index(
+        self,
+        generation: Hashable,
+        loader: Callable[[], List[Song]]
+    ) -> SongFeatureIndex:
+        """
+        Get the catalog index for ``generation``, rebuilding it with
+        ``loader()`` only when the generation changed.
+        """
+        index = self._index
+        if index is not None and index.generation == generation:
+            return index
+        
+        with self._index_lock:
+            if self._index is None or self._index.generation != generation:
+                self._feature_cache.clear()
+                self._index = self.build_index(loader(), generation)
+                logger.info(f"Built similarity index for {len(self._index)} songs")
+            return self._index
+    
+    def score_against_index(
+        self,
+        target_song: Song,
+        index: SongFeatureIndex
+    ) -> np.ndarray:
+        """Similarity of ``target_song`` to every indexed song (vectorized)."""
+        cfg = self.config
+        
+        feats = self._extract_features(target_song)
+        target = np.array([feats[name] for name in FEATURE_COLUMNS]) * index.weights
+        numeric = index.weights.sum() - np.abs(index.features - target).sum(axis=1)
+        
+        target_mood = target_song.get("mood")
+        mood_row = np.array([self._mood_similarity(target_mood, m) for m in index.moods])
+        mood_sim = mood_row[index.mood_idx] if len(index.moods) else np.zeros(0)
+        
+        target_tokens = self._tokenize_genre(target_song.get("genre"))
+        if target_tokens and index.genres.shape[1]:
+            target_vec = np.zeros(index.genres.shape[1], dtype=np.float32)
+            for token in target_tokens:
+                col = index.genre_vocab.get(token)
+                if col is not None:
+                    target_vec[col] = 1.0
+            intersection = index.genres @ target_vec
+            union = index.genre_sizes + len(target_tokens) - intersection
+            with np.errstate(divide="ignore", invalid="ignore"):
+                genre_sim = np.where(union > 0, intersection / union, 0.0)
+            genre_sim = np.where(index.genre_sizes > 0, genre_sim, 0.5)
+        else:
+            genre_sim = np.full(len(index), 0.5)
+        
+        return numeric + cfg.w_mood * mood_sim + cfg.w_genre * genre_sim
+    
+    def score_rows_against_index(
+        self,
+        index: SongFeatureIndex,
+        rows: np.ndarray
+    ) -> np.ndarray:
+        """
+        Similarity of the indexed songs at ``rows`` to every indexed song.
+        
+        Returns a (len(rows), len(index)) matrix; row i equals
+        ``score_against_index(index.songs[rows[i]], index)``.
+        """
+        cfg = self.config
+        rows = np.asarray(rows, dtype=np.int64)
+        
+        block = index.features[rows]
+        numeric = np.full((rows.size, len(index)), index.weights.sum())
+        for col in range(block.shape[1]):
+            numeric -= np.abs(block[:, col, None] - index.features[None, :, col])
+        
+        mood_matrix = np.array([
+            [self._mood_similarity(a, b) for b in index.moods] for a in index.moods
+        ]).reshape(len(index.moods), len(index.moods))
+        mood_sim = mood_matrix[index.mood_idx[rows, None], index.mood_idx[None, :]]
+        
+        sizes = index.genre_sizes
+        intersection = index.genres[rows] @ index.genres.T
+        union = sizes[rows, None] + sizes[None, :] - intersection
+        with np.errstate(divide="ignore", invalid="ignore"):
+            genre_sim = np.where(union > 0, intersection / union, 0.0)
+        missing = (sizes[rows, None] == 0) | (sizes[None, :] == 0)
+        genre_sim = np.where(missing, 0.5, genre_sim)
+        
+        return numeric + cfg.w_mood * mood_sim + cfg.w_genre * genre_sim
+    
+    def _resolve_index(
+        self,
+        candidates: Optional[List[Song]]
+    ) -> Optional[SongFeatureIndex]:
+        """Catalog index for ``None``/catalog songs, else a temporary index."""
+        if candidates is None:
+            return self._index
+        if self._index is not None and candidates is self._index.songs:
+            return self._index
+        return self.build_index(candidates)
+    
+    def _top_similar(
+        self,
+        target_song: Song,
+        index: SongFeatureIndex,
+        top_k: int,
+        exclude_same_artist: bool,
+        min_similarity: float
+    ) -> List[SimilarityResult]:
+        """Top-k most similar indexed songs, highest score first."""
+        if not len(index) or top_k <= 0:
+            return []
+        
+        scores = self.score_against_index(target_song, index)
+        
+        eligible = index.song_ids != (target_song.get("song_id") or 0)
+        if exclude_same_artist:
+            eligible &= index.artists != (target_song.get("artist") or "").lower()
+        eligible &= scores >= min_similarity
+        
+        rows = np.flatnonzero(eligible)
+        if rows.size > top_k:
+            rows = rows[np.argpartition(-scores[rows], top_k - 1)[:top_k]]
+        rows = rows[np.lexsort((rows, -scores[rows]))]
+        
+        # Per-feature breakdown only for the returned songs
+        return [self.calculate_similarity(target_song, index.songs[row]) for row in rows]
+    
     def find_similar_songs(
         self,
         target_song: Song,
-        candidates: List[Song],
+        candidates: Optional[List[Song]] = None,
         top_k: int = 10,
         exclude_same_artist: bool = False,
         min_similarity: float = 0.0
     ) -> List[SimilarityResult]:
-        """Find songs most similar to target."""
-        target_id = target_song.get("song_id")
-        target_artist = target_song.get("artist", "").lower()
-        
-        results = []
-        for song in candidates:
-            # Skip self
-            if song.get("song_id") == target_id:
-                continue
-            
-            # Skip same artist if requested
-            if exclude_same_artist:
-                if song.get("artist", "").lower() == target_artist:
-                    continue
-            
-            result = self.calculate_similarity(target_song, song)
-            
-            if result.similarity_score >= min_similarity:
-                results.append(result)
+        """
+        Find songs most similar to target.
         
-        # Sort by similarity descending
-        results.sort(key=lambda r: r.similarity_score, reverse=True)
+        With ``candidates=None`` the catalog index (see ``ensure_index``)
+        is searched; otherwise a temporary index is built over the
+        candidates.
+        """
+        index = self._resolve_index(candidates)
+        if index is None:
+            return []
         
-        return results[:top_k]
+        return self._top_similar(
+            target_song, index, top_k, exclude_same_artist, min_similarity
+        )
     
     def find_diverse_similar(
         self,
         target_song: Song,
-        candidates: List[Song],
+        candidates: Optional[List[Song]] = None,
         top_k: int = 10,
         diversity_weight: float = 0.3
     ) -> List[SimilarityResult]:
         """
         Find similar songs with diversity.
-        Uses greedy MMR-like selection to balance similarity and diversity.
-        """
-        target_id = target_song.get("song_id")
         
-        # Calculate all similarities
-        all_results = []
-        for song in candidates:
-            if song.get("song_id") == target_id:
-                continue
-            result = self.calculate_similarity(target_song, song)
-            all_results.append(result)
-        
-        if not all_results:
+        Greedy MMR selection (see ``mmr_select``): each pick adds one
+        vectorized similarity column to the running max-similarity
+        vector instead of re-scoring every candidate against every
+        selected song.
+        """
+        index = self._resolve_index(candidates)
+        if index is None or not len(index) or top_k <= 0:
             return []
         
-        # Greedy selection with diversity
-        selected: List[SimilarityResult] = []
-        remaining = all_results.copy()
-        
-        # First pick: most similar
-        remaining.sort(key=lambda r: r.similarity_score, reverse=True)
-        selected.append(remaining.pop(0))
+        scores = self.score_against_index(target_song, index)
+        rows = np.flatnonzero(index.song_ids != (target_song.get("song_id") or 0))
+        if not rows.size:
+            return []
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
         
-        while len(selected) < top_k and remaining:
-            best_score = -1
-            best_idx = 0
-            
-            for i, candidate in enumerate(remaining):
-                # Similarity to target
-                sim_to_target = candidate.similarity_score
-                
-                # Max similarity to already selected (penalize)
-                max_sim_to_selected = 0.0
-                for sel in selected:
-                    pair_sim = self.calculate_similarity(
-                        candidate.song, sel.song
-                    ).similarity_score
-                    max_sim_to_selected = max(max_sim_to_selected, pair_sim)
-                
-                # MMR score: balance similarity and diversity
-                mmr_score = (
-                    (1 - diversity_weight) * sim_to_target -
-                    diversity_weight * max_sim_to_selected
-                )
-                
-                if mmr_score > best_score:
-                    best_score = mmr_score
-                    best_idx = i
-            
-            selected.append(remaining.pop(best_idx))
+        def similarity_to(i: int) -> np.ndarray:
+            return self.score_against_index(index.songs[rows[i]], index)[rows]
         
-        return selected
+        picks = mmr_select(scores[rows], similarity_to, top_k, diversity_weight)
+        return [self.calculate_similarity(target_song, index.songs[rows[i]]) for i in picks]
     
     def cluster_by_similarity(
         self,
         songs: List[Song],
-        n_clusters: int = 5
+        n_clusters: int = 5,
+        seed: int = 42
     ) -> Dict[int, List[Song]]:
         """
-        Simple clustering based on similarity.
-        Uses iterative closest assignment.
+        Cluster songs with mini-batch k-means on the feature matrix.
+        
+        Rows are the weighted numeric features plus weighted mood and
+        genre indicators (see ``clustering_matrix``).
         """
         if len(songs) < n_clusters:
             return {0: songs}
         
-        # Initialize centroids with diverse songs
-        import random
-        centroids_idx = [random.randint(0, len(songs) - 1)]
+        index = self._resolve_index(songs)
+        result = minibatch_kmeans(self.clustering_matrix(index), n_clusters, seed=seed)
         
-        while len(centroids_idx) < n_clusters:
-            # Find song most different from current centroids
-            max_min_dist = -1
-            best_idx = 0
-            
-            for i, song in enumerate(songs):
-                if i in centroids_idx:
-                    continue
-                
-                min_sim = 1.0
-                for c_idx in centroids_idx:
-                    sim = self.calculate_similarity(song, songs[c_idx]).similarity_score
-                    min_sim = min(min_sim, sim)
-                
-                # We want max of min distances (most different)
-                dist = 1 - min_sim
-                if dist > max_min_dist:
-                    max_min_dist = dist
-                    best_idx = i
-            
-            centroids_idx.append(best_idx)
-        
-        # Assign songs to clusters
         clusters: Dict[int, List[Song]] = {i: [] for i in range(n_clusters)}
-        
-        for song in songs:
-            best_cluster = 0
-            best_sim = -1
-            
-            for c_id, c_idx in enumerate(centroids_idx):
-                sim = self.calculate_similarity(song, songs[c_idx]).similarity_score
-                if sim > best_sim:
-                    best_sim = sim
-                    best_cluster = c_id
-            
-            clusters[best_cluster].append(song)
+        for song, label in zip(index.songs, result.labels.tolist()):
+            clusters[label].append(song)
         
         return clusters
     
+    def clustering_matrix(self, index: SongFeatureIndex) -> np.ndarray:
+        """
+        Euclidean embedding of indexed songs for k-means.
+        
+        Weighted numeric features, a mood one-hot scaled by ``w_mood``
+        and L2-normalized genre tokens scaled by ``w_genre``.
+        """
+        cfg = self.config
+        moods = np.zeros((len(index), len(index.moods)))
+        moods[np.arange(len(index)), index.mood_idx] = cfg.w_mood
+        
+        norms = np.sqrt(index.genre_sizes)[:, None]
+        genres = np.divide(
+            index.genres, norms, out=np.zeros(index.genres.shape), where=norms > 0
+        ) * cfg.w_genre
+        
+        return np.hstack([index.features, moods, genres])
+    
     def get_feature_distribution(self, songs: List[Song]) -> Dict[str, Dict[str, float]]:
         """Analyze feature distribution of a song set."""
         if not songs:
@@ -416,26 +600,44 @@ def find_similar(
     return [r.to_dict() for r in results]
 
 
+def get_catalog_index(
+    db_path: str,
+    engine: Optional[SongSimilarityEngine] = None
+) -> SongFeatureIndex:
+    """
+    Get the similarity index for the songs table.
+    
+    The catalog is only re-read when its generation changes: the
+    in-process catalog generation (advanced by song writes) plus the
+    table's row count and max id, which also catches inserts made by
+    other processes.
+    """
+    from backend.src.repo.song_repo import connect, fetch_songs, fetch_catalog_fingerprint
+    from backend.repositories import get_catalog_generation
+    
+    engine = engine or get_similarity_engine()
+    con = connect(db_path)
+    try:
+        generation = (db_path, get_catalog_generation()) + fetch_catalog_fingerprint(con)
+        return engine.ensure_index(generation, lambda: fetch_songs(con))
+    finally:
+        con.close()
+
+
 def get_song_neighbors(
     song_id: int,
     db_path: str,
     top_k: int = 5
 ) -> List[Dict[str, Any]]:
     """Get similar songs from database."""
-    from backend.src.repo.song_repo import connect, fetch_songs, fetch_song_by_id
-    
-    con = connect(db_path)
-    target = fetch_song_by_id(con, song_id)
+    engine = get_similarity_engine()
+    index = get_catalog_index(db_path, engine)
+    target = index.get_song(song_id)
     
     if not target:
-        con.close()
         return []
     
-    all_songs = fetch_songs(con)
-    con.close()
-    
-    engine = SongSimilarityEngine()
-    results = engine.find_similar_songs(target, all_songs, top_k)
+    results = engine.find_similar_songs(target, None, top_k)
     
     return [
         {
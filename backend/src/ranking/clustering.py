@@ -0,0 +1,150 @@
+"""
+Mini-batch k-means over song feature matrices.
+
+Shared by catalog clustering (``SongSimilarityEngine.cluster_by_similarity``)
+and the recommendation layer's emotion clusters (``ClusterManager``):
+
+- k-means++ seeding from a seeded ``numpy.random.Generator`` so runs
+  are deterministic for a given seed
+- Mini-batch updates with per-centroid learning rates 1/count
+  (Sculley, 2010); small inputs fall back to full-batch Lloyd steps
+- Stops when the largest squared centroid shift drops below
+  ``tol`` times the mean feature variance, or after ``max_iter`` batches
+- A final full assignment pass gives labels, squared distances and inertia
+
+``assign_clusters`` assigns new rows to existing centroids, so callers
+can persist centroids and place new songs without re-clustering.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+
+@dataclass
+class KMeansResult:
+    """Result of a k-means run."""
+    centroids: np.ndarray  # (k, d)
+    labels: np.ndarray  # (n,) cluster index per row
+    distances: np.ndarray  # (n,) squared distance to assigned centroid
+    inertia: float
+    n_iter: int
+    converged: bool
+
+
+def assign_clusters(X: np.ndarray, centroids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Nearest centroid per row.
+
+    Returns:
+        (labels, squared distances)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2
+    sq = (
+        (X ** 2).sum(axis=1)[:, None]
+        - 2.0 * X @ centroids.T
+        + (centroids ** 2).sum(axis=1)[None, :]
+    )
+    np.maximum(sq, 0.0, out=sq)
+    labels = sq.argmin(axis=1)
+    return labels, sq[np.arange(X.shape[0]), labels]
+
+
+def kmeans_plus_plus(X: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ seeding: spread initial centroids proportionally to D(x)^2."""
+    n = X.shape[0]
+    centroids = np.empty((k, X.shape[1]))
+    centroids[0] = X[rng.integers(n)]
+    closest = ((X - centroids[0]) ** 2).sum(axis=1)
+
+    for i in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            # Fewer distinct points than k: duplicate centroids
+            centroids[i:] = centroids[0]
+            break
+        idx = rng.choice(n, p=closest / total)
+        centroids[i] = X[idx]
+        np.minimum(closest, ((X - centroids[i]) ** 2).sum(axis=1), out=closest)
+
+    return centroids
+
+
+def minibatch_kmeans(
+    X: np.ndarray,
+    k: int,
+    batch_size: int = 256,
+    max_iter: int = 100,
+    tol: float = 1e-4,
+    seed: int = 42
+) -> KMeansResult:
+    """
+    Cluster the rows of ``X`` into ``k`` clusters.
+
+    Args:
+        X: (n, d) feature matrix
+        k: Number of clusters (capped at n)
+        batch_size: Rows per mini-batch; n <= batch_size runs full batches
+        max_iter: Maximum number of batch updates
+        tol: Convergence tolerance relative to mean feature variance
+        seed: Random seed (init and batch sampling)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n = X.shape[0]
+    if n == 0:
+        return KMeansResult(
+            centroids=np.empty((0, X.shape[1] if X.ndim == 2 else 0)),
+            labels=np.empty(0, dtype=np.int64),
+            distances=np.empty(0),
+            inertia=0.0, n_iter=0, converged=True,
+        )
+
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+    centroids = kmeans_plus_plus(X, k, rng)
+    counts = np.zeros(k)
+    threshold = tol * float(X.var(axis=0).mean())
+
+    full_batch = n <= batch_size
+    converged = False
+    n_iter = 0
+
+    for n_iter in range(1, max_iter + 1):
+        batch = X if full_batch else X[rng.choice(n, batch_size, replace=False)]
+        labels, _ = assign_clusters(batch, centroids)
+
+        batch_counts = np.bincount(labels, minlength=k).astype(np.float64)
+        batch_sums = np.zeros_like(centroids)
+        np.add.at(batch_sums, labels, batch)
+
+        hit = batch_counts > 0
+        if full_batch:
+            new_centroids = centroids.copy()
+            new_centroids[hit] = batch_sums[hit] / batch_counts[hit, None]
+        else:
+            # Equivalent to per-sample updates with learning rate 1/count
+            counts += batch_counts
+            new_centroids = centroids.copy()
+            new_centroids[hit] += (
+                batch_sums[hit] - batch_counts[hit, None] * centroids[hit]
+            ) / counts[hit, None]
+
+        shift = float(((new_centroids - centroids) ** 2).sum(axis=1).max())
+        centroids = new_centroids
+        if shift <= threshold:
+            converged = True
+            break
+
+    labels, distances = assign_clusters(X, centroids)
+    return KMeansResult(
+        centroids=centroids,
+        labels=labels,
+        distances=distances,
+        inertia=float(distances.sum()),
+        n_iter=n_iter,
+        converged=converged,
+    )
@@ -0,0 +1,72 @@
+"""
+Maximal Marginal Relevance (MMR) selection.
+
+Greedy MMR picks, at each step, the candidate maximizing
+
+    (1 - w) * relevance - w * max(similarity to already selected)
+
+Instead of recomputing similarity to every selected item per step, a
+running max-similarity vector is kept and updated with one similarity
+column per selection, so selecting k of n items costs k vectorized
+column updates (O(k·n)) rather than O(k²·n) pairwise calls.
+
+The similarity source is a callable (one similarity column per
+selected candidate), so any precomputed similarity structure can be
+plugged in; song similarity passes its feature index columns.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, List, Sequence, Union
+
+import numpy as np
+
+
+# Returns similarity of every candidate to candidate ``i`` (length n)
+SimilarityColumn = Callable[[int], np.ndarray]
+
+
+def mmr_select(
+    relevance: Union[Sequence[float], np.ndarray],
+    similarity_to: SimilarityColumn,
+    k: int,
+    diversity_weight: float = 0.3
+) -> List[int]:
+    """
+    Select up to ``k`` candidate positions by MMR.
+
+    Args:
+        relevance: Relevance score per candidate
+        similarity_to: ``similarity_to(i)`` -> similarity of all candidates
+            to candidate ``i`` (only called for selected candidates)
+        k: Number of candidates to select
+        diversity_weight: Trade-off w in [0, 1]; 0 = pure relevance
+
+    Returns:
+        Selected positions in selection order. The first pick is the
+        most relevant candidate; ties go to the lower position.
+    """
+    relevance = np.asarray(relevance, dtype=np.float64)
+    n = relevance.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    max_sim = np.zeros(n)
+    available = np.ones(n, dtype=bool)
+    selected: List[int] = []
+
+    pick = int(np.argmax(relevance))
+    while True:
+        selected.append(pick)
+        available[pick] = False
+        if len(selected) >= k:
+            break
+
+        np.maximum(max_sim, similarity_to(pick), out=max_sim)
+
+        mmr = (1 - diversity_weight) * relevance - diversity_weight * max_sim
+        mmr[~available] = -np.inf
+        pick = int(np.argmax(mmr))
+
+    return selected
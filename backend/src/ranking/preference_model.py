@@ -120,12 +120,47 @@ class PreferenceModel:
         return float(proba[0]), float(proba[1])
     
     def batch_predict(self, songs: List[Dict]) -> List[int]:
-        """Predict for multiple songs."""
-        return [self.predict(song) for song in songs]
+        """Predict for multiple songs with a single model call."""
+        if not self.is_fitted:
+            raise ValueError("Model not fitted. Call fit() first.")
+        if not songs:
+            return []
+        
+        X_scaled = self.scaler.transform(self._extract_features(songs))
+        return [int(p) for p in self.model.predict(X_scaled)]
     
     def batch_predict_proba(self, songs: List[Dict]) -> List[Tuple[float, float]]:
-        """Predict probabilities for multiple songs."""
-        return [self.predict_proba(song) for song in songs]
+        """Predict probabilities for multiple songs with a single model call."""
+        if not songs:
+            return []
+        proba = self._predict_proba_matrix(songs)
+        return [(float(row[0]), float(row[1])) for row in proba]
+    
+    def predict_like_proba(self, songs: List[Dict]) -> np.ndarray:
+        """
+        Predict like probabilities for a batch of songs.
+        
+        Builds one feature matrix for all songs and runs a single
+        ``predict_proba`` call, so scoring N candidates costs one
+        scikit-learn invocation instead of N.
+        
+        Args:
+            songs: Song dictionaries
+            
+        Returns:
+            Array of shape (len(songs),) with P(like) in [0, 1]
+        """
+        if not songs:
+            return np.zeros(0)
+        return self._predict_proba_matrix(songs)[:, 1]
+    
+    def _predict_proba_matrix(self, songs: List[Dict]) -> np.ndarray:
+        """Return the (n_songs, 2) probability matrix for a batch."""
+        if not self.is_fitted:
+            raise ValueError("Model not fitted. Call fit() first.")
+        
+        X_scaled = self.scaler.transform(self._extract_features(songs))
+        return self.model.predict_proba(X_scaled)
     
     def score(
         self,
@@ -14,6 +14,9 @@ import time
 import os
 
 from backend.src.services.constants import TABLE_SONGS
+from backend.repositories.song_repository import (
+    MOOD_COLUMNS, bump_catalog_generation, sync_song_moods
+)
 
 logger = logging.getLogger(__name__)
 
@@ -335,6 +338,8 @@ class OptimizedSongRepo:
         with self.pool.connection() as con:
             cur = con.cursor()
             count = 0
+            updated: List[int] = []
+            mood_changed: List[int] = []
             
             for update in updates:
                 song_id = update.pop("song_id", None)
@@ -351,12 +356,18 @@ class OptimizedSongRepo:
                         vals
                     )
                     count += cur.rowcount
+                    updated.append(song_id)
+                    if MOOD_COLUMNS.intersection(cols):
+                        mood_changed.append(song_id)
             
+            sync_song_moods(con, mood_changed)
             con.commit()
         
         # Invalidate cache
         self._cache.clear()
         self._cache_time.clear()
+        if updated:
+            bump_catalog_generation(updated)
         
         return count
     
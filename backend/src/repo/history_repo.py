@@ -6,6 +6,8 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import sqlite3
 
+from backend.repositories.invalidation import publish_invalidation, user_tag
+
 
 TABLE_HISTORY = "listening_history"
 
@@ -84,6 +86,7 @@ def add_history_entry(
         entry_id = cur.lastrowid
     
     con.commit()
+    publish_invalidation(user_tag(user_id))
     return entry_id
 
 
@@ -155,6 +158,7 @@ def update_rating(con: sqlite3.Connection, user_id: int, song_id: int, rating: i
         WHERE user_id = ? AND song_id = ?
     """, (rating, user_id, song_id))
     con.commit()
+    publish_invalidation(user_tag(user_id))
     return cur.rowcount > 0
 
 
@@ -167,6 +171,7 @@ def update_like_status(con: sqlite3.Connection, user_id: int, song_id: int, like
         WHERE user_id = ? AND song_id = ?
     """, (int(liked), user_id, song_id))
     con.commit()
+    publish_invalidation(user_tag(user_id))
     return cur.rowcount > 0
 
 
@@ -222,6 +227,7 @@ def delete_history_entry(con: sqlite3.Connection, user_id: int, song_id: int) ->
         WHERE user_id = ? AND song_id = ?
     """, (user_id, song_id))
     con.commit()
+    publish_invalidation(user_tag(user_id))
     return cur.rowcount > 0
 
 
@@ -233,4 +239,5 @@ def clear_user_history(con: sqlite3.Connection, user_id: int) -> int:
         WHERE user_id = ?
     """, (user_id,))
     con.commit()
+    publish_invalidation(user_tag(user_id))
     return cur.rowcount
@@ -6,6 +6,7 @@ from typing import Dict, List, Optional, Tuple
 import sqlite3
 
 from backend.src.services.constants import Song, TABLE_SONGS
+from backend.repositories.song_repository import MOOD_COLUMNS, sync_song_moods
 
 
 def connect(db_path: str) -> sqlite3.Connection:
@@ -45,7 +46,20 @@ def fetch_song_by_id(con: sqlite3.Connection, song_id: int) -> Optional[Song]:
     return rows[0] if rows else None
 
 
+def fetch_catalog_fingerprint(con: sqlite3.Connection) -> Tuple[int, Optional[int]]:
+    """Cheap (row count, max song_id) fingerprint of the songs table."""
+    cur = con.cursor()
+    cur.execute(f"SELECT COUNT(*), MAX(song_id) FROM {TABLE_SONGS}")
+    count, max_id = cur.fetchone()
+    return count, max_id
+
+
 def update_song(con: sqlite3.Connection, song_id: int, updates: Dict[str, object]) -> None:
+    """Update one song on an open connection.
+
+    The caller commits and then calls ``bump_catalog_generation`` with the
+    updated ids, so cache refreshes never read uncommitted rows.
+    """
     if not updates:
         return
     cols = list(updates.keys())
@@ -54,6 +68,8 @@ def update_song(con: sqlite3.Connection, song_id: int, updates: Dict[str, object
     vals.append(song_id)
     cur = con.cursor()
     cur.execute(f"UPDATE {TABLE_SONGS} SET {set_clause} WHERE song_id=?", vals)
+    if MOOD_COLUMNS.intersection(cols):
+        sync_song_moods(con, [song_id])
 
 
 def _default_missing_where() -> str:
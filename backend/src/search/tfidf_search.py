@@ -7,13 +7,13 @@ Features:
 - Phonetic matching for typo tolerance
 - Query intent detection (mood/artist/title/similar)
 - Hybrid search with exact match fast path
-- LRU caching for repeated queries
+- LRU caching for repeated queries (invalidated per song on catalog writes)
 - BM25-inspired scoring
 """
 
 from __future__ import annotations
 
-from typing import List, Dict, Optional, Tuple, NamedTuple
+from typing import Callable, Iterable, List, Dict, Optional, Tuple, NamedTuple
 from enum import Enum
 from functools import lru_cache
 from collections import OrderedDict
@@ -29,6 +29,9 @@ from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 from scipy.sparse import csr_matrix
 import warnings
+
+from backend.repositories.invalidation import CATALOG_TAG, get_invalidation_bus, song_tag
+
 warnings.filterwarnings('ignore', category=DeprecationWarning)
 
 # Try to import rapidfuzz for faster fuzzy matching
@@ -139,7 +142,7 @@ def detect_query_intent(query: str, known_artists: set = None, known_moods: set
 # ================== SEARCH CACHE ==================
 
 class LRUCache:
-    """Simple LRU cache for search results"""
+    """Simple LRU cache for search results, tagged by the songs they contain"""
     
     def __init__(self, max_size: int = 100):
         self.cache = OrderedDict()
@@ -156,17 +159,24 @@ class LRUCache:
         self.misses += 1
         return None
     
-    def put(self, key: str, value: List):
+    def put(self, key: str, value: List, tags: Iterable[str] = ()):
         if key in self.cache:
             self.cache.move_to_end(key)
         else:
             if len(self.cache) >= self.max_size:
                 # Remove oldest
-                self.cache.popitem(last=False)
+                oldest, _ = self.cache.popitem(last=False)
+                get_invalidation_bus().untag(self, oldest)
         self.cache[key] = value
+        get_invalidation_bus().tag(self, key, tags)
+    
+    def delete(self, key: str) -> bool:
+        get_invalidation_bus().untag(self, key)
+        return self.cache.pop(key, None) is not None
     
     def clear(self):
         self.cache.clear()
+        get_invalidation_bus().untag_all(self)
         self.hits = 0
         self.misses = 0
     
@@ -537,6 +547,10 @@ class TFIDFSearchEngine:
         # Search cache
         self._cache = LRUCache(max_size=100) if enable_cache else None
         
+        # Optional precomputed neighbour lookup for search_similar:
+        # (song_id, top_k) -> [(song, score)] or None when unavailable
+        self.neighbor_source: Optional[Callable[[int, int], Optional[List[Tuple[Dict, float]]]]] = None
+        
         # Stats
         self._search_count = 0
         self._avg_search_time = 0.0
@@ -824,9 +838,10 @@ class TFIDFSearchEngine:
         results.sort(key=lambda x: x[1], reverse=True)
         results = results[:top_k]
         
-        # Cache results
+        # Cache results (added or removed songs can change any result list)
         if self._cache:
-            self._cache.put(cache_key, results)
+            tags = [CATALOG_TAG] + [song_tag(song.get('song_id')) for song, _ in results]
+            self._cache.put(cache_key, results, tags)
         
         # Update stats
         elapsed = time.time() - start_time
@@ -1093,6 +1108,13 @@ class TFIDFSearchEngine:
         if ref_song is None or self.tfidf_matrix is None:
             return []
         
+        # Precomputed audio-feature neighbours, if wired in. They pick
+        # the candidates; scores use the same relevance scale as below.
+        if self.neighbor_source is not None:
+            neighbors = self.neighbor_source(song_id, top_k)
+            if neighbors is not None:
+                return self._rescore_neighbors(ref_song, ref_idx, neighbors)
+        
         try:
             # Fast vectorized cosine similarity
             ref_vec = self.tfidf_matrix[ref_idx]
@@ -1111,13 +1133,7 @@ class TFIDFSearchEngine:
                 except (TypeError, ValueError):
                     score = 0.0
                 
-                # Boost if same mood/genre
-                if song.get('mood') == ref_song.get('mood'):
-                    score = min(1.0, score + 0.1)
-                if song.get('genre') == ref_song.get('genre'):
-                    score = min(1.0, score + 0.1)
-                
-                similarities.append((song, score))
+                similarities.append((song, self._boost_relevance(score, ref_song, song)))
             
             # Sort and return top_k
             similarities.sort(key=lambda x: x[1], reverse=True)
@@ -1126,6 +1142,45 @@ class TFIDFSearchEngine:
             print(f"Error in search_similar: {e}")
             return []
     
+    @staticmethod
+    def _boost_relevance(score: float, ref_song: Dict, song: Dict) -> float:
+        """Boost a TF-IDF similarity for a shared mood/genre (capped at 1.0)."""
+        if song.get('mood') == ref_song.get('mood'):
+            score = min(1.0, score + 0.1)
+        if song.get('genre') == ref_song.get('genre'):
+            score = min(1.0, score + 0.1)
+        return score
+    
+    def _rescore_neighbors(self,
+                           ref_song: Dict,
+                           ref_idx: int,
+                           neighbors: List[Tuple[Dict, float]]) -> List[Tuple[Dict, float]]:
+        """
+        Put precomputed neighbours on the search_similar relevance scale.
+        
+        Audio-feature similarity and TF-IDF relevance have different
+        ranges, so neighbours are re-scored like the TF-IDF path and
+        sorted by that score (neighbour rank breaks ties).
+        """
+        rows = {song.get('song_id'): i for i, song in enumerate(self.songs)}
+        indexed = [rows.get(song.get('song_id')) for song, _ in neighbors]
+        
+        cosine = np.zeros(len(neighbors))
+        known = [i for i, row in enumerate(indexed) if row is not None]
+        if known:
+            ref_vec = self.tfidf_matrix[ref_idx]
+            cosine[known] = cosine_similarity(ref_vec, self.tfidf_matrix[[indexed[i] for i in known]])[0]
+        cosine = np.nan_to_num(cosine)
+        
+        results = [
+            (song, self._boost_relevance(
+                float(score), ref_song, self.songs[row] if row is not None else song
+            ))
+            for (song, _), score, row in zip(neighbors, cosine, indexed)
+        ]
+        results.sort(key=lambda x: x[1], reverse=True)
+        return results
+    
     def search_by_mood(self, mood: str, intensity: Optional[int] = None, top_k: int = 10) -> List[Dict]:
         """
         Search songs by mood with optional intensity filter.
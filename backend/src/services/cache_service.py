@@ -1,12 +1,16 @@
 """
 Caching service for API responses and expensive computations.
 Supports TTL-based expiration and LRU eviction.
+
+Entries can be tagged (``song:<id>``, ``user:<id>``, ``catalog``);
+repository writes publish those tags on the shared invalidation bus,
+which deletes exactly the affected entries.
 """
 
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any, Dict, Optional, Callable, TypeVar, Generic
+from typing import Any, Dict, Iterable, Optional, Callable, TypeVar, Generic
 from datetime import datetime, timedelta
 from collections import OrderedDict
 from functools import wraps
@@ -15,6 +19,8 @@ import hashlib
 import json
 import logging
 
+from backend.repositories.invalidation import CATALOG_TAG, get_invalidation_bus
+
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
@@ -86,7 +92,7 @@ class LRUCache:
                 return None
             
             if entry.is_expired:
-                del self._cache[key]
+                self._remove(key)
                 self._misses += 1
                 return None
             
@@ -99,15 +105,15 @@ class LRUCache:
         self,
         key: str,
         value: Any,
-        ttl_seconds: Optional[int] = None
+        ttl_seconds: Optional[int] = None,
+        tags: Iterable[str] = ()
     ) -> None:
-        """Set value in cache."""
+        """Set value in cache, optionally tagged for invalidation."""
         with self._lock:
             # Check max size
             while len(self._cache) >= self.max_size:
                 # Evict oldest (least recently used)
-                oldest_key = next(iter(self._cache))
-                del self._cache[oldest_key]
+                self._remove(next(iter(self._cache)))
                 self._evictions += 1
             
             # Calculate expiration
@@ -122,12 +128,13 @@ class LRUCache:
             )
             
             self._cache[key] = entry
+            get_invalidation_bus().tag(self, key, tags)
     
     def delete(self, key: str) -> bool:
         """Delete key from cache."""
         with self._lock:
             if key in self._cache:
-                del self._cache[key]
+                self._remove(key)
                 return True
             return False
     
@@ -136,8 +143,14 @@ class LRUCache:
         with self._lock:
             count = len(self._cache)
             self._cache.clear()
+            get_invalidation_bus().untag_all(self)
             return count
     
+    def _remove(self, key: str) -> None:
+        """Drop an entry and its tags (caller holds the lock)."""
+        del self._cache[key]
+        get_invalidation_bus().untag(self, key)
+    
     def cleanup_expired(self) -> int:
         """Remove all expired entries."""
         with self._lock:
@@ -146,7 +159,7 @@ class LRUCache:
                 if entry.is_expired
             ]
             for key in expired_keys:
-                del self._cache[key]
+                self._remove(key)
             return len(expired_keys)
     
     @property
@@ -192,15 +205,23 @@ def get_cache(
 def cached(
     cache_name: str = "default",
     ttl_seconds: Optional[int] = None,
-    key_prefix: str = ""
+    key_prefix: str = "",
+    tags: Any = ()
 ) -> Callable:
     """
     Decorator to cache function results.
     
+    ``tags`` is a list of tags or a function of the call's arguments
+    returning them.
+    
     Usage:
-        @cached(cache_name="songs", ttl_seconds=60)
+        @cached(cache_name="songs", ttl_seconds=60, tags=[CATALOG_TAG])
         def get_songs_by_mood(mood: str) -> List[Song]:
             ...
+        
+        @cached(cache_name="recommendations", tags=lambda user_id, mood: [user_tag(user_id)])
+        def recommend(user_id: int, mood: str) -> List[Song]:
+            ...
     """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
@@ -225,7 +246,8 @@ def cached(
             # Compute and cache
             logger.debug(f"Cache MISS: {func.__name__}")
             result = func(*args, **kwargs)
-            cache.set(cache_key, result, ttl_seconds)
+            entry_tags = tags(*args, **kwargs) if callable(tags) else tags
+            cache.set(cache_key, result, ttl_seconds, entry_tags)
             return result
         
         return wrapper
@@ -233,7 +255,12 @@ def cached(
 
 
 def invalidate_cache(cache_name: str = "default", pattern: str = None) -> int:
-    """Invalidate cache entries matching pattern."""
+    """
+    Invalidate cache entries matching pattern.
+    
+    Scans every key; prefer tagging entries and publishing the tags
+    (``publish_invalidation``) for data-driven invalidation.
+    """
     cache = get_cache(cache_name)
     if pattern is None:
         return cache.clear()
@@ -246,7 +273,7 @@ def invalidate_cache(cache_name: str = "default", pattern: str = None) -> int:
             if pattern in key
         ]
         for key in keys_to_delete:
-            del cache._cache[key]
+            cache._remove(key)
             count += 1
     return count
 
@@ -277,7 +304,7 @@ user_cache = get_cache("users", max_size=100, default_ttl_seconds=900)
 def cache_song_list(songs: list, mood: str = None) -> None:
     """Cache a list of songs with optional mood key."""
     key = f"songs_{mood}" if mood else "songs_all"
-    song_cache.set(key, songs)
+    song_cache.set(key, songs, tags=[CATALOG_TAG])
 
 
 def get_cached_songs(mood: str = None) -> Optional[list]:
@@ -289,7 +316,7 @@ def get_cached_songs(mood: str = None) -> Optional[list]:
 def cache_search_results(query: str, results: list) -> None:
     """Cache search results."""
     key = hashlib.md5(query.lower().encode()).hexdigest()
-    search_cache.set(key, results)
+    search_cache.set(key, results, tags=[CATALOG_TAG])
 
 
 def get_cached_search(query: str) -> Optional[list]:
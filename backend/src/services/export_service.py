@@ -22,6 +22,7 @@ from enum import Enum
 import logging
 
 from backend.src.services.constants import TABLE_SONGS
+from backend.repositories.song_repository import MOOD_COLUMNS, sync_song_moods
 
 logger = logging.getLogger(__name__)
 
@@ -344,6 +345,7 @@ class DataExportService:
         
         with self._connect() as con:
             cur = con.cursor()
+            mood_changed: List[int] = []
             
             for i, song in enumerate(songs):
                 try:
@@ -376,6 +378,8 @@ class DataExportService:
                                 f"UPDATE {TABLE_SONGS} SET {set_clause} WHERE song_id=?",
                                 vals
                             )
+                            if MOOD_COLUMNS.intersection(cols):
+                                mood_changed.append(song_id)
                             result.imported_count += 1
                             continue
                     
@@ -389,12 +393,15 @@ class DataExportService:
                         f"INSERT INTO {TABLE_SONGS} ({col_names}) VALUES ({placeholders})",
                         vals
                     )
+                    if MOOD_COLUMNS.intersection(cols):
+                        mood_changed.append(cur.lastrowid)
                     result.imported_count += 1
                     
                 except Exception as e:
                     result.error_count += 1
                     result.errors.append(f"Row {i}: {e}")
             
+            sync_song_moods(con, mood_changed)
             con.commit()
         
         result.success = result.imported_count > 0 or result.skipped_count > 0
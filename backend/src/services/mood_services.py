@@ -6,6 +6,7 @@ from typing import Dict, Optional
 import sqlite3
 import time
 
+from backend.repositories import bump_catalog_generation
 from backend.src.pipelines.mood_engine import MoodEngine, EngineConfig
 from backend.src.repo.song_repo import (
     connect, fetch_songs, fetch_song_by_id, update_song, ensure_columns
@@ -124,6 +125,7 @@ class DBMoodEngine:
                 })
             update_song(con, song_id, updates)
             con.commit()
+            bump_catalog_generation([song_id])
             return True
         finally:
             con.close()
@@ -150,6 +152,7 @@ class DBMoodEngine:
                     })
                 update_song(con, int(s["song_id"]), updates)
             con.commit()
+            bump_catalog_generation([s["song_id"] for s in targets])
             return len(targets)
         finally:
             con.close()
@@ -175,6 +178,7 @@ class DBMoodEngine:
                     })
                 update_song(con, int(s["song_id"]), updates)
             con.commit()
+            bump_catalog_generation([s["song_id"] for s in songs])
             # engine was fit on previous distribution; update cached count
             self._last_fit_song_count = len(songs)
             return len(songs)
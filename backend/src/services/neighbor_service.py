@@ -0,0 +1,343 @@
+"""
+Persisted song neighbours.
+
+Precomputes the top-k most similar songs of every song into the
+``song_neighbors`` table so similar-song lookups (``/songs/{id}/similar``,
+queue auto-fill, "more like this" search) are a single indexed query
+instead of a scan of the whole catalog.
+
+- The table is rebuilt by a background blockwise kNN job: the catalog
+  feature index is scored ``block_size`` rows at a time, keeping the
+  top-k per row with ``argpartition``
+- Rows carry a ``model_version`` derived from the similarity weights,
+  so a config change invalidates stored neighbours
+- The build is tagged with the catalog fingerprint (row count, max id)
+  and the in-process catalog generation; when either moves on, lookups
+  return None, a refresh is scheduled and callers fall back to
+  on-the-fly similarity
+- Catalog writes (the ``catalog`` invalidation tag) schedule a refresh
+  right away; writes during a running refresh queue one more run
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from backend.src.services.constants import Song, TABLE_SONGS
+from backend.src.repo.song_repo import connect, fetch_songs, fetch_catalog_fingerprint
+from backend.src.pipelines.song_similarity import SongSimilarityEngine, get_similarity_engine
+from backend.repositories import CATALOG_TAG, get_catalog_generation, get_invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+
+class SongNeighborService:
+    """
+    Stores and serves precomputed song neighbours.
+
+    Usage:
+        service = get_neighbor_service(db_path)
+        neighbors = service.get_neighbors(song_id, limit=10)
+        if neighbors is None:
+            ...  # Not built or stale (refresh scheduled): compute on the fly
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        k: int = 50,
+        block_size: int = 256,
+        engine: Optional[SongSimilarityEngine] = None
+    ):
+        """
+        Initialize service.
+
+        Args:
+            db_path: SQLite database with the songs table
+            k: Neighbours stored per song
+            block_size: Songs scored per kNN block
+            engine: Similarity engine (defaults to the shared engine)
+        """
+        self.db_path = db_path
+        self.k = k
+        self.block_size = block_size
+        self.engine = engine or get_similarity_engine()
+
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_pending = False
+        # Catalog generation the stored table is known to reflect
+        self._trusted_generation: Optional[int] = None
+
+        self._ensure_tables()
+        self._subscribe()
+
+    def _ensure_tables(self) -> None:
+        """Create neighbour tables if they don't exist."""
+        con = sqlite3.connect(self.db_path)
+        cur = con.cursor()
+
+        # Tables from before the (song_id, neighbor_id) key only hold
+        # derived rows; drop them and let the next refresh rebuild
+        keyed = any(row[3] == "pk" for row in cur.execute("PRAGMA index_list(song_neighbors)"))
+        exists = cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'song_neighbors'"
+        ).fetchone()
+        if exists and not keyed:
+            cur.execute("DROP TABLE song_neighbors")
+            cur.execute("DROP TABLE IF EXISTS song_neighbors_meta")
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS song_neighbors (
+                song_id INTEGER NOT NULL,
+                neighbor_id INTEGER NOT NULL,
+                score REAL NOT NULL,
+                rank INTEGER NOT NULL,
+                model_version TEXT NOT NULL,
+                PRIMARY KEY (song_id, neighbor_id)
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS song_neighbors_meta (
+                model_version TEXT PRIMARY KEY,
+                song_count INTEGER NOT NULL,
+                max_song_id INTEGER,
+                built_at TEXT NOT NULL
+            )
+        """)
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_song_neighbors_rank ON song_neighbors(song_id, rank)"
+        )
+
+        con.commit()
+        con.close()
+
+    @property
+    def model_version(self) -> str:
+        """Version tag of the similarity model the neighbours come from."""
+        cfg = self.engine.config
+        params = (
+            cfg.w_energy, cfg.w_happiness, cfg.w_danceability, cfg.w_tempo,
+            cfg.w_loudness, cfg.w_acousticness, cfg.w_mood, cfg.w_genre,
+            cfg.tempo_min, cfg.tempo_max, cfg.loudness_min, cfg.loudness_max,
+            self.k,
+        )
+        return "sim-" + hashlib.md5(repr(params).encode()).hexdigest()[:10]
+
+    # ==================== LOOKUP ====================
+
+    def is_fresh(self, con: Optional[sqlite3.Connection] = None) -> bool:
+        """Whether stored neighbours match the current catalog and model."""
+        own = con is None
+        con = con or connect(self.db_path)
+        try:
+            row = con.execute(
+                "SELECT song_count, max_song_id FROM song_neighbors_meta WHERE model_version = ?",
+                (self.model_version,)
+            ).fetchone()
+            if row is None:
+                return False
+            if tuple(row) != fetch_catalog_fingerprint(con):
+                return False
+
+            generation = get_catalog_generation()
+            if self._trusted_generation is None:
+                # Built by an earlier process; trust it from here on
+                self._trusted_generation = generation
+            return self._trusted_generation == generation
+        finally:
+            if own:
+                con.close()
+
+    def get_neighbors(
+        self,
+        song_id: int,
+        limit: int = 10,
+        exclude_same_artist: bool = False
+    ) -> Optional[List[Tuple[Song, float]]]:
+        """
+        Get stored neighbours as (song, score), most similar first.
+
+        Returns None when the table cannot answer (not built, stale, or
+        ``limit`` above the stored k); a refresh is scheduled if needed.
+        """
+        if limit > self.k:
+            return None
+
+        con = connect(self.db_path)
+        try:
+            if not self.is_fresh(con):
+                self.refresh_async()
+                return None
+
+            query = f"""
+                SELECT n.score AS neighbor_score, s.*
+                FROM song_neighbors n
+                JOIN {TABLE_SONGS} s ON s.song_id = n.neighbor_id
+                WHERE n.song_id = ? AND n.model_version = ?
+            """
+            params: list = [song_id, self.model_version]
+            if exclude_same_artist:
+                query += f"""
+                AND LOWER(COALESCE(s.artist, '')) != (
+                    SELECT LOWER(COALESCE(artist, '')) FROM {TABLE_SONGS} WHERE song_id = ?
+                )
+                """
+                params.append(song_id)
+            query += " ORDER BY n.rank LIMIT ?"
+            params.append(limit)
+
+            rows = con.execute(query, params).fetchall()
+        finally:
+            con.close()
+
+        if exclude_same_artist and len(rows) < limit:
+            return None  # Filter may have removed more than k - limit
+
+        results = []
+        for row in rows:
+            song = dict(row)
+            score = song.pop("neighbor_score")
+            results.append((song, score))
+        return results
+
+    # ==================== BUILD ====================
+
+    def refresh(self) -> int:
+        """
+        Rebuild the neighbour table synchronously.
+
+        Returns:
+            Number of neighbour rows written
+        """
+        con = connect(self.db_path)
+        try:
+            generation = get_catalog_generation()
+            song_count, max_song_id = fetch_catalog_fingerprint(con)
+            songs = fetch_songs(con)
+
+            rows = self._compute_neighbors(songs)
+            version = self.model_version
+
+            with con:
+                con.execute("DELETE FROM song_neighbors")
+                con.executemany(
+                    "INSERT OR REPLACE INTO song_neighbors (song_id, neighbor_id, score, rank, model_version) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [row + (version,) for row in rows]
+                )
+                con.execute("DELETE FROM song_neighbors_meta")
+                con.execute(
+                    "INSERT INTO song_neighbors_meta (model_version, song_count, max_song_id, built_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (version, song_count, max_song_id, datetime.now().isoformat())
+                )
+        finally:
+            con.close()
+
+        self._trusted_generation = generation
+        logger.info(f"Stored {len(rows)} neighbours for {len(songs)} songs ({version})")
+        return len(rows)
+
+    def refresh_async(self) -> bool:
+        """
+        Start a background refresh.
+
+        If one is already running, another run is queued after it (so
+        catalog writes during a build are picked up).
+
+        Returns:
+            True if a new refresh thread was started
+        """
+        with self._refresh_lock:
+            if self._refresh_thread is not None:
+                self._refresh_pending = True
+                return False
+            self._refresh_thread = threading.Thread(
+                target=self._run_refresh, name="song-neighbors-refresh", daemon=True
+            )
+            self._refresh_thread.start()
+            return True
+
+    def wait_for_refresh(self, timeout: Optional[float] = None) -> None:
+        """Block until a running background refresh finishes."""
+        thread = self._refresh_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def delete(self, key: str) -> bool:
+        """Invalidation bus hook: the catalog changed, rebuild in the background."""
+        self._subscribe()
+        self.refresh_async()
+        return True
+
+    def _subscribe(self) -> None:
+        """Listen for catalog writes (a publish consumes the tag)."""
+        get_invalidation_bus().tag(self, "song_neighbors", [CATALOG_TAG])
+
+    def _run_refresh(self) -> None:
+        while True:
+            with self._refresh_lock:
+                self._refresh_pending = False
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Neighbour refresh failed: {e}")
+            with self._refresh_lock:
+                if not self._refresh_pending:
+                    self._refresh_thread = None
+                    return
+
+    def _compute_neighbors(self, songs: List[Song]) -> List[Tuple[int, int, float, int]]:
+        """Blockwise exact kNN over the catalog feature index."""
+        index = self.engine.build_index(songs)
+        n = len(index)
+        k = min(self.k, n - 1)
+        if k <= 0:
+            return []
+
+        rows: List[Tuple[int, int, float, int]] = []
+        for start in range(0, n, self.block_size):
+            block = np.arange(start, min(start + self.block_size, n))
+            scores = self.engine.score_rows_against_index(index, block)
+            scores[np.arange(block.size), block] = -np.inf  # Not its own neighbour
+
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.lexsort((top, -top_scores))
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            for i, row in enumerate(block.tolist()):
+                song_id = int(index.song_ids[row])
+                for rank, (col, score) in enumerate(zip(top[i].tolist(), top_scores[i].tolist())):
+                    rows.append((song_id, int(index.song_ids[col]), float(score), rank))
+
+        return rows
+
+
+# Global instances (one per database)
+_neighbor_services: Dict[str, SongNeighborService] = {}
+_services_lock = threading.Lock()
+
+
+def get_neighbor_service(db_path: str = None) -> SongNeighborService:
+    """Get or create the neighbour service for a database."""
+    if db_path is None:
+        current_file = os.path.abspath(__file__)
+        backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_file)))
+        db_path = os.path.join(backend_dir, "src", "database", "music.db")
+
+    with _services_lock:
+        service = _neighbor_services.get(db_path)
+        if service is None:
+            service = _neighbor_services[db_path] = SongNeighborService(db_path)
+        return service
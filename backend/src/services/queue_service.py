@@ -332,16 +332,25 @@ class SmartQueue:
             return
         
         try:
-            # Get similar songs
-            from backend.src.pipelines.song_similarity import get_similarity_engine
+            # Get similar songs (precomputed neighbours, else on the fly)
+            from backend.src.services.neighbor_service import get_neighbor_service
             
-            engine = get_similarity_engine(self.db_path)
-            current_song = self._current.song
-            
-            similar = engine.find_similar_songs(
-                self._current.song_id,
-                limit=self.auto_queue_count * 2
+            limit = self.auto_queue_count * 2
+            neighbors = get_neighbor_service(self.db_path).get_neighbors(
+                self._current.song_id, limit
             )
+            if neighbors is not None:
+                similar = [song for song, _ in neighbors]
+            else:
+                from backend.src.pipelines.song_similarity import (
+                    get_similarity_engine, get_catalog_index
+                )
+                
+                engine = get_similarity_engine()
+                get_catalog_index(self.db_path, engine)
+                similar = [
+                    r.song for r in engine.find_similar_songs(self._current.song, None, limit)
+                ]
             
             # Filter out already in queue and history
             in_queue = {item.song_id for item in self._queue}
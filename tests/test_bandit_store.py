@@ -0,0 +1,172 @@
+"""
+=============================================================================
+BANDIT STATE STORE - TEST SUITE
+=============================================================================
+
+Unit tests for BanditStateStore and the Thompson sampling bandit.
+
+Test Coverage:
+- Posteriors surviving restarts
+- Concurrent workers sharing one table
+- LRU capacity and write-behind buffering
+- Vectorized per-user sampling
+- Lazy store creation and per-user feedback credit
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_bandit_store.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import sqlite3
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.bandit_store import BanditStateStore
+from backend.services.recommendation import scoring_engine
+from backend.services.recommendation.scoring_engine import ScoringEngine, ThompsonSamplingBandit
+
+
+ARMS = ["emotion", "content", "exploration"]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "music.db")
+
+
+def _store(db_path, **kwargs):
+    kwargs.setdefault("flush_interval", 3600.0)
+    return BanditStateStore(ARMS, db_path, **kwargs)
+
+
+class TestBanditStateStore:
+    """Tests for persistence and caching."""
+
+    def test_updates_survive_restart(self, db_path):
+        store = _store(db_path)
+        store.update(7, "content", d_alpha=1.0, d_beta=0.0, reward=1.0)
+        store.update(7, "content", d_alpha=0.0, d_beta=0.8, reward=0.2)
+
+        # Visible before the write-behind flush
+        assert store.get(7).alphas.tolist() == [1.0, 2.0, 1.0]
+        store.close()
+
+        posterior = _store(db_path).get(7)
+        assert posterior.alphas.tolist() == [1.0, 2.0, 1.0]
+        assert posterior.betas == pytest.approx([1.0, 1.8, 1.0])
+
+        con = sqlite3.connect(db_path)
+        row = con.execute(
+            "SELECT total_pulls, total_reward FROM bandit_stats WHERE user_id = 7"
+        ).fetchone()
+        con.close()
+        assert row == (2, pytest.approx(1.2))
+
+    def test_workers_do_not_overwrite_each_other(self, db_path):
+        first, second = _store(db_path), _store(db_path, max_age=0.0)
+        first.get(1)
+        second.get(1)
+
+        first.update(1, "emotion", 1.0, 0.0, 1.0)
+        second.update(1, "emotion", 1.0, 0.0, 1.0)
+        first.flush()
+        second.flush()
+
+        assert second.get(1).alphas[0] == 3.0
+        assert _store(db_path).get(1).alphas[0] == 3.0
+
+    def test_no_writes_until_first_update(self, db_path):
+        store = _store(db_path)
+        assert store.get(3).alphas.tolist() == [1.0, 1.0, 1.0]
+        assert store._thread is None
+
+        con = sqlite3.connect(db_path)
+        assert con.execute("SELECT name FROM sqlite_master").fetchall() == []
+        con.close()
+
+        store.update(3, "emotion", 1.0, 0.0, 1.0)
+        assert store._thread is not None
+        store.close()
+
+    def test_lru_capacity_and_users_isolated(self, db_path):
+        store = _store(db_path, capacity=2)
+        store.update(1, "exploration", 1.0, 0.0, 1.0)
+        for user_id in (1, 2, 3):
+            store.get(user_id)
+
+        assert list(store._cache) == [2, 3]
+        assert store.get(1).alphas.tolist() == [1.0, 1.0, 2.0]
+        assert store.get(2).alphas.tolist() == [1.0, 1.0, 1.0]
+
+
+class TestThompsonSamplingBandit:
+    """Tests for bandit sampling over stored posteriors."""
+
+    def test_per_user_posteriors(self, db_path):
+        bandit = ThompsonSamplingBandit(ARMS, store=_store(db_path), seed=3)
+        for _ in range(200):
+            bandit.update("exploration", 1.0, user_id=1)
+            bandit.update("exploration", 0.0, user_id=2)
+
+        assert bandit.sample(1)[0] == "exploration"
+        winner, samples = bandit.sample(2)
+        assert winner != "exploration"
+        assert set(samples) == set(ARMS)
+        assert samples[winner] == max(samples.values())
+        assert bandit.get_expected_rewards(1)["exploration"] > 0.99
+
+    def test_in_memory_without_store(self):
+        bandit = ThompsonSamplingBandit(ARMS, seed=1)
+        bandit.update("content", 1.0)
+        bandit.load_state({"betas": {"emotion": 4.0}})
+
+        assert bandit.get_state() == {
+            "alphas": {"emotion": 1.0, "content": 2.0, "exploration": 1.0},
+            "betas": {"emotion": 4.0, "content": 1.0, "exploration": 1.0},
+        }
+
+    def test_store_arms_must_match(self, db_path):
+        with pytest.raises(ValueError):
+            ThompsonSamplingBandit(["emotion"], store=_store(db_path))
+
+
+class TestScoringEngineBandit:
+    """Tests for the scoring engine's use of the store."""
+
+    def test_store_created_on_first_use(self, db_path):
+        engine = ScoringEngine(db_path)
+        assert engine._bandit is None
+
+        engine.update_bandit("content", 1.0, user_id=4)
+        assert engine._bandit is not None
+        assert engine.get_bandit_state(4)["state"]["alphas"]["content"] == 2.0
+        assert engine.get_bandit_state(5)["state"]["alphas"]["content"] == 1.0
+
+    def test_reward_feedback_credits_user(self, db_path, monkeypatch):
+        import jwt
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from backend.api.v1.adaptive import router
+        from backend.api.v1.dependencies import JWT_ALGORITHM, JWT_SECRET
+
+        engine = ScoringEngine(db_path)
+        monkeypatch.setattr(scoring_engine, "_scoring_engine", engine)
+        app = FastAPI()
+        app.include_router(router)
+        token = jwt.encode({"user_id": 11}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+        response = TestClient(app).post(
+            "/feedback/reward",
+            json={"song_id": 1, "feedback_type": "love", "context": {"strategy": "exploration"}},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+        assert response.status_code == 200
+        state = engine.get_bandit_state(11)["state"]
+        assert state["alphas"]["exploration"] + state["betas"]["exploration"] > 2.0
+        assert engine.get_bandit_state(12)["state"]["alphas"]["exploration"] == 1.0
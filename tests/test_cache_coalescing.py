@@ -0,0 +1,155 @@
+"""
+=============================================================================
+CACHE COALESCING - TEST SUITE
+=============================================================================
+
+Unit tests for single-flight request coalescing in MultiLevelCache.
+
+Test Coverage:
+- One compute per key for concurrent misses
+- Error propagation to waiting callers
+- Probabilistic early refresh before TTL expiry
+- Compute cost kept on L2 -> L1 promotion
+- Coalescing metrics
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_cache_coalescing.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.recommendation.performance import (
+    CacheConfig,
+    MultiLevelCache,
+    cached,
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = MultiLevelCache(CacheConfig(l2_db_path=str(tmp_path / "cache.db")))
+    yield cache
+    cache.close()
+
+
+def _run_concurrently(n, fn):
+    """Call ``fn`` from ``n`` threads at once, return results and errors."""
+    barrier = threading.Barrier(n)
+    results, errors = [], []
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+class TestSingleFlight:
+    """Tests for coalescing concurrent misses."""
+
+    def test_concurrent_misses_compute_once(self, cache):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"songs": [1, 2, 3]}
+
+        results, errors = _run_concurrently(8, lambda: cache.get_or_compute("recs", compute))
+
+        assert not errors
+        assert len(calls) == 1
+        assert results == [{"songs": [1, 2, 3]}] * 8
+        stats = cache.get_stats()['coalescing']
+        assert (stats.computes, stats.coalesced) == (1, 7)
+        assert cache.l2.get("recs") == {"songs": [1, 2, 3]}
+
+    def test_waiters_receive_the_error(self, cache):
+        def compute():
+            time.sleep(0.2)
+            raise RuntimeError("backend down")
+
+        results, errors = _run_concurrently(4, lambda: cache.get_or_compute("recs", compute))
+
+        assert not results
+        assert len(errors) == 4 and all(isinstance(e, RuntimeError) for e in errors)
+        assert cache.get_stats()['coalescing'].errors == 1
+        # Nothing cached, the next call computes again
+        assert cache.get_or_compute("recs", lambda: 42) == 42
+
+    def test_decorator_coalesces(self, cache):
+        calls = []
+
+        @cached(cache, ttl=60, key_prefix="recs")
+        def recommend(user_id):
+            calls.append(user_id)
+            time.sleep(0.1)
+            return [user_id]
+
+        results, _ = _run_concurrently(5, lambda: recommend(7))
+
+        assert results == [[7]] * 5
+        assert calls == [7]
+
+
+class TestEarlyRefresh:
+    """Tests for probabilistic refresh before expiry."""
+
+    def _expire_in(self, cache, key, seconds):
+        cache.l1._cache[key].expires_at = datetime.now() + timedelta(seconds=seconds)
+
+    def test_refreshes_near_expiry(self, cache):
+        cache.put("recs", "old", compute_seconds=5.0)
+        self._expire_in(cache, "recs", 0.001)
+
+        assert cache.get_or_compute("recs", lambda: "new") == "new"
+        assert cache.get_stats()['coalescing'].early_refreshes == 1
+        assert cache.get("recs") == "new"
+
+    def test_no_refresh_far_from_expiry_or_unknown_cost(self, cache):
+        cache.put("cheap", "cached")  # Cost unknown
+        self._expire_in(cache, "cheap", 0.001)
+        cache.put("fresh", "cached", compute_seconds=0.01)
+
+        for _ in range(50):
+            assert cache.get_or_compute("cheap", lambda: "new") == "cached"
+            assert cache.get_or_compute("fresh", lambda: "new") == "cached"
+        assert cache.get_stats()['coalescing'].early_refreshes == 0
+
+    def test_failed_refresh_serves_cached_value(self, cache):
+        cache.put("recs", "old", compute_seconds=5.0)
+        self._expire_in(cache, "recs", 0.001)
+
+        def compute():
+            raise RuntimeError("backend down")
+
+        assert cache.get_or_compute("recs", compute) == "old"
+
+    def test_promotion_keeps_compute_cost(self, cache):
+        cache.put("recs", "old", compute_seconds=5.0)
+        cache.l1.clear()
+
+        assert cache.get("recs") == "old"
+        assert cache.l1._cache["recs"].compute_seconds == 5.0
+
+        self._expire_in(cache, "recs", 0.001)
+        assert cache.get_or_compute("recs", lambda: "new") == "new"
+        assert cache.get_stats()['coalescing'].early_refreshes == 1
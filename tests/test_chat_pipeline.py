@@ -0,0 +1,572 @@
+"""
+=============================================================================
+CHAT PIPELINE - TEST SUITE
+=============================================================================
+
+Unit tests for the ChatOrchestrator recommendation pipeline.
+
+Test Coverage:
+- Batched personalization (PreferenceModel.predict_like_proba)
+- Reason generation for the final playlist only
+- PreferenceModelCache (LRU bounds, version invalidation, persisted store,
+  feedback tag invalidation)
+- WriteBehindWriter (batched history/playlist writes, barriers, shutdown)
+- PipelineTracer (spans, histograms, slow-trace ring buffer)
+- CandidatePoolCache (shared pools, TTL, catalog generation, catalog tag,
+  heard exclusion)
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_chat_pipeline.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import sqlite3
+import time
+from unittest.mock import MagicMock
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.src.ranking.preference_model import PreferenceModel
+from backend.services.chat_orchestrator import ChatOrchestrator, MoodResult
+from backend.services.preference_cache import PreferenceModelCache
+from backend.services.write_behind import (
+    WriteBehindWriter,
+    get_write_behind_writer,
+    shutdown_write_behind,
+)
+from backend.services.tracing import PipelineTracer, LatencyHistogram
+from backend.services.candidate_pool import CandidatePoolCache
+from backend.services.implicit_als import ALSModel
+from backend.repositories import (
+    CATALOG_TAG,
+    PlaylistRepository,
+    feedback_tag,
+    bump_catalog_generation,
+    get_catalog_generation,
+    get_invalidation_bus,
+    publish_invalidation,
+    user_tag,
+)
+
+
+def _make_songs(n: int = 30):
+    """Build a deterministic synthetic catalog."""
+    songs = []
+    for i in range(n):
+        songs.append({
+            "song_id": i + 1,
+            "song_name": f"Song {i + 1}",
+            "artist": f"Artist {i % 4}",
+            "genre": ["V-Pop", "Ballad", "Rock", "R&B"][i % 4],
+            "mood": ["happy", "sad"][i % 2],
+            "energy": (i * 37) % 100,
+            "valence": (i * 53) % 100,
+            "tempo": 70 + (i * 11) % 110,
+            "loudness": -((i * 7) % 30),
+            "danceability": (i * 29) % 100,
+            "acousticness": (i * 17) % 100,
+            "mood_score": 1.0 if i % 2 == 0 else 0.5,
+        })
+    return songs
+
+
+def _make_orchestrator(pref_model: PreferenceModel, user_prefs=None, embeddings=None):
+    """Create an orchestrator without touching the database."""
+    orchestrator = ChatOrchestrator.__new__(ChatOrchestrator)
+    orchestrator.prefs_repo = MagicMock()
+    orchestrator.prefs_repo.get_user_preferences.return_value = user_prefs or {
+        "mood": {}, "genre": {}, "artist": {}
+    }
+    orchestrator._get_pref_model = MagicMock(return_value=pref_model)
+    orchestrator.embeddings = embeddings
+    return orchestrator
+
+
+class TestBatchedPersonalization:
+    """Tests for the vectorized personalization stage."""
+
+    @pytest.fixture
+    def fitted_model(self):
+        songs = _make_songs(20)
+        labels = [1 if s["energy"] > 50 else 0 for s in songs]
+        return PreferenceModel().fit(songs, labels)
+
+    def test_predict_like_proba_matches_single(self, fitted_model):
+        """Batched probabilities equal the per-song predictions."""
+        songs = _make_songs(15)
+        batch = fitted_model.predict_like_proba(songs)
+
+        assert batch.shape == (15,)
+        for song, prob in zip(songs, batch):
+            _, single = fitted_model.predict_proba(song)
+            assert prob == pytest.approx(single)
+
+    def test_batch_predict_proba_returns_tuples(self, fitted_model):
+        songs = _make_songs(5)
+        result = fitted_model.batch_predict_proba(songs)
+
+        assert len(result) == 5
+        assert all(abs(a + b - 1.0) < 1e-9 for a, b in result)
+
+    def test_personalize_sorted_and_reasonless(self, fitted_model):
+        """Candidates are ranked by final score; reasons are deferred."""
+        orchestrator = _make_orchestrator(
+            fitted_model, {"mood": {"happy": 1.5}, "genre": {"Rock": 0.5}, "artist": {}}
+        )
+        mood_result = MoodResult(mood="happy", mood_vi="Vui", confidence=1.0, intensity="Vừa")
+
+        ranked = orchestrator._personalize(_make_songs(30), 1, mood_result)
+
+        assert len(ranked) == 30
+        scores = [r.final_score for r in ranked]
+        assert scores == sorted(scores, reverse=True)
+        assert all(r.reason == "" for r in ranked)
+        assert all(r.pref_score <= 2.0 for r in ranked)
+
+    def test_attach_reasons_only_final(self, fitted_model):
+        orchestrator = _make_orchestrator(fitted_model)
+        mood_result = MoodResult(mood="sad", mood_vi="Buồn", confidence=1.0, intensity="Nhẹ")
+
+        ranked = orchestrator._personalize(_make_songs(10), 1, mood_result)
+        final = orchestrator._attach_reasons(ranked[:3], mood_result)
+
+        assert all(r.reason for r in final)
+        assert all(r.reason == "" for r in ranked[3:])
+
+    def test_personalize_uses_als_affinity(self):
+        songs = [dict(song, mood_score=1.0) for song in _make_songs(4)]
+        model = ALSModel(
+            user_ids=np.array([1], dtype=np.int64),
+            song_ids=np.array([1, 2, 3], dtype=np.int64),
+            user_factors=np.array([[1.0, 0.0]], dtype=np.float32),
+            item_factors=np.array([[0.1, 1.0], [0.9, 0.0], [0.5, 0.0]], dtype=np.float32),
+        )
+        service = MagicMock()
+        service.model.return_value = model
+        orchestrator = _make_orchestrator(PreferenceModel(), embeddings=service)
+        mood_result = MoodResult(mood="happy", mood_vi="Vui", confidence=1.0, intensity="Vừa")
+
+        ranked = orchestrator._personalize(songs, 1, mood_result)
+        assert [r.song_id for r in ranked] == [2, 3, 4, 1]
+        # Song 4 was not in training: neutral factor
+        assert {r.song_id: r.pref_score for r in ranked}[4] == pytest.approx(1.0)
+
+        # Users not seen in training are ranked without embeddings
+        unknown = orchestrator._personalize(songs, 2, mood_result)
+        assert [r.song_id for r in unknown] == [1, 2, 3, 4]
+
+    def test_personalize_empty(self, fitted_model):
+        orchestrator = _make_orchestrator(fitted_model)
+        mood_result = MoodResult(mood="happy", mood_vi="Vui", confidence=1.0, intensity="Vừa")
+
+        assert orchestrator._personalize([], 1, mood_result) == []
+
+
+class TestPreferenceModelCache:
+    """Tests for the bounded, version-checked preference model cache."""
+
+    @pytest.fixture
+    def trainer(self):
+        songs = _make_songs(20)
+        labels = [1 if s["energy"] > 50 else 0 for s in songs]
+        calls = []
+
+        def train(user_id):
+            calls.append(user_id)
+            return PreferenceModel().fit(songs, labels)
+
+        train.calls = calls
+        return train
+
+    def test_hit_after_first_load(self, trainer):
+        cache = PreferenceModelCache(trainer, version_fn=lambda uid: 1)
+
+        first = cache.get(7)
+        second = cache.get(7)
+
+        assert first is second
+        assert trainer.calls == [7]
+        stats = cache.get_stats()
+        assert stats.hits == 1 and stats.misses == 1
+        assert stats.resident_models == 1
+        assert stats.resident_bytes > 0
+
+    def test_lru_eviction_by_count(self, trainer):
+        cache = PreferenceModelCache(trainer, version_fn=lambda uid: 1, max_models=2)
+
+        cache.get(1)
+        cache.get(2)
+        cache.get(1)  # 1 becomes most recently used
+        cache.get(3)
+
+        assert 1 in cache and 3 in cache
+        assert 2 not in cache
+        assert cache.get_stats().evictions == 1
+
+    def test_eviction_by_bytes(self, trainer):
+        cache = PreferenceModelCache(trainer, version_fn=lambda uid: 1, max_bytes=1)
+
+        cache.get(1)
+        cache.get(2)
+
+        assert len(cache) == 1
+        assert 2 in cache
+
+    def test_write_version_invalidates(self, trainer):
+        cache = PreferenceModelCache(trainer, version_fn=lambda uid: 5)
+
+        first = cache.get(1)
+        cache.record_write(1, 6)
+        second = cache.get(1)
+
+        assert first is not second
+        assert trainer.calls == [1, 1]
+
+    def test_stored_version_checked_on_every_get(self, trainer):
+        versions = {1: 5}
+        cache = PreferenceModelCache(trainer, version_fn=versions.get)
+
+        first = cache.get(1)
+        assert cache.get(1) is first
+
+        versions[1] = 6  # Feedback written without record_write
+        second = cache.get(1)
+
+        assert first is not second
+        assert trainer.calls == [1, 1]
+
+    def test_lazy_load_from_store(self, trainer, tmp_path):
+        cache = PreferenceModelCache(trainer, version_fn=lambda uid: 3, store_dir=str(tmp_path))
+        model = cache.get(1)
+        assert (tmp_path / "user_1.v3.pkl").exists()
+
+        fresh = PreferenceModelCache(trainer, version_fn=lambda uid: 3, store_dir=str(tmp_path))
+        loaded = fresh.get(1)
+
+        assert trainer.calls == [1]
+        assert fresh.get_stats().store_loads == 1
+        songs = _make_songs(5)
+        assert list(loaded.predict_like_proba(songs)) == pytest.approx(
+            list(model.predict_like_proba(songs))
+        )
+
+    def test_newer_version_replaces_stored_file(self, trainer, tmp_path):
+        versions = {1: 3}
+        cache = PreferenceModelCache(trainer, version_fn=versions.get, store_dir=str(tmp_path))
+        cache.get(1)
+        cache.record_write(1, 4)
+        cache.get(1)
+
+        assert not (tmp_path / "user_1.v3.pkl").exists()
+        assert (tmp_path / "user_1.v4.pkl").exists()
+
+    def test_feedback_tag_invalidates(self, trainer, tmp_path):
+        cache = PreferenceModelCache(trainer, version_fn=lambda uid: 3, store_dir=str(tmp_path))
+        cache.get(1)
+        cache.get(2)
+
+        publish_invalidation(user_tag(1))  # e.g. a chat history write
+        cache.get(1)
+        assert trainer.calls == [1, 2]
+
+        assert publish_invalidation(feedback_tag(1)) == 1
+        assert 1 not in cache and 2 in cache
+        cache.get(1)  # Retrained, not reloaded from the stale stored file
+        assert trainer.calls == [1, 2, 1]
+
+        # Still subscribed after the publish consumed the tag
+        assert publish_invalidation(feedback_tag(1)) == 1
+        cache.clear()
+        assert publish_invalidation(feedback_tag(2)) == 0
+
+
+class TestWriteBehindWriter:
+    """Tests for background history persistence and auto playlists."""
+
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        path = str(tmp_path / "chat.db")
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE chat_history (
+                history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                mood TEXT, intensity TEXT, song_id INTEGER, reason TEXT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE playlists (
+                playlist_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                description TEXT,
+                mood TEXT,
+                total_duration_seconds INTEGER DEFAULT 0,
+                song_count INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_auto_generated BOOLEAN DEFAULT FALSE
+            );
+            CREATE TABLE playlist_songs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                playlist_id INTEGER NOT NULL,
+                song_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        conn.close()
+        return path
+
+    @staticmethod
+    def _count(db_path, table):
+        conn = sqlite3.connect(db_path)
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _entries(n):
+        return [
+            {"mood": "Vui", "intensity": "Vừa", "song_id": i, "reason": "r"}
+            for i in range(n)
+        ]
+
+    def test_session_barrier_sees_writes(self, db_path):
+        writer = WriteBehindWriter(db_path)
+        writer.enqueue_history(1, "s1", self._entries(5))
+
+        assert writer.barrier(session_id="s1")
+        assert self._count(db_path, "chat_history") == 5
+        writer.close()
+
+    def test_writers_are_per_database(self, db_path, tmp_path):
+        other = str(tmp_path / "other.db")
+        try:
+            writer = get_write_behind_writer(db_path)
+            assert get_write_behind_writer(os.path.join(str(tmp_path), ".", "chat.db")) is writer
+            assert get_write_behind_writer(other) is not writer
+            assert get_write_behind_writer(other).db_path == os.path.realpath(other)
+        finally:
+            shutdown_write_behind()
+
+    def test_persist_returns_playlist_id_with_write_behind(self, db_path):
+        orchestrator = ChatOrchestrator.__new__(ChatOrchestrator)
+        orchestrator.playlist_repo = PlaylistRepository(db_path)
+        orchestrator.writer = WriteBehindWriter(db_path)
+        songs = [MagicMock(song_id=i, reason="r") for i in (3, 1, 2)]
+        mood_result = MoodResult(mood="happy", mood_vi="Vui", confidence=1.0, intensity="Vừa")
+
+        playlist_id = orchestrator._persist_results(1, songs, mood_result, "chip", "", "s1")
+
+        assert playlist_id is not None
+        conn = sqlite3.connect(db_path)
+        row = conn.execute(
+            "SELECT song_count, is_auto_generated, updated_at IS NOT NULL "
+            "FROM playlists WHERE playlist_id = ?", (playlist_id,)
+        ).fetchone()
+        positions = conn.execute(
+            "SELECT song_id FROM playlist_songs ORDER BY position"
+        ).fetchall()
+        conn.close()
+        assert row == (3, 1, 1)
+        assert [p[0] for p in positions] == [3, 1, 2]
+
+        assert orchestrator.writer.barrier(session_id="s1")
+        assert self._count(db_path, "chat_history") == 3
+        orchestrator.writer.close()
+
+    def test_writes_are_grouped(self, db_path):
+        writer = WriteBehindWriter(db_path, flush_interval=0.2)
+        for user_id in range(20):
+            writer.enqueue_history(user_id, f"s{user_id}", self._entries(2))
+
+        assert writer.flush()
+        stats = writer.get_stats()
+        assert stats.written == 20
+        assert stats.batches < 20
+        assert stats.pending == 0
+        writer.close()
+
+    def test_full_buffer_writes_synchronously(self, db_path):
+        writer = WriteBehindWriter(db_path, max_pending=0)
+        writer.enqueue_history(1, "s1", self._entries(3))
+
+        # Written on the caller's thread, no barrier needed
+        assert self._count(db_path, "chat_history") == 3
+        assert writer.get_stats().sync_fallbacks == 1
+        writer.close()
+
+    def test_close_flushes(self, db_path):
+        writer = WriteBehindWriter(db_path, flush_interval=1.0)
+        writer.enqueue_history(1, "s1", self._entries(4))
+        writer.close()
+
+        assert self._count(db_path, "chat_history") == 4
+
+    def test_failed_write_does_not_block_batch(self, db_path):
+        writer = WriteBehindWriter(db_path, flush_interval=0.2)
+        writer.enqueue_history(1, "s1", [{"song_id": 1}])
+        writer.enqueue_history(None, "s2", [{"song_id": 2}])  # violates NOT NULL
+        writer.enqueue_history(3, "s3", [{"song_id": 3}])
+
+        assert writer.flush()
+        assert self._count(db_path, "chat_history") == 2
+        assert writer.get_stats().failed == 1
+        writer.close()
+
+
+class TestPipelineTracer:
+    """Tests for per-request span recording."""
+
+    def test_spans_attach_to_current_trace(self):
+        tracer = PipelineTracer(slow_threshold_ms=0.0)
+
+        with tracer.trace("process_message", input_type="chip") as trace:
+            with tracer.span("mood_detection"):
+                pass
+            with tracer.span("personalization"):
+                pass
+
+        assert [s.name for s in trace.spans] == ["mood_detection", "personalization"]
+        assert trace.total_ms >= sum(s.duration_ms for s in trace.spans)
+        stats = tracer.get_stats()
+        assert stats["mood_detection"]["count"] == 1
+        assert stats["process_message.total"]["count"] == 1
+
+    def test_span_outside_trace_is_noop(self):
+        tracer = PipelineTracer()
+        with tracer.span("orphan"):
+            pass
+        assert tracer.get_stats() == {}
+
+    def test_slow_ring_buffer(self):
+        tracer = PipelineTracer(slow_threshold_ms=1e9, max_slow_traces=2)
+        with tracer.trace("fast"):
+            pass
+        assert tracer.get_slow_traces() == []
+
+        tracer.slow_threshold_ms = 0.0
+        for i in range(3):
+            with tracer.trace("slow", n=i):
+                pass
+
+        slow = tracer.get_slow_traces()
+        assert [t["attributes"]["n"] for t in slow] == [2, 1]
+
+    def test_admin_endpoints_require_admin(self, monkeypatch):
+        import jwt
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from backend.api.v1.admin import router
+        from backend.api.v1.dependencies import JWT_ALGORITHM, JWT_SECRET
+
+        monkeypatch.setenv("MMB_ADMIN_USER_IDS", "9")
+        app = FastAPI()
+        app.include_router(router, prefix="/admin")
+        client = TestClient(app)
+
+        def auth(user_id):
+            token = jwt.encode({"user_id": user_id}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+            return {"Authorization": f"Bearer {token}"}
+
+        assert client.get("/admin/pipeline/traces").status_code == 401
+        assert client.delete("/admin/pipeline/traces", headers=auth(1)).status_code == 403
+        assert client.get("/admin/pipeline/stats", headers=auth(9)).status_code == 200
+
+    def test_histogram_percentiles(self):
+        histogram = LatencyHistogram()
+        for value in [1] * 98 + [300, 3000]:
+            histogram.observe(value)
+
+        assert histogram.percentile(0.5) == 1
+        assert histogram.percentile(0.99) == 500
+        assert histogram.to_dict()["count"] == 100
+
+
+class TestCandidatePoolCache:
+    """Tests for the shared (mood, intensity) candidate pools."""
+
+    @pytest.fixture
+    def builder(self):
+        return MagicMock(side_effect=lambda mood, intensity: _make_songs(10))
+
+    def test_pool_shared_until_generation_changes(self, builder):
+        generation = [0]
+        pools = CandidatePoolCache(builder, generation_fn=lambda: generation[0])
+
+        first = pools.get("happy", "Vừa")
+        second = pools.get("HAPPY", "Vừa")
+        assert builder.call_count == 1
+        assert [s["song_id"] for s in first] == [s["song_id"] for s in second]
+
+        generation[0] += 1
+        pools.get("happy", "Vừa")
+        assert builder.call_count == 2
+        assert len(pools) == 1  # Older generation dropped
+
+    def test_ttl_expiry(self, builder):
+        pools = CandidatePoolCache(builder, ttl_seconds=0.0, generation_fn=lambda: 0)
+        pools.get("sad", "Nhẹ")
+        time.sleep(0.01)
+        pools.get("sad", "Nhẹ")
+
+        stats = pools.get_stats()
+        assert builder.call_count == 2
+        assert stats.expired == 1
+
+    def test_intensity_is_part_of_key_and_lru_bound(self, builder):
+        pools = CandidatePoolCache(builder, max_entries=2, generation_fn=lambda: 0)
+        for intensity in ["Nhẹ", "Vừa", "Mạnh"]:
+            pools.get("happy", intensity)
+
+        assert builder.call_count == 3
+        assert len(pools) == 2
+        assert pools.get_stats().evictions == 1
+
+    def test_catalog_tag_drops_pools(self, builder):
+        pools = CandidatePoolCache(builder, generation_fn=lambda: 0)
+        pools.get("happy", "Vừa")
+        key = ("happy", "Vừa", 0)
+        assert get_invalidation_bus().tags_of(pools, key) == (CATALOG_TAG,)
+
+        publish_invalidation(CATALOG_TAG)
+        assert len(pools) == 0
+        pools.get("happy", "Vừa")
+        assert builder.call_count == 2
+
+    def test_catalog_writes_advance_generation(self):
+        before = get_catalog_generation()
+        assert bump_catalog_generation() == before + 1
+
+    def test_heard_songs_moved_behind_fresh(self):
+        orchestrator = ChatOrchestrator.__new__(ChatOrchestrator)
+        orchestrator.history_repo = MagicMock()
+        orchestrator.history_repo.get_recent_chat_song_ids.return_value = [1, 2]
+        orchestrator.writer = MagicMock()
+        orchestrator.writer.pending_song_ids.return_value = [3]
+        pool = _make_songs(10)
+
+        enough = orchestrator._exclude_heard(pool, user_id=7, limit=5)
+        assert [s["song_id"] for s in enough] == [4, 5, 6, 7, 8, 9, 10]
+
+        topped_up = orchestrator._exclude_heard(pool, user_id=7, limit=9)
+        assert [s["song_id"] for s in topped_up] == [4, 5, 6, 7, 8, 9, 10, 1, 2, 3]
+
+    def test_pool_ranked_by_mood_then_energy(self):
+        orchestrator = ChatOrchestrator.__new__(ChatOrchestrator)
+        orchestrator.mood_engine = MagicMock()
+        orchestrator.mood_engine.predict.side_effect = lambda song: {"mood": song["mood"]}
+
+        ranked = orchestrator._score_by_predicted_mood(_make_songs(20), "happy", "Mạnh", 20)
+
+        assert all(s["predicted_mood"] == "happy" for s in ranked[:10])
+        distances = [abs(s["energy"] - 90) for s in ranked[:10]]
+        assert distances == sorted(distances)
@@ -0,0 +1,174 @@
+"""
+=============================================================================
+CLUSTERING - TEST SUITE
+=============================================================================
+
+Unit tests for the shared mini-batch k-means and its consumers.
+
+Test Coverage:
+- k-means++ / mini-batch k-means (recovery, determinism, edge cases)
+- SongSimilarityEngine.cluster_by_similarity
+- ClusterManager build, persistence and incremental assignment
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_clustering.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import sqlite3
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.src.ranking.clustering import assign_clusters, minibatch_kmeans
+from backend.src.pipelines.song_similarity import SongSimilarityEngine
+from backend.services.recommendation.performance import ClusterManager
+
+
+def _blobs(per_blob: int = 300, seed: int = 3):
+    """Three well-separated 2-D blobs."""
+    rng = np.random.default_rng(seed)
+    centers = np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 10.0]])
+    X = np.vstack([c + rng.normal(scale=0.5, size=(per_blob, 2)) for c in centers])
+    return X, np.repeat(np.arange(3), per_blob)
+
+
+class TestMiniBatchKMeans:
+    """Tests for minibatch_kmeans."""
+
+    def test_recovers_blobs(self):
+        X, truth = _blobs()
+        result = minibatch_kmeans(X, 3, batch_size=64, seed=1)
+
+        # Each true blob maps to exactly one cluster
+        for blob in range(3):
+            assert len(set(result.labels[truth == blob].tolist())) == 1
+        assert len(set(result.labels.tolist())) == 3
+
+    def test_deterministic_for_seed(self):
+        X, _ = _blobs()
+        first = minibatch_kmeans(X, 4, batch_size=64, seed=7)
+        second = minibatch_kmeans(X, 4, batch_size=64, seed=7)
+
+        assert np.array_equal(first.labels, second.labels)
+        assert np.allclose(first.centroids, second.centroids)
+
+    def test_labels_match_assignment(self):
+        X, _ = _blobs(50)
+        result = minibatch_kmeans(X, 3)
+
+        labels, distances = assign_clusters(X, result.centroids)
+        assert np.array_equal(labels, result.labels)
+        assert result.inertia == pytest.approx(distances.sum())
+
+    def test_small_inputs(self):
+        assert minibatch_kmeans(np.empty((0, 2)), 3).labels.size == 0
+
+        result = minibatch_kmeans(np.ones((4, 2)), 3)
+        assert result.centroids.shape == (3, 2)
+        assert result.inertia == pytest.approx(0.0)
+
+
+class TestCatalogClustering:
+    """Tests for SongSimilarityEngine.cluster_by_similarity."""
+
+    def test_partitions_all_songs(self):
+        songs = [
+            {"song_id": i, "energy": e, "happiness": h, "mood": m, "genre": g}
+            for i, (e, h, m, g) in enumerate(
+                [(10, 10, "sad", "ballad"), (90, 90, "happy", "edm")] * 20, start=1
+            )
+        ]
+
+        clusters = SongSimilarityEngine().cluster_by_similarity(songs, n_clusters=2)
+
+        assert sorted(len(c) for c in clusters.values()) == [20, 20]
+        for members in clusters.values():
+            assert len({s["mood"] for s in members}) == 1
+
+    def test_fewer_songs_than_clusters(self):
+        songs = [{"song_id": 1}, {"song_id": 2}]
+        assert SongSimilarityEngine().cluster_by_similarity(songs, n_clusters=5) == {0: songs}
+
+
+class TestClusterManager:
+    """Tests for persisted emotion clusters."""
+
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        path = str(tmp_path / "music.db")
+        rng = np.random.default_rng(0)
+        con = sqlite3.connect(path)
+        con.execute(
+            "CREATE TABLE songs (song_id INTEGER PRIMARY KEY, valence REAL, energy REAL, mood TEXT)"
+        )
+        rows = []
+        for mood, (v, a) in (("happy", (85, 80)), ("sad", (15, 20)), ("angry", (20, 90))):
+            for _ in range(40):
+                rows.append((float(v + rng.normal(0, 3)), float(a + rng.normal(0, 3)), mood))
+        con.executemany("INSERT INTO songs (valence, energy, mood) VALUES (?, ?, ?)", rows)
+        con.commit()
+        con.close()
+        return path
+
+    def test_build_persists_and_reloads(self, db_path):
+        manager = ClusterManager(db_path, n_clusters=3)
+        manager.build_clusters()
+
+        assert {c.representative_mood for c in manager.clusters.values()} == {"happy", "sad", "angry"}
+
+        reloaded = ClusterManager(db_path, n_clusters=3)
+        assert reloaded.load_clusters()
+        assert reloaded.get_candidate_songs(mood="sad") == manager.get_candidate_songs(mood="sad")
+
+    def test_new_songs_assigned_without_rebuild(self, db_path):
+        ClusterManager(db_path, n_clusters=3).build_clusters()
+
+        con = sqlite3.connect(db_path)
+        con.execute("INSERT INTO songs (song_id, valence, energy, mood) VALUES (999, 84, 82, NULL)")
+        con.commit()
+        con.close()
+
+        manager = ClusterManager(db_path, n_clusters=3)
+        candidates = manager.get_candidate_songs(mood="happy", limit=1000)
+        assert 999 in candidates
+        assert sum(len(c.song_ids) for c in manager.clusters.values()) == 121
+
+    def test_nearest_cluster_by_va(self, db_path):
+        manager = ClusterManager(db_path, n_clusters=3)
+        manager.build_clusters()
+
+        # (20, 90) on the 0-100 scale maps to (-0.6, 0.8)
+        assert manager.get_nearest_cluster(-0.6, 0.8).representative_mood == "angry"
+
+    def test_mood_spanning_clusters_returns_all_songs(self, db_path):
+        manager = ClusterManager(db_path, n_clusters=6)
+        manager.build_clusters()
+
+        happy = [c for c in manager.clusters.values() if c.representative_mood == "happy"]
+        candidates = manager.get_candidate_songs(mood="happy", limit=1000)
+        assert sorted(candidates) == sorted(s for c in happy for s in c.song_ids)
+        assert len(candidates) == 40
+
+    def test_reload_drops_deleted_songs(self, db_path):
+        ClusterManager(db_path, n_clusters=3).build_clusters()
+
+        con = sqlite3.connect(db_path)
+        con.execute("DELETE FROM songs WHERE song_id <= 5")
+        con.commit()
+        con.close()
+
+        manager = ClusterManager(db_path, n_clusters=3)
+        assert manager.load_clusters()
+        members = {s for c in manager.clusters.values() for s in c.song_ids}
+        assert len(members) == 115 and not members & set(range(1, 6))
+
+        con = sqlite3.connect(db_path)
+        assert con.execute("SELECT COUNT(*) FROM song_clusters").fetchone()[0] == 115
+        con.close()
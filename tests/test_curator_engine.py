@@ -0,0 +1,270 @@
+"""
+=============================================================================
+CURATOR ENGINE - TEST SUITE
+=============================================================================
+
+Unit tests for CuratorEngine playlist sequencing.
+
+Test Coverage:
+- Precomputed Camelot/texture transition matrices
+- Vectorized pool scoring (matches per-candidate scoring)
+- Playlist generation over a TrackPool
+- Beam-search sequencing (determinism, quality, time budget)
+- Incremental skip re-routing (session reuse, lazy planning)
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_curator_engine.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import random
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.src.pipelines.curator_engine import (
+    CuratorEngine,
+    CuratorConfig,
+    EnergyCurveTemplates,
+    TrackPool,
+    CAMELOT_CODES,
+    CAMELOT_INDEX,
+    HARMONIC_MATRICES,
+    TEXTURE_MATRIX,
+    TEXTURE_ORDER,
+    _harmonic_flow_score,
+)
+from backend.src.pipelines.curator_types import (
+    CuratorTrack, PlaylistState, texture_transition_score
+)
+
+
+GENRES = ["rock", "edm", "acoustic", "ambient", "pop", None]
+
+
+def _make_tracks(n: int = 60, seed: int = 7):
+    """Build a deterministic synthetic pool."""
+    rng = random.Random(seed)
+    return [
+        CuratorTrack.from_song_dict({
+            "song_id": i,
+            "song_name": f"Song {i}",
+            "artist": f"Artist {i % 7}",
+            "genre": rng.choice(GENRES),
+            "energy": rng.uniform(0, 100),
+            "key": rng.choice([None] + list(range(12))),
+            "mode": rng.choice([0, 1]),
+            "energy_buildup": rng.uniform(0, 100),
+            "tension_level": rng.uniform(0, 100),
+            "acousticness": rng.uniform(0, 100),
+        })
+        for i in range(1, n + 1)
+    ]
+
+
+class TestTransitionMatrices:
+    """Tests for the precomputed lookup tables."""
+
+    def test_camelot_matrix_matches_pairwise_score(self):
+        matrix = HARMONIC_MATRICES[True]
+        assert matrix.shape == (25, 25)  # 24 codes + unknown
+        for a in ("8A", "8B", "1A", "12B", "??"):
+            for b in CAMELOT_CODES:
+                assert matrix[CAMELOT_INDEX[a], CAMELOT_INDEX[b]] == _harmonic_flow_score(a, b, True)
+
+    def test_texture_matrix_matches_pairwise_score(self):
+        for i, a in enumerate(TEXTURE_ORDER):
+            for j, b in enumerate(TEXTURE_ORDER):
+                assert TEXTURE_MATRIX[i, j] == texture_transition_score(a, b)
+
+
+class TestVectorizedScoring:
+    """Tests for whole-pool scoring."""
+
+    @pytest.fixture
+    def tracks(self):
+        return _make_tracks()
+
+    @pytest.fixture
+    def state(self, tracks):
+        state = PlaylistState(recent_plays=[3, 4, 5], recent_skips=[7, 9])
+        state.record_skip(tracks[10])
+        return state
+
+    @pytest.mark.parametrize("target", [10.0, 45.0, 80.0])
+    def test_pool_scores_match_single(self, tracks, state, target):
+        engine = CuratorEngine()
+        pool = TrackPool(tracks)
+
+        for current in tracks[:10]:
+            vectorized = engine._score_pool(current, pool, target, state)
+            expected = [engine._score_candidate(current, c, target, state) for c in tracks]
+            assert np.allclose(vectorized, expected)
+
+    def test_select_skips_used_tracks(self, tracks, state):
+        engine = CuratorEngine()
+        used = {t.song_id for t in tracks[:-1]}
+
+        chosen = engine._select_next_track(tracks[0], tracks, 50.0, state, used)
+        assert chosen.song_id == tracks[-1].song_id
+
+        assert engine._select_next_track(tracks[0], tracks, 50.0, state, used | {tracks[-1].song_id}) is None
+
+    def test_generate_playlist_unique_and_full(self, tracks):
+        engine = CuratorEngine(CuratorConfig(beam_width=1))
+        curve = EnergyCurveTemplates.party_build(20)
+
+        playlist = engine.generate_playlist(tracks[0], curve, TrackPool(tracks[1:]))
+
+        ids = [t.song_id for t in playlist]
+        assert len(ids) == 21
+        assert len(set(ids)) == len(ids)
+
+
+class TestBeamSequencing:
+    """Tests for the beam-search sequencer."""
+
+    @pytest.fixture
+    def tracks(self):
+        return _make_tracks(200)
+
+    def test_beam_is_deterministic(self, tracks):
+        engine = CuratorEngine(CuratorConfig(beam_width=4, beam_time_budget_ms=1000))
+        curve = EnergyCurveTemplates.healing_journey(12)
+
+        first = engine.generate_playlist(tracks[0], curve, tracks[1:])
+        second = engine.generate_playlist(tracks[0], curve, tracks[1:])
+
+        assert [t.song_id for t in first] == [t.song_id for t in second]
+        assert len({t.song_id for t in first}) == 13
+
+    def test_beam_beats_greedy_sampling(self, tracks):
+        curve = EnergyCurveTemplates.party_build(15)
+        beam = CuratorEngine(CuratorConfig(beam_width=4, beam_time_budget_ms=1000))
+        greedy = CuratorEngine(CuratorConfig(beam_width=1))
+        random.seed(0)
+
+        beam_score = beam.sequence_score(beam.generate_playlist(tracks[0], curve, tracks[1:]), curve)
+        greedy_scores = [
+            greedy.sequence_score(greedy.generate_playlist(tracks[0], curve, tracks[1:]), curve)
+            for _ in range(5)
+        ]
+
+        assert beam_score >= sum(greedy_scores) / len(greedy_scores)
+
+    def test_default_config_sequences_with_beam(self, tracks):
+        engine = CuratorEngine()
+        curve = EnergyCurveTemplates.party_build(30)
+        assert engine.cfg.beam_width > 1
+
+        random.seed(1)
+        first = engine.generate_playlist(tracks[0], curve, tracks[1:])
+        random.seed(2)
+        second = engine.generate_playlist(tracks[0], curve, tracks[1:])
+
+        # No sampling involved: the seed does not change the playlist
+        assert [t.song_id for t in first] == [t.song_id for t in second]
+        assert len({t.song_id for t in first}) == 31
+
+    def test_beam_never_repeats_duplicated_songs(self, tracks):
+        engine = CuratorEngine(CuratorConfig(beam_width=4, beam_time_budget_ms=1000))
+        pool = tracks[1:20] * 3  # Every song appears in three pool rows
+
+        playlist = engine.generate_playlist(tracks[0], [50.0] * 30, pool)
+
+        ids = [t.song_id for t in playlist]
+        assert len(ids) == 20
+        assert len(set(ids)) == len(ids)
+
+    def test_exhausted_time_budget_still_completes(self, tracks):
+        engine = CuratorEngine(CuratorConfig(beam_width=8, beam_time_budget_ms=0.0))
+        curve = EnergyCurveTemplates.wind_down(10)
+
+        playlist = engine.generate_playlist(tracks[0], curve, tracks[1:])
+        assert len(playlist) == 11
+
+    def test_small_pool_stops_when_exhausted(self, tracks):
+        engine = CuratorEngine()
+        playlist = engine.generate_playlist(tracks[0], [50.0] * 10, tracks[1:4])
+        assert [t.song_id for t in playlist[:1]] == [tracks[0].song_id]
+        assert len(playlist) == 4
+
+
+class TestIncrementalRerouting:
+    """Tests for skip handling with a kept RerouteSession."""
+
+    @pytest.fixture
+    def tracks(self):
+        return _make_tracks(300)
+
+    @pytest.fixture
+    def state(self, tracks):
+        engine = CuratorEngine()
+        curve = EnergyCurveTemplates.party_build(20)
+        playlist = engine.generate_playlist(tracks[0], curve[1:], tracks[1:])
+        return PlaylistState(tracks=playlist, energy_curve=curve, current_index=2)
+
+    def test_session_reused_across_skips(self, tracks, state):
+        engine = CuratorEngine()
+        pool = TrackPool(tracks)
+
+        engine.handle_skip(state, pool)
+        session = state.reroute_session
+        engine.handle_skip(state, pool)
+
+        assert state.reroute_session is session
+        assert session.cache_hits >= 1  # Same previous track and target
+
+    def test_skipped_tracks_never_return(self, tracks, state):
+        engine = CuratorEngine()
+        pool = TrackPool(tracks)
+        skipped = []
+
+        for _ in range(5):
+            skipped.append(state.current_track.song_id)
+            engine.handle_skip(state, pool)
+            engine.reroute_upcoming(state, pool)
+
+        ids = [t.song_id for t in state.tracks]
+        assert len(ids) == len(state.energy_curve)
+        assert len(ids) == len(set(ids))
+        assert not set(skipped) & set(ids)
+
+    def test_reroute_keeps_playlist_length(self, tracks, state):
+        engine = CuratorEngine()
+        pool = TrackPool(tracks)
+        length = len(state.tracks)
+        tail = state.tracks[state.current_index + 4:]
+
+        engine.handle_skip(state, pool)
+        segment = engine.reroute_upcoming(state, pool, lookahead=3)
+
+        assert len(segment) == 3
+        assert len(state.tracks) == length
+        assert state.tracks[state.current_index + 1:state.current_index + 4] == segment
+        assert state.tracks[state.current_index + 4:] == tail
+        ids = [t.song_id for t in state.tracks]
+        assert len(ids) == len(set(ids))
+
+    def test_plan_ahead_extends_lazily(self, tracks, state):
+        engine = CuratorEngine()
+        pool = TrackPool(tracks)
+        del state.tracks[state.current_index + 2:]
+
+        added = engine.plan_ahead(state, pool, lookahead=3)
+        assert len(added) == 2
+        assert len(state.tracks) == state.current_index + 4
+        assert engine.plan_ahead(state, pool, lookahead=3) == []
+
+    def test_plan_ahead_stops_at_curve_end(self, tracks, state):
+        engine = CuratorEngine()
+        state.current_index = len(state.energy_curve) - 2
+        engine.reroute_upcoming(state, tracks, lookahead=5)
+
+        assert len(state.tracks) == len(state.energy_curve)
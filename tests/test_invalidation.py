@@ -0,0 +1,280 @@
+"""
+=============================================================================
+CACHE INVALIDATION BUS - TEST SUITE
+=============================================================================
+
+Unit tests for tag-based cache invalidation.
+
+Test Coverage:
+- Tag/untag/publish bookkeeping
+- Song, feedback and history writes invalidating tagged entries
+- Write-behind history batches publishing after commit
+- Persisted L2 tags surviving restarts and resolved on disk
+- L2 -> L1 promotion keeping tags
+- TF-IDF search results tagged with the catalog
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_invalidation.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import sqlite3
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.repositories import (
+    CATALOG_TAG,
+    FeedbackRepository,
+    HistoryRepository,
+    InvalidationBus,
+    SongRepository,
+    feedback_tag,
+    get_invalidation_bus,
+    song_tag,
+    user_tag,
+)
+from backend.src.repo import history_repo
+from backend.src.search.tfidf_search import create_search_engine
+from backend.src.services.cache_service import LRUCache, cached, get_cache
+from backend.services.write_behind import WriteBehindWriter
+from backend.services.recommendation.performance import (
+    CacheConfig,
+    MultiLevelCache,
+    PersistentCache,
+)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "music.db")
+    con = sqlite3.connect(path)
+    con.execute(
+        "CREATE TABLE songs (song_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, "
+        "artist TEXT, genre TEXT, mood TEXT, mood_confidence REAL)"
+    )
+    con.execute(
+        "CREATE TABLE feedback (feedback_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "user_id INTEGER, song_id INTEGER, feedback_type TEXT, history_id INTEGER, "
+        "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+    con.execute(
+        "CREATE TABLE chat_history (history_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "user_id INTEGER, mood TEXT, intensity TEXT, song_id INTEGER, reason TEXT)"
+    )
+    con.executemany(
+        "INSERT INTO songs (song_id, name, artist) VALUES (?, ?, 'A')",
+        [(1, "Song 1"), (2, "Song 2")]
+    )
+    con.commit()
+    con.close()
+    return path
+
+
+class _Cache:
+    """Minimal cache exposing the delete(key) hook."""
+
+    def __init__(self, **entries):
+        self.entries = entries
+
+    def delete(self, key):
+        return self.entries.pop(key, None) is not None
+
+
+class TestInvalidationBus:
+    """Tests for the tag index."""
+
+    def test_publish_deletes_exactly_tagged_keys(self):
+        bus = InvalidationBus()
+        first, second = _Cache(a=1, b=2, c=3), _Cache(a=1)
+        bus.tag(first, "a", [song_tag(1), CATALOG_TAG])
+        bus.tag(first, "b", [song_tag(2)])
+        bus.tag(second, "a", [song_tag(1)])
+
+        assert bus.publish(song_tag(1), CATALOG_TAG) == 2
+        assert first.entries == {"b": 2, "c": 3}
+        assert second.entries == {}
+        assert bus.publish(song_tag(1)) == 0
+
+        stats = bus.get_stats()
+        assert (stats.tagged_entries, stats.publishes, stats.invalidated) == (1, 2, 2)
+
+    def test_retag_and_untag(self):
+        bus = InvalidationBus()
+        cache = _Cache(a=1, b=2)
+        bus.tag(cache, "a", [user_tag(1)])
+        bus.tag(cache, "a", [user_tag(2)])
+        bus.tag(cache, "b", [user_tag(2)])
+        bus.untag(cache, "b")
+
+        assert bus.tags_of(cache, "a") == ("user:2",)
+        assert bus.publish(user_tag(1)) == 0
+        assert bus.publish(user_tag(2)) == 1
+        assert cache.entries == {"b": 2}
+
+        bus.tag(cache, "b", [user_tag(3)])
+        bus.untag_all(cache)
+        assert bus.publish(user_tag(3)) == 0
+
+
+class TestRepositoryWrites:
+    """Tests for writes publishing their tags."""
+
+    def test_song_update_invalidates_tagged_entries(self, db_path):
+        cache = LRUCache(max_size=10)
+        cache.set("song1", "x", tags=[song_tag(1)])
+        cache.set("song2", "y", tags=[song_tag(2)])
+        cache.set("listing", "z", tags=[CATALOG_TAG])
+        cache.set("untagged", "w")
+
+        assert SongRepository(db_path).update(1, name="Renamed")
+
+        assert cache.get("song1") is None
+        assert cache.get("listing") is None
+        assert cache.get("song2") == "y"
+        assert cache.get("untagged") == "w"
+
+    def test_feedback_invalidates_user_entries(self, db_path):
+        calls = []
+
+        @cached(cache_name="test_invalidation", tags=lambda user_id: [user_tag(user_id)])
+        def recommend(user_id):
+            calls.append(user_id)
+            return [user_id]
+
+        recommend(1)
+        recommend(2)
+        recommend(1)
+        assert calls == [1, 2]
+
+        FeedbackRepository(db_path).add(1, 2, "like")
+        recommend(1)
+        recommend(2)
+        assert calls == [1, 2, 1]
+        get_cache("test_invalidation").clear()
+
+    def test_feedback_writes_publish_feedback_tag(self, db_path):
+        cache = LRUCache(max_size=10)
+        repo = FeedbackRepository(db_path)
+        for write in (lambda: repo.add(1, 2, "like"), lambda: repo.update_feedback(1, 2, "dislike")):
+            cache.set("model", "m", tags=[feedback_tag(1)])
+            write()
+            assert cache.get("model") is None
+
+    def test_history_writes_invalidate_user_entries(self, db_path):
+        cache = LRUCache(max_size=10)
+
+        def invalidated_by(write):
+            cache.set("u1", "x", tags=[user_tag(1)])
+            cache.set("u2", "y", tags=[user_tag(2)])
+            write()
+            assert cache.get("u1") is None
+            assert cache.get("u2") == "y"
+
+        con = history_repo.connect(db_path)
+        history_repo.ensure_history_table(con)
+        invalidated_by(lambda: history_repo.add_history_entry(con, 1, 1))
+        invalidated_by(lambda: history_repo.delete_history_entry(con, 1, 1))
+        invalidated_by(lambda: history_repo.clear_user_history(con, 1))
+        con.close()
+
+        repo = HistoryRepository(db_path)
+        invalidated_by(lambda: repo.add_chat_entry(1, mood="happy", song_id=1))
+        invalidated_by(lambda: repo.clear_user_history(1))
+
+    def test_write_behind_publishes_after_commit(self, db_path):
+        committed = []
+
+        class _Probe:
+            def delete(self, key):
+                con = sqlite3.connect(db_path)
+                committed.append(con.execute("SELECT COUNT(*) FROM chat_history").fetchone()[0])
+                con.close()
+
+        probe = _Probe()
+        get_invalidation_bus().tag(probe, "recs", [user_tag(1)])
+        writer = WriteBehindWriter(db_path)
+        writer.enqueue_history(1, "s1", [{"song_id": 1}, {"song_id": 2}])
+        assert writer.flush()
+        writer.close()
+
+        assert committed == [2]
+
+    def test_eviction_untags(self):
+        cache = LRUCache(max_size=1)
+        cache.set("a", 1, tags=[song_tag(99)])
+        cache.set("b", 2)
+
+        assert get_invalidation_bus().tags_of(cache, "a") == ()
+
+
+class TestTieredCacheTags:
+    """Tests for tags on the persistent and multi-level caches."""
+
+    def test_persistent_tags_survive_restart(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        cache = PersistentCache(path)
+        cache.put("a", 1, tags=[user_tag(5)])
+        cache.put("b", 2, tags=[user_tag(6)])
+        cache.close()
+
+        reopened = PersistentCache(path)
+        assert get_invalidation_bus().publish(user_tag(5)) == 1
+        assert reopened.get("a") is None
+        assert reopened.get("b") == 2
+
+        con = sqlite3.connect(path)
+        assert con.execute("SELECT key, tag FROM l2_cache_tags").fetchall() == [("b", "user:6")]
+        con.close()
+        reopened.close()
+
+    def test_persistent_invalidates_entries_of_other_writers(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        cache = PersistentCache(path)
+        other = PersistentCache(path)  # e.g. another worker on the same file
+        other.put("a", 1, tags=[song_tag(7), CATALOG_TAG])
+        other.put("b", 2, tags=[song_tag(8)])
+        other.close()
+
+        assert cache.tags_of("a") == ("catalog", "song:7")
+        assert get_invalidation_bus().publish(song_tag(7)) == 1
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+
+        con = sqlite3.connect(path)
+        assert con.execute("SELECT key FROM l2_cache_tags").fetchall() == [("b",)]
+        con.close()
+        cache.close()
+
+    def test_promotion_keeps_tags(self, tmp_path):
+        cache = MultiLevelCache(CacheConfig(l2_db_path=str(tmp_path / "cache.db")))
+        cache.put("a", {"song_id": 3}, tags=[song_tag(3)])
+        cache.l1.clear()
+
+        assert cache.get("a") == {"song_id": 3}
+        assert get_invalidation_bus().tags_of(cache.l1, "a") == ("song:3",)
+
+        get_invalidation_bus().publish(song_tag(3))
+        assert cache.get("a") is None
+        cache.close()
+
+
+class TestSearchCacheTags:
+    """Tests for tags on the TF-IDF search cache."""
+
+    def test_results_carry_catalog_tag(self):
+        engine = create_search_engine([
+            {"song_id": i, "name": f"Song {i}", "artist": "Artist", "genre": "pop", "mood": "happy"}
+            for i in range(1, 6)
+        ])
+        results = engine.smart_search("Song 3", top_k=3)
+        assert results
+        key = next(iter(engine._cache.cache))
+        assert CATALOG_TAG in get_invalidation_bus().tags_of(engine._cache, key)
+
+        get_invalidation_bus().publish(CATALOG_TAG)
+        assert len(engine._cache.cache) == 0
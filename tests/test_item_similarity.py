@@ -0,0 +1,171 @@
+"""
+=============================================================================
+ITEM SIMILARITY - TEST SUITE
+=============================================================================
+
+Unit tests for the sparse item-item co-occurrence model.
+
+Test Coverage:
+- Cosine co-occurrence from history and feedback
+- Top-N truncation
+- Shared id -> row lookup
+- Persistence and reloading
+- CollaborativeStrategy blending the model with popularity
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_item_similarity.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import sqlite3
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.item_similarity import (
+    ItemSimilarityModel,
+    ItemSimilarityService,
+    build_item_similarity,
+    get_item_similarity_service,
+    id_positions,
+)
+from backend.services.recommendation.multi_strategy_engine import (
+    CollaborativeStrategy,
+    RecommendationContext,
+    StrategyType,
+    create_multi_strategy_engine,
+)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Users 1-3 co-listen songs 1 and 2; song 3 is liked with song 1 once."""
+    path = str(tmp_path / "music.db")
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE songs (song_id INTEGER PRIMARY KEY, song_name TEXT)")
+    con.executemany("INSERT INTO songs VALUES (?, ?)", [(i, f"Song {i}") for i in range(1, 6)])
+    con.execute(
+        "CREATE TABLE listening_history (id INTEGER PRIMARY KEY, user_id INTEGER, "
+        "song_id INTEGER, liked INTEGER DEFAULT 0, play_count INTEGER DEFAULT 1, "
+        "last_played TIMESTAMP)"
+    )
+    con.executemany(
+        "INSERT INTO listening_history (user_id, song_id, play_count) VALUES (?, ?, ?)",
+        [(1, 1, 3), (1, 2, 3), (2, 1, 1), (2, 2, 1), (3, 1, 2), (3, 2, 2), (4, 4, 1), (5, 5, 1)]
+    )
+    con.execute(
+        "CREATE TABLE feedback (feedback_id INTEGER PRIMARY KEY, user_id INTEGER, "
+        "song_id INTEGER, feedback_type TEXT)"
+    )
+    con.executemany(
+        "INSERT INTO feedback (user_id, song_id, feedback_type) VALUES (?, ?, ?)",
+        [(1, 3, 'like'), (4, 5, 'like'), (4, 5, 'dislike'), (5, 4, 'dislike')]
+    )
+    con.commit()
+    con.close()
+    return path
+
+
+class TestBuild:
+    """Tests for the offline build."""
+
+    def test_cosine_neighbours(self, db_path):
+        model = build_item_similarity(db_path)
+
+        assert model.song_ids.tolist() == [1, 2, 3, 4, 5]
+        top = model.neighbours(1)
+        assert list(top) == [2, 3]
+        assert top[2] > 0.9
+        # Liked then disliked: no co-occurrence left between 4 and 5
+        assert model.neighbours(4) == {}
+        assert model.matrix.diagonal().tolist() == [0.0] * 5
+
+    def test_top_n_truncation(self, db_path):
+        model = build_item_similarity(db_path, top_n=1, block_size=2)
+
+        assert list(model.neighbours(1)) == [2]
+        assert np.diff(model.matrix.indptr).max() == 1
+
+    def test_score_sums_seed_rows(self, db_path):
+        model = build_item_similarity(db_path)
+        sims = model.neighbours(3)
+
+        scores = model.score([1, 2, 99], [3, 4, 99, "x"])
+
+        assert scores[0] == pytest.approx(sims[1] + sims.get(2, 0.0))
+        assert scores[1:].tolist() == [0.0, 0.0, 0.0]
+
+        # Mean over the two seeds found in the model
+        means = model.score([1, 2, 99], [3, 4], mean=True)
+        assert means[0] == pytest.approx(scores[0] / 2)
+        assert means.max() <= 1.0
+
+    def test_id_positions(self):
+        ids = np.array([3, 7, 9], dtype=np.int64)
+
+        assert id_positions(ids, np.array([9, 1, 7, 10])).tolist() == [2, -1, 1, -1]
+        assert id_positions(ids[:0], np.array([3])).tolist() == [-1]
+
+
+class TestService:
+    """Tests for persistence and reloading."""
+
+    def test_rebuild_persists_and_reloads(self, db_path, tmp_path):
+        path = str(tmp_path / "sim.npz")
+        service = ItemSimilarityService(db_path, path, check_interval=0.0)
+        assert service.model() is None
+
+        built = service.rebuild()
+        loaded = ItemSimilarityModel.load(path)
+
+        assert loaded.song_ids.tolist() == built.song_ids.tolist()
+        assert (loaded.matrix != built.matrix).nnz == 0
+        assert ItemSimilarityService(db_path, path).model().nnz == built.nnz
+
+
+class TestCollaborativeStrategy:
+    """Tests for collaborative scoring from the model."""
+
+    def test_history_drives_scores(self, db_path, tmp_path):
+        service = ItemSimilarityService(db_path, str(tmp_path / "sim.npz"))
+        model = service.rebuild()
+        strategy = CollaborativeStrategy(item_similarity=service)
+        context = RecommendationContext(user_id=9, target_mood="happy", user_history=[{"song_id": 1}])
+
+        related = strategy.score({"song_id": 2, "play_count": 0}, context)
+        unrelated = strategy.score({"song_id": 4, "play_count": 0}, context)
+        popular = strategy.score({"song_id": 4, "play_count": 5000}, context)
+        fallback = CollaborativeStrategy().score({"song_id": 4, "play_count": 5000}, context).score
+
+        assert related.components["co_occurrence"] == pytest.approx(model.neighbours(1)[2])
+        assert unrelated.components["co_occurrence"] == 0.0
+        # Co-occurrence is blended with popularity, not substituted for it
+        assert related.score == pytest.approx(0.7 * model.neighbours(1)[2])
+        assert popular.score == pytest.approx(0.3 * fallback)
+        assert related.score > popular.score > unrelated.score
+        assert "alongside" in strategy.explain({"song_id": 2}, related, context)
+
+    def test_without_known_history_uses_popularity(self, db_path, tmp_path):
+        service = ItemSimilarityService(db_path, str(tmp_path / "sim.npz"))
+        service.rebuild()
+        context = RecommendationContext(user_id=9, target_mood="happy", user_history=[{"song_id": 99}])
+        song = {"song_id": 4, "play_count": 50}
+
+        assert (
+            CollaborativeStrategy(item_similarity=service).score(song, context).score
+            == CollaborativeStrategy().score(song, context).score
+        )
+
+    def test_engine_defaults_to_shared_service(self, db_path, monkeypatch):
+        monkeypatch.setenv("MMB_DB_PATH", db_path)
+
+        engine = create_multi_strategy_engine()
+
+        strategy = engine.strategies[StrategyType.COLLABORATIVE]
+        assert strategy.item_similarity is get_item_similarity_service(db_path)
@@ -0,0 +1,194 @@
+"""
+=============================================================================
+MOOD TRANSITION - TEST SUITE
+=============================================================================
+
+Unit tests for MoodTransitionEngine.
+
+Test Coverage:
+- Precomputed all-pairs transition paths
+- Vectorized transition playlists with cached step pools
+- Thread-safe catalog feature cache
+- Mood journeys keeping the requested phase shape
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_mood_transition.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import random
+import threading
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.repositories import bump_catalog_generation
+from backend.src.pipelines.mood_transition import MoodTransitionEngine, TransitionSpeed
+
+
+MOODS = ["happy", "sad", "energetic", "stress", "angry"]
+
+
+def _make_songs(n: int = 500, seed: int = 5):
+    """Build a deterministic synthetic catalog."""
+    rng = random.Random(seed)
+    return [
+        {
+            "song_id": i,
+            "mood": rng.choice(MOODS + [None]),
+            "energy": rng.choice([None, rng.uniform(0, 100)]),
+            "happiness": rng.uniform(0, 100),
+            "danceability": rng.uniform(0, 100),
+            "tempo": rng.uniform(60, 190),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def _reference_playlist(engine, source, target, songs, speed, songs_per_step):
+    """Per-song scoring as in the original implementation."""
+    path = engine.calculate_transition(source, target, speed)
+    playlist = []
+    for step in path.steps:
+        candidates = []
+        for song in songs:
+            if song.get("song_id") in [s.get("song_id") for s in playlist]:
+                continue
+            score = 50.0 if song.get("mood") == step.mood else 0.0
+            for feature, value in step.feature_targets.items():
+                if song.get(feature) is not None:
+                    score += max(0, 25 - abs(float(song[feature]) - value) * 0.3)
+            candidates.append((song, score))
+        candidates.sort(key=lambda x: x[1], reverse=True)
+        playlist.extend(song for song, _ in candidates[:songs_per_step])
+    return [s["song_id"] for s in playlist]
+
+
+class TestTransitionPaths:
+    """Tests for the all-pairs path table."""
+
+    def test_known_paths(self):
+        engine = MoodTransitionEngine()
+
+        assert engine._find_shortest_path("sad", "sad") == ["sad"]
+        assert engine._find_shortest_path("energetic", "happy") == ["energetic", "happy"]
+        assert engine._find_shortest_path("sad", "angry") == ["sad", "stress", "angry"]
+        assert engine._find_shortest_path("happy", "angry") == ["happy", "energetic", "stress", "angry"]
+
+    def test_every_pair_is_a_natural_path(self):
+        engine = MoodTransitionEngine()
+
+        for source in MOODS:
+            for target in MOODS:
+                path = engine._find_shortest_path(source, target)
+                assert path[0] == source and path[-1] == target
+                for a, b in zip(path, path[1:]):
+                    assert b in engine.NATURAL_TRANSITIONS[a]
+
+    def test_unknown_mood_is_direct(self):
+        engine = MoodTransitionEngine()
+        assert engine._find_shortest_path("calm", "sad") == ["calm", "sad"]
+        assert engine._find_shortest_path("sad", "angry", max_depth=1) == ["sad", "angry"]
+
+
+class TestTransitionPlaylist:
+    """Tests for vectorized transition playlists."""
+
+    @pytest.fixture
+    def songs(self):
+        return _make_songs()
+
+    @pytest.mark.parametrize("source,target", [("sad", "energetic"), ("happy", "angry"), ("stress", "stress")])
+    def test_matches_per_song_scoring(self, songs, source, target):
+        engine = MoodTransitionEngine()
+
+        for speed in TransitionSpeed:
+            playlist = engine.get_transition_playlist(source, target, songs, speed, 3)
+            expected = _reference_playlist(engine, source, target, songs, speed, 3)
+            assert [s["song_id"] for s in playlist] == expected
+
+    def test_step_pools_reused_for_same_catalog(self, songs):
+        engine = MoodTransitionEngine()
+
+        first = engine.get_transition_playlist("sad", "happy", songs)
+        catalog = engine._catalog_features(songs)
+        pools = dict(catalog.step_pools)
+
+        second = engine.get_transition_playlist("sad", "happy", songs)
+        assert first == second
+        assert all(catalog.step_pools[k] is v for k, v in pools.items())
+
+    def test_catalog_cache_follows_generation(self, songs):
+        engine = MoodTransitionEngine()
+        catalog = engine._catalog_features(songs)
+
+        assert engine._catalog_features(list(songs)) is catalog
+        assert engine._catalog_features(songs[:100]) is not catalog
+
+        bump_catalog_generation()
+        assert engine._catalog_features(songs) is not catalog
+        assert len(engine._catalogs) == 1
+
+    def test_catalog_cache_thread_safe(self, songs):
+        engine = MoodTransitionEngine()
+        song_lists = [songs[:n] for n in range(20, 120, 10)]  # More than MAX_CATALOGS
+        errors = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(200):
+                    engine._catalog_features(rng.choice(song_lists))
+            except Exception as e:
+                errors.append(e)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # Interleave threads aggressively
+        try:
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        assert errors == []
+        assert len(engine._catalogs) <= engine.MAX_CATALOGS
+
+    def test_no_duplicate_songs(self, songs):
+        engine = MoodTransitionEngine()
+        playlist = engine.get_transition_playlist(
+            "happy", "angry", songs[:10], TransitionSpeed.GRADUAL, songs_per_step=4
+        )
+
+        ids = [s["song_id"] for s in playlist]
+        assert len(ids) == len(set(ids)) == 10
+
+
+class TestMoodJourney:
+    """Tests for journey planning."""
+
+    def test_medium_journey_keeps_requested_phases(self):
+        engine = MoodTransitionEngine()
+        random.seed(3)
+
+        journey = engine.get_mood_journey(40, start_mood="sad", end_mood="angry")
+        moods = [p["mood"] for p in journey["phases"]]
+
+        assert len(moods) == 3
+        assert moods[0] == "sad" and moods[1] in engine.NATURAL_TRANSITIONS["sad"]
+        assert moods[-1] == journey["end_mood"] == "angry"
+
+    def test_long_journey_appends_end_mood_once(self):
+        engine = MoodTransitionEngine()
+        random.seed(1)
+
+        journey = engine.get_mood_journey(90, start_mood="happy", end_mood="angry")
+
+        assert len(journey["phases"]) in (3, 4)
+        assert journey["end_mood"] == "angry"
@@ -0,0 +1,197 @@
+"""
+=============================================================================
+MULTI-STRATEGY ENGINE - TEST SUITE
+=============================================================================
+
+Unit tests for vectorized strategy scoring and fusion.
+
+Test Coverage:
+- Candidate feature matrix
+- Batch scoring consistent with single-song scoring
+- Array fusion and top-k selection
+- Exploration/exploitation weight selection
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_multi_strategy.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import math
+import random
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.recommendation.multi_strategy_engine import (
+    CandidateFeatures,
+    ExplorationExploitationBalancer,
+    ExplorationMethod,
+    MultiStrategyEngine,
+    RecommendationContext,
+    StrategyType,
+)
+from backend.services.popularity_stats import PopularityStatsService
+
+
+def _make_songs(n: int = 100, seed: int = 4):
+    """Build a deterministic synthetic candidate list."""
+    rng = random.Random(seed)
+    songs = []
+    for i in range(1, n + 1):
+        song = {
+            "song_id": i,
+            "artist": f"Artist {rng.randint(0, 10)}",
+            "genre": rng.choice(["pop", "rock", "dance", "jazz", None]),
+            "mood": rng.choice(["happy", "sad", "calm"]),
+            "play_count": rng.randint(0, 3000),
+            "like_count": rng.randint(0, 200),
+        }
+        for key in ("valence", "arousal", "energy", "tempo"):
+            if rng.random() < 0.8:
+                song[key] = rng.uniform(60, 180) if key == "tempo" else rng.uniform(-1, 1)
+        songs.append(song)
+    return songs
+
+
+@pytest.fixture
+def popularity(tmp_path):
+    """Popularity service on an empty database (no catalog-wide plays)."""
+    return PopularityStatsService(str(tmp_path / "music.db"))
+
+
+@pytest.fixture
+def context():
+    songs = _make_songs(6)
+    return RecommendationContext(
+        user_id=1,
+        target_mood="sad",
+        user_preferences={"genres": {"pop": 0.9}, "artists": {"artist 3": 0.8}},
+        user_history=songs,
+        session_songs=[2, 5],
+    )
+
+
+class TestCandidateFeatures:
+    """Tests for the candidate feature matrix."""
+
+    def test_missing_values_and_encoding(self):
+        features = CandidateFeatures.from_songs([
+            {"song_id": 1, "genre": "Pop", "energy": 0.4, "tempo": "fast"},
+            {"id": 2, "genre": "pop", "artist": None},
+        ])
+
+        assert features.song_ids == [1, 2]
+        assert features.column("energy", 0.5).tolist() == [0.4, 0.5]
+        assert features.column("tempo", 120).tolist() == [120, 120]
+        assert features.genres == ["pop"]
+        assert features.genre_codes.tolist() == [0, 0]
+        assert features.artists[features.artist_codes[1]] == ""
+
+
+class TestBatchScoring:
+    """Tests for per-strategy score vectors."""
+
+    def test_single_song_scores_match_batch(self, context, popularity):
+        songs = _make_songs()
+        features = CandidateFeatures.from_songs(songs)
+
+        for strategy_type, strategy in MultiStrategyEngine(popularity=popularity).strategies.items():
+            if strategy_type == StrategyType.EXPLORATION:
+                continue  # Random boost
+            batch = strategy.score_batch(features, context)
+            assert batch.scores.shape == (len(songs),)
+            for i in (0, 17, 63):
+                assert strategy.score(songs[i], context) == batch.at(i)
+
+    def test_emotion_falls_back_to_mood(self, context, popularity):
+        strategy = MultiStrategyEngine(popularity=popularity).strategies[StrategyType.EMOTION]
+        score = strategy.score({"song_id": 1, "mood": "Sad", "valence": 0.0}, context)
+
+        assert score.score == 1.0
+        assert score.confidence == 0.9
+
+    def test_diversity_penalties(self, context, popularity):
+        strategy = MultiStrategyEngine(popularity=popularity).strategies[StrategyType.DIVERSITY]
+        history_artist = context.user_history[0]["artist"]
+        artist_count = sum(1 for h in context.user_history if h["artist"] == history_artist)
+
+        score = strategy.score({"song_id": 5, "artist": history_artist, "genre": "metal"}, context)
+
+        artist_penalty = min(artist_count * 0.3, 1.0)
+        assert score.components["artist_penalty"] == pytest.approx(artist_penalty)
+        assert score.components["average_penalty"] == pytest.approx((artist_penalty + 1.0) / 3)
+
+
+class TestFusion:
+    """Tests for array fusion inside recommend()."""
+
+    def test_top_k_from_weighted_sum(self, context, popularity):
+        songs = _make_songs(300)
+        engine = MultiStrategyEngine(popularity=popularity)
+        engine.strategies[StrategyType.EXPLORATION]._rng = np.random.default_rng(0)
+
+        result = engine.recommend(songs, context, top_k=8)
+
+        weights = result.strategy_weights_used
+        assert len(result.songs) == 8
+        for candidate in result.songs:
+            expected = sum(weights[st] * s.score for st, s in candidate.strategy_scores.items())
+            assert candidate.final_score == pytest.approx(expected)
+            assert candidate.selected_strategy == max(
+                candidate.strategy_scores,
+                key=lambda st: weights[st] * candidate.strategy_scores[st].score
+            )
+        scores = [c.final_score for c in result.songs]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_no_candidates(self, context, popularity):
+        result = MultiStrategyEngine(popularity=popularity).recommend([], context)
+        assert result.songs == []
+
+
+class TestBalancer:
+    """Tests for array-based weight selection."""
+
+    def test_ucb1_tries_untried_strategies_first(self):
+        balancer = ExplorationExploitationBalancer()
+        balancer.update_performance(StrategyType.EMOTION, 1.0, True)
+        balancer.update_performance(StrategyType.CONTENT, 0.5, True)
+
+        weights = balancer.select_weights(ExplorationMethod.UCB1, None)
+
+        assert weights[StrategyType.EMOTION] == 0.0
+        assert weights[StrategyType.COLLABORATIVE] == pytest.approx(1 / 3)
+
+        for st in StrategyType:
+            balancer.update_performance(st, 0.2, False)
+        weights = balancer.select_weights(ExplorationMethod.UCB1, None)
+        assert sum(weights.values()) == pytest.approx(1.0)
+        assert weights[StrategyType.COLLABORATIVE] == weights[StrategyType.DIVERSITY]
+        assert weights[StrategyType.EMOTION] > weights[StrategyType.CONTENT]
+
+    def test_methods_return_normalized_vectors(self):
+        balancer = ExplorationExploitationBalancer(seed=2)
+        balancer.update_performance(StrategyType.DIVERSITY, 1.0, True)
+
+        for method in ExplorationMethod:
+            vector = balancer.select_weight_vector(method, None)
+            assert vector.shape == (len(StrategyType),)
+            assert vector.sum() == pytest.approx(1.0)
+
+        softmax = balancer.select_weights(ExplorationMethod.SOFTMAX, None)
+        assert softmax[StrategyType.DIVERSITY] == pytest.approx(math.e / (math.e + 4))
+
+    def test_thompson_sampling_is_seeded(self):
+        first = ExplorationExploitationBalancer(seed=7).select_weight_vector(
+            ExplorationMethod.THOMPSON_SAMPLING, None
+        )
+        second = ExplorationExploitationBalancer(seed=7).select_weight_vector(
+            ExplorationMethod.THOMPSON_SAMPLING, None
+        )
+        assert first.tolist() == second.tolist()
@@ -0,0 +1,151 @@
+"""
+=============================================================================
+PERSISTENT CACHE - TEST SUITE
+=============================================================================
+
+Unit tests for the SQLite-backed L2 cache.
+
+Test Coverage:
+- Binary round-trips and persistence across instances
+- Batched hit counters
+- Size counter and batched eviction
+- Expiry
+- Compute cost stored with entries (including older tables)
+- Legacy JSON table dropped only when it has the old layout
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_persistent_cache.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import sqlite3
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.recommendation.performance import PersistentCache
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def _hits(db_path):
+    con = sqlite3.connect(db_path)
+    rows = dict(con.execute("SELECT key, hits FROM l2_cache"))
+    con.close()
+    return rows
+
+
+class TestPersistentCache:
+    """Tests for the redesigned persistent cache."""
+
+    def test_values_round_trip_and_persist(self, db_path):
+        cache = PersistentCache(db_path, compress_min_bytes=64)
+        small = {"song_id": 1, "ids": (1, 2), 3: "non-string key"}
+        large = {"songs": [{"song_id": i, "name": f"Song {i}"} for i in range(50)]}
+        cache.put("small", small)
+        cache.put("large", large)
+        cache.close()
+
+        reopened = PersistentCache(db_path)
+        assert reopened.get("small") == small
+        assert reopened.get("large") == large
+        assert reopened.get_stats().size == 2
+
+    def test_hits_are_batched(self, db_path):
+        cache = PersistentCache(db_path, hit_flush_size=3)
+        cache.put("a", 1)
+        cache.put("b", 2)
+
+        cache.get("a")
+        cache.get("a")
+        assert _hits(db_path) == {"a": 0, "b": 0}
+
+        cache.get("b")
+        assert _hits(db_path) == {"a": 2, "b": 1}
+
+        cache.get("missing")
+        cache.get("b")
+        cache.close()
+        assert _hits(db_path) == {"a": 2, "b": 2}
+
+        stats = cache.get_stats()
+        assert (stats.hits, stats.misses) == (4, 1)
+
+    def test_size_counter_and_eviction(self, db_path):
+        cache = PersistentCache(db_path, max_size=5, evict_batch=2)
+        for i in range(5):
+            cache.put(f"k{i}", i)
+        cache.put("k4", "replaced")
+        assert cache.get_stats().size == 5
+
+        cache.put("k5", 5)
+
+        stats = cache.get_stats()
+        assert (stats.size, stats.evictions) == (3, 3)
+        assert [cache.get(f"k{i}") for i in range(6)] == [None, None, None, 3, "replaced", 5]
+        assert cache.delete("k3")
+        assert not cache.delete("k3")
+        assert PersistentCache(db_path).get_stats().size == 2
+
+    def test_expired_entries(self, db_path):
+        cache = PersistentCache(db_path)
+        cache.put("old", 1, ttl=-1)
+        cache.put("stale", 2, ttl=-1)
+        cache.put("fresh", 3)
+
+        assert cache.get("old") is None
+        assert cache.cleanup_expired() == 1
+        assert cache.get("fresh") == 3
+        assert cache.get_stats().size == 1
+
+        cache.clear()
+        assert cache.get_stats().size == 0
+
+    def test_compute_cost_persists(self, db_path):
+        con = sqlite3.connect(db_path)
+        con.execute(
+            "CREATE TABLE l2_cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL, hits INTEGER DEFAULT 0)"
+        )
+        con.close()
+
+        cache = PersistentCache(db_path)
+        cache.put("recs", [1, 2], compute_seconds=2.5)
+        cache.put("plain", 1)
+        cache.close()
+
+        reopened = PersistentCache(db_path)
+        assert reopened.get_entry("recs") == ([1, 2], 2.5)
+        assert reopened.get_entry("plain") == (1, 0.0)
+        assert reopened.get_entry("missing") is None
+
+    def test_only_legacy_cache_table_dropped(self, tmp_path):
+        legacy, other = str(tmp_path / "legacy.db"), str(tmp_path / "other.db")
+        con = sqlite3.connect(legacy)
+        con.execute(
+            "CREATE TABLE cache (key TEXT PRIMARY KEY, value TEXT, created_at TEXT, "
+            "expires_at TEXT, hits INTEGER DEFAULT 0)"
+        )
+        con.close()
+        con = sqlite3.connect(other)
+        con.execute("CREATE TABLE cache (id INTEGER PRIMARY KEY, payload BLOB)")
+        con.execute("INSERT INTO cache (payload) VALUES (x'00')")
+        con.commit()
+        con.close()
+
+        PersistentCache(legacy).close()
+        PersistentCache(other).close()
+
+        con = sqlite3.connect(legacy)
+        assert con.execute("SELECT name FROM sqlite_master WHERE name = 'cache'").fetchall() == []
+        con.close()
+        con = sqlite3.connect(other)
+        assert con.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 1
+        con.close()
@@ -0,0 +1,218 @@
+"""
+=============================================================================
+POPULARITY STATISTICS - TEST SUITE
+=============================================================================
+
+Unit tests for PopularityStatsService and its consumers.
+
+Test Coverage:
+- Decayed play counts and catalog percentiles
+- Incremental refreshes (updated rows, new rows, new songs)
+- Both listening history layouts
+- Ranking, cold-start and multi-strategy consumers (shared service from the factories)
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_popularity_stats.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import sqlite3
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.popularity_stats import PopularityStatsService, get_popularity_service
+from backend.services.recommendation.ranking_engine import HybridRankingEngine, create_ranking_engine
+from backend.services.recommendation.cold_start import ColdStartHandler
+from backend.services.recommendation.multi_strategy_engine import (
+    CollaborativeStrategy,
+    MultiStrategyEngine,
+    RecommendationContext,
+    StrategyType,
+    create_multi_strategy_engine,
+)
+
+
+def _days_ago(days: float) -> str:
+    return f"datetime('now', '-{days} days')"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Catalog of 5 songs with per-(user, song) listening history."""
+    path = str(tmp_path / "music.db")
+    con = sqlite3.connect(path)
+    con.execute(
+        "CREATE TABLE songs (song_id INTEGER PRIMARY KEY, song_name TEXT, "
+        "artist TEXT, genre TEXT, mood TEXT, popularity INTEGER)"
+    )
+    con.executemany(
+        "INSERT INTO songs VALUES (?, ?, ?, 'pop', 'happy', ?)",
+        [(i, f"Song {i}", f"Artist {i}", pop) for i, pop in
+         [(1, 10), (2, 90), (3, None), (4, 40), (5, 70)]]
+    )
+    con.execute(
+        "CREATE TABLE listening_history (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "user_id INTEGER, song_id INTEGER, play_count INTEGER DEFAULT 1, last_played TIMESTAMP)"
+    )
+    for user_id, song_id, plays, days in [(1, 1, 4, 0), (2, 1, 2, 0), (1, 4, 6, 14), (1, 5, 1, 0)]:
+        con.execute(
+            f"INSERT INTO listening_history (user_id, song_id, play_count, last_played) "
+            f"VALUES (?, ?, ?, {_days_ago(days)})",
+            (user_id, song_id, plays)
+        )
+    con.commit()
+    con.close()
+    return path
+
+
+class TestPopularitySnapshot:
+    """Tests for snapshot contents."""
+
+    def test_decayed_plays_and_percentiles(self, db_path):
+        snapshot = PopularityStatsService(db_path, half_life_days=14.0).snapshot()
+
+        assert snapshot.song_ids.tolist() == [1, 2, 3, 4, 5]
+        assert snapshot.play_counts.tolist() == [6, 0, 0, 6, 1]
+        # Song 4's plays are one half-life old
+        assert snapshot.decayed_plays == pytest.approx([6, 0, 0, 3, 1], rel=1e-3)
+        assert snapshot.play_percentiles.tolist() == [1.0, 0.0, 0.0, 0.75, 0.5]
+        # songs.popularity with NULL -> 50
+        assert snapshot.catalog_percentiles.tolist() == [0.0, 1.0, 0.5, 0.25, 0.75]
+
+    def test_lookup_and_top(self, db_path):
+        snapshot = PopularityStatsService(db_path).snapshot()
+
+        values = snapshot.lookup([4, 99, None, 1])
+        assert values.tolist() == [0.75, 0.0, 0.0, 1.0]
+        # Unplayed songs 2 and 3 ordered by catalog popularity
+        assert snapshot.top(5) == [1, 4, 5, 2, 3]
+
+
+class TestIncrementalRefresh:
+    """Tests for incremental refreshes."""
+
+    def test_applies_only_changes(self, db_path):
+        service = PopularityStatsService(db_path)
+        first = service.snapshot()
+
+        con = sqlite3.connect(db_path)
+        con.execute(
+            "UPDATE listening_history SET play_count = play_count + 3, "
+            "last_played = datetime('now') WHERE user_id = 1 AND song_id = 5"
+        )
+        con.execute(
+            "INSERT INTO listening_history (user_id, song_id, play_count, last_played) "
+            "VALUES (3, 2, 1, datetime('now'))"
+        )
+        con.execute("INSERT INTO songs VALUES (6, 'Song 6', 'Artist 6', 'pop', 'sad', 5)")
+        con.commit()
+        con.close()
+
+        second = service.refresh()
+
+        assert second.version == first.version + 1
+        assert second.song_ids.tolist() == [1, 2, 3, 4, 5, 6]
+        assert second.play_counts.tolist() == [6, 1, 0, 6, 4, 0]
+        # Re-reading without changes adds nothing
+        assert service.refresh().play_counts.tolist() == second.play_counts.tolist()
+        # Earlier snapshots are not modified
+        assert first.play_counts.tolist() == [6, 0, 0, 6, 1]
+
+    def test_per_listen_history_layout(self, tmp_path):
+        path = str(tmp_path / "music.db")
+        con = sqlite3.connect(path)
+        con.execute("CREATE TABLE songs (song_id INTEGER PRIMARY KEY)")
+        con.executemany("INSERT INTO songs VALUES (?)", [(1,), (2,)])
+        con.execute(
+            "CREATE TABLE listening_history (history_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "user_id INTEGER, song_id INTEGER, listened_at TIMESTAMP)"
+        )
+        con.executemany(
+            "INSERT INTO listening_history (user_id, song_id, listened_at) VALUES (1, ?, datetime('now'))",
+            [(2,), (2,), (1,)]
+        )
+        con.commit()
+        con.close()
+
+        service = PopularityStatsService(path)
+        assert service.snapshot().play_counts.tolist() == [1, 2]
+        assert service.refresh().play_counts.tolist() == [1, 2]
+
+        con = sqlite3.connect(path)
+        con.executemany(
+            "INSERT INTO listening_history (user_id, song_id, listened_at) VALUES (2, ?, datetime('now'))",
+            [(1,), (1,)]
+        )
+        con.commit()
+        con.close()
+
+        assert service.refresh().play_counts.tolist() == [3, 2]
+        # Only the row id high-water mark is kept, not per-row state
+        assert service._high_water == 5
+
+    def test_missing_catalog_is_empty(self, tmp_path):
+        snapshot = PopularityStatsService(str(tmp_path / "empty.db")).snapshot()
+
+        assert len(snapshot) == 0 and not snapshot.has_plays
+
+
+class TestPopularityConsumers:
+    """Tests for engines reading the service."""
+
+    def test_ranking_popularity_independent_of_candidates(self, db_path):
+        engine = HybridRankingEngine(popularity=PopularityStatsService(db_path))
+        songs = [
+            {"song_id": i, "artist": f"Artist {i}", "mood": "happy",
+             "valence": 80, "energy": 70, "avg_rating": 4.0, "play_count": plays}
+            for i, plays in [(1, 6), (4, 6), (5, 1000)]
+        ]
+
+        full = engine.score_batch(songs, "happy")
+        subset = engine.score_batch(songs[1:], "happy")
+
+        assert full.popularity_boost[1] == subset.popularity_boost[0]
+        # Song 5's raw play_count field is ignored in favour of history
+        assert full.popularity_boost[2] < full.popularity_boost[0]
+
+    def test_factories_use_shared_service(self, db_path, monkeypatch):
+        monkeypatch.setenv("MMB_DB_PATH", db_path)
+        shared = get_popularity_service(db_path)
+
+        engine = create_ranking_engine()
+        multi = create_multi_strategy_engine()
+
+        assert engine.popularity is shared
+        assert multi.strategies[StrategyType.COLLABORATIVE].popularity is shared
+        assert multi.strategies[StrategyType.EXPLORATION].popularity is shared
+        shared.stop()
+
+    def test_constructors_start_no_service(self, db_path, monkeypatch):
+        monkeypatch.setenv("MMB_DB_PATH", db_path)
+        engine = HybridRankingEngine()
+        multi = MultiStrategyEngine()
+
+        assert engine.popularity is None
+        assert multi.strategies[StrategyType.COLLABORATIVE].popularity is None
+        assert engine.score_batch([{"song_id": 1, "play_count": 5}], "happy") is not None
+
+    def test_cold_start_baseline(self, db_path):
+        songs = ColdStartHandler(db_path)._popularity_baseline(3)
+
+        assert [s.song_id for s in songs] == [1, 4, 5]
+        assert songs[0].name == "Song 1"
+        assert songs[0].score > songs[-1].score
+
+    def test_collaborative_fallback(self, db_path):
+        strategy = CollaborativeStrategy(popularity=PopularityStatsService(db_path))
+        context = RecommendationContext(user_id=1, target_mood="happy")
+
+        top = strategy.score({"song_id": 1, "play_count": 10}, context)
+        unplayed = strategy.score({"song_id": 2, "play_count": 10}, context)
+
+        assert top.score == pytest.approx(0.6)
+        assert unplayed.score == pytest.approx(0.0)
@@ -0,0 +1,288 @@
+"""
+=============================================================================
+HYBRID RANKING ENGINE - TEST SUITE
+=============================================================================
+
+Unit tests for HybridRankingEngine.
+
+Test Coverage:
+- Sliding-window diversity accumulator
+- Diversity penalties during ranking
+- Columnar batch scoring
+- Lazy explanations (ranking, multi-strategy, explainability)
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_ranking_engine.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import math
+import random
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.recommendation.ranking_engine import (
+    HybridRankingEngine,
+    RankingConfig,
+    DiversityAccumulator,
+    RankingExplanation,
+    ScoringComponents,
+    _explanation_template,
+    song_va_coordinates,
+)
+from backend.services.recommendation.multi_strategy_engine import (
+    MultiStrategyEngine,
+    RecommendationContext,
+)
+from backend.services.recommendation.explainability import ExplainableRecommendation
+from backend.services.popularity_stats import PopularityStatsService
+
+
+def _make_songs(n: int = 200, seed: int = 9):
+    """Build a deterministic synthetic candidate list."""
+    rng = random.Random(seed)
+    return [
+        {
+            "song_id": i,
+            "song_name": f"Song {i}",
+            "artist": f"Artist {rng.randint(0, 15)}",
+            "genre": rng.choice(["pop", "rock", "edm", None]),
+            "mood": rng.choice(["happy", "sad", "Vui", "calm", "angry", ""]),
+            "valence": rng.uniform(0, 100),
+            "energy": rng.uniform(0, 100),
+            "play_count": rng.randint(0, 500),
+            "avg_rating": rng.uniform(0, 5),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+@pytest.fixture
+def popularity(tmp_path):
+    """Popularity service on an empty database (no catalog-wide plays)."""
+    return PopularityStatsService(str(tmp_path / "music.db"))
+
+
+def _window_penalty(song, window_songs):
+    """Reference penalty computed from the window contents."""
+    if not window_songs:
+        return 1.0
+    known = [s for s in window_songs if s is not None]
+    same_artist = sum(1 for s in known if s.get("artist") == song.get("artist", ""))
+    same_genre = sum(1 for s in known if s.get("genre") == song.get("genre", ""))
+    same_mood = sum(1 for s in known if song.get("mood") and s.get("mood") == song.get("mood"))
+    raw = (same_artist + 0.5 * same_genre + 0.25 * same_mood) / len(window_songs)
+    if known:
+        points = [song_va_coordinates(s) for s in known]
+        cv = sum(p[0] for p in points) / len(points)
+        ca = sum(p[1] for p in points) / len(points)
+        v, a = song_va_coordinates(song)
+        proximity = max(0.0, 1.0 - math.hypot(v - cv, a - ca) / 0.5)
+        raw += 0.25 * proximity * len(known) / len(window_songs)
+    return 1.0 - min(raw, 1.0)
+
+
+class TestDiversityAccumulator:
+    """Tests for DiversityAccumulator."""
+
+    def test_empty_window_is_fully_diverse(self):
+        assert DiversityAccumulator(5).penalty({"artist": "A", "genre": "pop"}) == 1.0
+
+    def test_counts_slide_with_window(self):
+        songs = _make_songs(40)
+        acc = DiversityAccumulator(5)
+
+        for i, song in enumerate(songs):
+            window = songs[max(0, i - 5):i]
+            assert acc.penalty(song) == pytest.approx(_window_penalty(song, window))
+            acc.push(song)
+
+        assert len(acc) == 5
+        assert sum(acc.artists.values()) == 5
+
+    def test_unknown_songs_take_a_slot(self):
+        acc = DiversityAccumulator(3)
+        acc.push(None)
+        acc.push({"artist": "A", "genre": "pop", "valence": 100, "energy": 100})
+
+        assert acc.penalty({"artist": "A", "genre": "rock"}) == pytest.approx(0.5)
+        assert acc.centroid == pytest.approx((1.0, 1.0))
+
+    def test_mood_repeats_and_centroid_proximity(self):
+        acc = DiversityAccumulator(2)
+        acc.push({"artist": "A", "genre": "pop", "mood": "sad", "valence": 20, "energy": 20})
+        acc.push({"artist": "B", "genre": "pop", "mood": "sad", "valence": 30, "energy": 30})
+
+        near = {"artist": "C", "genre": "rock", "mood": "sad", "valence": 25, "energy": 25}
+        far = {"artist": "C", "genre": "rock", "mood": "happy", "valence": 95, "energy": 95}
+
+        # Two mood repeats (0.25 each over a window of 2) plus a full proximity penalty
+        assert acc.penalty(near) == pytest.approx(1.0 - (0.25 + 0.25))
+        assert acc.penalty(far) == 1.0
+
+
+class TestRankingDiversity:
+    """Tests for diversity penalties inside rank_songs."""
+
+    def test_penalties_follow_scoring_order(self, popularity):
+        songs = _make_songs()
+        engine = HybridRankingEngine(RankingConfig(diversity_window=4), popularity)
+        already = [3, 7, 999]
+
+        results = engine.rank_songs(songs, "happy", already_recommended=already, limit=len(songs))
+        by_id = {r.song_id: r for r in results}
+
+        lookup = {s["song_id"]: s for s in songs}
+        window = [lookup.get(i) for i in already]
+        for song in songs:
+            expected = _window_penalty(song, window[-4:])
+            assert by_id[song["song_id"]].components.diversity_penalty == pytest.approx(expected)
+            window.append(song)
+
+    def test_results_sorted_and_limited(self, popularity):
+        results = HybridRankingEngine(popularity=popularity).rank_songs(_make_songs(), "sad", limit=10)
+
+        assert len(results) == 10
+        assert [r.rank for r in results] == list(range(1, 11))
+        scores = [r.final_score for r in results]
+        assert scores == sorted(scores, reverse=True)
+
+
+class TestBatchScoring:
+    """Tests for columnar batch scoring."""
+
+    def test_components_match_formulas(self, popularity):
+        engine = HybridRankingEngine(popularity=popularity)
+        song = {
+            "song_id": 1, "artist": "A", "genre": "rock", "mood": "Vui",
+            "valence": 75, "energy": 60, "play_count": 50, "avg_rating": 4.0,
+        }
+        prefs = {"mood": {"happy": 2.0}, "artist": {"A": 1.25}}
+
+        batch = engine.score_batch([song], "happy", target_intensity=0.6, user_prefs=prefs)
+        c = batch.components_at(0)
+
+        assert c.categorical_mood_score == 1.0
+        # (0.5, 0.6) vs happy (0.8, 0.7)
+        va = 1 - ((0.3 ** 2 + 0.1 ** 2) ** 0.5) / 5 ** 0.5
+        assert c.va_space_score == pytest.approx(va)
+        assert c.intensity_match == pytest.approx(1.0)
+        assert c.user_preference == pytest.approx((1.0 * 0.5) ** 0.5)
+        assert c.recency_penalty == 1.0
+        assert c.popularity_boost == pytest.approx(min((0.6 * 0.8 + 0.4) / 0.95, 1.0))
+
+    def test_unusable_rows_skipped(self, popularity):
+        songs = _make_songs(10)
+        songs[2]["valence"] = None
+        songs[5]["energy"] = "loud"
+
+        batch = HybridRankingEngine(popularity=popularity).score_batch(songs, "sad")
+
+        ids = [s["song_id"] for s in batch.columns.songs]
+        assert ids == [s["song_id"] for i, s in enumerate(songs) if i not in (2, 5)]
+        assert batch.final_score.shape == (8,)
+
+    def test_non_numeric_preference_weights_dropped(self, popularity):
+        engine = HybridRankingEngine(popularity=popularity)
+        songs = [
+            {"song_id": 1, "artist": "A", "genre": "rock", "mood": "happy"},
+            {"song_id": 2, "artist": "B", "genre": "pop", "mood": "happy"},
+        ]
+        prefs = {"mood": {"happy": "2.0"}, "artist": {"A": "lots", "B": None}, "genre": {"pop": float("nan")}}
+
+        batch = engine.score_batch(songs, "happy", user_prefs=prefs)
+
+        # Only the (string-encoded) mood weight is usable for either song
+        assert batch.user_preference.tolist() == pytest.approx([1.0, 1.0])
+
+    def test_rank_songs_uses_batch_scores(self, popularity):
+        songs = _make_songs()
+        engine = HybridRankingEngine(popularity=popularity)
+
+        batch = engine.score_batch(songs, "calm", already_recommended=[1, 2])
+        results = engine.rank_songs(songs, "calm", already_recommended=[1, 2], limit=5)
+
+        best = sorted(range(len(songs)), key=lambda i: -batch.final_score[i])[:5]
+        assert [r.song_id for r in results] == [songs[i]["song_id"] for i in best]
+        assert results[0].components == batch.components_at(best[0])
+        assert results[0].explanation.song_id == results[0].song_id
+
+
+class TestLazyExplanations:
+    """Tests for explanations rendered only when read."""
+
+    def test_ranking_explanation_renders_from_signature(self):
+        explanation = RankingExplanation(
+            song_id=1, song_name="Song {1}", artist="A",
+            reason_keys=("mood", "intensity_high", "novelty", "popularity"),
+            target_mood="happy",
+            contributions=(0.3, 0.1, 0.0, 0.1, 0.0, 0.0),
+        )
+
+        assert explanation.primary_reason == "phù hợp tâm trạng happy"
+        assert explanation.secondary_reasons == ["cường độ mạnh mẽ", "bài hát mới lạ"]
+        assert explanation.to_natural_language("vi") == (
+            'Gợi ý "Song {1}" của A vì: phù hợp tâm trạng happy; cường độ mạnh mẽ; bài hát mới lạ.'
+        )
+        assert explanation.to_natural_language("en").startswith('Recommended "Song {1}" by A because: ')
+        assert explanation.top_contributor == "mood"
+        assert explanation.contribution_percentages["mood"] == pytest.approx(60.0)
+
+    def test_templates_memoized_per_signature(self, popularity):
+        results = HybridRankingEngine(popularity=popularity).rank_songs(_make_songs(), "happy", limit=20)
+        signatures = {r.explanation.reason_keys for r in results}
+
+        _explanation_template.cache_clear()
+        for r in results:
+            r.explanation.to_natural_language("en")
+
+        info = _explanation_template.cache_info()
+        assert info.misses == len(signatures)
+        assert info.hits == len(results) - len(signatures)
+
+    def test_fallback_reason(self, popularity):
+        engine = HybridRankingEngine(popularity=popularity)
+        explanation = engine._generate_explanation(
+            {"song_id": 1}, 0.1, ScoringComponents(), "sad", 0.5
+        )
+        assert explanation.reason_keys == ("overall",)
+        assert explanation.primary_reason == "điểm tổng hợp cao"
+
+    def test_multi_strategy_explains_top_k_only(self, popularity):
+        songs = [dict(s, genre=s["genre"] or "pop") for s in _make_songs(50)]
+        context = RecommendationContext(user_id=1, target_mood="happy")
+
+        result = MultiStrategyEngine(popularity=popularity).recommend(songs, context, top_k=5)
+
+        assert len(result.songs) == 5
+        for candidate in result.songs:
+            assert candidate.explanation_components
+
+    def test_strategy_text_rendered_on_demand(self, popularity):
+        song = dict(_make_songs(1)[0], genre="pop")
+        context = RecommendationContext(user_id=1, target_mood="happy")
+
+        for strategy in MultiStrategyEngine(popularity=popularity).strategies.values():
+            score = strategy.score(song, context)
+            assert score.explanation == ""
+            text = strategy.explain(song, score, context)
+            assert text and score.explanation == text
+
+    def test_explain_batch_is_lazy(self):
+        songs = _make_songs(30)
+        scores = [{"emotion": 0.9, "content": 0.4}] * len(songs)
+
+        batch = ExplainableRecommendation().explain_batch(songs, scores)
+
+        assert len(batch) == 30
+        assert batch.rendered_count == 0
+        first = batch[0]
+        assert batch[0] is first
+        assert [e.song_id for e in batch[:3]] == [1, 2, 3]
+        assert batch[-1].song_id == 30
+        assert batch.rendered_count == 4
@@ -0,0 +1,179 @@
+"""
+=============================================================================
+SONG MOODS - TEST SUITE
+=============================================================================
+
+Unit tests for the normalized song_moods table.
+
+Test Coverage:
+- Backfill from mood/mood_confidence and legacy moods columns
+- Sync on repository and raw-layer mood writes
+- Catalog invalidation after the mood service commits
+- Indexed mood lookups in repositories and scoring
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_song_moods.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import sqlite3
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unittest.mock import MagicMock
+
+from backend.repositories import (
+    CATALOG_TAG,
+    SongRepository,
+    ensure_song_moods,
+    get_catalog_generation,
+    get_invalidation_bus,
+)
+from backend.src.repo.song_repo import connect, update_song
+from backend.src.services.mood_services import DBMoodEngine
+from backend.src.database.migrations.migrate_song_moods import run_migration
+from backend.services.recommendation.scoring_engine import ScoringEngine
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Catalog with both the current and the legacy mood columns."""
+    path = str(tmp_path / "music.db")
+    con = sqlite3.connect(path)
+    con.execute(
+        "CREATE TABLE songs (song_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, "
+        "song_name TEXT, artist TEXT, genre TEXT, suy_score REAL, reason TEXT, "
+        "moods TEXT, mood TEXT, mood_confidence REAL, valence REAL, energy REAL, "
+        "tempo REAL, popularity INTEGER)"
+    )
+    con.executemany(
+        "INSERT INTO songs (song_id, name, artist, mood, mood_confidence, moods) "
+        "VALUES (?, ?, 'A', ?, ?, ?)",
+        [
+            (1, "Song 1", "happy", 0.9, None),
+            (2, "Song 2", "sad", 0.6, "Buồn, sad"),
+            (3, "Song 3", None, None, "Vui"),
+            (4, "Song 4", "happy", 0.4, None),
+            (5, "Song 5", None, None, None),
+            (6, "Song 6", "sadness", None, None),
+        ]
+    )
+    con.commit()
+    con.close()
+    return path
+
+
+def _moods(path):
+    con = sqlite3.connect(path)
+    rows = con.execute("SELECT song_id, mood, confidence FROM song_moods ORDER BY song_id, mood").fetchall()
+    con.close()
+    return rows
+
+
+class TestBackfill:
+    """Tests for building song_moods from songs."""
+
+    def test_migration_backfills_all_columns(self, db_path):
+        assert run_migration(db_path)
+
+        assert _moods(db_path) == [
+            (1, "happy", 0.9),
+            (2, "buồn", 1.0),
+            (2, "sad", 1.0),
+            (3, "vui", 1.0),
+            (4, "happy", 0.4),
+            (6, "sadness", 1.0),
+        ]
+
+    def test_mood_lookup_uses_index(self, db_path):
+        con = sqlite3.connect(db_path)
+        ensure_song_moods(con)
+        plan = " ".join(
+            str(row[-1]) for row in con.execute(
+                "EXPLAIN QUERY PLAN SELECT song_id FROM song_moods WHERE mood = ?", ("sad",)
+            )
+        )
+        con.close()
+
+        assert "idx_song_moods_mood" in plan
+
+    def test_database_without_catalog_untouched(self, tmp_path):
+        path = str(tmp_path / "empty.db")
+        con = sqlite3.connect(path)
+        ensure_song_moods(con, path)
+
+        assert con.execute("SELECT name FROM sqlite_master").fetchall() == []
+        con.close()
+
+
+class TestSync:
+    """Tests for keeping song_moods in sync with mood writes."""
+
+    def test_repository_writes(self, db_path):
+        repo = SongRepository(db_path)
+
+        assert [s["song_id"] for s in repo.get_by_mood("Happy")] == [1, 4]
+
+        repo.update(4, mood="sad", mood_confidence=0.8)
+        new_id = repo.add("Song 7", "B", moods="happy")
+        repo.delete(1)
+
+        assert [s["song_id"] for s in repo.get_by_mood("happy")] == [new_id]
+        assert [s["song_id"] for s in repo.get_by_mood("sad")] == [2, 4]
+        assert [s["song_id"] for s in repo.get_random(10, mood="vui")] == [3]
+
+    def test_raw_layer_update(self, db_path):
+        run_migration(db_path)
+        con = connect(db_path)
+        update_song(con, 5, {"mood": "angry", "mood_confidence": 0.7})
+        update_song(con, 1, {"suy_score": 8.0})
+        con.commit()
+        con.close()
+
+        rows = _moods(db_path)
+        assert (5, "angry", 0.7) in rows
+        assert (1, "happy", 0.9) in rows
+
+    def test_mood_service_publishes_after_commit(self, db_path):
+        run_migration(db_path)
+        con = sqlite3.connect(db_path)
+        con.execute("ALTER TABLE songs ADD COLUMN intensity INTEGER")
+        con.execute("ALTER TABLE songs ADD COLUMN mood_score REAL")
+        con.close()
+        seen = []
+
+        class _Probe:
+            def delete(self, key):
+                con = sqlite3.connect(db_path)
+                seen.append(con.execute("SELECT mood FROM songs WHERE song_id = 5").fetchone()[0])
+                con.close()
+
+        probe = _Probe()
+        get_invalidation_bus().tag(probe, "neighbors", [CATALOG_TAG])
+        service = DBMoodEngine(db_path, refit_on_change=False)
+        service._engine = MagicMock()
+        service._engine.predict.return_value = {"mood": "angry", "intensity": 2, "mood_score": 0.5}
+        generation = get_catalog_generation()
+
+        assert service.update_one(5)
+
+        assert seen == ["angry"]
+        assert get_catalog_generation() == generation + 1
+
+
+class TestMoodCandidates:
+    """Tests for mood-filtered candidate retrieval."""
+
+    def test_tagged_songs_first_then_untagged(self, db_path):
+        engine = ScoringEngine(db_path)
+
+        songs = engine._get_candidate_songs("sad", limit=10)
+
+        # Exact label match: "sadness" is no longer a substring hit
+        assert [s["song_id"] for s in songs] == [2, 5]
+        assert [s["song_id"] for s in engine._get_candidate_songs("sad", limit=1)] == [2]
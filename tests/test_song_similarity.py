@@ -0,0 +1,318 @@
+"""
+=============================================================================
+SONG SIMILARITY - TEST SUITE
+=============================================================================
+
+Unit tests for SongSimilarityEngine.
+
+Test Coverage:
+- Vectorized index scoring (matches per-pair calculate_similarity)
+- Top-k search filters (target, same artist, min similarity)
+- Catalog index caching per generation
+- MMR diversification (running max-similarity vector)
+- Persisted song_neighbors table (blockwise kNN, freshness, fallback)
+- Catalog-write refresh and "more like this" relevance scale
+
+Author: MusicMoodBot Team
+
+Run with: pytest tests/test_song_similarity.py -v
+=============================================================================
+"""
+
+import pytest
+import sys
+import os
+import random
+import sqlite3
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.src.pipelines.song_similarity import SongSimilarityEngine
+from backend.src.ranking.diversity import mmr_select
+from backend.src.services.neighbor_service import SongNeighborService
+from backend.src.search.tfidf_search import create_search_engine
+from backend.repositories import bump_catalog_generation
+
+
+MOODS = ["happy", "sad", "energetic", "stress", "angry", None]
+GENRES = ["pop", "indie pop", "rock/metal", "edm+house", "acoustic", None]
+
+
+def _make_songs(n: int = 300, seed: int = 11):
+    """Build a deterministic synthetic catalog."""
+    rng = random.Random(seed)
+    return [
+        {
+            "song_id": i,
+            "song_name": f"Song {i}",
+            "artist": f"Artist {i % 9}",
+            "mood": rng.choice(MOODS),
+            "genre": rng.choice(GENRES),
+            "energy": rng.choice([None, rng.uniform(0, 100)]),
+            "happiness": rng.uniform(0, 100),
+            "danceability": rng.uniform(0, 100),
+            "acousticness": rng.uniform(0, 100),
+            "tempo": rng.uniform(50, 200),
+            "loudness": rng.uniform(-40, 0),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+class TestIndexScoring:
+    """Tests for the catalog feature matrix."""
+
+    @pytest.fixture
+    def songs(self):
+        return _make_songs()
+
+    def test_scores_match_pairwise(self, songs):
+        engine = SongSimilarityEngine()
+        index = engine.build_index(songs)
+
+        for target in songs[:15]:
+            scores = engine.score_against_index(target, index)
+            expected = [engine.calculate_similarity(target, s).similarity_score for s in songs]
+            assert np.allclose(scores, expected)
+
+    def test_top_k_matches_full_sort(self, songs):
+        engine = SongSimilarityEngine()
+        target = songs[0]
+
+        results = engine.find_similar_songs(target, songs, top_k=10)
+
+        expected = sorted(
+            (engine.calculate_similarity(target, s) for s in songs[1:]),
+            key=lambda r: r.similarity_score, reverse=True
+        )[:10]
+        assert [r.song_id for r in results] == [r.song_id for r in expected]
+
+    def test_filters(self, songs):
+        engine = SongSimilarityEngine()
+        target = songs[0]
+
+        results = engine.find_similar_songs(
+            target, songs, top_k=20, exclude_same_artist=True, min_similarity=0.6
+        )
+
+        assert results
+        assert all(r.song_id != target["song_id"] for r in results)
+        assert all(r.song["artist"] != target["artist"] for r in results)
+        assert all(r.similarity_score >= 0.6 for r in results)
+
+
+class TestCatalogIndex:
+    """Tests for generation-keyed index caching."""
+
+    def test_rebuilds_only_on_generation_change(self):
+        engine = SongSimilarityEngine()
+        songs = _make_songs(50)
+        loads = []
+
+        def loader():
+            loads.append(1)
+            return songs
+
+        first = engine.ensure_index((1, 50), loader)
+        assert engine.ensure_index((1, 50), loader) is first
+        assert len(loads) == 1
+
+        second = engine.ensure_index((2, 50), loader)
+        assert second is not first
+        assert len(loads) == 2
+
+    def test_search_without_candidates_uses_index(self):
+        engine = SongSimilarityEngine()
+        songs = _make_songs(50)
+
+        assert engine.find_similar_songs(songs[0]) == []
+
+        index = engine.ensure_index(1, lambda: songs)
+        results = engine.find_similar_songs(index.get_song(5), top_k=5)
+        assert len(results) == 5
+        assert all(r.song_id != 5 for r in results)
+
+
+def cosine_similarity_columns(vectors):
+    """Similarity source over row vectors (cosine similarity)."""
+    vectors = np.asarray(vectors, dtype=np.float64)
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return lambda i: unit @ unit[i]
+
+
+class TestMMR:
+    """Tests for MMR selection."""
+
+    def test_zero_weight_is_relevance_order(self):
+        relevance = [0.2, 0.9, 0.5, 0.7]
+        columns = cosine_similarity_columns(np.eye(4))
+
+        assert mmr_select(relevance, columns, 3, diversity_weight=0.0) == [1, 3, 2]
+
+    def test_penalizes_near_duplicates(self):
+        vectors = np.array([[1.0, 0.0], [1.0, 0.01], [0.0, 1.0]])
+        relevance = [1.0, 0.95, 0.6]
+
+        picks = mmr_select(relevance, cosine_similarity_columns(vectors), 2, diversity_weight=0.5)
+        assert picks == [0, 2]
+
+    def test_k_larger_than_pool(self):
+        columns = cosine_similarity_columns(np.ones((3, 2)))
+        assert sorted(mmr_select([0.1, 0.2, 0.3], columns, 10)) == [0, 1, 2]
+        assert mmr_select([], columns, 5) == []
+
+    def test_diverse_similar_matches_pairwise_mmr(self):
+        engine = SongSimilarityEngine()
+        songs = _make_songs(120)
+        target = songs[0]
+        weight = 0.4
+
+        results = engine.find_diverse_similar(target, songs, top_k=6, diversity_weight=weight)
+
+        # Reference: original O(k^2 n) greedy MMR
+        remaining = sorted(
+            (engine.calculate_similarity(target, s) for s in songs[1:]),
+            key=lambda r: r.similarity_score, reverse=True
+        )
+        expected = [remaining.pop(0)]
+        while len(expected) < 6:
+            mmr = [
+                (1 - weight) * c.similarity_score - weight * max(
+                    engine.calculate_similarity(c.song, sel.song).similarity_score
+                    for sel in expected
+                )
+                for c in remaining
+            ]
+            expected.append(remaining.pop(int(np.argmax(mmr))))
+
+        assert [r.song_id for r in results] == [r.song_id for r in expected]
+
+
+class TestSongNeighbors:
+    """Tests for the persisted neighbour table."""
+
+    COLUMNS = (
+        "song_id", "song_name", "artist", "mood", "genre", "energy", "happiness",
+        "danceability", "acousticness", "tempo", "loudness"
+    )
+
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        path = str(tmp_path / "music.db")
+        con = sqlite3.connect(path)
+        con.execute(
+            "CREATE TABLE songs (song_id INTEGER PRIMARY KEY, song_name TEXT, artist TEXT, "
+            "mood TEXT, genre TEXT, energy REAL, happiness REAL, danceability REAL, "
+            "acousticness REAL, tempo REAL, loudness REAL)"
+        )
+        con.executemany(
+            f"INSERT INTO songs VALUES ({', '.join('?' * len(self.COLUMNS))})",
+            [tuple(song[c] for c in self.COLUMNS) for song in _make_songs(150)]
+        )
+        con.commit()
+        con.close()
+        return path
+
+    @pytest.fixture
+    def service(self, db_path):
+        return SongNeighborService(db_path, k=10, block_size=32, engine=SongSimilarityEngine())
+
+    def test_unbuilt_table_falls_back(self, service):
+        assert service.get_neighbors(1, 5) is None
+        service.wait_for_refresh()
+        assert service.is_fresh()
+
+    def test_neighbors_match_on_the_fly_search(self, service):
+        service.refresh()
+        songs = _make_songs(150)
+        engine = SongSimilarityEngine()
+
+        for song_id in (1, 42, 150):
+            stored = service.get_neighbors(song_id, 10)
+            expected = engine.find_similar_songs(songs[song_id - 1], songs, top_k=10)
+            assert [s["song_id"] for s, _ in stored] == [r.song_id for r in expected]
+            assert np.allclose([score for _, score in stored], [r.similarity_score for r in expected])
+
+    def test_exclude_same_artist(self, service):
+        service.refresh()
+
+        stored = service.get_neighbors(1, 3, exclude_same_artist=True)
+        assert len(stored) == 3
+        assert all(s["artist"] != "Artist 1" for s, _ in stored)
+
+    def test_catalog_change_marks_stale(self, service, db_path):
+        service.refresh()
+        assert service.get_neighbors(1, 5) is not None
+        assert service.get_neighbors(1, 50) is None  # Above stored k
+
+        con = sqlite3.connect(db_path)
+        con.execute("INSERT INTO songs (song_id, song_name, artist) VALUES (999, 'New', 'New Artist')")
+        con.commit()
+        con.close()
+
+        assert not service.is_fresh()
+        service.refresh()
+        assert service.get_neighbors(999, 5) is not None
+
+    def test_pairs_are_unique(self, service, db_path):
+        service.refresh()
+        service.refresh()
+
+        con = sqlite3.connect(db_path)
+        total, pairs = con.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT song_id || ':' || neighbor_id) FROM song_neighbors"
+        ).fetchone()
+        con.close()
+        assert total == pairs == 150 * 10
+
+    def test_unkeyed_table_is_rebuilt(self, db_path):
+        con = sqlite3.connect(db_path)
+        con.execute(
+            "CREATE TABLE song_neighbors (song_id INTEGER, neighbor_id INTEGER, "
+            "score REAL, rank INTEGER, model_version TEXT)"
+        )
+        con.commit()
+        con.close()
+
+        service = SongNeighborService(db_path, k=10, engine=SongSimilarityEngine())
+        service.refresh()
+        con = sqlite3.connect(db_path)
+        with pytest.raises(sqlite3.IntegrityError):
+            con.execute("INSERT INTO song_neighbors SELECT * FROM song_neighbors LIMIT 1")
+        con.close()
+
+    def test_catalog_write_schedules_refresh(self, service, db_path):
+        service.refresh()
+        con = sqlite3.connect(db_path)
+        con.execute("INSERT INTO songs (song_id, song_name, artist) VALUES (999, 'New', 'New Artist')")
+        con.commit()
+        con.close()
+
+        bump_catalog_generation([999])
+        service.wait_for_refresh()
+
+        assert service.is_fresh()
+        assert service.get_neighbors(999, 5) is not None
+
+    def test_similar_search_scale_independent_of_source(self, service):
+        service.refresh()
+        engine = create_search_engine([
+            {**song, "mood": song["mood"] or "", "genre": song["genre"] or ""}
+            for song in _make_songs(150)
+        ])
+        fallback = dict(
+            (song["song_id"], score) for song, score in engine.search_similar(1, top_k=150)
+        )
+
+        engine.neighbor_source = service.get_neighbors
+        results = engine.search_similar(1, top_k=10)
+
+        stored = [song["song_id"] for song, _ in service.get_neighbors(1, 10)]
+        assert sorted(song["song_id"] for song, _ in results) == sorted(stored)
+        for song, score in results:
+            assert score == pytest.approx(fallback[song["song_id"]])
+        scores = [score for _, score in results]
+        assert scores == sorted(scores, reverse=True)
@@ -9,6 +9,7 @@ sys.stdout.reconfigure(encoding='utf-8')  # Fix encoding issues
 
 from backend.src.pipelines.mood_engine import MoodEngine, EngineConfig
 from backend.src.services.constants import Song, MOODS
+from backend.repositories import sync_song_moods
 
 def calculate_missing_attributes():
     """Calculate and update missing music attributes in database"""
@@ -126,6 +127,7 @@ def calculate_missing_attributes():
             update['song_id']
         ))
     
+    sync_song_moods(conn, [update['song_id'] for update in updates])
     conn.commit()
     print(f"Successfully updated {len(updates)} songs!")
     